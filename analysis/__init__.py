@@ -0,0 +1,16 @@
+"""Offline analysis of many measurement files at once.
+
+The runs are loaded into arrays which are stacked along the first axis
+(shorter runs are padded with NaN), so a quantity is computed for hundreds of
+files with a few numpy operations instead of a script loop per file. Results
+of a file are cached under the hash of its content, see analysis/cache.py.
+
+:usage:
+    from analysis import ResultCache, resistance_vs_temperature
+    result = resistance_vs_temperature(glob('/data/*.dat'), cache=ResultCache('/data/.analysis'))
+    result['R'], result['T']
+"""
+from .cache import ResultCache
+from .fits import fit_lines
+from .quantities import conductance_vs_time, magnetoresistance, resistance_vs_temperature
+from .runs import Run, load_run, load_runs, split_curves, stack
@@ -0,0 +1,102 @@
+"""Cache of analysis results, keyed on the content of the data file."""
+import hashlib
+import json
+import os
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+Result = Dict[str, np.ndarray]
+
+
+class ResultCache:
+    """Stores the arrays computed from a file as '<directory>/<name>-<file hash>.npz'.
+
+    Hashing a file means reading it, so the hash is remembered together with
+    the size and modification time of the file and only computed again if
+    those change.
+    """
+
+    HASHES = 'hashes.json'
+    BLOCK_SIZE = 1024 * 1024
+
+    def __init__(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._hashes_path = os.path.join(directory, self.HASHES)
+        try:
+            with open(self._hashes_path) as file_handle:
+                self._hashes = json.load(file_handle)  # type: Dict[str, list]
+        except (OSError, ValueError):
+            self._hashes = {}
+        self._changed = False
+
+    def file_hash(self, path: str) -> str:
+        path = os.path.abspath(path)
+        status = os.stat(path)
+        known = self._hashes.get(path)
+        if known is not None and known[0] == status.st_size and known[1] == status.st_mtime_ns:
+            return known[2]
+
+        digest = hashlib.sha1()
+        with open(path, 'rb') as file_handle:
+            for block in iter(lambda: file_handle.read(self.BLOCK_SIZE), b''):
+                digest.update(block)
+        self._hashes[path] = [status.st_size, status.st_mtime_ns, digest.hexdigest()]
+        self._changed = True
+        return digest.hexdigest()
+
+    def _result_path(self, name: str, path: str) -> str:
+        return os.path.join(self._directory, '{}-{}.npz'.format(name, self.file_hash(path)))
+
+    def get(self, name: str, path: str) -> Optional[Result]:
+        """The result of name for the file, None if it was not computed yet."""
+        try:
+            with np.load(self._result_path(name, path)) as stored:
+                return {key: stored[key] for key in stored.files}
+        except (OSError, ValueError):
+            return None
+
+    def put(self, name: str, path: str, result: Result) -> None:
+        result_path = self._result_path(name, path)
+        temporary = result_path + '.tmp.npz'
+        np.savez(temporary, **result)
+        os.replace(temporary, result_path)
+
+    def save(self) -> None:
+        """Write the remembered file hashes, call it after a batch of files."""
+        if not self._changed:
+            return
+        temporary = self._hashes_path + '.tmp'
+        with open(temporary, 'w') as file_handle:
+            json.dump(self._hashes, file_handle)
+        os.replace(temporary, self._hashes_path)
+        self._changed = False
+
+
+def cached(name: str, paths, compute: Callable, cache: Optional[ResultCache]) -> Dict[str, Result]:
+    """Return the result of every file, compute is called once with the paths which are not cached.
+
+    :param name: name of the result including its parameters, part of the cache file name
+    :param compute: takes a list of paths and returns a dict path -> result
+    """
+    paths = list(paths)
+    if cache is None:
+        return compute(paths)
+
+    results = {}
+    missing = []
+    for path in paths:
+        result = cache.get(name, path)
+        if result is None:
+            missing.append(path)
+        else:
+            results[path] = result
+
+    if missing:
+        computed = compute(missing)
+        for path, result in computed.items():
+            cache.put(name, path, result)
+        results.update(computed)
+    cache.save()
+    return results
@@ -0,0 +1,37 @@
+"""Least-squares fits of many curves at once."""
+from typing import Tuple
+
+import numpy as np
+
+
+def fit_lines(x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Fit y = m x + b to every row of x and y, like np.polyfit(x[i], y[i], 1) for each i.
+
+    NaN in either array (e.g. the padding of stack) is left out. Rows with
+    less than two points or without spread in x get NaN.
+
+    :param x: array of shape (curves, points)
+    :param y: array of the same shape
+    :return: slopes m and intercepts b, one per row
+    """
+    x = np.atleast_2d(np.asarray(x, dtype=float))
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    valid = np.isfinite(x) & np.isfinite(y)
+    x = np.where(valid, x, 0.0)
+    y = np.where(valid, y, 0.0)
+
+    count = valid.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # centered sums are numerically safer than the raw normal equations
+        x_mean = x.sum(axis=1) / count
+        y_mean = y.sum(axis=1) / count
+        dx = np.where(valid, x - x_mean[:, None], 0.0)
+        dy = np.where(valid, y - y_mean[:, None], 0.0)
+        spread = (dx * dx).sum(axis=1)
+        slopes = (dx * dy).sum(axis=1) / spread
+        intercepts = y_mean - slopes * x_mean
+
+    invalid = (count < 2) | (spread == 0)
+    slopes[invalid] = np.nan
+    intercepts[invalid] = np.nan
+    return slopes, intercepts
@@ -0,0 +1,130 @@
+"""Derived quantities of many runs: R(T), G(t) and the magnetoresistance."""
+import hashlib
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+from .cache import ResultCache, cached
+from .fits import fit_lines
+from .runs import Run, load_runs, split_curves, stack
+
+
+def _combine(paths: Sequence[str], results: Dict[str, Dict[str, np.ndarray]], names: Sequence[str]) -> Dict:
+    """Concatenate the per-file results, 'file' is the index of the file in paths."""
+    combined = {name: np.concatenate([results[path][name] for path in paths]) if paths else np.empty(0)
+                for name in names}
+    combined['file'] = np.concatenate([np.full(len(results[path][names[0]]), index)
+                                       for index, path in enumerate(paths)]) if paths else np.empty(0, int)
+    combined['paths'] = list(paths)
+    return combined
+
+
+def resistance_vs_temperature(paths: Iterable[str], temperature: str = 'T3', gap_factor: float = 10.0,
+                              cache: Optional[ResultCache] = None) -> Dict:
+    """R(T) of I-V sweep files (SMUTempSweepIV) and constant-voltage files (SMUTempSweep).
+
+    Every I-V curve of every file is fitted in one go with V = R I + b, as
+    SMUTempSweepIV does for its live plot. Files at a fixed voltage give
+    R = V / I for every point.
+
+    :param temperature: column with the sample temperature
+    :param gap_factor: see split_curves
+    :return: 'R' and 'T' (mean of each curve), 'file' and 'paths'
+    """
+    paths = list(paths)
+
+    def compute(missing):
+        runs = load_runs(missing, ['Datetime', 'Voltage', 'Current', temperature])
+        sweeps = [run for run in runs if np.ptp(run['Voltage']) > 0]
+        fixed = [run for run in runs if np.ptp(run['Voltage']) == 0]
+
+        results = {}
+        curves = [(run.path, curve) for run in sweeps for curve in split_curves(run, gap_factor)]
+        if curves:
+            curve_runs = [curve for _, curve in curves]
+            resistances, _ = fit_lines(stack(curve_runs, 'Current'), stack(curve_runs, 'Voltage'))
+            temperatures = np.nanmean(stack(curve_runs, temperature), axis=1)
+            owners = np.array([path for path, _ in curves])
+            for run in sweeps:
+                mine = owners == run.path
+                results[run.path] = dict(R=resistances[mine], T=temperatures[mine])
+
+        for run in fixed:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                results[run.path] = dict(R=run['Voltage'] / run['Current'], T=run[temperature].astype(float))
+        return results
+
+    name = 'rt-{}-{}'.format(temperature, gap_factor)
+    return _combine(paths, cached(name, paths, compute, cache), ['R', 'T'])
+
+
+def conductance_vs_time(paths: Iterable[str], cache: Optional[ResultCache] = None) -> Dict:
+    """G = I / V against the seconds since the start of each run (SMU2ProbeIvt, SMUTempSweep).
+
+    :return: 't' and 'G' stacked to arrays of shape (files, points), padded with NaN, and 'paths'
+    """
+    paths = list(paths)
+
+    def compute(missing):
+        results = {}
+        for run in load_runs(missing, ['Datetime', 'Voltage', 'Current']):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                conductance = np.where(run['Voltage'] != 0, run['Current'] / run['Voltage'], np.nan)
+            results[run.path] = dict(t=run.seconds, G=conductance)
+        return results
+
+    results = cached('gt', paths, compute, cache)
+    runs = [Run(path, [], results[path]) for path in paths]
+    return dict(t=stack(runs, 't'), G=stack(runs, 'G'), paths=paths)
+
+
+def _lock_in_resistance(run: Run, signal: str) -> np.ndarray:
+    """The resistance like SRS830RvTBlue calculates it, the signal itself if the header lacks the values."""
+    excitation = run.header_value('V')
+    pre_resistance = run.header_value('OHM')
+    if excitation and pre_resistance:
+        return run[signal] / excitation * pre_resistance
+    return run[signal].astype(float)
+
+
+def magnetoresistance(paths: Iterable[str], fields: Sequence[float], field: str = 'Field', signal: str = 'Real',
+                      cache: Optional[ResultCache] = None) -> Dict:
+    """Symmetric and antisymmetric parts of R(B) of field sweep files (SRS830 field sweeps).
+
+    R is interpolated at +B and -B for every B in fields, both sweep
+    directions are averaged. Fields outside the range of a file give NaN.
+
+    :param fields: the non-negative fields in T at which the parts are calculated
+    :return: 'B', and arrays of shape (files, len(fields)): 'R_sym' = (R(B) + R(-B)) / 2,
+             'R_anti' = (R(B) - R(-B)) / 2 and 'MR' = R_sym(B) / R_sym(0) - 1, and 'paths'
+    """
+    paths = list(paths)
+    fields = np.abs(np.asarray(fields, dtype=float))
+
+    def compute(missing):
+        results = {}
+        for run in load_runs(missing, [field, signal]):
+            order = np.argsort(run[field], kind='stable')
+            b = run[field][order]
+            r = _lock_in_resistance(run, signal)[order]
+            valid = np.isfinite(b) & np.isfinite(r)
+            b, r = b[valid], r[valid]
+            if len(b) < 2:
+                nan = np.full(len(fields), np.nan)
+                results[run.path] = dict(R_sym=nan, R_anti=nan)
+                continue
+            positive = np.interp(fields, b, r, left=np.nan, right=np.nan)
+            negative = np.interp(-fields, b, r, left=np.nan, right=np.nan)
+            results[run.path] = dict(R_sym=(positive + negative) / 2, R_anti=(positive - negative) / 2)
+        return results
+
+    name = 'mr-{}-{}-{}'.format(field, signal, hashlib.sha1(fields.tobytes()).hexdigest()[:12])
+    results = cached(name, paths, compute, cache)
+    symmetric = np.array([results[path]['R_sym'] for path in paths]).reshape(len(paths), len(fields))
+    antisymmetric = np.array([results[path]['R_anti'] for path in paths]).reshape(len(paths), len(fields))
+
+    # the zero-field value is the one closest to B = 0
+    zero = np.argmin(fields) if len(fields) else 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = symmetric / symmetric[:, zero:zero + 1] - 1 if len(fields) else symmetric
+    return dict(B=fields, R_sym=symmetric, R_anti=antisymmetric, MR=ratio, paths=paths)
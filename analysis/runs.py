@@ -0,0 +1,106 @@
+"""Loading measurement files and stacking them into arrays."""
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from measurement.datafile import DATETIME, DataFile
+
+# the column with the timestamps of the points, if a file has one
+TIME_COLUMNS = ('Datetime', 'datetime')
+
+
+class Run:
+    """The columns of one data file (or a part of it) as numpy arrays."""
+
+    def __init__(self, path: str, header: List[str], columns: Dict[str, np.ndarray]) -> None:
+        self.path = path
+        self.header = header
+        self.columns = columns
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __repr__(self) -> str:
+        return '<Run {} {} points {}>'.format(os.path.basename(self.path), len(self), list(self.columns))
+
+    @property
+    def seconds(self) -> Optional[np.ndarray]:
+        """Seconds since the first point, None if the file has no timestamps."""
+        for name in TIME_COLUMNS:
+            if name in self.columns and np.issubdtype(self.columns[name].dtype, np.datetime64):
+                times = self.columns[name]
+                return (times - times[0]) / np.timedelta64(1, 's') if len(times) else np.empty(0)
+        return None
+
+    def header_value(self, unit: str) -> Optional[float]:
+        """The number of a header line like '# 0.004 V' or '# pre resistance 1e7 OHM'."""
+        pattern = re.compile(r'(?:^|\s)([-+]?\d[\d.]*(?:[eE][-+]?\d+)?)\s+{}$'.format(re.escape(unit)))
+        for line in self.header:
+            match = pattern.search(line.strip())
+            if match:
+                return float(match.group(1))
+        return None
+
+
+def load_run(path: str, columns: Optional[Sequence[str]] = None) -> Run:
+    """Read the given or all columns of a data file."""
+    with DataFile(path) as data_file:
+        names = [name for name in (columns or data_file.columns) if name in data_file.columns]
+        frame = data_file.values(names)
+        values = {}
+        for name in names:
+            if data_file.kinds[name] == DATETIME:
+                values[name] = frame[name].values.astype('datetime64[us]')
+            else:
+                values[name] = frame[name].values
+        return Run(path, data_file.header, values)
+
+
+def load_runs(paths: Iterable[str], columns: Optional[Sequence[str]] = None, workers: int = 8) -> List[Run]:
+    """Read many files, several at a time since most of the time is spent waiting for the disk."""
+    paths = list(paths)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(paths)))) as executor:
+        return list(executor.map(lambda path: load_run(path, columns), paths))
+
+
+def split_curves(run: Run, gap_factor: float = 10.0) -> List[Run]:
+    """Split a run into its sweeps, e.g. the I-V curves at each temperature of SMUTempSweepIV.
+
+    A new sweep starts where the time between two points is gap_factor times
+    longer than the median time between points. Runs without timestamps are
+    returned unchanged.
+    """
+    seconds = run.seconds
+    if seconds is None or len(seconds) < 3:
+        return [run]
+
+    intervals = np.diff(seconds)
+    starts = np.flatnonzero(intervals > gap_factor * np.median(intervals)) + 1
+    bounds = np.concatenate(([0], starts, [len(run)]))
+    return [Run(run.path, run.header, {name: values[start:stop] for name, values in run.columns.items()})
+            for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def stack(runs: Sequence[Run], column: str, length: Optional[int] = None) -> np.ndarray:
+    """Stack a column of all runs into a 2D float array, rows are padded with NaN.
+
+    Timestamps are converted to seconds since the first point of each run.
+    """
+    length = length if length is not None else max((len(run) for run in runs), default=0)
+    stacked = np.full((len(runs), length), np.nan)
+    for row, run in enumerate(runs):
+        values = run[column]
+        if np.issubdtype(values.dtype, np.datetime64):
+            values = (values - values[0]) / np.timedelta64(1, 's') if len(values) else values
+        count = min(len(values), length)
+        stacked[row, :count] = values[:count]
+    return stacked
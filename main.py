@@ -1,25 +1,44 @@
 #!/usr/bin/python3
+import sys
+
+import startup_profiler
+# must happen before the heavy imports below to see their cost
+startup_profiler.enable_from_arguments(sys.argv)
+
+if '--simulate' in sys.argv:
+    # replace all instrument drivers, has to happen before they are imported
+    sys.argv.remove('--simulate')
+    from measurement import simulation
+    simulation.install()
 
 from PyQt5 import QtCore, QtWidgets, QtGui
 from PyQt5.QtWidgets import QApplication, QInputDialog, QErrorMessage, QFileDialog
 
 from main_ui import MainUI
 from windows.table_window import TableWindow
-from windows.plot_window import PlotWindow
+from windows.plot_window import ImagePlotWindow, PlotWindow
+from windows.stats_window import StatsWindow
 from windows.dynamic_input import DynamicInputLayout, delete_children
-import pandas as pd
 
 import os
-from threading import Thread
+from functools import partial
 
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import measurement
-from measurement.measurement import SignalInterface, Contacts, AbstractMeasurement
+from measurement.checkpoint import Checkpoint
+from measurement.datafile import DataFile
+from measurement.history import DataHistory
+from measurement.measurement import SignalInterface, Contacts, AbstractMeasurement, PlotRecommendation
+from measurement.scheduler import Job, RunQueue, Scheduler
+from measurement.station import ResourceConflict, Station
+from measurement.streaming import DEFAULT_ADDRESS, start_publisher, stop_publisher
+from measurement.worker import isolated
 from typing import Dict, List, Union, Tuple, Type
 
 from configparser import ConfigParser
 
+from windows.file_follower import FileFollower
 from windows.gpib_picker import GPIBPicker
 
 
@@ -49,6 +68,28 @@ class SignalDataAcquisition(QtCore.QObject, SignalInterface):
         self.status.emit(message)
 
 
+class SchedulerSignals(QtCore.QObject):
+    """Hands the callbacks of the scheduler thread over to the GUI thread."""
+    job_starting = QtCore.pyqtSignal(object, object)
+    job_done = QtCore.pyqtSignal(object)
+    queue_done = QtCore.pyqtSignal()
+
+
+class StationView:
+    """The GUI side of a station: its signals, data and plot windows."""
+
+    def __init__(self, name: str) -> None:
+        self.signals = SignalDataAcquisition()
+        self.station = Station(name, self.signals)
+        self.history = DataHistory()
+        self.plot_windows = {}  # type: Dict[Tuple[str, str], PlotWindow]
+        self.measurement = None  # type: AbstractMeasurement
+
+    @property
+    def name(self) -> str:
+        return self.station.name
+
+
 class WrapAroundList(list):
     """A standard list with wrap-around indexing.
 
@@ -83,18 +124,24 @@ class Main(MainUI):
 
     SIDE_BAR_WIDTH = 210
 
+    RING_SWEEP = 'all positions of the ring'
+    GROUP_SWEEP = 'all groups of the sample config'
+
+    QUEUE_JOURNAL = 'queue.journal'
+
+    KEEP_ALL = 'keep all points'
+    KEEP_POINTS = 'keep the newest points'
+    KEEP_MINUTES = 'keep the points of the last minutes'
+
     def __init__(self):
         super(Main, self).__init__()
 
         self._config = ConfigParser()
         self._config.read('settings.cfg')
 
-        self.__signal_interface = SignalDataAcquisition()
-        self.__signal_interface.finished.connect(self.__finished)
-        self.__signal_interface.data.connect(self.__new_data)
-        self.__signal_interface.aborted.connect(self.__measurement_aborted)
-        self.__signal_interface.status.connect(self._show_status)
-        self.__signal_interface.started.connect(self.__started)
+        self._stations = {}  # type: Dict[str, StationView]
+        self._followers = []  # type: List[FileFollower]
+        self._station = None  # type: StationView
 
         if 'general' in self._config:
             if 'last_folder' in self._config['general']:
@@ -107,14 +154,25 @@ class Main(MainUI):
             self._directory_name = '/tmp'
 
         self._measurement_class = AbstractMeasurement
-        self._measurement = None  # type: AbstractMeasurement
+
+        self._queue = RunQueue(self.QUEUE_JOURNAL)
+        self._scheduler = None  # type: Scheduler
+        self._queue_station = None  # type: StationView
+        self.__scheduler_signals = SchedulerSignals()
+        # the scheduler thread waits until the windows for the next job exist
+        self.__scheduler_signals.job_starting.connect(self.__prepare_job,
+                                                      type=QtCore.Qt.BlockingQueuedConnection)
+        self.__scheduler_signals.job_done.connect(self.__job_done)
+        self.__scheduler_signals.queue_done.connect(self.__queue_done)
 
         self._init_gui()
 
         for key, meas in measurement.REGISTRY.items():
-            self._dock.add_method(key, meas)
+            with startup_profiler.span('widget', 'InputDock.add_method({})'.format(key)):
+                self._dock.add_method(key, meas)
 
         self.__setup_connections()
+        self.__add_station()
 
         self._dir_picker.directory = self._directory_name
 
@@ -123,6 +181,11 @@ class Main(MainUI):
         self._method_selection_box.currentTextChanged.connect(
             lambda title: self.__measurement_method_selected(title, measurement.REGISTRY[title])
         )
+        self._station_selection_box.currentTextChanged.connect(self.__station_selected)
+        self._add_station_action.triggered.connect(self.__add_station)
+        self._history_limit_action.triggered.connect(self.__set_history_limit)
+        self._resume_action.triggered.connect(self.__resume_measurement)
+        self._publish_action.toggled.connect(self.__toggle_publishing)
         self._measure_button.clicked.connect(self.__start__measurement)
         self._abort_button.clicked.connect(self.__abort_measurement)
         self._next_button.clicked.connect(self.__increment_contact_number)
@@ -132,14 +195,107 @@ class Main(MainUI):
         self._select_folder_action.triggered.connect(self._dir_picker.select_directory)
         self._show_folder_action.triggered.connect(self._dir_picker.open_directory)
 
+        self._open_data_file_action.triggered.connect(self._open_data_file)
+        self._follow_data_file_action.triggered.connect(self._follow_data_file)
+        self._stop_following_action.triggered.connect(self._stop_following)
         self._load_sample_config_action.triggered.connect(self._load_sample_config)
         self._save_sample_config_action.triggered.connect(self._save_sample_config)
 
         self._show_dock_action.triggered.connect(self._show_dock)
+        self._show_stats_action.triggered.connect(self._show_stats)
+
+        self._enqueue_action.triggered.connect(self.__enqueue_measurement)
+        self._contact_sweep_action.triggered.connect(self.__enqueue_contact_sweep)
+        self._run_queue_action.triggered.connect(self.__run_queue)
+        self._stop_queue_action.triggered.connect(self.__stop_queue)
+        self._clear_queue_action.triggered.connect(self.__clear_queue)
 
     def _show_dock(self):
         self._dock.show()
 
+    def _show_stats(self):
+        # measurements in a worker process have no recorder in this process
+        window = StatsWindow(lambda: getattr(self._station.measurement, 'timing', None))
+        self._mdi.addSubWindow(window)
+        window.show()
+
+    def _open_data_file(self):
+        """Show a data file of a previous run in the table and a plot of two of its columns."""
+        file_path = self.__ask_data_file('Open Data File')
+        if file_path is None:
+            return
+
+        try:
+            data_file = DataFile(file_path)
+        except (OSError, ValueError) as error:
+            QErrorMessage(self).showMessage('Could not open {}: {}'.format(file_path, error))
+            return
+
+        self.__show_data_file(data_file)
+
+    def _follow_data_file(self):
+        """Like _open_data_file, but lines which another process appends are shown as they arrive."""
+        file_path = self.__ask_data_file('Follow Data File')
+        if file_path is None:
+            return
+
+        try:
+            follower = FileFollower(file_path, parent=self)
+        except (OSError, ValueError) as error:
+            QErrorMessage(self).showMessage('Could not open {}: {}'.format(file_path, error))
+            return
+
+        window = self.__show_data_file(follower.data_file, 'following')
+        follower.appended.connect(partial(self.__followed_data, follower, window))
+        follower.reopened.connect(partial(self.__followed_file_reopened, follower, window))
+        self._followers.append(follower)
+        self._show_status('Following {}.'.format(file_path))
+
+    def _stop_following(self):
+        for follower in self._followers:
+            follower.stop()
+        self._followers = []
+
+    def __ask_data_file(self, title):
+        file_path, _ = QFileDialog.getOpenFileName(self, title, self._directory_name,
+                                                   filter='Data (*.dat);;All files (*)')
+        return file_path if file_path != '' else None
+
+    def __show_data_file(self, data_file, title_suffix=''):
+        """Show a data file in the table, return a plot window of two columns chosen by the user or None."""
+        self._tb_window.show_history(data_file)
+        if len(data_file.columns) < 2:
+            return None
+
+        columns = data_file.columns
+        x_label, okay = QInputDialog.getItem(self, 'Plot', 'x axis', columns, 0, editable=False)
+        if not okay:
+            return None
+        y_label, okay = QInputDialog.getItem(self, 'Plot', 'y axis', columns, 1, editable=False)
+        if not okay:
+            return None
+
+        window = PlotWindow(PlotRecommendation(os.path.basename(data_file.path), x_label, y_label),
+                            title_suffix, x_axis_label=x_label, y_axis_label=y_label)
+        window.show_history(data_file, (x_label, y_label))
+        window.update_history()
+        self._mdi.addSubWindow(window)
+        window.show()
+        return window
+
+    def __followed_data(self, follower, window, count):
+        if self._tb_window.history is follower.data_file:
+            self._tb_window.update_history()
+        if window is not None:
+            window.update_history()
+
+    def __followed_file_reopened(self, follower, window):
+        self._show_status('{} was replaced, reading it again.'.format(follower.path))
+        self._tb_window.show_history(follower.data_file)
+        if window is not None:
+            window.show_history(follower.data_file, window.columns)
+            window.update_history()
+
     def _load_sample_config(self):
         file_path, _ = QFileDialog.getOpenFileName(self, 'Load Sample Settings', filter = 'JSON (*.json)')
 
@@ -168,6 +324,14 @@ class Main(MainUI):
         self._contacts_picker.select_list(contacts_list)
 
     def __measurement_method_selected(self, title, cls: AbstractMeasurement):
+        try:
+            # the registry is lazy, the drivers of a method are imported on selection
+            cls.load()
+        except ImportError as error:
+            self._measure_button.setEnabled(False)
+            QErrorMessage(self).showMessage("Could not load '{}': {}".format(title, error))
+            return
+
         for button in [self._next_button, self._abort_button, self._measure_button]:
             button.setEnabled(True)
 
@@ -181,11 +345,136 @@ class Main(MainUI):
 
         self._next_button.setVisible(number_of_contacts == Contacts.TWO)
 
+    def __add_station(self):
+        """Add a station which runs measurements independent of the others."""
+        view = StationView('Station {}'.format(len(self._stations) + 1))
+        view.signals.finished.connect(partial(self.__finished, view))
+        view.signals.data.connect(partial(self.__new_data, view))
+        view.signals.aborted.connect(partial(self.__measurement_aborted, view))
+        view.signals.status.connect(partial(self.__show_station_status, view))
+        view.signals.started.connect(partial(self.__started, view))
+
+        self._stations[view.name] = view
+        self._station_selection_box.addItem(view.name)
+        self._station_selection_box.setCurrentText(view.name)
+
+    def __station_selected(self, name):
+        self._station = self._stations[name]
+        self._tb_window.show_history(self._station.history)
+        if self._dynamic_inputs_layout is not None:
+            self._set_ui_state(not self.__is_busy(self._station))
+
+    def __is_busy(self, view: StationView) -> bool:
+        return view.station.is_running or (view is self._queue_station and self._scheduler.is_running)
+
+    def __new_history(self) -> DataHistory:
+        """Return an empty history limited as configured in the 'history' section."""
+        section = self._config['history'] if 'history' in self._config else {}
+        window_points = int(section['window_points']) if 'window_points' in section else None
+        window_seconds = 60 * float(section['window_minutes']) if 'window_minutes' in section else None
+        return DataHistory(window_points, window_seconds, section.get('spill_directory'))
+
+    def __set_history_limit(self):
+        """Ask how many points of a run are kept in memory, older ones are moved to disk."""
+        choice, okay = QInputDialog.getItem(self, 'Data in memory', 'For long runs',
+                                            [self.KEEP_ALL, self.KEEP_POINTS, self.KEEP_MINUTES],
+                                            editable=False)
+        if not okay:
+            return
+
+        section = {key: value for key, value in self._config['history'].items()
+                   if key == 'spill_directory'} if 'history' in self._config else {}
+        if choice == self.KEEP_POINTS:
+            points, okay = QInputDialog.getInt(self, 'Data in memory', 'Number of points', 10000, 100, 10 ** 8)
+            if not okay:
+                return
+            section['window_points'] = str(points)
+        elif choice == self.KEEP_MINUTES:
+            minutes, okay = QInputDialog.getDouble(self, 'Data in memory', 'Minutes', 60, 1, 10 ** 6, 1)
+            if not okay:
+                return
+            section['window_minutes'] = str(minutes)
+
+        self._config['history'] = section
+        self._update_config()
+        self._show_status('The limit applies to the next measurement.')
+
+    def __toggle_publishing(self, checked):
+        """Publish the data of all measurements started from now on, see measurement/streaming.py."""
+        if not checked:
+            stop_publisher()
+            self._show_status('Stopped publishing live data.')
+            return
+
+        section = self._config['streaming'] if 'streaming' in self._config else {}
+        address = section.get('address', DEFAULT_ADDRESS)
+        try:
+            start_publisher(address)
+        except OSError as error:
+            QErrorMessage(self).showMessage('Can not publish on {}: {}'.format(address, error))
+            self._publish_action.setChecked(False)
+            return
+        self._show_status('Publishing live data on {} for measurements started from now on.'.format(address))
+
     def __start__measurement(self):
         contacts = self.__get_contacts()
-        path = self.__get_path()
+        path = self.__get_existing_path()
+        if path is None:
+            return
 
         inputs = self._dynamic_inputs_layout.get_inputs()
+        view = self._station
+
+        method = self._measurement_class
+        if self._isolate_action.isChecked():
+            # a crash of the measurement or its drivers does not take the GUI down
+            method = isolated(method)
+
+        try:
+            measurement_object = view.station.start(method, path, contacts, inputs)
+        except ResourceConflict as error:
+            QErrorMessage(self).showMessage('{} can not start: {}'.format(view.name, error))
+            return
+        except RuntimeError as error:
+            QErrorMessage(self).showMessage('{} can not start: {}'.format(view.name, error))
+            return
+
+        self.__prepare_windows(view, measurement_object, self._measurement_class, contacts)
+
+        self._set_ui_state(False)
+
+    def __resume_measurement(self):
+        """Continue an interrupted run from its checkpoint on the current station."""
+        file_path, _ = QFileDialog.getOpenFileName(self, 'Resume Measurement', self._directory_name,
+                                                   filter='Checkpoints (*.checkpoint.json);;All files (*)')
+        if file_path == '':
+            return
+
+        try:
+            checkpoint = Checkpoint.load(file_path)
+        except (OSError, ValueError) as error:
+            QErrorMessage(self).showMessage('Could not resume {}: {}'.format(file_path, error))
+            return
+        if checkpoint.method not in measurement.REGISTRY:
+            QErrorMessage(self).showMessage('"{}" is not a known measurement.'.format(checkpoint.method))
+            return
+
+        view = self._station
+        method = measurement.REGISTRY[checkpoint.method]
+        try:
+            measurement_object = view.station.start(method, checkpoint.path, checkpoint.contacts,
+                                                    checkpoint.inputs_for(method), resume=checkpoint)
+        except (ResourceConflict, RuntimeError, ValueError) as error:
+            QErrorMessage(self).showMessage('{} can not resume: {}'.format(view.name, error))
+            return
+
+        self.__prepare_windows(view, measurement_object, method, checkpoint.contacts)
+        self._set_ui_state(False)
+        self._show_status('Resumed {}.'.format(checkpoint))
+
+    def __get_existing_path(self):
+        """Return the save directory, the user is asked for another one if it does not exist."""
+        path = self.__get_path()
 
         while not os.path.isdir(path):
             result = QtWidgets.QMessageBox.critical(
@@ -198,42 +487,172 @@ class Main(MainUI):
                 self._set_directory_name()
                 path = self.__get_path()
             else:
-                return
-
-        self._measurement = self._measurement_class(self.__signal_interface,
-                                                    path, contacts, **inputs)
+                return None
 
-        self.__df = pd.DataFrame()
+        return path
 
-        self._plot_windows = {}
+    def __prepare_windows(self, view, measurement_object, measurement_class, contacts):
+        """Reset the data of a station and open the recommended plot windows of a measurement."""
+        view.history.close()
+        view.history = self.__new_history()
+        view.measurement = measurement_object
+        if view is self._station:
+            self._tb_window.show_history(view.history)
 
-        contacts = self._contacts_picker.contacts
+        view.plot_windows = {}
 
         contacts_string = ' '.join(contacts)
+        if len(self._stations) > 1:
+            contacts_string = '{}: {}'.format(view.name, contacts_string)
 
-        for recommended_plot in self._measurement.recommended_plots:
+        for recommended_plot in measurement_object.recommended_plots:
             pair = (recommended_plot.x_label, recommended_plot.y_label)
-            if pair not in self._plot_windows:
-                outputs = self._measurement_class.outputs()
+            if pair not in view.plot_windows:
+                outputs = measurement_class.outputs()
                 x_label = outputs[pair[0]].fullname
                 y_label = outputs[pair[1]].fullname
 
-                window = PlotWindow(
-                    recommended_plot,
-                    "| Contacts: '{}'".format(contacts_string),
-                    x_axis_label=x_label, y_axis_label=y_label
-                )
-                self._plot_windows[pair] = window
+                if recommended_plot.z_label is not None:
+                    window = ImagePlotWindow(
+                        recommended_plot,
+                        "| Contacts: '{}'".format(contacts_string),
+                        x_axis_label=x_label, y_axis_label=y_label,
+                        z_axis_label=outputs[recommended_plot.z_label].fullname
+                    )
+                    window.show_history(view.history, pair + (recommended_plot.z_label,))
+                else:
+                    window = PlotWindow(
+                        recommended_plot,
+                        "| Contacts: '{}'".format(contacts_string),
+                        x_axis_label=x_label, y_axis_label=y_label
+                    )
+                    window.show_history(view.history, pair)
+                view.plot_windows[pair] = window
                 self._mdi.addSubWindow(window)
                 window.show()
 
-        thread = Thread(target=self._measurement)
-        thread.start()
+    def __abort_measurement(self):
+        view = self._station
+        if view is self._queue_station and self._scheduler.is_running:
+            self._scheduler.abort()
+        else:
+            view.station.abort()
+
+    def __enqueue_measurement(self):
+        """Add the selected method with the current inputs and contacts to the run queue."""
+        title = self._method_selection_box.currentText()
+        if title not in measurement.REGISTRY:
+            self._show_status('Select a measurement method first.')
+            return
+
+        path = self.__get_existing_path()
+        if path is None:
+            return
+
+        job = Job(title, path, self.__get_contacts(), self._dynamic_inputs_layout.get_inputs())
+        self._queue.add(job)
+        self._show_status('Queued {}, {} jobs pending.'.format(job, len(self._queue.pending)))
+
+    def __enqueue_contact_sweep(self):
+        """Queue the selected method once for every contact set and run the queue.
+
+        The contact sets are either the positions the 'next' button would step
+        through or the groups of the sample config. The instruments stay open
+        between the runs, only the switching delay is waited for in between.
+        """
+        title = self._method_selection_box.currentText()
+        if title not in measurement.REGISTRY:
+            self._show_status('Select a measurement method first.')
+            return
+
+        source, okay = QInputDialog.getItem(self, 'Contact Sweep', 'Contacts',
+                                            [self.RING_SWEEP, self.GROUP_SWEEP], editable=False)
+        if not okay:
+            return
+
+        if source == self.RING_SWEEP:
+            if not self.__get_contacts():
+                self._show_status('Select the first contacts of the sweep.')
+                return
+            sequence = self._contacts_picker.sequence()
+        else:
+            sequence = list(self._sample_config.groups.values())
+            if not sequence:
+                self._show_status('The sample config has no groups.')
+                return
+
+        delay, okay = QInputDialog.getDouble(self, 'Contact Sweep', 'Switching delay [s]',
+                                             value=0.0, min=0.0, max=3600.0, decimals=1)
+        if not okay:
+            return
 
-        self._set_ui_state(False)
+        path = self.__get_existing_path()
+        if path is None:
+            return
 
-    def __abort_measurement(self):
-        self._measurement.abort()
+        inputs = self._dynamic_inputs_layout.get_inputs()
+        for index, contacts in enumerate(sequence):
+            # nothing was switched before the first run
+            self._queue.add(Job(title, path, contacts, inputs, settle_time=delay if index > 0 else 0.0))
+
+        self._show_status('Queued {} runs of {}.'.format(len(sequence), title))
+        self.__run_queue()
+
+    def __run_queue(self):
+        if self._scheduler is not None and self._scheduler.is_running:
+            self._show_status('The queue is already running on {}.'.format(self._queue_station.name))
+            return
+        if self.__is_busy(self._station):
+            self._show_status('{} is still running.'.format(self._station.name))
+            return
+        if not self._queue.pending:
+            self._show_status('The queue is empty.')
+            return
+
+        signals = self.__scheduler_signals
+        self._queue_station = self._station
+        self._scheduler = Scheduler(self._queue, self._station.signals,
+                                    before_job=signals.job_starting.emit,
+                                    after_job=signals.job_done.emit,
+                                    after_queue=signals.queue_done.emit,
+                                    owner=self._station.name)
+        self._set_ui_state(False)
+        self._scheduler.start()
+
+    def __stop_queue(self):
+        if self._scheduler is not None:
+            self._scheduler.stop()
+            self._show_status('The queue stops after the current job.')
+
+    def __clear_queue(self):
+        self._queue.clear()
+        self._show_status('Removed all pending jobs from the queue.')
+
+    def __prepare_job(self, job, measurement_object):
+        self.__prepare_windows(self._queue_station, measurement_object,
+                               measurement.REGISTRY[job.method], job.contacts)
+        self.__show_queue_progress('Running {}'.format(job))
+
+    def __job_done(self, job):
+        self.__show_queue_progress('{} {}'.format(job, job.state.value))
+
+    def __queue_done(self):
+        self._queue.compact()
+        self.__show_station_status(self._queue_station, 'Queue finished.')
+        if self._queue_station is self._station:
+            self._set_ui_state(True)
+
+    def __show_queue_progress(self, message):
+        done, total = self._scheduler.progress()
+        eta = self._scheduler.eta()
+        eta_string = 'unknown' if eta is None else str(timedelta(seconds=int(eta)))
+        self.__show_station_status(self._queue_station, '{} - job {}/{}, ETA {}'.format(
+            message, min(done + 1, total), total, eta_string))
+
+    def __show_station_status(self, view, message):
+        if len(self._stations) > 1:
+            message = '{}: {}'.format(view.name, message)
+        self._show_status(message)
 
     def __get_contacts(self) -> Tuple[str, ...]:
         return tuple(self._contacts_picker.contacts)
@@ -241,34 +660,45 @@ class Main(MainUI):
     def __get_path(self):
         return self._dir_picker.directory
 
-    def __finished(self, data_dict):
+    def __finished(self, view, data_dict):
         # Save plots:
         for axis_label_pair in list(data_dict.keys()):
-            if axis_label_pair in self._plot_windows.keys():
-                plot_window = self._plot_windows[axis_label_pair]  # type: PlotWindow
+            if axis_label_pair in view.plot_windows.keys():
+                plot_window = view.plot_windows[axis_label_pair]  # type: PlotWindow
                 plot_path = data_dict[axis_label_pair]  # type: str
                 plot_window.save_plot(plot_path)
 
-        self._show_status('Measurement finished.')
-        self._set_ui_state(True)
+        if view is not self._queue_station or not self._scheduler.is_running:
+            self.__show_station_status(view, 'Measurement finished.')
+            if view is self._station:
+                self._set_ui_state(True)
 
-    def __new_data(self, data_dict):
-        self.__df = self.__df.append(data_dict, ignore_index=True)
-        self._tb_window.update_data(self.__df)
+    def __new_data(self, view, data_dict):
+        view.history.append(data_dict)
+        if view is self._station:
+            self._tb_window.update_history()
 
-        for pair, window in self._plot_windows.items():
-            window.update_data(self.__df[list(pair)])
+        for window in view.plot_windows.values():
+            window.update_history()
 
-    def __measurement_aborted(self):
-        self._show_status('Measurement aborted.')
+    def __measurement_aborted(self, view):
+        self.__show_station_status(view, 'Measurement aborted.')
 
     @QtCore.pyqtSlot()
     def __increment_contact_number(self):
         """Switch to the next contact pair in the list."""
         self._contacts_picker.next()
 
-    def __started(self):
-        self._show_status('Measurement running ...')
+    def __started(self, view):
+        self.__show_station_status(view, 'Measurement running ...')
+
+    def closeEvent(self, event):
+        # removes the files with the spilled points
+        for view in self._stations.values():
+            view.history.close()
+        self._stop_following()
+        stop_publisher()
+        super().closeEvent(event)
 
     def _update_config(self):
         print('updating config')
@@ -283,9 +713,11 @@ class Main(MainUI):
 
 
 if __name__ == '__main__':
-    import sys
-
     app = QApplication(sys.argv)
-    m = Main()
+    with startup_profiler.span('widget', 'Main'):
+        m = Main()
     m.show()
+
+    # report as soon as the event loop runs, i.e. the window is visible
+    QtCore.QTimer.singleShot(0, startup_profiler.finish)
     sys.exit(app.exec_())
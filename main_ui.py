@@ -16,6 +16,8 @@ from windows.sample_config import SampleConfig
 
 from windows.inputdock import InputDock
 
+from startup_profiler import span
+
 
 class MainUI(QtWidgets.QMainWindow):
     """Class that generates the layout for the main application window."""
@@ -30,7 +32,8 @@ class MainUI(QtWidgets.QMainWindow):
 
         self._init_menu_bar()
 
-        self._dock = InputDock()
+        with span('widget', 'InputDock'):
+            self._dock = InputDock()
 
         self.addDockWidget(Qt.RightDockWidgetArea, self._dock)
 
@@ -43,19 +46,30 @@ class MainUI(QtWidgets.QMainWindow):
         self._inputs_layout.setSpacing(10)
         central_layout.addLayout(self._inputs_layout)
 
-        self._dir_picker = DirectoryPicker()
+        with span('widget', 'DirectoryPicker'):
+            self._dir_picker = DirectoryPicker()
         self._dir_picker.setFixedWidth(self.SIDE_BAR_WIDTH)
         self._inputs_layout.addWidget(self._dir_picker)
         self._dir_picker.directory_changed.connect(self._set_directory_name)
 
-        self._contacts_picker = ContactsSelector()
+        with span('widget', 'ContactsSelector'):
+            self._contacts_picker = ContactsSelector()
         
         self._contacts_picker.setFixedWidth(self.SIDE_BAR_WIDTH)
         self._inputs_layout.addWidget(self._contacts_picker)
 
-        self._sample_config = SampleConfig()
+        with span('widget', 'SampleConfig'):
+            self._sample_config = SampleConfig()
         self._inputs_layout.addWidget(self._sample_config)
 
+        station_layout = QtWidgets.QVBoxLayout()
+        station_layout.setSpacing(3)
+        self._inputs_layout.addLayout(station_layout)
+        station_layout.addWidget(QtWidgets.QLabel("Station:"))
+        self._station_selection_box = QtWidgets.QComboBox()
+        self._station_selection_box.setFixedWidth(self.SIDE_BAR_WIDTH)
+        station_layout.addWidget(self._station_selection_box)
+
         method_layout = QtWidgets.QVBoxLayout()
         method_layout.setSpacing(3)
         self._inputs_layout.addLayout(method_layout)
@@ -78,7 +92,8 @@ class MainUI(QtWidgets.QMainWindow):
         self._dynamic_inputs_area = QtWidgets.QScrollArea()
         # Initialise and hold all dynamic inputs in memory:
         self._dynamic_inputs = dict()  # type: Dict[Type, QtWidgets.QWidget]
-        self.__create_input_ui()
+        with span('widget', 'dynamic inputs'):
+            self.__create_input_ui()
 
         self._dynamic_inputs_area.setFrameShape(QtWidgets.QFrame.NoFrame)
         self._dynamic_inputs_area.setFixedWidth(self.SIDE_BAR_WIDTH)
@@ -116,11 +131,10 @@ class MainUI(QtWidgets.QMainWindow):
         self.setStatusBar(self.__statusbar)
 
         self.setCentralWidget(central_widget)
-        self._tb_window = TableWindow()
+        with span('widget', 'TableWindow'):
+            self._tb_window = TableWindow()
         self._mdi.addSubWindow(self._tb_window)
 
-        self._plot_windows = {}
-
     def _init_menu_bar(self):
         main_menu = self.menuBar()
 
@@ -132,6 +146,14 @@ class MainUI(QtWidgets.QMainWindow):
         self._show_folder_action = QAction('show folder', self)
         self._show_folder_action.setShortcut('Ctrl+e')
 
+        self._open_data_file_action = QAction('open data file...', self)
+        self._open_data_file_action.setShortcut('Ctrl+o')
+
+        self._follow_data_file_action = QAction('follow data file...', self)
+        self._follow_data_file_action.setShortcut('Ctrl+f')
+
+        self._stop_following_action = QAction('stop following files', self)
+
         self._load_sample_config_action = QAction('load sample settings...', self)
         self._load_sample_config_action.setShortcut('Ctrl+l')
 
@@ -144,6 +166,10 @@ class MainUI(QtWidgets.QMainWindow):
         file_menu.addAction(self._select_folder_action)
         file_menu.addAction(self._show_folder_action)
         file_menu.addSeparator()
+        file_menu.addAction(self._open_data_file_action)
+        file_menu.addAction(self._follow_data_file_action)
+        file_menu.addAction(self._stop_following_action)
+        file_menu.addSeparator()
         file_menu.addAction(self._load_sample_config_action)
         file_menu.addAction(self._save_sample_config_action)
         file_menu.addSeparator()
@@ -155,7 +181,53 @@ class MainUI(QtWidgets.QMainWindow):
         self._show_dock_action = QAction('show Input Dock', self)
         self._show_dock_action.setShortcut('Ctrl+i')
 
+        self._show_stats_action = QAction('show Statistics', self)
+        self._show_stats_action.setShortcut('Ctrl+t')
+
         window_menu.addAction(self._show_dock_action)
+        window_menu.addAction(self._show_stats_action)
+
+        station_menu = main_menu.addMenu('Station')
+
+        self._add_station_action = QAction('add station', self)
+        self._add_station_action.setShortcut('Ctrl+n')
+
+        self._isolate_action = QAction('run measurements in a separate process', self)
+        self._isolate_action.setCheckable(True)
+
+        self._resume_action = QAction('resume interrupted measurement ...', self)
+
+        self._history_limit_action = QAction('limit data kept in memory ...', self)
+
+        self._publish_action = QAction('publish live data', self)
+        self._publish_action.setCheckable(True)
+
+        station_menu.addAction(self._add_station_action)
+        station_menu.addAction(self._isolate_action)
+        station_menu.addAction(self._resume_action)
+        station_menu.addAction(self._history_limit_action)
+        station_menu.addAction(self._publish_action)
+
+        queue_menu = main_menu.addMenu('Queue')
+
+        self._enqueue_action = QAction('add measurement to queue', self)
+        self._enqueue_action.setShortcut('Ctrl+q')
+
+        self._run_queue_action = QAction('run queue', self)
+        self._run_queue_action.setShortcut('Ctrl+r')
+
+        self._contact_sweep_action = QAction('run measurement for all contacts ...', self)
+
+        self._stop_queue_action = QAction('stop queue after current measurement', self)
+
+        self._clear_queue_action = QAction('clear queue', self)
+
+        queue_menu.addAction(self._enqueue_action)
+        queue_menu.addAction(self._contact_sweep_action)
+        queue_menu.addAction(self._run_queue_action)
+        queue_menu.addAction(self._stop_queue_action)
+        queue_menu.addSeparator()
+        queue_menu.addAction(self._clear_queue_action)
 
 
     @QtCore.pyqtSlot(QtCore.QPoint)
@@ -1,5 +1,7 @@
 from .measurement import register, AbstractMeasurement, Contacts, PlotRecommendation
 from .measurement import StringValue, FloatValue, IntegerValue, DatetimeValue, AbstractValue, SignalInterface, BooleanValue
+from .instruments import open_resource
+from .sweep import plan_sweep
 
 import numpy as np
 from datetime import datetime
@@ -23,6 +25,7 @@ class SETSGD(AbstractMeasurement):
     TEMP_ADDR = 12
     VISA_LIBRARY = "@py"
     QUERY_DELAY = 0.0
+    FIXED_RESOURCES = (GPIB_RESOURCE, 'GPIB0::{}::INSTR'.format(TEMP_ADDR))
 
     def __init__(self, signal_interface: SignalInterface,
                  path: str, contacts: Tuple[str, str],
@@ -30,7 +33,9 @@ class SETSGD(AbstractMeasurement):
                  nplc: int = 1, comment: str = '', gate_voltage: float=0.0,
                  sd_current_range: float = 0.0, 
                  gd_current_range: float = 0.0,
-                 symmetric: bool = False) -> None:
+                 symmetric: bool = False,
+                 adaptive: bool = False, min_step: float = 0.0, max_step: float = 0.0,
+                 tolerance: float = 0.01) -> None:
         super().__init__(signal_interface, path, contacts)
         self._max_voltage = v
         self._current_limit = i
@@ -41,18 +46,22 @@ class SETSGD(AbstractMeasurement):
         
         print('DEBUG: current limit is ',self._current_limit, i)
 
-        resource_man = ResourceManager(self.VISA_LIBRARY)
-        resource = resource_man.open_resource(self.GPIB_RESOURCE, query_delay=self.QUERY_DELAY)
+        resource = open_resource(self.GPIB_RESOURCE, self.VISA_LIBRARY, query_delay=self.QUERY_DELAY)
         
-        self._device = Sourcemeter2636A(resource, sub_device=SMUChannel.channelA)
+        self._device = self._timed(Sourcemeter2636A(resource, sub_device=SMUChannel.channelA), 'sourcemeter A')
         self._device.voltage_driven(0, i, nplc, range=sd_current_range)
         
-        self._gate = Sourcemeter2636A(resource, sub_device=SMUChannel.channelB)
+        self._gate = self._timed(Sourcemeter2636A(resource, sub_device=SMUChannel.channelB), 'sourcemeter B')
         self._gate.voltage_driven(0, i, nplc, range=gd_current_range)
         
-        self._temperature_controller = Model340(self.TEMP_ADDR)
+        self._temperature_controller = self._shared(('Model340', self.TEMP_ADDR),
+                                                    lambda: Model340(self.TEMP_ADDR), 'Model340')
         
         self._symmetric = symmetric
+        self._adaptive = adaptive
+        self._min_step = min_step
+        self._max_step = max_step
+        self._tolerance = tolerance
 
     @staticmethod
     def number_of_contacts():
@@ -68,7 +77,11 @@ class SETSGD(AbstractMeasurement):
                 'gate_voltage': FloatValue('Gate Voltage', default=0.0),
                 'sd_current_range': FloatValue('SD min. I-range', default=1e-8),
                 'gd_current_range': FloatValue('GD min. I-range', default=1e-8), 
-                'symmetric': BooleanValue('Symmetric', default=False)              
+                'symmetric': BooleanValue('Symmetric', default=False),
+                'adaptive': BooleanValue('Adaptive Steps', default=False),
+                'min_step': FloatValue('Min. Step (0: auto)', default=0.0),
+                'max_step': FloatValue('Max. Step (0: auto)', default=0.0),
+                'tolerance': FloatValue('Step Tolerance', default=0.01)
                 }
 
     @staticmethod
@@ -92,11 +105,13 @@ class SETSGD(AbstractMeasurement):
         time.sleep(0.5)
         
         if self._symmetric:
-            voltages = np.linspace(-self._max_voltage, self._max_voltage, self._number_of_points)
+            corners = [-self._max_voltage, self._max_voltage]
         else:
-            voltages = np.linspace(0, self._max_voltage, self._number_of_points)
+            corners = [0, self._max_voltage]
+        voltages = np.linspace(corners[0], corners[1], self._number_of_points)
+        sweep = plan_sweep(corners, voltages, self._adaptive, self._min_step, self._max_step, self._tolerance)
 
-        for voltage in voltages:
+        for voltage in sweep:
             if self._should_stop.is_set():
                 print("DEBUG: Aborting measurement.")
                 self._signal_interface.emit_aborted()
@@ -104,6 +119,7 @@ class SETSGD(AbstractMeasurement):
 
             self._device.set_voltage(voltage)
             (voltage, current), (gate_voltage, gate_current) = self.__measure_data_point()
+            sweep.add(voltage, current)
             
             temperature_a, temperature_b, temperature_c = self._get_temperatures()
             
@@ -146,6 +162,8 @@ class SETSGD(AbstractMeasurement):
         file_handle.write("# current limit {0} A\n".format(self._current_limit))
         file_handle.write("# gate voltage {0} V\n".format(self._gate_voltage))
         file_handle.write('# nplc {}\n'.format(self._nplc))
+        if self._adaptive:
+            file_handle.write('# adaptive steps, tolerance {}\n'.format(self._tolerance))
         file_handle.write("Datetime Voltage Current GateVoltage GateCurrent TemperatureA TemperatureB TemperatureC\n")
 
     def __measure_data_point(self) -> Tuple[Tuple[float, float], Tuple[float, float]]:
@@ -1,5 +1,6 @@
 from .measurement import register, AbstractMeasurement, Contacts, PlotRecommendation
 from .measurement import StringValue, FloatValue, IntegerValue, DatetimeValue, AbstractValue, SignalInterface, BooleanValue
+from .instruments import open_resource
 
 import numpy as np
 from datetime import datetime
@@ -23,6 +24,7 @@ class SETSGD(AbstractMeasurement):
     TEMP_ADDR = 12
     VISA_LIBRARY = "@py"
     QUERY_DELAY = 0.0
+    FIXED_RESOURCES = (GPIB_RESOURCE, 'GPIB0::{}::INSTR'.format(TEMP_ADDR))
 
     def __init__(self, signal_interface: SignalInterface,
                  path: str, contacts: Tuple[str, str],
@@ -39,16 +41,16 @@ class SETSGD(AbstractMeasurement):
         self._comment = comment
         self._gate_voltage = gate_voltage
 
-        resource_man = ResourceManager(self.VISA_LIBRARY)
-        resource = resource_man.open_resource(self.GPIB_RESOURCE, query_delay=self.QUERY_DELAY)
+        resource = open_resource(self.GPIB_RESOURCE, self.VISA_LIBRARY, query_delay=self.QUERY_DELAY)
         
-        self._device = Sourcemeter2636A(resource, sub_device=SMUChannel.channelA)
+        self._device = self._timed(Sourcemeter2636A(resource, sub_device=SMUChannel.channelA), 'sourcemeter A')
         self._device.voltage_driven(0, i, nplc, range=sd_current_range)
         
-        self._gate = Sourcemeter2636A(resource, sub_device=SMUChannel.channelB)
+        self._gate = self._timed(Sourcemeter2636A(resource, sub_device=SMUChannel.channelB), 'sourcemeter B')
         self._gate.voltage_driven(0, i, nplc, range=gd_current_range)
         
-        self._temperature_controller = Model340(self.TEMP_ADDR)
+        self._temperature_controller = self._shared(('Model340', self.TEMP_ADDR),
+                                                    lambda: Model340(self.TEMP_ADDR), 'Model340')
         
         self._symmetric = symmetric
         
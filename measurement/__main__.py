@@ -0,0 +1,226 @@
+"""Command line interface for running measurements without the GUI.
+
+usage:
+    python3 -m measurement list
+    python3 -m measurement run "Dummy Measurement" --path /tmp --input n=5
+    python3 -m measurement queue add "Dummy Measurement" --path /tmp --input n=5
+    python3 -m measurement queue run
+    python3 -m measurement bench --duration 20
+    python3 -m measurement run "SourceMeter two probe voltage sweep" --simulate --input v=1
+    python3 -m measurement queue run --publish tcp://127.0.0.1:5557
+    python3 -m measurement resume /data/sample1/contacts_I7--I8_003.dat
+"""
+import argparse
+import os
+import sys
+
+from . import REGISTRY
+from .checkpoint import find_checkpoints
+from .headless import ConsoleSignalInterface, find_method, parse_inputs, resume_measurement, run_measurement
+from .scheduler import Job, RunQueue, Scheduler
+from .streaming import DEFAULT_ADDRESS, start_publisher
+
+QUEUE_JOURNAL = 'queue.journal'
+
+
+def list_methods(arguments) -> int:
+    for name in sorted(REGISTRY.keys()):
+        method = REGISTRY[name]
+        print('{} ({}, {} contacts)'.format(name, method.class_name, method.number_of_contacts().value))
+        if arguments.verbose:
+            for key, value in sorted(method.inputs().items()):
+                print('    {}={!r}  {}'.format(key, value.default, value.fullname))
+    return 0
+
+
+def run(arguments) -> int:
+    if arguments.simulate:
+        from . import simulation
+        simulation.install(speedup=arguments.speedup)
+    if arguments.publish:
+        start_publisher(arguments.publish)
+
+    try:
+        method = find_method(arguments.name)
+        inputs = parse_inputs(method, arguments.input)
+    except (KeyError, ValueError) as error:
+        print('ERROR', error.args[0], file=sys.stderr)
+        return 2
+
+    if not os.path.isdir(arguments.path):
+        print('ERROR', 'directory "{}" does not exist'.format(arguments.path), file=sys.stderr)
+        return 2
+
+    log_file = open(arguments.log, 'a') if arguments.log else None
+    try:
+        signal_interface = ConsoleSignalInterface(log_file, quiet=arguments.quiet)
+        run_measurement(method, arguments.path, tuple(arguments.contacts), inputs, signal_interface)
+    except ImportError as error:
+        print('ERROR', 'could not load "{}": {}'.format(method.name, error), file=sys.stderr)
+        return 2
+    finally:
+        if log_file is not None:
+            log_file.close()
+
+    return 0 if signal_interface.finished and not signal_interface.aborted else 1
+
+
+def resume(arguments) -> int:
+    if os.path.isdir(arguments.path):
+        for checkpoint in find_checkpoints(arguments.path):
+            print(checkpoint)
+        return 0
+
+    if arguments.simulate:
+        from . import simulation
+        simulation.install(speedup=arguments.speedup)
+
+    signal_interface = ConsoleSignalInterface(quiet=arguments.quiet)
+    try:
+        resume_measurement(arguments.path, signal_interface)
+    except (OSError, ValueError) as error:
+        print('ERROR', 'can not resume {}: {}'.format(arguments.path, error), file=sys.stderr)
+        return 2
+    except KeyError as error:
+        print('ERROR', error.args[0], file=sys.stderr)
+        return 2
+    except ImportError as error:
+        print('ERROR', 'could not load the measurement of {}: {}'.format(arguments.path, error), file=sys.stderr)
+        return 2
+
+    return 0 if signal_interface.finished and not signal_interface.aborted else 1
+
+
+def queue_add(arguments) -> int:
+    try:
+        method = find_method(arguments.name)
+        inputs = parse_inputs(method, arguments.input)
+    except (KeyError, ValueError) as error:
+        print('ERROR', error.args[0], file=sys.stderr)
+        return 2
+
+    queue = RunQueue(arguments.journal)
+    job = queue.add(Job(method.name, os.path.abspath(arguments.path), tuple(arguments.contacts),
+                        inputs, arguments.settle_time))
+    print('queued {} as {}'.format(job, job.id))
+    return 0
+
+
+def queue_list(arguments) -> int:
+    for job in RunQueue(arguments.journal).jobs:
+        print('{} {:8} {}'.format(job.id, job.state.value, job))
+    return 0
+
+
+def queue_run(arguments) -> int:
+    if arguments.publish:
+        start_publisher(arguments.publish)
+    queue = RunQueue(arguments.journal)
+    signal_interface = ConsoleSignalInterface(quiet=arguments.quiet)
+
+    def report(job):
+        done, total = scheduler.progress()
+        eta = scheduler.eta()
+        print('{} {} ({}/{}, ETA {})'.format(job, job.state.value, done, total,
+                                            'unknown' if eta is None else '{:.0f} s'.format(eta)))
+
+    scheduler = Scheduler(queue, signal_interface, after_job=report)
+    scheduler.start()
+    try:
+        while scheduler.is_running:
+            scheduler.wait(0.5)
+    except KeyboardInterrupt:
+        print('aborting, please wait for the devices to be reset', file=sys.stderr)
+        scheduler.abort()
+        scheduler.wait()
+
+    queue.compact()
+    return 0
+
+
+def bench(arguments) -> int:
+    from .benchmark import format_results, run_benchmark, save_results
+
+    results = run_benchmark(arguments.method or None, arguments.duration, arguments.path,
+                            arguments.speedup, arguments.latency)
+    print(format_results(results))
+    if arguments.output:
+        save_results(results, arguments.output)
+    return 0 if all(not result['status'].startswith('failed') for result in results) else 1
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python3 -m measurement',
+                                     description='Run measurements without the GUI.')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    list_parser = subparsers.add_parser('list', help='list all registered measurements')
+    list_parser.add_argument('-v', '--verbose', action='store_true', help='show the inputs too')
+    list_parser.set_defaults(function=list_methods)
+
+    run_parser = subparsers.add_parser('run', help='run a measurement')
+    run_parser.add_argument('name', help='registered name or class name of the measurement')
+    run_parser.add_argument('-i', '--input', action='append', default=[], metavar='KEY=VALUE',
+                            help='set an input, can be given several times')
+    run_parser.add_argument('-c', '--contacts', nargs='*', default=[], help='contact names, e.g. I7 I8')
+    run_parser.add_argument('-p', '--path', default='.', help='directory for the data files')
+    run_parser.add_argument('-l', '--log', help='append all messages to this file')
+    run_parser.add_argument('-q', '--quiet', action='store_true', help='do not print data points')
+    run_parser.add_argument('--simulate', action='store_true', help='use simulated instruments')
+    run_parser.add_argument('--speedup', type=float, default=1.0,
+                            help='simulated temperature and field change this much faster')
+    run_parser.add_argument('--publish', nargs='?', const=DEFAULT_ADDRESS, metavar='ADDRESS',
+                            help='publish live data, e.g. on tcp://127.0.0.1:5557 or unix:///tmp/measurement.sock')
+    run_parser.set_defaults(function=run)
+
+    resume_parser = subparsers.add_parser('resume', help='continue an interrupted measurement from its checkpoint')
+    resume_parser.add_argument('path', help='data file or checkpoint of the run, a directory lists the resumable runs')
+    resume_parser.add_argument('-q', '--quiet', action='store_true', help='do not print data points')
+    resume_parser.add_argument('--simulate', action='store_true', help='use simulated instruments')
+    resume_parser.add_argument('--speedup', type=float, default=1.0,
+                               help='simulated temperature and field change this much faster')
+    resume_parser.set_defaults(function=resume)
+
+    bench_parser = subparsers.add_parser('bench', help='benchmark measurements with simulated instruments')
+    bench_parser.add_argument('-m', '--method', action='append', default=[],
+                              help='registered name of a measurement, all if not given')
+    bench_parser.add_argument('-d', '--duration', type=float, default=30.0,
+                              help='seconds after which a measurement is aborted')
+    bench_parser.add_argument('-p', '--path', help='directory for the data files, temporary if not given')
+    bench_parser.add_argument('-s', '--speedup', type=float, default=60.0,
+                              help='simulated temperature and field change this much faster')
+    bench_parser.add_argument('--latency', type=float, default=0.002, help='seconds per bus access')
+    bench_parser.add_argument('-o', '--output', help='save the results as JSON')
+    bench_parser.set_defaults(function=bench)
+
+    queue_parser = subparsers.add_parser('queue', help='manage and run the measurement queue')
+    queue_parser.add_argument('-j', '--journal', default=QUEUE_JOURNAL, help='journal file of the queue')
+    queue_subparsers = queue_parser.add_subparsers(dest='queue_command')
+    queue_subparsers.required = True
+
+    add_parser = queue_subparsers.add_parser('add', help='add a measurement to the queue')
+    add_parser.add_argument('name', help='registered name or class name of the measurement')
+    add_parser.add_argument('-i', '--input', action='append', default=[], metavar='KEY=VALUE',
+                            help='set an input, can be given several times')
+    add_parser.add_argument('-c', '--contacts', nargs='*', default=[], help='contact names, e.g. I7 I8')
+    add_parser.add_argument('-p', '--path', default='.', help='directory for the data files')
+    add_parser.add_argument('-s', '--settle-time', type=float, default=0.0,
+                            help='seconds to wait before the measurement starts')
+    add_parser.set_defaults(function=queue_add)
+
+    queue_list_parser = queue_subparsers.add_parser('list', help='show the jobs in the queue')
+    queue_list_parser.set_defaults(function=queue_list)
+
+    queue_run_parser = queue_subparsers.add_parser('run', help='run all pending jobs')
+    queue_run_parser.add_argument('-q', '--quiet', action='store_true', help='do not print data points')
+    queue_run_parser.add_argument('--publish', nargs='?', const=DEFAULT_ADDRESS, metavar='ADDRESS',
+                                  help='publish live data, e.g. on tcp://127.0.0.1:5557')
+    queue_run_parser.set_defaults(function=queue_run)
+
+    arguments = parser.parse_args(argv)
+    return arguments.function(arguments)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,6 @@
 from .measurement import register, SignalInterface, AbstractValue, AbstractMeasurement, Contacts, PlotRecommendation
 from .measurement import FloatValue, IntegerValue, StringValue, DatetimeValue
+from .instruments import open_resource
 
 from visa import ResourceManager
 from scientificdevices.keithley.sourcemeter2400 import Sourcemeter2400
@@ -16,6 +17,7 @@ class Ald2ProbeMultipleSETMonitor(AbstractMeasurement):
     GPIB_RESOURCE_2400 = 'GPIB0::10::INSTR'
     GPIB_RESOURCE_2636A = 'GPIB0::11::INSTR'
     GPIB_RESOURCE_2602A = 'GPIB0::12::INSTR'
+    FIXED_RESOURCES = (GPIB_RESOURCE_2400, GPIB_RESOURCE_2636A, GPIB_RESOURCE_2602A)
 
     def __init__(self, signal_interface: SignalInterface,
                  path: str, contacts: Tuple[str, str],
@@ -43,16 +45,17 @@ class Ald2ProbeMultipleSETMonitor(AbstractMeasurement):
         self._init_smus()
 
     def _init_smus(self):
-        rm = ResourceManager('@py')
-        dev1 = rm.open_resource(self.GPIB_RESOURCE_2400)
-        dev2 = rm.open_resource(self.GPIB_RESOURCE_2636A)
-        dev3 = rm.open_resource(self.GPIB_RESOURCE_2602A)
+        dev1 = open_resource(self.GPIB_RESOURCE_2400)
+        dev2 = open_resource(self.GPIB_RESOURCE_2636A)
+        dev3 = open_resource(self.GPIB_RESOURCE_2602A)
 
         self._smus = [Sourcemeter2400(dev1),
                       Sourcemeter2636A(dev2, sub_device=SMUChannel.channelA),
                       Sourcemeter2636A(dev2, sub_device=SMUChannel.channelB),
                       Sourcemeter2602A(dev3, sub_device=SMUChannel.channelA),
                       Sourcemeter2602A(dev3, sub_device=SMUChannel.channelB)]
+        self._smus = [self._timed(smu, 'sourcemeter {}'.format(index + 1))
+                      for index, smu in enumerate(self._smus)]
 
         for index, smu in enumerate(self._smus):
             sample = self._samples[index]
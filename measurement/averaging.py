@@ -0,0 +1,109 @@
+"""Averaging readings until they are precise enough.
+
+Instead of a fixed number of readings per point, a measurement keeps reading
+until the standard error of the mean relative to the mean is below a target
+or a time limit is reached. Quiet samples are done after a few readings,
+noisy ones get more.
+
+Near a mean of zero no relative error is small enough, e.g. at 0 V of an
+I-V sweep. The error is therefore taken relative to at least a floor, the
+full scale of the range or the noise floor of the instrument, so such a
+point is done once its error is small compared to the range.
+
+:usage:
+    values, stats = average_reads(device.read, target=1e-3, max_time=5, floor=1e-6, stop=self._should_stop)
+    voltage, current = values
+    file_handle.write('{} {} {} {}\n'.format(voltage, current, stats.sem, stats.count))
+"""
+import math
+from time import monotonic
+from threading import Event
+from typing import Callable, Optional, Sequence, Tuple
+
+
+class RunningMean:
+    """Mean and standard error of a stream of values (Welford's algorithm)."""
+
+    def __init__(self, target: float = 0.0, max_time: float = 0.0, min_samples: int = 3,
+                 floor: float = 0.0) -> None:
+        """
+        :param target: relative standard error at which the mean is precise enough, 0 to take a single value
+        :param max_time: seconds after which the mean is taken as it is, only 0 without a target
+        :param min_samples: values needed before the standard error is trusted, also without a target
+        :param floor: the error is relative to at least this value, e.g. the full scale of the range
+        """
+        if target > 0 and max_time <= 0:
+            raise ValueError('averaging to a target error needs a time limit')
+        self._target = target
+        self._floor = abs(floor)
+        self._max_time = max_time
+        self._min_samples = min_samples
+        self._started = monotonic()
+        self._count = 0
+        self._mean = 0.0
+        self._squares = 0.0
+
+    def add(self, value: float) -> None:
+        self._count += 1
+        delta = value - self._mean
+        self._mean += delta / self._count
+        self._squares += delta * (value - self._mean)
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def mean(self) -> float:
+        return self._mean if self._count else math.nan
+
+    @property
+    def sem(self) -> float:
+        """Standard error of the mean, NaN for less than two values."""
+        if self._count < 2:
+            return math.nan
+        return math.sqrt(self._squares / (self._count - 1) / self._count)
+
+    @property
+    def relative_error(self) -> float:
+        sem = self.sem
+        if math.isnan(sem) or sem == 0:
+            # readings which do not change at all are as precise as they get
+            return sem
+        return sem / abs(self._mean) if self._mean != 0 else math.inf
+
+    @property
+    def elapsed(self) -> float:
+        return monotonic() - self._started
+
+    @property
+    def done(self) -> bool:
+        if self._count < self._min_samples:
+            return False
+        if self._target <= 0 or self.sem <= self._target * max(abs(self._mean), self._floor):
+            return True
+        return self.elapsed >= self._max_time
+
+
+def average_reads(read: Callable[[], Sequence[float]], target: float = 0.0, max_time: float = 0.0,
+                  min_samples: int = 3, index: int = -1, floor: float = 0.0,
+                  stop: Optional[Event] = None) -> Tuple[Tuple[float, ...], RunningMean]:
+    """Call read until the value at index is precise enough, see RunningMean.
+
+    With a target of 0 read is called once, as without averaging.
+
+    :param read: returns a tuple of values, e.g. (voltage, current) of a sourcemeter
+    :param index: the value whose relative standard error decides, the current by default
+    :param floor: the error is relative to at least this value, e.g. the current limit
+    :param stop: the averaging ends after the current reading when it is set
+    :return: the mean of each value and the statistics of the deciding one
+    """
+    stats = RunningMean(target, max_time, min_samples if target > 0 else 1, floor)
+    sums = None
+    while not stats.done:
+        values = read()
+        sums = list(values) if sums is None else [total + value for total, value in zip(sums, values)]
+        stats.add(values[index])
+        if stop is not None and stop.is_set():
+            break
+    return tuple(total / stats.count for total in sums), stats
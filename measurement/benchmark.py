@@ -0,0 +1,221 @@
+"""Run every registered measurement against the simulated instruments.
+
+For each measurement the benchmark reports the throughput (points per
+second), the wall time, how much memory the run left behind and how long
+data points wait before a consumer thread picks them up, which is what the
+queued Qt connection to the GUI does. Measurements which run until they
+are aborted (monitors, temperature sweeps) are aborted after `duration`.
+The scan of the GPIB pickers of the GUI is run against the simulated bus
+as well, it is skipped where PyQt5 is not installed.
+
+:usage:
+    python3 -m measurement bench --duration 20 --output benchmark.json
+"""
+import json
+import os
+import tempfile
+import tracemalloc
+from queue import Queue
+from threading import Thread, Timer
+from time import perf_counter, perf_counter_ns
+from typing import Dict, List, Optional
+
+from . import simulation
+from .measurement import SignalInterface
+from .timing import Histogram
+
+# inputs which differ from the defaults, e.g. so sweeps do not stay at 0 V
+BENCHMARK_INPUTS = {
+    'SourceMeter two probe voltage sweep': dict(v=1.0, n=50),
+    'SourceMeter two probe voltage sweep, channels A and B': dict(v=1.0, n=50),
+    'SIMULATED SourceMeter two probe voltage sweep': dict(v=1.0, n=50),
+    'SourceMeter two probe voltage sweep 2636A': dict(v=1.0, n=50),
+    'SET voltage sweep': dict(v=1.0, n=50),
+    'SET Gate Sweep': dict(v=0.1, gate_voltage=1.0, n=50),
+    'SourceMeter two probe current vs. time': dict(v=0.1),
+    'SourceMeter two probe Current vs. Temp. (blue)': dict(temperature_end=290),
+    'SRS830 Resistance vs. Temp. (blue)': dict(temperature_end=290),
+    'SRS830 Voltage vs. Field (blue)': dict(max_field=0.05),
+    'SRS830 Voltage vs. Field stepwise (blue)': dict(fields='[0.02, 0.05]', settle_time=1.0),
+    'Two Probe I-V Automatic Temperature Sweep (blue)': dict(v=1.0, temperatures='[299]'),
+    # two samples on each of three sourcemeters, the first two share a ground relay
+    'SMU scan list monitor': dict(scan_list='S1 A 1!1!1,1!2!12; S2 A 1!1!2,1!2!12; S3 C 1!3!3,1!4!13; '
+                                            'S4 C 1!3!4,1!4!13; S5 E 1!5!5,1!6!14; S6 E 1!5!6,1!6!14'),
+}
+
+CONTACTS = ('I1', 'I2', 'I3', 'I4')
+
+# name of the GPIB scan of the GUI in the results
+DEVICE_SCAN = 'GPIB device scan (GUI)'
+
+
+class BenchmarkSignalInterface(SignalInterface):
+    """Hands the data points to a consumer thread and measures how long they waited."""
+
+    def __init__(self) -> None:
+        self.lag = Histogram()
+        self.points = 0
+        self.aborted = False
+        self.messages = []  # type: List[str]
+        self._queue = Queue()
+        self._consumer = Thread(target=self._consume, name='benchmark consumer', daemon=True)
+        self._consumer.start()
+
+    def _consume(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            self.lag.record(perf_counter_ns() - item[0])
+            self.points += 1
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._consumer.join()
+
+    def emit_data(self, data) -> None:
+        self._queue.put((perf_counter_ns(), data))
+
+    def emit_started(self) -> None:
+        pass
+
+    def emit_finished(self, data) -> None:
+        pass
+
+    def emit_aborted(self) -> None:
+        self.aborted = True
+
+    def emit_status_message(self, message: str) -> None:
+        self.messages.append(message)
+
+
+def benchmark_method(name: str, path: str, duration: float) -> Dict:
+    """Run one registered measurement with the benchmark inputs and return its figures."""
+    from . import REGISTRY
+    from .headless import parse_inputs
+
+    method = REGISTRY[name]
+    signal_interface = BenchmarkSignalInterface()
+    result = dict(name=name)
+
+    tracemalloc.start()
+    memory_before, _ = tracemalloc.get_traced_memory()
+    start = perf_counter()
+    timer = None
+    try:
+        inputs = parse_inputs(method, [])
+        inputs.update(BENCHMARK_INPUTS.get(name, {}))
+        contacts = CONTACTS[:max(method.number_of_contacts().value, 0)]
+        measurement = method(signal_interface, path, contacts, **inputs)
+        # the measurements abort themselves in __init__ when their inputs are invalid
+        if measurement.aborted:
+            raise RuntimeError('aborted while it was created, the inputs are invalid')
+
+        timer = Timer(duration, measurement.abort)
+        timer.start()
+        measurement()
+        result['status'] = 'aborted' if signal_interface.aborted or timer.finished.is_set() else 'finished'
+        summary = measurement.timing.summary()
+        result['bus_utilization'] = summary['bus_utilization']
+    except Exception as error:
+        result['status'] = 'failed: {}: {}'.format(type(error).__name__, error)
+    finally:
+        if timer is not None:
+            timer.cancel()
+        wall_time = perf_counter() - start
+        signal_interface.close()
+        memory_after, memory_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    if signal_interface.points == 0 and not result['status'].startswith('failed'):
+        result['status'] = 'failed: no data points'
+
+    lag = signal_interface.lag.to_dict()
+    result.update(wall_s=wall_time,
+                  points=signal_interface.points,
+                  points_per_second=signal_interface.points / wall_time if wall_time > 0 else None,
+                  memory_growth_kib=(memory_after - memory_before) / 1024,
+                  memory_peak_kib=memory_peak / 1024,
+                  gui_lag_p50_ms=lag['p50_ms'], gui_lag_p99_ms=lag['p99_ms'], gui_lag_max_ms=lag['max_ms'])
+    return result
+
+
+def benchmark_device_scan() -> Dict:
+    """Scan and identify the simulated devices the way the GPIB pickers of the GUI do."""
+    result = dict(name=DEVICE_SCAN, points=0, points_per_second=None, memory_growth_kib=None,
+                  memory_peak_kib=None, gui_lag_p50_ms=None, gui_lag_p99_ms=None, gui_lag_max_ms=None)
+    start = perf_counter()
+    try:
+        from windows.gpib_picker import DeviceScanner
+    except ImportError as error:
+        result.update(status='skipped: {}'.format(error), wall_s=None)
+        return result
+
+    scanner = DeviceScanner()
+    try:
+        scanner._scan(identify=True)
+        found, identified = len(scanner.resources), len(scanner.identities)
+        if scanner.error is not None:
+            result['status'] = 'failed: {}: {}'.format(type(scanner.error).__name__, scanner.error)
+        elif found == 0 or identified < found:
+            result['status'] = 'failed: {} devices found, {} identified'.format(found, identified)
+        else:
+            result['status'] = 'finished'
+        result['points'] = found
+    except Exception as error:
+        result['status'] = 'failed: {}: {}'.format(type(error).__name__, error)
+    result['wall_s'] = perf_counter() - start
+    return result
+
+
+def run_benchmark(names: Optional[List[str]] = None, duration: float = 30.0, path: Optional[str] = None,
+                  speedup: float = 60.0, latency: float = simulation.LATENCY,
+                  seed: Optional[int] = 0) -> List[Dict]:
+    """Benchmark the given or all registered measurements against the simulation.
+
+    :param names: registered names or DEVICE_SCAN, all and the scan if None
+    :param duration: seconds after which a measurement is aborted
+    :param path: directory for the data files, a temporary one if None
+    :param speedup: how much faster temperature and field change than in reality
+    :param latency: seconds per simulated bus access
+    :param seed: seed of the simulated noise
+    """
+    simulation.install(speedup=speedup, latency=latency, seed=seed)
+    from . import REGISTRY
+    from .instruments import POOL
+
+    if path is None:
+        path = tempfile.mkdtemp(prefix='benchmark_')
+
+    results = []
+    for name in names or sorted(REGISTRY.keys()) + [DEVICE_SCAN]:
+        print('benchmarking {} ...'.format(name), flush=True)
+        if name == DEVICE_SCAN:
+            results.append(benchmark_device_scan())
+            continue
+        results.append(benchmark_method(name, path, duration))
+        # every measurement starts with freshly opened instruments
+        POOL.close_all()
+    return results
+
+
+def format_results(results: List[Dict]) -> str:
+    def number(value, pattern='{:.1f}'):
+        return '-' if value is None else pattern.format(value)
+
+    lines = ['{:50} {:>8} {:>7} {:>9} {:>10} {:>9} {:>9}  {}'.format(
+        'measurement', 'wall [s]', 'points', 'points/s', 'mem [KiB]', 'lag p50', 'lag p99', 'status')]
+    for result in results:
+        lines.append('{:50} {:>8} {:>7} {:>9} {:>10} {:>9} {:>9}  {}'.format(
+            result['name'][:50], number(result['wall_s']), result['points'],
+            number(result['points_per_second'], '{:.2f}'), number(result['memory_growth_kib']),
+            number(result['gui_lag_p50_ms'], '{:.3f}'), number(result['gui_lag_p99_ms'], '{:.3f}'),
+            result['status']))
+    return '\n'.join(lines)
+
+
+def save_results(results: List[Dict], file_path: str) -> None:
+    with open(file_path, 'w') as file_handle:
+        json.dump(dict(results=results, simulation=dict(latency=simulation.LATENCY,
+                                                        speedup=simulation.WORLD.speedup),
+                       cwd=os.getcwd()), file_handle, indent=1)
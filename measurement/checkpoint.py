@@ -0,0 +1,150 @@
+"""Checkpoints from which an interrupted measurement is resumed.
+
+Long series, e.g. an I-V curve at every temperature of a list, save a
+checkpoint whenever a step is completed: the method with its inputs and
+contacts, the data file, the number of bytes written to it and the number
+of completed steps. If the PC, a driver or the bus fails, the run is
+resumed from the checkpoint: the data file is cut back to the checkpointed
+length, so a half written step is measured again, and the measurement
+skips the completed steps.
+
+The inputs are saved as JSON, so datetimes come back as strings. They are
+converted to the types the measurement declares before it is created again.
+
+The checkpoint is kept next to the data file as '<name>.checkpoint.json'.
+It is written to a temporary file which then replaces the old one, a crash
+while saving leaves the previous checkpoint intact. It is removed when the
+run finishes, aborted runs keep it and can be resumed as well.
+
+:usage:
+    # in _measure of a measurement, after every temperature
+    self._checkpoint(file_handle, index + 1)
+
+    # after a crash
+    checkpoint = Checkpoint.load('contacts_1--2_001.dat')
+    method = REGISTRY[checkpoint.method]
+    measurement = method(signal_interface, checkpoint.path, checkpoint.contacts, **checkpoint.inputs_for(method))
+    measurement.resume_from(checkpoint)
+    measurement()
+"""
+import json
+import os
+from datetime import datetime
+from os.path import splitext
+from typing import Any, Dict, List, Optional, Tuple
+
+VERSION = 1
+SUFFIX = '.checkpoint.json'
+
+
+def checkpoint_path(file_path: str) -> str:
+    """The checkpoint of a data file, a checkpoint path is returned as it is."""
+    if file_path.endswith(SUFFIX):
+        return file_path
+    return splitext(file_path)[0] + SUFFIX
+
+
+class Checkpoint:
+    """The state of a run after its last completed step."""
+
+    def __init__(self, method: str, path: str, contacts: Tuple[str, ...], inputs: Dict[str, Any],
+                 file_path: str, offset: int = 0, position: int = 0, state: Optional[Dict] = None,
+                 saved: Optional[str] = None) -> None:
+        """
+        :param method: registered name of the measurement
+        :param path: directory of the data files
+        :param contacts: names of the contacts
+        :param inputs: inputs of the measurement
+        :param file_path: the data file
+        :param offset: length of the data file in bytes after the last completed step
+        :param position: number of completed steps
+        :param state: anything else the measurement needs to go on, it has to be JSON serializable
+        :param saved: when the checkpoint was saved
+        """
+        self.method = method
+        self.path = path
+        self.contacts = tuple(contacts)
+        self.inputs = dict(inputs)
+        self.file_path = file_path
+        self.offset = offset
+        self.position = position
+        self.state = dict(state or {})
+        self.saved = saved
+
+    def to_dict(self) -> Dict:
+        inputs = {key: value.isoformat() if isinstance(value, datetime) else value
+                  for key, value in self.inputs.items()}
+        return dict(version=VERSION, method=self.method, path=self.path, contacts=list(self.contacts),
+                    inputs=inputs, file_path=self.file_path, offset=self.offset, position=self.position,
+                    state=self.state, saved=self.saved)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Checkpoint':
+        if data.get('version') != VERSION:
+            raise ValueError('checkpoint version {} is not supported'.format(data.get('version')))
+        return cls(data['method'], data['path'], tuple(data['contacts']), data['inputs'], data['file_path'],
+                   data['offset'], data['position'], data.get('state'), data.get('saved'))
+
+    def inputs_for(self, method) -> Dict[str, Any]:
+        """The inputs converted to the types the inputs of the measurement class declare.
+
+        Inputs which were saved as strings but are not declared as strings, e.g.
+        datetimes, are converted with convert_from_string, the others are kept.
+        """
+        from .measurement import StringValue
+
+        declared = method.inputs()
+        inputs = {}
+        for name, value in self.inputs.items():
+            if name in declared and isinstance(value, str) and not isinstance(declared[name], StringValue):
+                value = declared[name].convert_from_string(value)
+            inputs[name] = value
+        return inputs
+
+    def save(self) -> None:
+        self.saved = datetime.now().isoformat()
+        path = checkpoint_path(self.file_path)
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'w') as file_handle:
+            json.dump(self.to_dict(), file_handle, indent=1)
+            file_handle.flush()
+            os.fsync(file_handle.fileno())
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, file_path: str) -> 'Checkpoint':
+        """Load the checkpoint of a data file or the checkpoint file itself.
+
+        :raises OSError: if there is no checkpoint
+        :raises ValueError: if it is malformed
+        """
+        with open(checkpoint_path(file_path), 'r') as file_handle:
+            data = json.load(file_handle)
+        try:
+            return cls.from_dict(data)
+        except KeyError as error:
+            raise ValueError('checkpoint misses {}'.format(error.args[0]))
+
+    def __str__(self) -> str:
+        return '{} ({}) in {}, {} steps done at {}'.format(self.method, ' '.join(self.contacts),
+                                                            self.file_path, self.position, self.saved)
+
+
+def remove_checkpoint(file_path: str) -> None:
+    """Remove the checkpoint of a data file if there is one."""
+    try:
+        os.remove(checkpoint_path(file_path))
+    except FileNotFoundError:
+        pass
+
+
+def find_checkpoints(directory: str) -> List[Checkpoint]:
+    """The runs in a directory which can be resumed, the newest first."""
+    checkpoints = []
+    for file_name in os.listdir(directory):
+        if file_name.endswith(SUFFIX):
+            try:
+                checkpoints.append(Checkpoint.load(os.path.join(directory, file_name)))
+            except (OSError, ValueError) as error:
+                print('WARNING', 'could not read checkpoint {}: {}'.format(file_name, error))
+    return sorted(checkpoints, key=lambda checkpoint: checkpoint.saved or '', reverse=True)
@@ -0,0 +1,339 @@
+"""Fast read access to the .dat files written by the measurements.
+
+The files start with '#' comment lines, followed by a line of column names
+separated by spaces and one line per data point. Timestamps are written in
+isoformat. A DataFile memory-maps the file and keeps the offsets of all data
+lines in a sidecar index '<file>.idx', so opening a file a second time, reading
+its last rows or any row range does not have to scan it again. Columns are
+converted with numpy in one go instead of line by line.
+
+A DataFile has the same reading interface as measurement.history.DataHistory,
+so plot and table windows can show a previous run.
+
+:usage:
+    data = DataFile('/data/contacts_I1_I2_001.dat')
+    data.columns             # ['Datetime', 'Voltage', 'Current']
+    data.column('Current')   # numpy array of the whole column
+    data.tail(100)           # DataFrame of the last 100 rows
+    data.refresh()           # index the lines which were appended since
+"""
+import csv
+import json
+import mmap
+import os
+import struct
+import zlib
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+COMMENT = ord('#')
+NEWLINE = ord('\n')
+
+FLOAT = 'float'
+DATETIME = 'datetime'
+TEXT = 'text'
+
+
+def _kind(token: bytes) -> str:
+    try:
+        float(token)
+        return FLOAT
+    except ValueError:
+        pass
+    try:
+        np.datetime64(token.decode(), 'us')
+        return DATETIME
+    except ValueError:
+        return TEXT
+
+
+def _split(line: bytes) -> List[bytes]:
+    """Values of a line, the overview files quote values which contain spaces."""
+    if b'"' in line:
+        return [value.encode() for value in next(csv.reader([line.decode().strip()], delimiter=' '))]
+    return line.split()
+
+
+def _convert(tokens: np.ndarray, kind: str) -> np.ndarray:
+    """Convert a column of byte strings, values which do not fit become NaN or NaT."""
+    if kind == TEXT:
+        return tokens.astype(str)
+    dtype = np.float64 if kind == FLOAT else 'datetime64[us]'
+    try:
+        return tokens.astype(dtype)
+    except ValueError:
+        invalid = np.nan if kind == FLOAT else np.datetime64('NaT')
+        values = []
+        for token in tokens:
+            try:
+                values.append(np.array(token).astype(dtype))
+            except ValueError:
+                values.append(invalid)
+        return np.array(values, dtype=dtype)
+
+
+class DataFile:
+    """Read-only view of a measurement data file, rows are parsed when they are read."""
+
+    INDEX_SUFFIX = '.idx'
+    INDEX_MAGIC = b'DATIDX01'
+    INDEX_HEADER = struct.Struct('<8sQ')
+    INDEX_VERSION = 1
+
+    # bytes at the end of the indexed part which have to be unchanged to reuse an index
+    CHECK_SIZE = 256
+
+    # rows of a reopened run which the plots show unless 'whole run' is checked
+    WINDOW_POINTS = 10000
+
+    def __init__(self, path: str, save_index: bool = True) -> None:
+        """
+        :param path: path of the .dat file
+        :param save_index: write the sidecar index, it is only read if False
+        """
+        self._path = path
+        self._save_index = save_index
+        self._file = open(path, 'rb')
+        self._map = None  # type: mmap.mmap
+        self._size = 0  # bytes up to the end of the last complete line which was indexed
+        self._header = []  # type: List[str]
+        self._columns = []  # type: List[str]
+        self._kinds = []  # type: List[str]
+        self._data_start = 0
+        # start and end (the newline) of every data line
+        self._lines = np.empty((0, 2), dtype=np.int64)
+
+        self._remap()
+        if not self._load_index():
+            self._parse_header()
+            self._index(self._data_start)
+            self._write_index()
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def header(self) -> List[str]:
+        """The comment lines at the top of the file without the '#'."""
+        return list(self._header)
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    @property
+    def kinds(self) -> Dict[str, str]:
+        """Column name to 'float', 'datetime' or 'text'."""
+        return dict(zip(self._columns, self._kinds))
+
+    @property
+    def bounded(self) -> bool:
+        return True
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def _remap(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if os.fstat(self._file.fileno()).st_size > 0:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _bytes(self) -> np.ndarray:
+        if self._map is None:
+            return np.empty(0, dtype=np.uint8)
+        return np.frombuffer(self._map, dtype=np.uint8)
+
+    def _parse_header(self) -> None:
+        self._header = []
+        self._columns = []
+        self._kinds = []
+        position = 0
+        size = len(self._map) if self._map is not None else 0
+        while position < size:
+            end = self._map.find(b'\n', position)
+            if end < 0:
+                break
+            line = self._map[position:end].strip()
+            if line.startswith(b'#'):
+                self._header.append(line[1:].strip().decode(errors='replace'))
+            elif line:
+                tokens = _split(line)
+                if all(_kind(token) != TEXT for token in tokens):
+                    # no line with column names, this is already data
+                    self._columns = ['column {}'.format(i + 1) for i in range(len(tokens))]
+                    break
+                self._columns = [token.decode(errors='replace') for token in tokens]
+                position = end + 1
+                break
+            position = end + 1
+        self._data_start = position
+        # a file with only its header has nothing more to index
+        self._size = max(self._size, position)
+
+    def _index(self, start: int) -> int:
+        """Add the complete data lines after start to the index, return their number."""
+        data = self._bytes()
+        ends = np.flatnonzero(data[start:] == NEWLINE) + start
+        if len(ends) == 0:
+            return 0
+        starts = np.concatenate(([start], ends[:-1] + 1))
+
+        # comment lines may be written between data points, e.g. after an error
+        keep = (ends > starts) & (data[np.minimum(starts, len(data) - 1)] != COMMENT)
+        lines = np.column_stack((starts[keep], ends[keep])).astype(np.int64)
+        self._size = int(ends[-1]) + 1
+
+        if not self._kinds and len(lines):
+            tokens = _split(bytes(data[lines[0, 0]:lines[0, 1]]))
+            self._kinds = [_kind(token) for token in tokens]
+            if len(self._columns) < len(tokens):
+                self._columns += ['column {}'.format(i + 1) for i in range(len(self._columns), len(tokens))]
+
+        self._lines = np.concatenate((self._lines, lines)) if len(self._lines) else lines
+        return len(lines)
+
+    def refresh(self) -> int:
+        """Index the lines which were appended to the file, return the number of new rows."""
+        size = os.fstat(self._file.fileno()).st_size
+        if size < self._size:
+            raise ValueError('{} was truncated'.format(self._path))
+        if size == self._size:
+            return 0
+        self._remap()
+        if not self._columns:
+            self._parse_header()
+            return self._index(self._data_start)
+        return self._index(max(self._size, self._data_start))
+
+    def _index_path(self) -> str:
+        return self._path + self.INDEX_SUFFIX
+
+    def _check_sum(self, size: int) -> int:
+        return zlib.crc32(self._map[max(0, size - self.CHECK_SIZE):size]) if self._map is not None else 0
+
+    def _load_index(self) -> bool:
+        """Use the sidecar index if it belongs to this file, lines appended since are indexed."""
+        try:
+            with open(self._index_path(), 'rb') as file_handle:
+                magic, length = self.INDEX_HEADER.unpack(file_handle.read(self.INDEX_HEADER.size))
+                if magic != self.INDEX_MAGIC:
+                    return False
+                meta = json.loads(file_handle.read(length).decode())
+                offset = self.INDEX_HEADER.size + length
+        except (OSError, ValueError, struct.error):
+            return False
+
+        file_size = len(self._map) if self._map is not None else 0
+        if (meta.get('version') != self.INDEX_VERSION or meta['size'] > file_size
+                or meta['check_sum'] != self._check_sum(meta['size'])):
+            return False
+
+        self._header = meta['header']
+        self._columns = meta['columns']
+        self._kinds = meta['kinds']
+        self._data_start = meta['data_start']
+        self._size = meta['size']
+        if meta['rows']:
+            self._lines = np.memmap(self._index_path(), dtype=np.int64, mode='r', offset=offset,
+                                    shape=(meta['rows'], 2))
+        # indexes of header-only files used to end before the column names
+        self._size = max(self._size, self._data_start)
+        if file_size > self._size and self._index(self._size):
+            self._write_index()
+        return True
+
+    def _write_index(self) -> None:
+        if not self._save_index:
+            return
+        meta = json.dumps(dict(version=self.INDEX_VERSION, size=self._size, check_sum=self._check_sum(self._size),
+                               header=self._header, columns=self._columns, kinds=self._kinds,
+                               data_start=self._data_start, rows=len(self._lines))).encode()
+        # the offsets start at a multiple of 8 bytes
+        meta += b' ' * (-(self.INDEX_HEADER.size + len(meta)) % 8)
+        temporary = self._index_path() + '.tmp'
+        try:
+            with open(temporary, 'wb') as file_handle:
+                file_handle.write(self.INDEX_HEADER.pack(self.INDEX_MAGIC, len(meta)))
+                file_handle.write(meta)
+                file_handle.write(np.ascontiguousarray(self._lines, dtype='<i8').tobytes())
+            os.replace(temporary, self._index_path())
+        except OSError:
+            # e.g. a read-only archive, the index is only kept in memory
+            pass
+
+    def _tokens(self, rows: np.ndarray) -> np.ndarray:
+        """The rows split into a two-dimensional array of byte strings."""
+        if len(rows) == 0:
+            return np.empty((0, len(self._kinds)), dtype=bytes)
+        lines = self._lines[rows]
+        contiguous = len(rows) > 1 and np.all(np.diff(rows) == 1)
+        if contiguous:
+            chunk = self._map[int(lines[0, 0]):int(lines[-1, 1])]
+            split = [line for line in chunk.split(b'\n') if line and not line.startswith(b'#')]
+        else:
+            split = [self._map[int(start):int(end)] for start, end in lines]
+
+        tokens = b' '.join(split).split()
+        width = len(self._kinds)
+        if len(tokens) == len(split) * width:
+            return np.array(tokens).reshape(len(split), width)
+
+        # some lines have a different number of values or quoted values with spaces (overview files)
+        table = np.full((len(split), width), b'nan', dtype=object)
+        for row, line in enumerate(split):
+            values = _split(line)[:width]
+            table[row, :len(values)] = values
+        return table.astype(bytes)
+
+    def _rows(self, start: int, stop: Optional[int], step: int = 1) -> np.ndarray:
+        return np.arange(*slice(start, stop, step).indices(len(self)))
+
+    def column(self, name: str, start: int = 0, stop: Optional[int] = None, step: int = 1) -> np.ndarray:
+        """Values of one column, float64 or datetime64 arrays for numbers and timestamps."""
+        index = self._columns.index(name)
+        return _convert(self._tokens(self._rows(start, stop, step))[:, index], self._kinds[index])
+
+    def values(self, columns: Optional[Sequence[str]] = None, start: int = 0, stop: Optional[int] = None,
+               max_points: Optional[int] = None) -> pd.DataFrame:
+        """Rows start to stop, every n-th row if there are more than max_points."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        step = 1
+        if max_points is not None and stop - start > max_points:
+            step = -(-(stop - start) // max_points)
+        names = list(columns) if columns is not None else self._columns
+        tokens = self._tokens(self._rows(start, stop, step))
+        return pd.DataFrame({name: _convert(tokens[:, self._columns.index(name)],
+                                            self._kinds[self._columns.index(name)])
+                             for name in names}, columns=names)
+
+    def tail(self, count: int, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        return self.values(columns, max(len(self) - count, 0))
+
+    def window(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        return self.tail(self.WINDOW_POINTS, columns)
+
+    def row(self, row: int) -> List:
+        tokens = self._tokens(np.array([row]))[0]
+        return [_convert(tokens[i:i + 1], kind)[0] for i, kind in enumerate(self._kinds)]
+
+    def value(self, row: int, column: int):
+        return _convert(self._tokens(np.array([row]))[0, column:column + 1], self._kinds[column])[0]
+
+    def close(self) -> None:
+        if isinstance(self._lines, np.memmap):
+            self._lines = np.array(self._lines)
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self) -> 'DataFile':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
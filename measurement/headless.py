@@ -0,0 +1,157 @@
+"""Run measurements without a GUI.
+
+Nothing in here imports Qt, matplotlib or pandas, so measurements can be
+started from scripts or from the command line (see measurement/__main__.py)
+on machines without a display.
+"""
+import sys
+from datetime import datetime
+from threading import Thread
+from typing import Dict, List, Optional, TextIO, Tuple, Union
+
+from . import REGISTRY
+from .checkpoint import Checkpoint
+from .measurement import AbstractMeasurement, BooleanValue, SignalInterface
+
+TRUE_STRINGS = ('1', 'true', 'yes', 'on')
+
+
+class ConsoleSignalInterface(SignalInterface):
+    """Prints everything a measurement reports to the console and optionally to a log file."""
+
+    def __init__(self, log_file: Optional[TextIO] = None, quiet: bool = False) -> None:
+        """
+        :param log_file: an open file which receives a copy of every line
+        :param quiet: do not print data points to the console
+        """
+        self._log_file = log_file
+        self._quiet = quiet
+        self._number_of_points = 0
+        self.finished = False
+        self.aborted = False
+
+    @property
+    def number_of_points(self) -> int:
+        return self._number_of_points
+
+    def _print(self, line: str, console: bool = True) -> None:
+        line = '{} {}'.format(datetime.now().isoformat(), line)
+        if console:
+            print(line, flush=True)
+        if self._log_file is not None:
+            self._log_file.write(line + '\n')
+            self._log_file.flush()
+
+    def emit_started(self) -> None:
+        self._number_of_points = 0
+        self.finished = False
+        self.aborted = False
+        self._print('started')
+
+    def emit_data(self, data: Dict[str, Union[int, float, bool, str, datetime]]) -> None:
+        self._number_of_points += 1
+        values = ' '.join('{}={}'.format(key, value.isoformat() if isinstance(value, datetime) else value)
+                          for key, value in sorted(data.items()))
+        self._print('data {}'.format(values), console=not self._quiet)
+
+    def emit_status_message(self, message: str) -> None:
+        self._print('status {}'.format(message))
+
+    def emit_aborted(self) -> None:
+        self.aborted = True
+        self._print('aborted')
+
+    def emit_finished(self, data) -> None:
+        self.finished = True
+        self._print('finished after {} points'.format(self._number_of_points))
+
+
+def find_method(name: str):
+    """Find a registered method by its registered name or by its class name.
+
+    :raises KeyError: if no or more than one method matches
+    """
+    if name in REGISTRY:
+        return REGISTRY[name]
+
+    matches = [method for method in REGISTRY.values() if method.class_name == name]
+    if len(matches) == 1:
+        return matches[0]
+    elif len(matches) > 1:
+        raise KeyError('class name "{}" is ambiguous, use one of: {}'.format(
+            name, ', '.join('"{}"'.format(method.name) for method in matches)))
+    raise KeyError('unknown measurement "{}"'.format(name))
+
+
+def parse_inputs(method, assignments: List[str]) -> Dict[str, Union[int, float, bool, str, datetime]]:
+    """Convert 'key=value' strings into measurement inputs, missing ones keep their default.
+
+    :raises ValueError: for unknown keys or malformed assignments
+    """
+    inputs = method.inputs()
+    values = {key: value.default for key, value in inputs.items()}
+
+    for assignment in assignments:
+        key, separator, string = assignment.partition('=')
+        if separator == '' or key not in inputs:
+            raise ValueError('unknown input "{}", known inputs are: {}'.format(
+                assignment, ', '.join(sorted(inputs.keys()))))
+
+        if isinstance(inputs[key], BooleanValue):
+            values[key] = string.strip().lower() in TRUE_STRINGS
+        else:
+            values[key] = inputs[key].convert_from_string(string)
+
+    return values
+
+
+def run_measurement(method, path: str, contacts: Tuple[str, ...] = (),
+                    inputs: Optional[Dict] = None,
+                    signal_interface: Optional[SignalInterface] = None,
+                    resume: Optional[Checkpoint] = None) -> AbstractMeasurement:
+    """Run a measurement in a thread and wait for it, Ctrl+C aborts it gracefully.
+
+    :param method: a registered measurement class or its registered name
+    :param path: directory for the data files
+    :param contacts: names of the contacts
+    :param inputs: inputs of the measurement, defaults are used for missing ones
+    :param signal_interface: receives the signals, printed to the console if None
+    :param resume: continue the run of this checkpoint instead of starting a new one
+    :return: the finished measurement object
+    """
+    if isinstance(method, str):
+        method = find_method(method)
+    if signal_interface is None:
+        signal_interface = ConsoleSignalInterface()
+
+    values = parse_inputs(method, [])
+    values.update(inputs or {})
+
+    measurement = method(signal_interface, path, tuple(contacts), **values)
+    if resume is not None:
+        measurement.resume_from(resume)
+
+    thread = Thread(target=measurement, name=str(method))
+    thread.start()
+    try:
+        while thread.is_alive():
+            thread.join(0.5)
+    except KeyboardInterrupt:
+        print('aborting, please wait for the devices to be reset', file=sys.stderr)
+        measurement.abort()
+        thread.join()
+
+    return measurement
+
+
+def resume_measurement(file_path: str, signal_interface: Optional[SignalInterface] = None) -> AbstractMeasurement:
+    """Continue an interrupted run with the method, inputs and contacts of its checkpoint.
+
+    :param file_path: the data file of the run or its checkpoint
+    :raises OSError: if the run has no checkpoint
+    :raises KeyError: if its method is not registered any more
+    """
+    checkpoint = Checkpoint.load(file_path)
+    method = find_method(checkpoint.method)
+    return run_measurement(method, checkpoint.path, checkpoint.contacts, checkpoint.inputs_for(method),
+                           signal_interface, resume=checkpoint)
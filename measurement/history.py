@@ -0,0 +1,319 @@
+"""The data points of a run as seen by the GUI.
+
+Monitors and temperature or field sweeps run for days. Only a window of the
+newest points (limited by number or age) is kept in memory, older points are
+moved to a memory-mapped file and read back when a plot or the table asks
+for them. All values are stored as float64, datetimes as seconds since 1970
+of the naive timestamp, so they come back as the same wall-clock time. Text
+which is no number is kept beside the array in memory, its columns come
+back as objects.
+
+The points in memory are one contiguous array which grows at the end and
+shrinks at the front, so the window is a slice of it and not stacked from
+the single points every time a plot asks for it.
+
+:usage:
+    history = DataHistory(window_points=10000)
+    history.append({'datetime': datetime.now(), 'g': 1e-6})
+    history.window(['datetime', 'g'])   # newest points as DataFrame
+    history.values(['datetime', 'g'], max_points=5000)  # the whole run, thinned out
+"""
+import math
+import os
+import tempfile
+from collections import OrderedDict, deque
+from datetime import datetime
+from time import monotonic
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+EPOCH = datetime(1970, 1, 1)
+
+Value = Union[int, float, bool, str, datetime]
+
+
+def _to_float(value: Value) -> float:
+    if isinstance(value, datetime):
+        return (value - EPOCH).total_seconds()
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+class SpillFile:
+    """A growing two-dimensional float64 array in a memory-mapped file."""
+
+    INITIAL_ROWS = 4096
+
+    def __init__(self, number_of_columns: int, directory: Optional[str] = None) -> None:
+        handle, self._path = tempfile.mkstemp(prefix='history_', suffix='.f64', dir=directory)
+        os.close(handle)
+        self._columns = number_of_columns
+        self._length = 0
+        self._array = None  # type: np.memmap
+        self._resize(self.INITIAL_ROWS)
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def _resize(self, rows: int) -> None:
+        if self._array is not None:
+            self._array.flush()
+            del self._array
+        with open(self._path, 'r+b') as file_handle:
+            file_handle.truncate(rows * self._columns * 8)
+        self._array = np.memmap(self._path, dtype=np.float64, mode='r+', shape=(rows, self._columns))
+
+    def append(self, rows: np.ndarray) -> None:
+        needed = self._length + len(rows)
+        if needed > self._array.shape[0]:
+            self._resize(max(needed, 2 * self._array.shape[0]))
+        self._array[self._length:needed] = rows
+        self._length = needed
+
+    def add_column(self) -> None:
+        """Widen the array by a column of NaN, the whole file is rewritten."""
+        old = np.array(self._array[:self._length])
+        self._columns += 1
+        self._array.flush()
+        del self._array
+        self._array = None
+        with open(self._path, 'r+b') as file_handle:
+            file_handle.truncate(0)
+        self._resize(max(self._length, self.INITIAL_ROWS))
+        self._array[:self._length, :-1] = old
+        self._array[:self._length, -1] = np.nan
+
+    def read(self, start: int, stop: int, step: int = 1) -> np.ndarray:
+        return np.array(self._array[start:stop:step])
+
+    def close(self) -> None:
+        if self._array is not None:
+            del self._array
+            self._array = None
+        if os.path.exists(self._path):
+            os.remove(self._path)
+
+
+class WindowBuffer:
+    """The newest rows as a float64 array, appended at the end and removed at the front."""
+
+    INITIAL_ROWS = 1024
+
+    def __init__(self, number_of_columns: int = 0) -> None:
+        self._array = np.full((self.INITIAL_ROWS, number_of_columns), np.nan)
+        self._start = 0
+        self._stop = 0
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def append(self, row: np.ndarray) -> None:
+        if self._stop == self._array.shape[0]:
+            self._make_room()
+        self._array[self._stop] = row
+        self._stop += 1
+
+    def _make_room(self) -> None:
+        """Move the rows to the front, into a twice as large array if they fill more than half of it."""
+        length = len(self)
+        rows = self._array[self._start:self._stop]
+        if 2 * length > self._array.shape[0]:
+            array = np.full((2 * self._array.shape[0], self._array.shape[1]), np.nan)
+        else:
+            array = self._array
+        array[:length] = rows
+        self._array, self._start, self._stop = array, 0, length
+
+    def popleft(self, count: int) -> np.ndarray:
+        """Remove the oldest rows and return them."""
+        rows = np.array(self._array[self._start:self._start + count])
+        self._start += len(rows)
+        return rows
+
+    def add_column(self) -> None:
+        self._array = np.hstack((self._array, np.full((self._array.shape[0], 1), np.nan)))
+
+    def read(self, start: int, stop: int, step: int = 1) -> np.ndarray:
+        """Rows start to stop, counted from the oldest, as a view which is valid until the next change."""
+        return self._array[self._start + start:self._start + min(stop, len(self)):step]
+
+    def clear(self) -> None:
+        self._start = self._stop = 0
+
+
+class DataHistory:
+    """All data points of one run, the older ones spilled to disk.
+
+    Without a limit everything stays in memory, as it always did. The
+    column set grows with the keys of the emitted points.
+    """
+
+    # rows which are read from disk together for the table
+    PAGE_SIZE = 256
+    PAGE_CACHE = 8
+
+    def __init__(self, window_points: Optional[int] = None, window_seconds: Optional[float] = None,
+                 spill_directory: Optional[str] = None) -> None:
+        """
+        :param window_points: maximal number of points in memory
+        :param window_seconds: points older than this are moved to disk
+        :param spill_directory: where the memory-mapped file is created, the temp directory if None
+        """
+        self._window_points = window_points
+        self._window_seconds = window_seconds
+        self._spill_directory = spill_directory
+
+        self._columns = []  # type: List[str]
+        self._datetime_columns = set()
+        # text values by row, also of the rows on disk
+        self._text = {}  # type: Dict[str, Dict[int, str]]
+        self._window = WindowBuffer()
+        self._arrival = deque()  # type: deque
+        self._spill = None  # type: SpillFile
+        self._pages = OrderedDict()  # type: OrderedDict
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    @property
+    def bounded(self) -> bool:
+        return self._window_points is not None or self._window_seconds is not None
+
+    @property
+    def spilled(self) -> int:
+        """Number of points which are on disk."""
+        return len(self._spill) if self._spill is not None else 0
+
+    def __len__(self) -> int:
+        return self.spilled + len(self._window)
+
+    def append(self, data: Dict[str, Value]) -> None:
+        for key, value in data.items():
+            if key not in self._columns:
+                self._add_column(key)
+            if isinstance(value, datetime):
+                self._datetime_columns.add(key)
+
+        index = len(self)
+        row = np.full(len(self._columns), np.nan)
+        for key, value in data.items():
+            number = _to_float(value)
+            if isinstance(value, str) and math.isnan(number):
+                self._text.setdefault(key, {})[index] = value
+            row[self._columns.index(key)] = number
+
+        self._window.append(row)
+        self._arrival.append(monotonic())
+        self._trim()
+
+    def _add_column(self, name: str) -> None:
+        self._columns.append(name)
+        self._window.add_column()
+        if self._spill is not None:
+            self._spill.add_column()
+        self._pages.clear()
+
+    def _trim(self) -> None:
+        count = 0
+        if self._window_points is not None:
+            count = max(count, len(self._window) - self._window_points)
+        if self._window_seconds is not None:
+            limit = monotonic() - self._window_seconds
+            # the newest point always stays in memory
+            while count < len(self._arrival) - 1 and self._arrival[count] < limit:
+                count += 1
+        if count <= 0:
+            return
+
+        if self._spill is None:
+            self._spill = SpillFile(len(self._columns), self._spill_directory)
+        for _ in range(count):
+            self._arrival.popleft()
+        self._spill.append(self._window.popleft(count))
+
+    def _rows(self, start: int, stop: int, step: int = 1) -> np.ndarray:
+        """Rows start to stop of the whole run as one array."""
+        start, stop, step = slice(start, stop, step).indices(len(self))
+        parts = []
+        spilled = self.spilled
+        if start < spilled:
+            parts.append(self._spill.read(start, min(stop, spilled), step))
+            # continue in the window where the step leaves the spill file
+            start = start + math.ceil((spilled - start) / step) * step
+        if stop > spilled and start < stop:
+            parts.append(self._window.read(start - spilled, stop - spilled, step))
+        if not parts:
+            return np.empty((0, len(self._columns)))
+        return np.vstack(parts)
+
+    def _frame(self, rows: np.ndarray, indices: range, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """The rows as DataFrame, indices are their numbers in the run."""
+        names = list(columns) if columns is not None else self._columns
+        frame = pd.DataFrame(rows[:, [self._columns.index(name) for name in names]], columns=names)
+        for name in names:
+            if name in self._datetime_columns:
+                frame[name] = pd.to_datetime(frame[name], unit='s')
+            elif name in self._text:
+                text = self._text[name]
+                frame[name] = pd.Series([text.get(index, number) for index, number in zip(indices, frame[name])],
+                                        dtype=object)
+        return frame
+
+    def window(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """The points which are in memory, all if the history is not bounded."""
+        rows = self._window.read(0, len(self._window))
+        return self._frame(rows, range(self.spilled, len(self)), columns)
+
+    def values(self, columns: Optional[Sequence[str]] = None, start: int = 0, stop: Optional[int] = None,
+               max_points: Optional[int] = None) -> pd.DataFrame:
+        """Points start to stop of the whole run, every n-th point if there are more than max_points."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        step = 1
+        if max_points is not None and stop - start > max_points:
+            step = math.ceil((stop - start) / max_points)
+        start, stop, step = slice(start, stop, step).indices(len(self))
+        return self._frame(self._rows(start, stop, step), range(start, stop, step), columns)
+
+    def value(self, row: int, column: int) -> Value:
+        """A single value for the table, the spilled points are read a page at a time."""
+        name = self._columns[column]
+        if row in self._text.get(name, ()):
+            return self._text[name][row]
+        if row >= self.spilled:
+            value = self._window.read(row - self.spilled, row - self.spilled + 1)[0][column]
+        else:
+            page = row // self.PAGE_SIZE
+            if page not in self._pages:
+                start = page * self.PAGE_SIZE
+                self._pages[page] = self._spill.read(start, min(start + self.PAGE_SIZE, self.spilled))
+                if len(self._pages) > self.PAGE_CACHE:
+                    self._pages.popitem(last=False)
+            rows = self._pages[page]
+            if row - page * self.PAGE_SIZE >= len(rows):
+                # the page was read before it was full
+                del self._pages[page]
+                return self.value(row, column)
+            value = rows[row - page * self.PAGE_SIZE][column]
+
+        if name in self._datetime_columns and not math.isnan(value):
+            return pd.to_datetime(value, unit='s')
+        return value
+
+    def close(self) -> None:
+        """Remove the spill file, the history is empty afterwards."""
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+        self._window.clear()
+        self._arrival.clear()
+        self._pages.clear()
+        self._text.clear()
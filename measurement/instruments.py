@@ -0,0 +1,103 @@
+"""Instrument handles which are shared between measurement runs.
+
+Opening a VISA resource, asking for its identification and configuring the
+driver costs a noticeable amount of time on the GPIB bus. Measurements get
+their instruments from the pool instead, so consecutive runs (e.g. from the
+scheduler) reuse the already opened handles.
+
+An instrument is opened outside of the lock of the pool, so a slow or
+hanging device only blocks the runs which want the same instrument. The
+settings given to open_resource (query_delay, timeout, ...) are applied on
+every call, a run gets the handle as it asked for it and not as the run
+which opened it did.
+
+:usage:
+    resource = open_resource('GPIB0::10::INSTR')
+    temp = shared(('ITC', 24), lambda: ITC(get_gpib_device(24)))
+"""
+from threading import RLock
+from typing import Any, Callable, Dict, Hashable
+
+# arguments of open_resource which are no attributes of the resource
+OPEN_ONLY = ('access_mode', 'open_timeout', 'resource_pyclass')
+
+
+class InstrumentPool:
+    """Keeps opened instruments by key and creates them on first use."""
+
+    def __init__(self) -> None:
+        self._lock = RLock()
+        self._instruments = {}  # type: Dict[Hashable, Any]
+        # held while the instrument of a key is opened
+        self._opening = {}  # type: Dict[Hashable, RLock]
+        self._resource_managers = {}  # type: Dict[str, Any]
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Return the instrument stored under key, it is created with factory if missing.
+
+        :param key: any hashable which identifies the instrument, e.g. ('ITC', 24)
+        :param factory: function without arguments which opens the instrument
+        """
+        with self._lock:
+            if key in self._instruments:
+                return self._instruments[key]
+            opening = self._opening.setdefault(key, RLock())
+
+        with opening:
+            with self._lock:
+                if key in self._instruments:
+                    # opened by another run meanwhile
+                    return self._instruments[key]
+            instrument = factory()
+            with self._lock:
+                self._instruments[key] = instrument
+            return instrument
+
+    def resource_manager(self, visa_library: str = '@py'):
+        with self._lock:
+            if visa_library not in self._resource_managers:
+                from visa import ResourceManager
+                self._resource_managers[visa_library] = ResourceManager(visa_library)
+            return self._resource_managers[visa_library]
+
+    def open_resource(self, address: str, visa_library: str = '@py', **kwargs):
+        """Return an open VISA resource, the keyword arguments are set as its attributes on every call."""
+        resource = self.get(('visa', visa_library, address),
+                            lambda: self.resource_manager(visa_library).open_resource(address, **kwargs))
+        for name, value in kwargs.items():
+            if name not in OPEN_ONLY:
+                setattr(resource, name, value)
+        return resource
+
+    def discard(self, key: Hashable) -> None:
+        """Forget an instrument, e.g. after it stopped responding, and try to close it."""
+        with self._lock:
+            instrument = self._instruments.pop(key, None)
+
+        close = getattr(instrument, 'close', None)
+        if close is not None:
+            try:
+                close()
+            except Exception as error:
+                print('WARNING', 'could not close {}: {}'.format(key, error))
+
+    def close_all(self) -> None:
+        with self._lock:
+            keys = list(self._instruments.keys())
+        for key in keys:
+            self.discard(key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._instruments
+
+
+POOL = InstrumentPool()
+
+
+def open_resource(address: str, visa_library: str = '@py', **kwargs):
+    return POOL.open_resource(address, visa_library, **kwargs)
+
+
+def shared(key: Hashable, factory: Callable[[], Any]) -> Any:
+    return POOL.get(key, factory)
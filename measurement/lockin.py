@@ -0,0 +1,131 @@
+"""Pacing SR830 readings to the time constant of the lock-in.
+
+The output of a lock-in only changes on the scale of its time constant, so
+readings taken back to back are strongly correlated: they make the files
+larger and the plots slower without adding information. A LockInPacer reads
+the time constant (oflt) and the filter slope (ofsl) once and lets the
+measurement take a given number of readings per time constant. The time
+until the next reading is due is left to the other instruments, e.g. the
+thermometers are read while the lock-in settles.
+
+The correlation time of the output depends on the slope: 1/(2 ENBW) with
+the equivalent noise bandwidth ENBW of the filter, i.e. 2, 4, 5.3 and 6.4
+time constants for 6, 12, 18 and 24 dB/oct. One reading per correlation
+time gives independent samples, which readings averaged to a standard
+error have to be, so their pacer is made with independent=True.
+
+A LockInGroup reads several lock-ins at the same time, e.g. the
+longitudinal and the Hall voltage during one field sweep.
+
+:usage:
+    pacer = LockInPacer(lock_in, samples_per_time_constant=1)
+    while not pacer.wait(should_stop):
+        x, y, r, theta = read_outputs(lock_in)
+        temperature = itc.T1
+"""
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from time import monotonic
+from typing import List, Sequence, Tuple
+
+# time constants of the SR830 in s, the index is the value of oflt
+TIME_CONSTANTS = [10e-6, 30e-6, 100e-6, 300e-6, 1e-3, 3e-3, 10e-3, 30e-3, 100e-3, 300e-3,
+                  1, 3, 10, 30, 100, 300, 1e3, 3e3, 10e3, 30e3]
+
+# full scales of the SR830 in V, the index is the value of sens
+SENSITIVITIES = [2e-9, 5e-9, 10e-9, 20e-9, 50e-9, 100e-9, 200e-9, 500e-9, 1e-6, 2e-6, 5e-6, 10e-6, 20e-6, 50e-6,
+                 100e-6, 200e-6, 500e-6, 1e-3, 2e-3, 5e-3, 10e-3, 20e-3, 50e-3, 100e-3, 200e-3, 500e-3, 1]
+
+# filter slopes in dB/oct and the equivalent noise bandwidth times the time constant, the index is ofsl
+SLOPES = [6, 12, 18, 24]
+NOISE_BANDWIDTHS = [1 / 4, 1 / 8, 3 / 32, 5 / 64]
+
+# the slope after a reset of the SR830, for drivers which can not read it
+DEFAULT_SLOPE = 1
+
+# lock-ins of one measurement, the outputs of the measurements are declared for this many
+MAX_LOCK_INS = 4
+
+
+class LockInPacer:
+    """Spaces the readings of a lock-in by a fraction of its time constant."""
+
+    def __init__(self, device, samples_per_time_constant: float = 1.0, independent: bool = False) -> None:
+        """
+        :param device: the SR830, oflt and ofsl are read once
+        :param samples_per_time_constant: readings per time constant, 0 to read as fast as possible
+        :param independent: the readings are at least one correlation time apart, e.g. to average them
+        """
+        self.oflt = int(device.oflt)
+        self.ofsl = int(getattr(device, 'ofsl', DEFAULT_SLOPE))
+        self.time_constant = TIME_CONSTANTS[self.oflt]
+        self.interval = self.time_constant / samples_per_time_constant if samples_per_time_constant > 0 else 0.0
+        if independent:
+            self.interval = max(self.interval, self.correlation_time)
+        self._next = monotonic()
+
+    @property
+    def slope(self) -> int:
+        """Filter slope in dB/oct."""
+        return SLOPES[self.ofsl]
+
+    @property
+    def correlation_time(self) -> float:
+        """Seconds after which readings are independent."""
+        return self.time_constant / (2 * NOISE_BANDWIDTHS[self.ofsl])
+
+    def describe(self) -> str:
+        return '{} s time constant, {} dB/oct, a reading every {} s'.format(self.time_constant, self.slope,
+                                                                           self.interval)
+
+    def wait(self, should_stop: Event) -> bool:
+        """Wait until the next reading is due, return True if the measurement was stopped meanwhile."""
+        remaining = self._next - monotonic()
+        if remaining > 0 and should_stop.wait(remaining):
+            return True
+        self._next = monotonic() + self.interval
+        return should_stop.is_set()
+
+
+def read_outputs(device) -> Tuple[float, float, float, float]:
+    """X, Y, R and theta in degrees of a lock-in, R and theta are calculated from X and Y instead of read."""
+    x, y = device.outpX, device.outpY
+    return x, y, math.hypot(x, y), math.degrees(math.atan2(y, x))
+
+
+def read_lock_in(device) -> Tuple[float, float, float, float, int]:
+    """X, Y, R, theta and the sensitivity of a lock-in."""
+    return read_outputs(device) + (device.sens,)
+
+
+def parse_addresses(text: str) -> List[str]:
+    """The addresses of a comma or space separated list like 'GPIB0::8::INSTR, GPIB0::9::INSTR'."""
+    return [address for address in re.split(r'[,\s]+', text) if address]
+
+
+class LockInGroup:
+    """Reads several lock-ins at the same time, one thread per lock-in.
+
+    All reads of a row are started together, so the readings belong to the
+    same moment up to one bus access and a row takes as long as the slowest
+    lock-in instead of the sum of all.
+    """
+
+    def __init__(self, devices: Sequence) -> None:
+        self.devices = list(devices)
+        self._executor = ThreadPoolExecutor(max_workers=len(self.devices)) if len(self.devices) > 1 else None
+
+    def __len__(self) -> int:
+        return len(self.devices)
+
+    def read(self) -> List[Tuple[float, float, float, float, int]]:
+        """read_lock_in of every lock-in, in the order of the devices."""
+        if self._executor is None:
+            return [read_lock_in(device) for device in self.devices]
+        return list(self._executor.map(read_lock_in, self.devices))
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
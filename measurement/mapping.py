@@ -0,0 +1,147 @@
+"""Points of 2D maps like the stability diagram of a SET.
+
+A QuadtreeMap starts with a coarse n x n grid and refines only the cells in
+which the measured value is not well described by its corners: the centre
+of every cell is measured and compared with the mean of the four corners.
+If they differ by more than the tolerance (relative to the largest value
+measured so far) the cell is split into four, down to depth levels. On a
+Coulomb diamond map this puts the points on the edges of the diamonds where
+the current sets in, the flat blockade regions and the linear parts stay
+coarse.
+
+All points lie on the lattice of the finest level, a uniform map of the
+same resolution would need uniform_points points. The map is measured in
+passes from coarse to fine, so a map which runs out of budget still covers
+the whole area. Within a pass the points are ordered row by row with
+alternating direction to keep the voltage steps small.
+
+:usage:
+    points = QuadtreeMap((-v, v), (gate_min, gate_max), n=11, depth=3)
+    for bias, gate in points:
+        ...
+        points.add(current)
+"""
+import math
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+Point = Tuple[int, int]
+
+
+class QuadtreeMap:
+    """Hands out the points of a map, the measured values decide where to refine."""
+
+    def __init__(self, x_range: Sequence[float], y_range: Sequence[float], n: int = 11, depth: int = 3,
+                 tolerance: float = 0.02, budget: int = 0) -> None:
+        """
+        :param x_range: first and last x, x is the fast axis of a pass
+        :param y_range: first and last y
+        :param n: number of points of the coarse grid along each axis
+        :param depth: number of times a coarse cell can be split
+        :param tolerance: allowed difference of centre and mean of the corners relative to the full scale
+        :param budget: maximal number of points, 0 for no limit
+        """
+        if n < 2:
+            raise ValueError('a map needs at least two points along each axis')
+        if depth < 0:
+            raise ValueError('the depth of a map can not be negative')
+
+        self._x_range = tuple(float(x) for x in x_range)
+        self._y_range = tuple(float(y) for y in y_range)
+        self._depth = depth
+        self._tolerance = tolerance
+        self._budget = budget
+
+        self._coarse_size = 2 ** depth
+        self._size = (n - 1) * self._coarse_size + 1
+        self._values = {}  # type: Dict[Point, float]
+        self._planned = 0
+        self._last = None  # type: Optional[Point]
+        self._scale = 0.0
+
+    @property
+    def uniform_points(self) -> int:
+        """Number of points of a uniform map with the finest resolution."""
+        return self._size ** 2
+
+    @property
+    def max_points(self) -> int:
+        """Largest number of points of the map, the budget if it is smaller than a uniform map."""
+        return min(self._budget, self.uniform_points) if self._budget else self.uniform_points
+
+    @property
+    def planned(self) -> int:
+        """Number of points handed out so far."""
+        return self._planned
+
+    def voltages(self, point: Point) -> Tuple[float, float]:
+        """x and y of a lattice point."""
+        (x0, x1), (y0, y1) = self._x_range, self._y_range
+        last = self._size - 1
+        return x0 + (x1 - x0) * point[0] / last, y0 + (y1 - y0) * point[1] / last
+
+    def add(self, value: float) -> None:
+        """Tell the map the value measured at the last point."""
+        if self._last is None or value is None or math.isnan(value):
+            return
+        self._values[self._last] = value
+        self._scale = max(self._scale, abs(value))
+
+    def _error(self, cell: Tuple[int, int, int]) -> Optional[float]:
+        """Difference of the centre and the mean of the corners of a cell, None if one of them is missing."""
+        x, y, size = cell
+        half = size // 2
+        points = [(x, y), (x + size, y), (x, y + size), (x + size, y + size), (x + half, y + half)]
+        values = [self._values.get(point) for point in points]
+        if any(value is None for value in values):
+            return None
+        return abs(values[4] - sum(values[:4]) / 4)
+
+    @staticmethod
+    def _ordered(points) -> List[Point]:
+        """Row by row, every other row backwards."""
+        rows = {}  # type: Dict[int, List[int]]
+        for x, y in points:
+            rows.setdefault(y, []).append(x)
+        ordered = []
+        for index, y in enumerate(sorted(rows)):
+            ordered.extend((x, y) for x in sorted(rows[y], reverse=index % 2 == 1))
+        return ordered
+
+    def _measure(self, points) -> Iterator[Tuple[float, float]]:
+        """Measure the points which are not known yet, the first ones if the budget does not suffice for all."""
+        points = [point for point in dict.fromkeys(points) if point not in self._values]
+        if self._budget:
+            points = points[:max(0, self._budget - self._planned)]
+        for point in self._ordered(points):
+            self._last = point
+            self._planned += 1
+            yield self.voltages(point)
+
+    def __iter__(self) -> Iterator[Tuple[float, float]]:
+        coarse = range(0, self._size, self._coarse_size)
+        yield from self._measure((x, y) for y in coarse for x in coarse)
+
+        cells = [(x, y, self._coarse_size) for y in coarse[:-1] for x in coarse[:-1]]
+        while cells and self._coarse_size > 1:
+            yield from self._measure((x + size // 2, y + size // 2) for x, y, size in cells)
+
+            threshold = self._tolerance * self._scale
+            split = []
+            for cell in cells:
+                error = self._error(cell)
+                if error is not None and error > threshold:
+                    split.append((error, cell))
+            # the cells with the largest errors first
+            split.sort(key=lambda entry: entry[0], reverse=True)
+
+            edges = []
+            cells = []
+            for _, (x, y, size) in split:
+                half = size // 2
+                edges.extend([(x + half, y), (x, y + half), (x + size, y + half), (x + half, y + size)])
+                if half > 1:
+                    cells.extend([(x, y, half), (x + half, y, half), (x, y + half, half), (x + half, y + half, half)])
+            if not edges:
+                return
+            # the centres of the new cells are measured in the same pass
+            yield from self._measure(edges + [(x + size // 2, y + size // 2) for x, y, size in cells])
@@ -1,25 +1,28 @@
 """
 
 """
+import re
 from enum import Enum
 from threading import Thread
 from datetime import datetime
 
 from threading import Event
-from typing import Dict, List, Tuple, Union
+from typing import Dict, List, Optional, Set, Tuple, Union
 
 from abc import ABC, abstractmethod
 
-from dateutil import parser
-
 from os import listdir
-from os.path import join as join_path
-
-import numpy as np
+from os.path import abspath, join as join_path, splitext
 
 from typing import List
 from overview import Overview
 
+from .checkpoint import Checkpoint, remove_checkpoint
+from .instruments import POOL, shared
+from .streaming import publishing
+from .timing import TimedFile, TimedProxy, TimedSignalInterface, TimingRecorder
+from .watchdog import GuardedProxy, Watchdog
+
 REGISTRY = {}
 
 
@@ -109,11 +112,24 @@ class GPIBPathValue(StringValue):
     pass
 
 
+def normalize_resource(address: str) -> str:
+    """Bring the different spellings of a GPIB address into one form.
+
+    'GPIB::10::INSTR', 'GPIB0::10::INSTR' and 'GPIB0::10' all become
+    'GPIB0::10::INSTR', anything else is returned unchanged.
+    """
+    match = re.match(r'^GPIB(\d*)::(\d+)(::INSTR)?$', address.strip(), re.IGNORECASE)
+    if match is None:
+        return address
+    return 'GPIB{}::{}::INSTR'.format(match.group(1) or 0, int(match.group(2)))
+
+
 class DatetimeValue(AbstractValue):
     def __init__(self, fullname: str) -> None:
         super().__init__(fullname, datetime.now())
 
     def convert_from_string(self, value) -> datetime:
+        from dateutil import parser
         return parser.parse(value)
 
 
@@ -146,10 +162,14 @@ class SignalInterface:
 
 
 class PlotRecommendation:
-    def __init__(self, title: str, x_label: str, y_label: str, show_fit: bool=False):
+    def __init__(self, title: str, x_label: str, y_label: str, show_fit: bool=False, z_label: str=None):
+        """
+        :param z_label: with a z_label the plot is an image of z against x and y, e.g. a stability diagram
+        """
         self._title = title
         self._xlabel = x_label
         self._ylabel = y_label
+        self._zlabel = z_label
         self._show_fit = show_fit
 
     @property
@@ -168,6 +188,10 @@ class PlotRecommendation:
     def y_label(self):
         return self._ylabel
 
+    @property
+    def z_label(self):
+        return self._zlabel
+
     def fit(self, x_data: List[float], y_data: List[float]):
         """
         calculates a linear fit and returns the fit parameters and the fit data to plot
@@ -175,6 +199,9 @@ class PlotRecommendation:
         :param y_data:  list of y data
         :return: A Dictionary with the fitted Data and tuple with xs and ys of the fit
         """
+        # numpy is imported here to keep the registry scan free of heavy imports
+        import numpy as np
+
         if len(x_data) < 2:
             return {}, None
 
@@ -193,6 +220,16 @@ class AbstractMeasurement(ABC):
     """
 
     """
+    # instruments at fixed addresses which are not chosen by an input,
+    # e.g. ('GPIB0::24::INSTR',) for the ITC503 of the blue cryostat
+    FIXED_RESOURCES = ()  # type: Tuple[str, ...]
+
+    def __new__(cls, *args, **kwargs):
+        measurement = super().__new__(cls)
+        # the inputs as given by the caller, they are saved with every checkpoint
+        measurement._inputs = dict(kwargs)
+        return measurement
+
     def __init__(self,
                  signal_interface: SignalInterface,
                  path: str,
@@ -202,12 +239,17 @@ class AbstractMeasurement(ABC):
         :param signal_interface: An object which is derived from SignalInterface
         """
         super().__init__()
-        self._signal_interface = signal_interface
+        self._timing = TimingRecorder()
+        # retries the instrument calls and counts the faults in the timing summary, see watchdog
+        self._watchdog = Watchdog(self._timing)
+        # counts and times every data point, see timing, and publishes it if the publisher runs, see streaming
+        self._signal_interface = TimedSignalInterface(publishing(signal_interface), self._timing)
         self._path = path
         self._contacts = contacts
         self._should_stop = Event()
         self._should_stop.clear()
         self._recommended_plot_file_paths = {}
+        self._resume = None  # type: Optional[Checkpoint]
 
     @staticmethod
     def inputs() -> Dict[str, AbstractValue]:
@@ -225,6 +267,18 @@ class AbstractMeasurement(ABC):
     def number_of_contacts() -> Contacts:
         return Contacts.TWO
 
+    @classmethod
+    def resources(cls, inputs: Dict[str, Union[int, float, bool, str, datetime]]) -> Set[str]:
+        """Return the instruments which a run with these inputs occupies.
+
+        These are the FIXED_RESOURCES and the values of all GPIBPathValue inputs.
+        """
+        addresses = set(cls.FIXED_RESOURCES)
+        for key, value in cls.inputs().items():
+            if isinstance(value, GPIBPathValue):
+                addresses.add(inputs.get(key, value.default))
+        return {normalize_resource(address) for address in addresses}
+
     def _get_next_file(self, file_prefix: str, file_suffix: str = '.dat') -> str:
         """
         Looks for existing files and generates a suitable successor
@@ -275,30 +329,119 @@ class AbstractMeasurement(ABC):
             self._recommended_plot_file_paths[pair] = self._get_next_file(plot_file_name_prefix, file_suffix='.pdf')
 
 
+    @property
+    def timing(self) -> TimingRecorder:
+        return self._timing
+
+    def _timed(self, instrument, name: str, deadlines: Optional[Dict[str, float]] = None, reopen=None):
+        """Return the instrument wrapped so the time of every call is recorded under name.
+
+        The calls are guarded by the watchdog of the run as well, they raise
+        watchdog.InstrumentError if the instrument still fails after the retries.
+
+        :param deadlines: seconds after which single methods or properties are given up, if the default is too short
+        :param reopen: function without arguments which opens the instrument again after repeated failures
+        """
+        return GuardedProxy(instrument, self._watchdog, name,
+                            lambda instrument: TimedProxy(instrument, self._timing, name),
+                            deadlines=deadlines, reopen=reopen)
+
+    def _shared(self, key, factory, name: str, deadlines: Optional[Dict[str, float]] = None):
+        """Return the instrument of the pool, see _timed and instruments.shared.
+
+        If it fails repeatedly, it is discarded from the pool and opened again with factory.
+        """
+        def reopen():
+            POOL.discard(key)
+            return shared(key, factory)
+        return self._timed(shared(key, factory), name, deadlines, reopen)
+
     def abort(self) -> None:
         self._should_stop.set()
 
+    @property
+    def aborted(self) -> bool:
+        """Whether the measurement was aborted, e.g. already while it was created from invalid inputs."""
+        return self._should_stop.is_set()
+
+    def resume_from(self, checkpoint: Checkpoint) -> None:
+        """Continue the run of a checkpoint in its data file instead of starting a new one.
+
+        Has to be called before the measurement is started.
+        """
+        self._resume = checkpoint
+
+    @property
+    def _resume_position(self) -> int:
+        """Number of steps which were completed before the run was resumed, 0 for a new run."""
+        return self._resume.position if self._resume is not None else 0
+
+    def _checkpoint(self, file_handle, position: int, **state) -> None:
+        """Save that the first position steps are done and written to file_handle, see measurement/checkpoint.py.
+
+        :param state: anything else the measurement needs when it is resumed
+        """
+        file_handle.flush()
+        checkpoint = Checkpoint(str(self), abspath(self._path), self._contacts, self._inputs, abspath(self._file_path),
+                                file_handle.tell(), position, state)
+        try:
+            checkpoint.save()
+        except OSError as error:
+            print('WARNING', 'could not save checkpoint of {}: {}'.format(self._file_path, error))
+
+    def _open_data_file(self):
+        if self._resume is None:
+            return open(self._file_path, 'w')
+
+        file_handle = open(self._file_path, 'r+')
+        # the lines of a step which was not completed are dropped, the step is measured again
+        file_handle.seek(self._resume.offset)
+        file_handle.truncate()
+        file_handle.write('# resumed {} after {} steps\n'.format(datetime.now().isoformat(),
+                                                                 self._resume.position))
+        return file_handle
+
     def __call__(self) -> None:
         self._signal_interface.emit_started()
         
         if not self._should_stop.is_set():
             self._generate_all_file_names()
+            if self._resume is not None:
+                self._file_path = self._resume.file_path
             print('writing to {}'.format(self._file_path))
-            with open(self._file_path, 'w') as file_handle:
-                self._measure(file_handle)
+            self._timing.start()
+            try:
+                with self._open_data_file() as file_handle:
+                    self._measure(TimedFile(file_handle, self._timing))
+                if not self._should_stop.is_set():
+                    remove_checkpoint(self._file_path)
+            finally:
+                self._timing.stop()
+                self._save_timing()
                 
         self._signal_interface.emit_finished(self._recommended_plot_file_paths)
 
+    def _save_timing(self) -> None:
+        timing_path = splitext(self._file_path)[0] + '.timing.json'
+        try:
+            self._timing.save(timing_path)
+        except OSError as error:
+            print('WARNING', 'could not save {}: {}'.format(timing_path, error))
+
     @abstractmethod
     def _measure(self, file_handle) -> None:
         pass
 
-    def _write_overview(self, comment_lines: List[str] = [],  **data) -> None:
+    def _write_overview(self, comment_lines: List[str] = [], contacts: Tuple[str, ...] = None, **data) -> None:
+        """Add a row to the overview file of this measurement class.
+
+        :param contacts: the contacts of the row, by default those of the measurement
+        """
         columns = list(data.keys())
         measurement_data = dict(data)
         
         contacts_string = ""
-        for contact in self._contacts:
+        for contact in (self._contacts if contacts is None else contacts):
             contacts_string += contact + " "
         if contacts_string != "":
             columns.append("Contacts")
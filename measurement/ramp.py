@@ -0,0 +1,103 @@
+"""Sweep rate of continuous temperature sweeps which follows the sample.
+
+The measurements take points as fast as they can while the ITC503 ramps, so
+the number of points per kelvin is inversely proportional to the sweep
+rate. A RampController estimates dR/dT from the recent points and chooses
+the rate at which R changes by a given fraction of its full scale (the
+largest |R| so far) per minute:
+
+    rate = resolution * full scale / |dR/dT|
+
+clamped to the bounds of the user. At a superconducting or metal-insulator
+transition the sweep slows down, where R hardly changes it runs at the
+maximal rate. The rate is only changed if it differs noticeably from the
+present one. Slowing down happens at once, speeding up not more often than
+every min_interval seconds, so a transition does not make the rate jump
+back and forth.
+
+:usage:
+    ramp = RampController(1.0, min_rate=0.05, max_rate=2.0, resolution=0.01)
+    ...
+    rate = ramp.add(temperature, resistance)
+    if rate is not None:
+        restart_sweep(itc, temperature_end, rate)
+"""
+import math
+from collections import deque
+from time import monotonic
+from typing import Optional
+
+
+class RampController:
+    """Chooses the sweep rate in K/min from the change of a value with the temperature."""
+
+    # relative difference of the rates below which the sweep is not changed
+    HYSTERESIS = 0.25
+
+    def __init__(self, rate: float, min_rate: float, max_rate: float, resolution: float,
+                 window: int = 10, min_interval: float = 20.0) -> None:
+        """
+        :param rate: the rate the sweep was started with in K/min
+        :param min_rate: slowest rate in K/min
+        :param max_rate: fastest rate in K/min
+        :param resolution: change of the value per minute relative to its full scale, e.g. 0.01 for 1 %/min
+        :param window: number of points from which the derivative is calculated
+        :param min_interval: seconds before the rate is increased again
+        """
+        if not 0 < min_rate <= max_rate:
+            raise ValueError('the sweep rates have to fulfil 0 < min_rate <= max_rate')
+        self._rate = rate
+        self._min_rate = min_rate
+        self._max_rate = max_rate
+        self._resolution = resolution
+        self._min_interval = min_interval
+        self._points = deque(maxlen=window)
+        self._scale = 0.0
+        self._last_change = monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def derivative(self) -> Optional[float]:
+        """dvalue/dT of the points in the window by least squares, None if they span no temperature."""
+        count = len(self._points)
+        if count < 3:
+            return None
+        mean_t = sum(point[0] for point in self._points) / count
+        mean_v = sum(point[1] for point in self._points) / count
+        spread = sum((point[0] - mean_t) ** 2 for point in self._points)
+        if spread <= 0:
+            return None
+        return sum((point[0] - mean_t) * (point[1] - mean_v) for point in self._points) / spread
+
+    def add(self, temperature: float, value: float) -> Optional[float]:
+        """Take a point into account, return the new rate if the sweep should be changed, otherwise None."""
+        if not (math.isfinite(value) and math.isfinite(temperature)):
+            return None
+        self._points.append((temperature, value))
+        self._scale = max(self._scale, abs(value))
+
+        derivative = self.derivative()
+        if derivative is None or self._scale == 0:
+            return None
+
+        rate = self._resolution * self._scale / abs(derivative) if derivative != 0 else self._max_rate
+        rate = min(max(rate, self._min_rate), self._max_rate)
+        if abs(rate - self._rate) <= self.HYSTERESIS * self._rate:
+            return None
+        now = monotonic()
+        if rate > self._rate and now - self._last_change < self._min_interval:
+            return None
+
+        self._rate = rate
+        self._last_change = now
+        return rate
+
+
+def restart_sweep(itc, temperature_end: float, rate: float) -> None:
+    """Continue the sweep of an ITC503 from its present set point with another rate in K/min."""
+    set_point = itc.temperature_set_point
+    itc.temperature_set_point = set_point
+    itc.set_temperature_sweep(temperature_end, sweep_time=abs(set_point - temperature_end) / rate)
+    itc.start_temperature_sweep()
@@ -0,0 +1,291 @@
+"""Lazy discovery of measurement methods.
+
+Every module in this package is scanned with the `ast` module for classes
+decorated with `@register('...')`. Name, inputs, outputs and number of
+contacts are read from the source code without importing the module, so
+instrument drivers (visa, gpib, scientificdevices, ...) are only imported
+once a method is actually selected.
+
+The scan results are cached in '__pycache__/registry_manifest.json' and are
+invalidated per file by its modification time and size.
+"""
+import ast
+import json
+import os
+from importlib import import_module
+from typing import Dict, List, Optional, Set, Tuple
+
+from .measurement import AbstractValue, Contacts, REGISTRY as LOADED_REGISTRY
+from .measurement import (IntegerValue, FloatValue, BooleanValue, StringValue,
+                          GPIBPathValue, DatetimeValue)
+
+MANIFEST_VERSION = 1
+
+VALUE_TYPES = {cls.__name__: cls for cls in (IntegerValue, FloatValue, BooleanValue,
+                                             StringValue, GPIBPathValue, DatetimeValue)}
+
+PACKAGE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_PATH = os.path.join(PACKAGE_DIRECTORY, '__pycache__', 'registry_manifest.json')
+
+SKIPPED_MODULES = ('__init__', '__main__', 'measurement', 'registry')
+
+
+class NotStatic(Exception):
+    """Raised when a part of a measurement class can not be read from its source."""
+
+
+class LazyMeasurement(object):
+    """Stands in for a registered measurement class until it is really needed.
+
+    It offers the static interface of AbstractMeasurement (inputs, outputs,
+    number_of_contacts) from the manifest and imports the module the first
+    time the class is loaded or called.
+    """
+
+    def __init__(self, name: str, module: str, class_name: str,
+                 inputs: Optional[dict] = None, outputs: Optional[dict] = None,
+                 contacts: Optional[str] = None) -> None:
+        """
+        :param name: name under which the class is registered
+        :param module: module name inside the measurement package
+        :param class_name: name of the class inside the module
+        :param inputs: serialized inputs or None if they could not be read statically
+        :param outputs: serialized outputs or None if they could not be read statically
+        :param contacts: name of the Contacts member or None
+        """
+        self._name = name
+        self._module = module
+        self._class_name = class_name
+        self._inputs = inputs
+        self._outputs = outputs
+        self._contacts = contacts
+        self._class = None
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def module(self) -> str:
+        return self._module
+
+    @property
+    def class_name(self) -> str:
+        return self._class_name
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._class is not None
+
+    def load(self):
+        """Import the module and return the real measurement class.
+
+        :raises ImportError: if the module or one of its drivers is missing
+        """
+        if self._class is None:
+            import_module('{}.{}'.format(__package__, self._module))
+            self._class = LOADED_REGISTRY[self._name]
+        return self._class
+
+    def inputs(self) -> Dict[str, AbstractValue]:
+        if self._inputs is None:
+            return self._load_quietly().inputs()
+        return {key: deserialize_value(value) for key, value in self._inputs.items()}
+
+    def outputs(self) -> Dict[str, AbstractValue]:
+        if self._outputs is None:
+            return self._load_quietly().outputs()
+        return {key: deserialize_value(value) for key, value in self._outputs.items()}
+
+    def number_of_contacts(self) -> Contacts:
+        if self._contacts is None:
+            return self._load_quietly().number_of_contacts()
+        return Contacts[self._contacts]
+
+    def resources(self, inputs: dict) -> Set[str]:
+        return self.load().resources(inputs)
+
+    def _load_quietly(self):
+        """Load the class, falling back to the abstract defaults if it can not be imported."""
+        try:
+            return self.load()
+        except ImportError as error:
+            print('ERROR', 'could not import measurement.{}: {}'.format(self._module, error))
+            from .measurement import AbstractMeasurement
+            return AbstractMeasurement
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __str__(self) -> str:
+        return self._name
+
+    def __repr__(self) -> str:
+        return '<LazyMeasurement {!r} ({}.{})>'.format(self._name, self._module, self._class_name)
+
+
+def deserialize_value(serialized: list) -> AbstractValue:
+    type_name, args, kwargs = serialized
+    return VALUE_TYPES[type_name](*args, **kwargs)
+
+
+def _literal(node: ast.AST):
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        raise NotStatic()
+
+
+def _parse_values(function: ast.FunctionDef) -> Dict[str, list]:
+    """Read a dictionary of AbstractValues from a `return {...}` statement."""
+    returns = [node for node in function.body if isinstance(node, ast.Return)]
+    if len(returns) != 1 or not isinstance(returns[0].value, ast.Dict):
+        raise NotStatic()
+
+    values = {}
+    for key_node, value_node in zip(returns[0].value.keys, returns[0].value.values):
+        if not (isinstance(value_node, ast.Call) and isinstance(value_node.func, ast.Name)
+                and value_node.func.id in VALUE_TYPES):
+            raise NotStatic()
+        args = [_literal(arg) for arg in value_node.args]
+        kwargs = {keyword.arg: _literal(keyword.value) for keyword in value_node.keywords}
+        values[_literal(key_node)] = [value_node.func.id, args, kwargs]
+    return values
+
+
+def _parse_contacts(function: ast.FunctionDef) -> str:
+    """Read the Contacts member from a `return Contacts.XXX` statement."""
+    returns = [node for node in function.body if isinstance(node, ast.Return)]
+    if len(returns) != 1:
+        raise NotStatic()
+    value = returns[0].value
+    if not (isinstance(value, ast.Attribute) and isinstance(value.value, ast.Name)
+            and value.value.id == 'Contacts' and value.attr in Contacts.__members__):
+        raise NotStatic()
+    return value.attr
+
+
+def _registered_name(class_node: ast.ClassDef) -> Optional[str]:
+    for decorator in class_node.decorator_list:
+        if (isinstance(decorator, ast.Call) and isinstance(decorator.func, ast.Name)
+                and decorator.func.id == 'register' and len(decorator.args) == 1):
+            return _literal(decorator.args[0])
+    return None
+
+
+def _find_method(class_node: ast.ClassDef, classes: Dict[str, ast.ClassDef],
+                 method_name: str) -> Optional[ast.FunctionDef]:
+    """Find a method in a class or its bases which are defined in the same module.
+
+    Returns None if the method is inherited from AbstractMeasurement.
+    """
+    for node in class_node.body:
+        if isinstance(node, ast.FunctionDef) and node.name == method_name:
+            return node
+
+    for base in class_node.bases:
+        if isinstance(base, ast.Name) and base.id in classes:
+            method = _find_method(classes[base.id], classes, method_name)
+            if method is not None:
+                return method
+        elif not (isinstance(base, ast.Name) and base.id == 'AbstractMeasurement'):
+            raise NotStatic()
+    return None
+
+
+def scan_module(file_path: str) -> List[dict]:
+    """Return the manifest entries of all registered classes in a module."""
+    with open(file_path, 'r', encoding='utf-8') as file_handle:
+        tree = ast.parse(file_handle.read(), file_path)
+
+    classes = {node.name: node for node in tree.body if isinstance(node, ast.ClassDef)}
+    module = os.path.splitext(os.path.basename(file_path))[0]
+
+    entries = []
+    for class_node in classes.values():
+        try:
+            name = _registered_name(class_node)
+        except NotStatic:
+            name = None
+        if name is None:
+            continue
+
+        entry = dict(name=name, module=module, class_name=class_node.name,
+                     inputs=None, outputs=None, contacts=None)
+        try:
+            method = _find_method(class_node, classes, 'inputs')
+            entry['inputs'] = {} if method is None else _parse_values(method)
+            method = _find_method(class_node, classes, 'outputs')
+            entry['outputs'] = {} if method is None else _parse_values(method)
+            method = _find_method(class_node, classes, 'number_of_contacts')
+            entry['contacts'] = Contacts.TWO.name if method is None else _parse_contacts(method)
+        except NotStatic:
+            print('WARNING', '{}.{} can not be scanned statically, '
+                             'it will be imported on first use'.format(module, class_node.name))
+            entry.update(inputs=None, outputs=None, contacts=None)
+        entries.append(entry)
+
+    return entries
+
+
+def _load_manifest() -> dict:
+    try:
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as file_handle:
+            manifest = json.load(file_handle)
+    except (OSError, ValueError):
+        return {}
+
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('modules', {})
+
+
+def _save_manifest(modules: dict) -> None:
+    try:
+        os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+        with open(MANIFEST_PATH, 'w', encoding='utf-8') as file_handle:
+            json.dump({'version': MANIFEST_VERSION, 'modules': modules}, file_handle, indent=1)
+    except OSError as error:
+        # A read-only installation just has to scan on every start
+        print('WARNING', 'could not write registry manifest: {}'.format(error))
+
+
+def _module_files(directory: str) -> List[Tuple[str, str]]:
+    return sorted((file_name[:-3], os.path.join(directory, file_name))
+                  for file_name in os.listdir(directory)
+                  if file_name.endswith('.py') and file_name[:-3] not in SKIPPED_MODULES)
+
+
+def discover(directory: str = PACKAGE_DIRECTORY) -> Dict[str, LazyMeasurement]:
+    """Scan all measurement modules and return a registry of lazy measurement classes.
+
+    :param directory: directory of the measurement package
+    :return: registry names mapped to LazyMeasurement objects
+    """
+    cached_modules = _load_manifest()
+    modules = {}
+
+    for module, file_path in _module_files(directory):
+        stat = os.stat(file_path)
+        cached = cached_modules.get(module)
+        if cached is not None and cached['mtime'] == stat.st_mtime and cached['size'] == stat.st_size:
+            modules[module] = cached
+            continue
+
+        try:
+            entries = scan_module(file_path)
+        except SyntaxError as error:
+            print('ERROR', 'could not scan measurement.{}: {}'.format(module, error))
+            continue
+        modules[module] = dict(mtime=stat.st_mtime, size=stat.st_size, entries=entries)
+
+    if modules != cached_modules:
+        _save_manifest(modules)
+
+    registry = {}
+    for module in modules.values():
+        for entry in module['entries']:
+            registry[entry['name']] = LazyMeasurement(entry['name'], entry['module'],
+                                                      entry['class_name'], entry['inputs'],
+                                                      entry['outputs'], entry['contacts'])
+    return registry
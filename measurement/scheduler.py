@@ -0,0 +1,326 @@
+"""A persistent queue of measurement runs and a scheduler which works it off.
+
+Every change of the queue is appended to a journal file (one JSON object per
+line), so the queue survives a restart of the program. Jobs which were
+running when the program stopped are put back into the queue.
+"""
+import json
+import os
+from datetime import datetime
+from enum import Enum
+from threading import Event, Lock, Thread
+from time import monotonic
+from typing import Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from . import REGISTRY
+from .measurement import AbstractMeasurement, SignalInterface
+from .station import LOCKS, ResourceLocks
+
+
+class JobState(Enum):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FINISHED = 'finished'
+    ABORTED = 'aborted'
+    FAILED = 'failed'
+
+
+class Job:
+    """One measurement run: method, inputs, contacts and target directory."""
+
+    def __init__(self, method: str, path: str, contacts: Tuple[str, ...] = (),
+                 inputs: Optional[Dict] = None, settle_time: float = 0.0,
+                 job_id: Optional[str] = None) -> None:
+        """
+        :param method: registered name of the measurement
+        :param path: directory for the data files
+        :param contacts: names of the contacts
+        :param inputs: inputs of the measurement
+        :param settle_time: seconds to wait before the job is started, e.g. for a switch matrix
+        :param job_id: unique id, generated if None
+        """
+        self.method = method
+        self.path = path
+        self.contacts = tuple(contacts)
+        self.inputs = dict(inputs or {})
+        self.settle_time = settle_time
+        self.id = job_id or uuid4().hex
+        self.state = JobState.PENDING
+        self.started = None  # type: Optional[float]
+        self.duration = None  # type: Optional[float]
+
+    def create(self, signal_interface: SignalInterface) -> AbstractMeasurement:
+        """Create the measurement object of this job."""
+        return REGISTRY[self.method](signal_interface, self.path, self.contacts, **self.inputs)
+
+    def to_dict(self) -> Dict:
+        inputs = {key: value.isoformat() if isinstance(value, datetime) else value
+                  for key, value in self.inputs.items()}
+        return dict(id=self.id, method=self.method, path=self.path, contacts=list(self.contacts),
+                    inputs=inputs, settle_time=self.settle_time)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Job':
+        return cls(data['method'], data['path'], tuple(data['contacts']), data['inputs'],
+                   data.get('settle_time', 0.0), data['id'])
+
+    def __str__(self) -> str:
+        return '{} ({})'.format(self.method, ' '.join(self.contacts))
+
+
+class RunQueue:
+    """An ordered list of jobs which is journaled to disk."""
+
+    def __init__(self, journal_path: str) -> None:
+        """
+        :param journal_path: file which holds the journal, it is created if it does not exist
+        """
+        self._journal_path = journal_path
+        self._lock = Lock()
+        self._jobs = []  # type: List[Job]
+        self._replay()
+
+    def _replay(self) -> None:
+        if not os.path.isfile(self._journal_path):
+            return
+
+        jobs = {}
+        with open(self._journal_path, 'r') as file_handle:
+            for line in file_handle:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # the last line may be incomplete after a crash
+                    continue
+
+                if entry['event'] == 'add':
+                    job = Job.from_dict(entry['job'])
+                    jobs[job.id] = job
+                elif entry['id'] in jobs:
+                    if entry['event'] == 'remove':
+                        del jobs[entry['id']]
+                    elif entry['event'] == 'state':
+                        job = jobs[entry['id']]
+                        job.state = JobState(entry['state'])
+                        job.duration = entry.get('duration')
+
+        for job in jobs.values():
+            if job.state == JobState.RUNNING:
+                print('WARNING', 'job {} was interrupted, it is queued again'.format(job))
+                job.state = JobState.PENDING
+        self._jobs = list(jobs.values())
+
+    def _write(self, **entry) -> None:
+        entry['time'] = datetime.now().isoformat()
+        with open(self._journal_path, 'a') as file_handle:
+            file_handle.write(json.dumps(entry) + '\n')
+            file_handle.flush()
+            os.fsync(file_handle.fileno())
+
+    @property
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs)
+
+    @property
+    def pending(self) -> List[Job]:
+        with self._lock:
+            return [job for job in self._jobs if job.state == JobState.PENDING]
+
+    def add(self, job: Job) -> Job:
+        with self._lock:
+            self._jobs.append(job)
+            self._write(event='add', job=job.to_dict())
+        return job
+
+    def remove(self, job: Job) -> None:
+        with self._lock:
+            if job in self._jobs and job.state != JobState.RUNNING:
+                self._jobs.remove(job)
+                self._write(event='remove', id=job.id)
+
+    def clear(self) -> None:
+        """Remove all jobs which are not running."""
+        for job in self.jobs:
+            self.remove(job)
+
+    def next_pending(self) -> Optional[Job]:
+        pending = self.pending
+        return pending[0] if pending else None
+
+    def set_state(self, job: Job, state: JobState) -> None:
+        with self._lock:
+            job.state = state
+            self._write(event='state', id=job.id, state=state.value, duration=job.duration)
+
+    def compact(self) -> None:
+        """Rewrite the journal so it only contains the jobs which are still queued."""
+        with self._lock:
+            self._jobs = [job for job in self._jobs if job.state == JobState.PENDING]
+            temporary_path = self._journal_path + '.tmp'
+            with open(temporary_path, 'w') as file_handle:
+                for job in self._jobs:
+                    file_handle.write(json.dumps(dict(event='add', job=job.to_dict(),
+                                                      time=datetime.now().isoformat())) + '\n')
+            os.replace(temporary_path, self._journal_path)
+
+
+class Scheduler:
+    """Runs the pending jobs of a queue back to back in a worker thread.
+
+    Instruments stay open between the jobs since the measurements take them
+    from measurement.instruments.POOL.
+    """
+
+    def __init__(self, queue: RunQueue, signal_interface: SignalInterface,
+                 before_job: Optional[Callable[[Job, AbstractMeasurement], None]] = None,
+                 after_job: Optional[Callable[[Job], None]] = None,
+                 after_queue: Optional[Callable[[], None]] = None,
+                 owner: str = 'queue', locks: ResourceLocks = LOCKS) -> None:
+        """
+        :param queue: the jobs to run
+        :param signal_interface: handed on to every measurement
+        :param before_job: called in the worker thread after a measurement was created
+                           and before it is started
+        :param after_job: called in the worker thread after a job ended
+        :param after_queue: called in the worker thread when the scheduler stops
+        :param owner: name under which the instruments of the jobs are locked
+        :param locks: shared with the stations which run at the same time
+        """
+        self._queue = queue
+        self._signal_interface = signal_interface
+        self._before_job = before_job
+        self._after_job = after_job
+        self._after_queue = after_queue
+        self._owner = owner
+        self._locks = locks
+        self._stop = Event()
+        self._thread = None  # type: Optional[Thread]
+        # the measurement is None while it is created
+        self._current = None  # type: Optional[Tuple[Job, Optional[AbstractMeasurement]]]
+        # guards _current and _aborted_jobs between abort and the worker thread
+        self._lock = Lock()
+        self._aborted_jobs = set()
+        self._done = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def current_job(self) -> Optional[Job]:
+        current = self._current
+        return current[0] if current is not None else None
+
+    def start(self) -> None:
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._done = 0
+        self._thread = Thread(target=self._run, name='scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop after the current job."""
+        self._stop.set()
+
+    def abort(self) -> None:
+        """Abort the current job and stop.
+
+        A job whose measurement is still created is aborted as soon as it exists.
+        """
+        with self._lock:
+            self._stop.set()
+            current = self._current
+            if current is None:
+                return
+            job, measurement = current
+            self._aborted_jobs.add(job.id)
+        if measurement is not None:
+            measurement.abort()
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def progress(self) -> Tuple[int, int]:
+        """Return the number of jobs done and the number of jobs done plus remaining."""
+        remaining = len(self._queue.pending) + (1 if self._current is not None else 0)
+        return self._done, self._done + remaining
+
+    def estimated_duration(self, job: Job) -> Optional[float]:
+        """Estimate the duration of a job from the finished jobs of the same method."""
+        durations = [other.duration for other in self._queue.jobs
+                     if other.state == JobState.FINISHED and other.duration is not None]
+        same_method = [other.duration for other in self._queue.jobs
+                       if other.state == JobState.FINISHED and other.duration is not None
+                       and other.method == job.method]
+        samples = same_method or durations
+        if not samples:
+            return None
+        return sum(samples) / len(samples)
+
+    def eta(self) -> Optional[float]:
+        """Return the estimated number of seconds until the queue is empty, None if unknown."""
+        remaining = 0.0
+        current = self.current_job
+        jobs = self._queue.pending + ([current] if current is not None else [])
+        for job in jobs:
+            estimate = self.estimated_duration(job)
+            if estimate is None:
+                return None
+            if job is current and job.started is not None:
+                estimate = max(0.0, estimate - (monotonic() - job.started))
+            remaining += estimate + job.settle_time
+        return remaining
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            job = self._queue.next_pending()
+            if job is None:
+                break
+
+            # a stop or an abort during the settle time leaves the job queued
+            if job.settle_time > 0 and self._stop.wait(job.settle_time):
+                break
+
+            # the job is current before it is published as running, so an abort from then on is not lost
+            with self._lock:
+                if self._stop.is_set():
+                    break
+                self._current = (job, None)
+            job.started = monotonic()
+            self._queue.set_state(job, JobState.RUNNING)
+            state = JobState.FINISHED
+            try:
+                self._locks.acquire(self._owner, REGISTRY[job.method].resources(job.inputs))
+                measurement = job.create(self._signal_interface)
+                with self._lock:
+                    self._current = (job, measurement)
+                    aborted = job.id in self._aborted_jobs
+                if aborted:
+                    measurement.abort()
+                if self._before_job is not None:
+                    self._before_job(job, measurement)
+                measurement()
+            except Exception as error:
+                print('ERROR', 'job {} failed: {}'.format(job, error))
+                state = JobState.FAILED
+                self._signal_interface.emit_status_message('{} failed: {}'.format(job, error))
+            finally:
+                with self._lock:
+                    self._current = None
+                self._locks.release(self._owner)
+
+            if job.id in self._aborted_jobs:
+                state = JobState.ABORTED
+            job.duration = monotonic() - job.started
+            self._queue.set_state(job, state)
+            self._done += 1
+
+            if self._after_job is not None:
+                self._after_job(job)
+
+        if self._after_queue is not None:
+            self._after_queue()
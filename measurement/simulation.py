@@ -0,0 +1,586 @@
+"""Simulated instruments for running measurements without hardware.
+
+install() puts simulated versions of the driver modules (visa, gpib and the
+parts of scientificdevices the measurements use) into sys.modules. It has
+to be called before a measurement module is imported, the measurements then
+run unchanged against the simulation.
+
+All simulated instruments look at one sample in one cryostat (WORLD): the
+ITC503 ramps the temperature, the IPS120 ramps the field and the
+sourcemeters and lock-ins measure a resistance which depends on both.
+Every bus access takes LATENCY seconds, sourcemeter readings additionally
+take their integration time (nplc), and every reading carries noise.
+Temperature and field evolve `speedup` times faster than real time, so
+sweeps which take hours in the lab finish in minutes.
+
+:usage:
+    from measurement import simulation
+    simulation.install(speedup=60)
+    from measurement import REGISTRY
+    REGISTRY['SRS830 Resistance vs. Temp. (blue)'](...)
+"""
+import math
+import random
+import sys
+import types
+from enum import Enum
+from threading import RLock
+from time import monotonic, sleep
+from typing import Dict, Optional, Tuple
+
+# seconds per bus access
+LATENCY = 0.002
+
+# power line frequency, used for the integration time of the sourcemeters
+LINE_FREQUENCY = 50.0
+
+
+class SimulatedWorld:
+    """State of the simulated cryostat and sample, it is updated whenever it is looked at."""
+
+    def __init__(self, speedup: float = 1.0, noise: float = 1e-3, seed: Optional[int] = None) -> None:
+        """
+        :param speedup: how much faster temperature and field change than in reality
+        :param noise: relative noise of all readings
+        :param seed: seed of the random numbers, for reproducible runs
+        """
+        self.speedup = speedup
+        self.noise = noise
+        self.random = random.Random(seed)
+        self._lock = RLock()
+        self._last_update = monotonic()
+
+        # sample: metallic resistance with a residual part and a positive magnetoresistance
+        self.residual_resistance = 1e6
+        self.room_temperature_resistance = 1e7
+        self.magnetoresistance = 0.05  # relative change per T^2
+        # (temperature, width) in K of a superconducting transition, None for a normal metal
+        self.transition = None  # type: Optional[Tuple[float, float]]
+        # resistor in series with the lock-in output, SRS830 measurements use the same default
+        self.pre_resistance = 9.99e6
+
+        # cryostat
+        self.temperature = 300.0
+        self.thermal_time_constant = 60.0  # s
+        self.set_point = 300.0
+        self._sweep = None  # type: Optional[Tuple[float, float, float, float]]
+
+        # magnet
+        self.field = 0.0
+        self.target_field = 0.0
+        self.field_rate = 0.1  # T/min
+        self.field_mode = 'hold'
+
+    def now(self) -> float:
+        """Simulated time in seconds."""
+        return monotonic() * self.speedup
+
+    def update(self) -> None:
+        with self._lock:
+            now = monotonic()
+            elapsed = (now - self._last_update) * self.speedup
+            self._last_update = now
+            if elapsed <= 0:
+                return
+
+            if self._sweep is not None:
+                start_time, start, end, duration = self._sweep
+                progress = 1.0 if duration <= 0 else min(1.0, (self.now() - start_time) / duration)
+                self.set_point = start + (end - start) * progress
+
+            relaxation = 1 - math.exp(-elapsed / self.thermal_time_constant)
+            self.temperature += (self.set_point - self.temperature) * relaxation
+
+            if self.field_mode != 'hold':
+                target = self.target_field if self.field_mode == 'to set point' else 0.0
+                step = self.field_rate / 60 * elapsed
+                if abs(target - self.field) <= step:
+                    self.field = target
+                else:
+                    self.field += math.copysign(step, target - self.field)
+
+    def sweep_temperature(self, end: float, duration: float) -> None:
+        """Ramp the set point from the current one to end within duration seconds."""
+        with self._lock:
+            self.update()
+            self._sweep = (self.now(), self.set_point, end, duration)
+
+    def stop_sweep(self) -> None:
+        with self._lock:
+            self.update()
+            self._sweep = None
+
+    def resistance(self) -> float:
+        with self._lock:
+            self.update()
+            metallic = self.residual_resistance + ((self.room_temperature_resistance - self.residual_resistance)
+                                                   * max(self.temperature, 0.0) / 300.0)
+            if self.transition is not None:
+                temperature, width = self.transition
+                exponent = min(-(self.temperature - temperature) / width, 700.0)
+                # a small remainder keeps the resistance positive
+                metallic *= 1e-6 + 1 / (1 + math.exp(exponent))
+            return metallic * (1 + self.magnetoresistance * self.field ** 2)
+
+    def noisy(self, value: float, absolute: float = 0.0) -> float:
+        return value * (1 + self.random.gauss(0, self.noise)) + self.random.gauss(0, absolute)
+
+
+WORLD = SimulatedWorld()
+
+
+def _bus(seconds: float = 0.0) -> None:
+    sleep(LATENCY + seconds)
+
+
+# visa
+
+class VisaIOError(Exception):
+    pass
+
+
+class SimulatedResource:
+    """A VISA resource which answers '*IDN?' with the identity of a Keithley sourcemeter.
+
+    The dual-channel sourcemeters sit at the addresses of the lab, all other
+    addresses are a 2400.
+    """
+
+    IDENTITY = 'KEITHLEY INSTRUMENTS INC.,MODEL 2400,0000000,C30 (SIMULATED)'
+    IDENTITIES = {'GPIB0::11::INSTR': 'KEITHLEY INSTRUMENTS INC.,MODEL 2636A,0000000,2.2.6 (SIMULATED)',
+                  'GPIB0::12::INSTR': 'KEITHLEY INSTRUMENTS INC.,MODEL 2602A,0000000,2.2.6 (SIMULATED)'}
+
+    def __init__(self, address: str, **kwargs) -> None:
+        self.address = address
+        self.write_termination = kwargs.get('write_termination', '\n')
+        self.read_termination = kwargs.get('read_termination', '\n')
+        self.query_delay = kwargs.get('query_delay', 0.0)
+        # bus timeout in ms, the simulated bus never times out
+        self.timeout = kwargs.get('timeout', 2000.0)
+        self._last_query = ''
+
+    def write(self, message: str) -> None:
+        _bus()
+        self._last_query = message
+
+    def read(self) -> str:
+        _bus()
+        if self._last_query.strip() == '*IDN?':
+            return self.IDENTITIES.get(self.address, self.IDENTITY)
+        return '0'
+
+    def query(self, message: str) -> str:
+        self.write(message)
+        return self.read()
+
+    def set_visa_attribute(self, attribute, value) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class ResourceManager:
+    def __init__(self, visa_library: str = '@py') -> None:
+        self.visa_library = visa_library
+
+    def open_resource(self, address: str, **kwargs) -> SimulatedResource:
+        return SimulatedResource(address, **kwargs)
+
+    def list_resources(self) -> Tuple[str, ...]:
+        return ('GPIB0::7::INSTR', 'GPIB0::10::INSTR', 'GPIB0::12::INSTR', 'GPIB0::24::INSTR')
+
+    def close(self) -> None:
+        pass
+
+
+# gpib (linux-gpib)
+
+GPIB_TIMEOUTS = ['TNONE', 'T10us', 'T30us', 'T100us', 'T300us', 'T1ms', 'T3ms', 'T10ms', 'T30ms',
+                 'T100ms', 'T300ms', 'T1s', 'T3s', 'T10s', 'T30s', 'T100s', 'T300s', 'T1000s']
+
+
+def _gpib_dev(board: int, pad: int) -> int:
+    return pad
+
+
+def _gpib_read(device: int, length: int) -> bytes:
+    _bus()
+    return b'0\n'
+
+
+def _gpib_write(device: int, message) -> None:
+    _bus()
+
+
+def _gpib_noop(device: int, *args) -> None:
+    pass
+
+
+# scientificdevices.keithley
+
+class SMUChannel(Enum):
+    channelA = 'a'
+    channelB = 'b'
+
+
+class SimulatedSourcemeter:
+    """Sources a voltage or current on the simulated sample and measures the other."""
+
+    def __init__(self, device, sub_device: SMUChannel = SMUChannel.channelA) -> None:
+        self._dev = device
+        self._sub_device = sub_device
+        self._voltage_driven = True
+        self._value = 0.0
+        self._limit = 1e-6
+        self._nplc = 1
+        self._armed = False
+
+    def voltage_driven(self, voltage: float, current_limit: float = 1e-6, nplc: float = 1,
+                       range: float = 0.0) -> None:
+        _bus()
+        self._voltage_driven, self._value, self._limit, self._nplc = True, voltage, current_limit, nplc
+
+    def current_driven(self, current: float, voltage_limit: float = 1.0, nplc: float = 1,
+                       range: float = 0.0) -> None:
+        _bus()
+        self._voltage_driven, self._value, self._limit, self._nplc = False, current, voltage_limit, nplc
+
+    def set_voltage(self, voltage: float) -> None:
+        _bus()
+        self._value = voltage
+
+    def set_current(self, current: float) -> None:
+        _bus()
+        self._value = current
+
+    def arm(self) -> None:
+        _bus()
+        self._armed = True
+
+    def disarm(self) -> None:
+        _bus()
+        self._armed = False
+
+    def read(self) -> Tuple[float, float]:
+        _bus(self._nplc / LINE_FREQUENCY)
+        resistance = WORLD.resistance()
+        if self._voltage_driven:
+            current = max(-self._limit, min(self._limit, self._value / resistance))
+            return self._value, WORLD.noisy(current, 1e-13)
+        voltage = max(-self._limit, min(self._limit, self._value * resistance))
+        return WORLD.noisy(voltage, 1e-7), self._value
+
+    def __str__(self) -> str:
+        return '{} {} (simulated)'.format(type(self).__name__, self._sub_device.name)
+
+
+class Sourcemeter2400(SimulatedSourcemeter):
+    pass
+
+
+class Sourcemeter2602A(SimulatedSourcemeter):
+    pass
+
+
+class Sourcemeter2636A(SimulatedSourcemeter):
+    pass
+
+
+# scientificdevices.oxford.itc503
+
+class ITC:
+    """Oxford ITC503 temperature controller, T1 to T3 are the three sensors."""
+
+    def __init__(self, device=None) -> None:
+        self._device = device
+        self._pid_auto = True
+
+    def _temperature(self, offset: float) -> float:
+        _bus()
+        WORLD.update()
+        return WORLD.noisy(WORLD.temperature + offset, 1e-3)
+
+    @property
+    def T1(self) -> float:
+        return self._temperature(0.0)
+
+    @property
+    def T2(self) -> float:
+        return self._temperature(0.05)
+
+    @property
+    def T3(self) -> float:
+        return self._temperature(-0.05)
+
+    @property
+    def temperature_set_point(self) -> float:
+        _bus()
+        WORLD.update()
+        return WORLD.set_point
+
+    @temperature_set_point.setter
+    def temperature_set_point(self, value: float) -> None:
+        _bus()
+        WORLD.stop_sweep()
+        WORLD.set_point = value
+
+    def set_temperature_sweep(self, end: float, sweep_time: float = 1.0) -> None:
+        """:param sweep_time: duration of the sweep in minutes"""
+        _bus()
+        self._sweep = (end, sweep_time * 60)
+
+    def start_temperature_sweep(self) -> None:
+        _bus()
+        end, duration = getattr(self, '_sweep', (WORLD.set_point, 0.0))
+        WORLD.sweep_temperature(end, duration)
+
+    def stop_temperature_sweep(self) -> None:
+        _bus()
+        WORLD.stop_sweep()
+
+    def toggle_pid_auto(self, on: bool) -> None:
+        _bus()
+        self._pid_auto = on
+
+
+# scientificdevices.oxford.ips120
+
+class ControlMode(Enum):
+    LOCAL_AND_LOCKED = 0
+    REMOTE_AND_LOCKED = 1
+    LOCAL_AND_UNLOCKED = 2
+    REMOTE_AND_UNLOCKED = 3
+
+
+class CommunicationProtocol(Enum):
+    NORMAL = 0
+    EXTENDED_RESOLUTION = 4
+
+
+class SweepMode(Enum):
+    HOLD = 0
+    TO_SET_POINT = 1
+    TO_ZERO = 2
+    CLAMP = 4
+
+
+class SwitchHeaterMode(Enum):
+    OFF = 0
+    ON = 1
+    FORCE = 2
+
+
+class IPS120_10:
+    """Oxford IPS120-10 magnet power supply."""
+
+    MODES = {SweepMode.HOLD: 'hold', SweepMode.TO_SET_POINT: 'to set point',
+             SweepMode.TO_ZERO: 'to zero', SweepMode.CLAMP: 'hold'}
+
+    def __init__(self, *args, **kwargs) -> None:
+        pass
+
+    def clear(self) -> None:
+        _bus()
+
+    def set_control_mode(self, mode: ControlMode) -> None:
+        _bus()
+
+    def set_communication_protocol(self, protocol: CommunicationProtocol) -> None:
+        _bus()
+
+    def set_switch_heater(self, mode: SwitchHeaterMode) -> None:
+        _bus()
+
+    def set_field_sweep_rate(self, rate: float) -> None:
+        """:param rate: T/min"""
+        _bus()
+        WORLD.update()
+        WORLD.field_rate = rate
+
+    def set_target_field(self, field: float) -> None:
+        _bus()
+        WORLD.update()
+        WORLD.target_field = field
+
+    def set_sweep_mode(self, mode: SweepMode) -> None:
+        _bus()
+        WORLD.update()
+        WORLD.field_mode = self.MODES[mode]
+
+    def get_field(self) -> float:
+        _bus()
+        WORLD.update()
+        return round(WORLD.field, 5)
+
+
+# scientificdevices.stanford_research_systems.sr830m
+
+class SR830m:
+    """Stanford Research SR830 lock-in which measures the voltage over the sample.
+
+    The sample is current biased by the sine output through WORLD.pre_resistance.
+    """
+
+    def __init__(self, address: str = 'GPIB0::8::INSTR') -> None:
+        self.address = address
+        self._freq = 17.77
+        self._slvl = 1.0
+        self._oflt = 9  # 300 ms
+        self._ofsl = 1  # 12 dB/oct
+        self._sens = 26  # 1 V
+        self._phase = 0.5  # degrees
+
+    def _signal(self) -> complex:
+        amplitude = self._slvl * WORLD.resistance() / WORLD.pre_resistance
+        phase = math.radians(self._phase)
+        return complex(WORLD.noisy(amplitude * math.cos(phase), 1e-7),
+                       WORLD.noisy(amplitude * math.sin(phase), 1e-7))
+
+    @property
+    def outpX(self) -> float:
+        _bus()
+        return self._signal().real
+
+    @property
+    def outpY(self) -> float:
+        _bus()
+        return self._signal().imag
+
+    @property
+    def outpR(self) -> float:
+        _bus()
+        return abs(self._signal())
+
+    @property
+    def outpT(self) -> float:
+        _bus()
+        signal = self._signal()
+        return math.degrees(math.atan2(signal.imag, signal.real))
+
+    @property
+    def freq(self) -> float:
+        _bus()
+        return self._freq
+
+    @property
+    def slvl(self) -> float:
+        _bus()
+        return self._slvl
+
+    @property
+    def oflt(self) -> int:
+        _bus()
+        return self._oflt
+
+    @property
+    def ofsl(self) -> int:
+        _bus()
+        return self._ofsl
+
+    @property
+    def sens(self) -> int:
+        _bus()
+        return self._sens
+
+
+# scientificdevices.lakeshore.model340
+
+class Sensor(Enum):
+    A = 'A'
+    B = 'B'
+    C = 'C'
+    D = 'D'
+
+
+class Model340:
+    """LakeShore Model340 temperature controller, all sensors see the sample temperature."""
+
+    OFFSETS = {Sensor.A: 0.0, Sensor.B: 0.1, Sensor.C: -0.1, Sensor.D: 0.2}
+
+    def __init__(self, address=12) -> None:
+        self.address = address
+
+    def get_temperature(self, sensor: Sensor) -> float:
+        _bus()
+        WORLD.update()
+        return WORLD.noisy(WORLD.temperature + self.OFFSETS[sensor], 1e-3)
+
+
+def _module(name: str, **attributes) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    module.__simulated__ = True
+    return module
+
+
+def _modules() -> Dict[str, types.ModuleType]:
+    gpib = _module('gpib', dev=_gpib_dev, read=_gpib_read, write=_gpib_write,
+                   clear=_gpib_noop, close=_gpib_noop, timeout=_gpib_noop,
+                   **{name: index for index, name in enumerate(GPIB_TIMEOUTS)})
+    visa = _module('visa', ResourceManager=ResourceManager, VisaIOError=VisaIOError,
+                   constants=types.SimpleNamespace(VI_ATTR_TERMCHAR_EN=0x3FFF0038, VI_TRUE=1, VI_FALSE=0))
+
+    return {
+        'visa': visa,
+        'pyvisa': visa,
+        'gpib': gpib,
+        'scientificdevices': _module('scientificdevices'),
+        'scientificdevices.keithley': _module('scientificdevices.keithley'),
+        'scientificdevices.keithley.sourcemeter2400': _module(
+            'scientificdevices.keithley.sourcemeter2400', Sourcemeter2400=Sourcemeter2400),
+        'scientificdevices.keithley.sourcemeter2602A': _module(
+            'scientificdevices.keithley.sourcemeter2602A', Sourcemeter2602A=Sourcemeter2602A,
+            SMUChannel=SMUChannel),
+        'scientificdevices.keithley.sourcemeter2636A': _module(
+            'scientificdevices.keithley.sourcemeter2636A', Sourcemeter2636A=Sourcemeter2636A,
+            SMUChannel=SMUChannel),
+        'scientificdevices.oxford': _module('scientificdevices.oxford'),
+        'scientificdevices.oxford.itc503': _module('scientificdevices.oxford.itc503', ITC=ITC),
+        'scientificdevices.oxford.ips120': _module(
+            'scientificdevices.oxford.ips120', IPS120_10=IPS120_10, ControlMode=ControlMode,
+            CommunicationProtocol=CommunicationProtocol, SweepMode=SweepMode,
+            SwitchHeaterMode=SwitchHeaterMode),
+        'scientificdevices.stanford_research_systems': _module('scientificdevices.stanford_research_systems'),
+        'scientificdevices.stanford_research_systems.sr830m': _module(
+            'scientificdevices.stanford_research_systems.sr830m', SR830m=SR830m),
+        'scientificdevices.lakeshore': _module('scientificdevices.lakeshore'),
+        'scientificdevices.lakeshore.model340': _module(
+            'scientificdevices.lakeshore.model340', Model340=Model340, Sensor=Sensor),
+    }
+
+
+def install(speedup: float = 1.0, noise: float = 1e-3, latency: float = LATENCY,
+            seed: Optional[int] = None) -> SimulatedWorld:
+    """Replace the instrument drivers with the simulation.
+
+    :param speedup: how much faster temperature and field change than in reality
+    :param noise: relative noise of all readings
+    :param latency: seconds per bus access
+    :param seed: seed of the random numbers
+    :return: the simulated world, e.g. to change the sample parameters
+    """
+    global WORLD, LATENCY
+
+    loaded = [name for name in sys.modules
+              if name.startswith('measurement.') and not name.startswith('measurement.simulation')
+              and getattr(sys.modules[name], '__file__', None) and _uses_drivers(sys.modules[name])]
+    if loaded:
+        print('WARNING', 'already imported with the real drivers: {}'.format(', '.join(sorted(loaded))))
+
+    LATENCY = latency
+    WORLD = SimulatedWorld(speedup, noise, seed)
+    sys.modules.update(_modules())
+    return WORLD
+
+
+def is_installed() -> bool:
+    return getattr(sys.modules.get('visa'), '__simulated__', False)
+
+
+def _uses_drivers(module: types.ModuleType) -> bool:
+    return any(hasattr(module, name) for name in ('Sourcemeter2400', 'SR830m', 'ITC', 'Model340',
+                                                  'Sourcemeter2636A', 'Sourcemeter2602A'))
@@ -1,5 +1,10 @@
 from .measurement import register, AbstractMeasurement, Contacts, PlotRecommendation
 from .measurement import StringValue, FloatValue, IntegerValue, DatetimeValue, AbstractValue, SignalInterface, GPIBPathValue
+from .measurement import BooleanValue
+from .instruments import open_resource, shared
+from .sweep import plan_sweep
+from .averaging import average_reads
+from .timing import TimedFile
 
 import numpy as np
 from datetime import datetime
@@ -12,7 +17,7 @@ from visa import ResourceManager
 import visa
 #TODO: handle automagic Sourcemeter choice and write this info into the measurement file
 from scientificdevices.keithley.sourcemeter2400 import Sourcemeter2400
-from scientificdevices.keithley.sourcemeter2602A import Sourcemeter2602A
+from scientificdevices.keithley.sourcemeter2602A import Sourcemeter2602A, SMUChannel
 from scientificdevices.keithley.sourcemeter2636A import Sourcemeter2636A
 
 
@@ -26,22 +31,31 @@ class SMU2Probe(AbstractMeasurement):
     def __init__(self, signal_interface: SignalInterface,
                  path: str, contacts: Tuple[str, str],
                  v: float = 0.0, i: float = 1e-6, n: int = 100,
-                 nplc: int = 1, comment: str = '', gpib: str = '') -> None:
+                 nplc: int = 1, comment: str = '', gpib: str = '',
+                 adaptive: bool = False, min_step: float = 0.0, max_step: float = 0.0,
+                 tolerance: float = 0.01, target_error: float = 0.0, max_average_time: float = 5.0) -> None:
         super().__init__(signal_interface, path, contacts)
         self._max_voltage = v
         self._current_limit = i
         self._number_of_points = n
         self._nplc = nplc
         self._comment = comment
+        self._adaptive = adaptive
+        self._min_step = min_step
+        self._max_step = max_step
+        self._tolerance = tolerance
+        self._target_error = target_error
+        self._max_average_time = max_average_time
 
-        resource_man = ResourceManager(self.VISA_LIBRARY)
-        resource = resource_man.open_resource(gpib, query_delay=self.QUERY_DELAY)
+        resource = open_resource(gpib, self.VISA_LIBRARY, query_delay=self.QUERY_DELAY)
 
         try:
-            self._device = SMU2Probe._get_sourcemeter(resource)
+            self._device = shared(('sourcemeter', self.VISA_LIBRARY, gpib),
+                                  lambda: SMU2Probe._get_sourcemeter(resource))
         except visa.VisaIOError:
             # Should only occur when pyvisa-sim is used:
             self._device = Sourcemeter2400(resource)
+        self._device = self._timed(self._device, 'sourcemeter')
 
         self._device.voltage_driven(0, i, nplc)
 
@@ -69,7 +83,13 @@ class SMU2Probe(AbstractMeasurement):
                 'n': IntegerValue('Number of Points', default=100),
                 'nplc': IntegerValue('NPLC', default=1),
                 'comment': StringValue('Comment', default=''),
-                'gpib': GPIBPathValue('GPIB Address', default='GPIB0::10::INSTR')}
+                'gpib': GPIBPathValue('GPIB Address', default='GPIB0::10::INSTR'),
+                'adaptive': BooleanValue('Adaptive Steps', default=False),
+                'min_step': FloatValue('Min. Step (0: auto)', default=0.0),
+                'max_step': FloatValue('Max. Step (0: auto)', default=0.0),
+                'tolerance': FloatValue('Step Tolerance', default=0.01),
+                'target_error': FloatValue('Target Rel. Error (0: off)', default=0.0),
+                'max_average_time': FloatValue('Max. Averaging Time [s]', default=5.0)}
 
     @staticmethod
     def outputs() -> Dict[str, AbstractValue]:
@@ -89,17 +109,27 @@ class SMU2Probe(AbstractMeasurement):
         time.sleep(0.5)
         voltages, currents = [], []
 
-        for voltage in np.linspace(0, self._max_voltage, self._number_of_points):
+        # with adaptive steps the number of points is the maximum
+        sweep = plan_sweep([0, self._max_voltage], np.linspace(0, self._max_voltage, self._number_of_points),
+                           self._adaptive, self._min_step, self._max_step, self._tolerance)
+
+        for voltage in sweep:
             if self._should_stop.is_set():
                 print("DEBUG: Aborting measurement.")
                 self._signal_interface.emit_aborted()
                 break
 
             self._device.set_voltage(voltage)
-            voltage, current = self.__measure_data_point()
+            (voltage, current), stats = average_reads(self.__measure_data_point, self._target_error,
+                                                      self._max_average_time,
+                                                      floor=self._current_limit, stop=self._should_stop)
+            sweep.add(voltage, current)
             voltages.append(voltage)
             currents.append(current)
-            file_handle.write("{} {}\n".format(voltage, current))
+            if self._target_error > 0:
+                file_handle.write("{} {} {} {}\n".format(voltage, current, stats.sem, stats.count))
+            else:
+                file_handle.write("{} {}\n".format(voltage, current))
             file_handle.flush()
             # Send data point to UI for plotting:
             self._signal_interface.emit_data({'v': voltage, 'i': current, 'datetime': datetime.now()})
@@ -131,7 +161,14 @@ class SMU2Probe(AbstractMeasurement):
         file_handle.write("# maximum voltage {0} V\n".format(self._max_voltage))
         file_handle.write("# current limit {0} A\n".format(self._current_limit))
         file_handle.write('# nplc {}\n'.format(self._nplc))
-        file_handle.write("Voltage Current\n")
+        if self._adaptive:
+            file_handle.write('# adaptive steps, tolerance {}\n'.format(self._tolerance))
+        if self._target_error > 0:
+            file_handle.write('# averaged to a relative error of {} within {} s\n'.format(self._target_error,
+                                                                                        self._max_average_time))
+            file_handle.write("Voltage Current CurrentError Samples\n")
+        else:
+            file_handle.write("Voltage Current\n")
 
     def __measure_data_point(self) -> Tuple[float, float]:
         """Return one data point: (voltage, current).
@@ -141,6 +178,184 @@ class SMU2Probe(AbstractMeasurement):
         return self._device.read()
 
 
+@register('SourceMeter two probe voltage sweep, channels A and B')
+class SMU2ProbeDual(AbstractMeasurement):
+    """Two independent 2-probe sweeps on the channels A and B of a 2602A or 2636A at the same time.
+
+    The first two contacts are connected to channel A, the last two to
+    channel B. Each pair gets its own data file, plots and overview row, as
+    if it had been measured on its own. The steps of both sweeps are
+    interleaved: both voltages are set before both channels are read, so one
+    channel settles while the other one integrates.
+    """
+
+    VISA_LIBRARY = "@py"
+    QUERY_DELAY = 0.0
+
+    def __init__(self, signal_interface: SignalInterface,
+                 path: str, contacts: Tuple[str, str, str, str],
+                 v: float = 0.0, i: float = 1e-6, n: int = 100,
+                 nplc: int = 1, comment: str = '', gpib: str = 'GPIB0::11::INSTR',
+                 adaptive: bool = False, min_step: float = 0.0, max_step: float = 0.0,
+                 tolerance: float = 0.01) -> None:
+        super().__init__(signal_interface, path, contacts)
+        self._max_voltage = v
+        self._current_limit = i
+        self._number_of_points = n
+        self._nplc = nplc
+        self._comment = comment
+        self._adaptive = adaptive
+        self._min_step = min_step
+        self._max_step = max_step
+        self._tolerance = tolerance
+        self._pairs = (tuple(contacts[:2]), tuple(contacts[2:]))
+
+        resource = open_resource(gpib, self.VISA_LIBRARY, query_delay=self.QUERY_DELAY)
+        self._devices = [self._shared(('sourcemeter', self.VISA_LIBRARY, gpib, channel.value),
+                                      lambda channel=channel: SMU2ProbeDual._get_sourcemeter(resource, channel),
+                                      'sourcemeter {}'.format(channel.value))
+                         for channel in (SMUChannel.channelA, SMUChannel.channelB)]
+
+        for device in self._devices:
+            device.voltage_driven(0, i, nplc)
+
+    @staticmethod
+    def _get_sourcemeter(resource, channel: SMUChannel):
+        identification = resource.query('*IDN?')
+        print('DEBUG', identification)
+        if '2602' in identification:
+            return Sourcemeter2602A(resource, sub_device=channel)
+        elif '2636' in identification:
+            return Sourcemeter2636A(resource, sub_device=channel)
+        else:
+            raise ValueError('Sourcemeter "{}" has no channel B.'.format(identification))
+
+    @staticmethod
+    def number_of_contacts():
+        return Contacts.FOUR
+
+    @staticmethod
+    def inputs() -> Dict[str, AbstractValue]:
+        return {'v': FloatValue('Maximum Voltage', default=0.0),
+                'i': FloatValue('Current Limit', default=1e-6),
+                'n': IntegerValue('Number of Points', default=100),
+                'nplc': IntegerValue('NPLC', default=1),
+                'comment': StringValue('Comment', default=''),
+                'gpib': GPIBPathValue('GPIB Address', default='GPIB0::11::INSTR'),
+                'adaptive': BooleanValue('Adaptive Steps', default=False),
+                'min_step': FloatValue('Min. Step (0: auto)', default=0.0),
+                'max_step': FloatValue('Max. Step (0: auto)', default=0.0),
+                'tolerance': FloatValue('Step Tolerance', default=0.01)}
+
+    @staticmethod
+    def outputs() -> Dict[str, AbstractValue]:
+        return {'v': FloatValue('Voltage A'),
+                'i': FloatValue('Current A'),
+                'v2': FloatValue('Voltage B'),
+                'i2': FloatValue('Current B'),
+                'datetime': DatetimeValue('Timestamp')}
+
+    @property
+    def recommended_plots(self) -> List[PlotRecommendation]:
+        return [PlotRecommendation('Voltage Sweep A', x_label='v', y_label='i', show_fit=True),
+                PlotRecommendation('Voltage Sweep B', x_label='v2', y_label='i2', show_fit=True)]
+
+    def _generate_file_name_prefix(self) -> str:
+        return 'contacts_{}_'.format('--'.join(self._pairs[0]))
+
+    def _generate_plot_file_name_prefix(self, pair) -> str:
+        contacts = self._pairs[1] if pair == ('v2', 'i2') else self._pairs[0]
+        return 'contacts_{}_plot-{}-{}_'.format('--'.join(contacts), pair[0], pair[1])
+
+    def _generate_all_file_names(self) -> None:
+        super()._generate_all_file_names()
+        self._file_path_b = self._get_next_file('contacts_{}_'.format('--'.join(self._pairs[1])))
+
+    def _measure(self, file_handle) -> None:
+        """Custom measurement code lives here.
+        """
+        with open(self._file_path_b, 'w') as file_handle_b:
+            self.__sweep([file_handle, TimedFile(file_handle_b, self._timing)])
+
+    def __sweep(self, file_handles) -> None:
+        for index, file_handle in enumerate(file_handles):
+            self.__write_header(file_handle, index)
+        self.__initialize_devices()
+        time.sleep(0.5)
+
+        # with adaptive steps the number of points is the maximum
+        sweeps = [plan_sweep([0, self._max_voltage], np.linspace(0, self._max_voltage, self._number_of_points),
+                             self._adaptive, self._min_step, self._max_step, self._tolerance)
+                  for _ in self._devices]
+        steps = [iter(sweep) for sweep in sweeps]
+        points = [([], []) for _ in self._devices]
+        keys = [('v', 'i'), ('v2', 'i2')]
+
+        running = [0, 1]
+        while running:
+            if self._should_stop.is_set():
+                print("DEBUG: Aborting measurement.")
+                self._signal_interface.emit_aborted()
+                break
+
+            for index in list(running):
+                try:
+                    self._devices[index].set_voltage(next(steps[index]))
+                except StopIteration:
+                    # the other channel goes on alone
+                    self._devices[index].set_voltage(0)
+                    running.remove(index)
+
+            for index in running:
+                voltage, current = self._devices[index].read()
+                sweeps[index].add(voltage, current)
+                points[index][0].append(voltage)
+                points[index][1].append(current)
+                file_handles[index].write("{} {}\n".format(voltage, current))
+                file_handles[index].flush()
+                self._signal_interface.emit_data({keys[index][0]: voltage, keys[index][1]: current,
+                                                  'datetime': datetime.now()})
+
+        self.__deinitialize_devices()
+
+        for channel, pair, (voltages, currents) in zip('ab', self._pairs, points):
+            if len(voltages) < 2:
+                continue
+            conductance, _ = np.polyfit(voltages, currents, 1)
+            self._write_overview(contacts=pair, Resistance=1 / conductance, Channel=channel,
+                                 Datetime=datetime.now().isoformat(), Aborted=self._should_stop.is_set())
+
+    def __initialize_devices(self) -> None:
+        """Make devices ready for measurement."""
+        for device in self._devices:
+            device.arm()
+
+    def __deinitialize_devices(self) -> None:
+        """Reset devices to a safe state."""
+        for device in self._devices:
+            device.set_voltage(0)
+            device.disarm()
+
+    def __write_header(self, file_handle: TextIO, index: int) -> None:
+        """Write a file header for present settings.
+
+        Arguments:
+            file_handle: The open file to write to
+            index: 0 for channel A, 1 for channel B
+        """
+        other = 1 - index
+        file_handle.write("# {0}\n".format(datetime.now().isoformat()))
+        file_handle.write('# {}\n'.format(self._comment))
+        file_handle.write('# channel {}, measured together with contacts {} on channel {}\n'.format(
+            'ab'[index], ' '.join(self._pairs[other]), 'ab'[other]))
+        file_handle.write("# maximum voltage {0} V\n".format(self._max_voltage))
+        file_handle.write("# current limit {0} A\n".format(self._current_limit))
+        file_handle.write('# nplc {}\n'.format(self._nplc))
+        if self._adaptive:
+            file_handle.write('# adaptive steps, tolerance {}\n'.format(self._tolerance))
+        file_handle.write("Voltage Current\n")
+
+
 @register("SIMULATED SourceMeter two probe voltage sweep")
 class SMU2ProbeSimulation(SMU2Probe):
     """PyVisa-sim compatible adaptation of SMU2Probe for testing."""
@@ -151,9 +366,13 @@ class SMU2ProbeSimulation(SMU2Probe):
     def __init__(self, signal_interface: SignalInterface,
                  path: str, contacts: Tuple[str, str],
                  v: float = 0.0, i: float = 1e-6, n: int = 100,
-                 nplc: int = 1, comment: str = '', gpib: str = '') -> None:
+                 nplc: int = 1, comment: str = '', gpib: str = '',
+                 adaptive: bool = False, min_step: float = 0.0, max_step: float = 0.0,
+                 tolerance: float = 0.01, target_error: float = 0.0, max_average_time: float = 5.0) -> None:
         super().__init__(signal_interface, path, contacts,
-                         v, i, n, nplc, comment, gpib="GPIB::10::INSTR")
+                         v, i, n, nplc, comment, gpib="GPIB::10::INSTR",
+                         adaptive=adaptive, min_step=min_step, max_step=max_step, tolerance=tolerance,
+                         target_error=target_error, max_average_time=max_average_time)
 
         # Set some things that are needed to get pyvisa-sim running:
         self._device._dev.write_termination = "\n"
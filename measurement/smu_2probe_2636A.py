@@ -1,5 +1,7 @@
 from .measurement import register, AbstractMeasurement, Contacts, PlotRecommendation
 from .measurement import StringValue, FloatValue, IntegerValue, DatetimeValue, AbstractValue, SignalInterface
+from .instruments import open_resource
+from .averaging import average_reads
 
 import numpy as np
 from datetime import datetime
@@ -21,21 +23,24 @@ class SMU2Probe(AbstractMeasurement):
     GPIB_RESOURCE = "GPIB::10::INSTR"
     VISA_LIBRARY = "@py"
     QUERY_DELAY = 0.0
+    FIXED_RESOURCES = (GPIB_RESOURCE,)
 
     def __init__(self, signal_interface: SignalInterface,
                  path: str, contacts: Tuple[str, str],
                  v: float = 0.0, i: float = 1e-6, n: int = 100,
-                 nplc: int = 1, comment: str = '', range:float=1e-8) -> None:
+                 nplc: int = 1, comment: str = '', range:float=1e-8,
+                 target_error: float = 0.0, max_average_time: float = 5.0) -> None:
         super().__init__(signal_interface, path, contacts)
         self._max_voltage = v
         self._current_limit = i
         self._number_of_points = n
         self._nplc = nplc
         self._comment = comment
+        self._target_error = target_error
+        self._max_average_time = max_average_time
 
-        resource_man = ResourceManager(self.VISA_LIBRARY)
-        resource = resource_man.open_resource(self.GPIB_RESOURCE, query_delay=self.QUERY_DELAY)
-        self._device = Sourcemeter2602A(resource)
+        resource = open_resource(self.GPIB_RESOURCE, self.VISA_LIBRARY, query_delay=self.QUERY_DELAY)
+        self._device = self._timed(Sourcemeter2602A(resource), 'sourcemeter')
         self._device.voltage_driven(0, i, nplc, range=range)
 
     @staticmethod
@@ -49,7 +54,9 @@ class SMU2Probe(AbstractMeasurement):
                 'n': IntegerValue('Number of Points', default=100),
                 'nplc': IntegerValue('NPLC', default=1),
 		'range': FloatValue('Minimal Range', default=1e-8),
-                'comment': StringValue('Comment', default='')}
+                'comment': StringValue('Comment', default=''),
+                'target_error': FloatValue('Target Rel. Error (0: off)', default=0.0),
+                'max_average_time': FloatValue('Max. Averaging Time [s]', default=5.0)}
 
     @staticmethod
     def outputs() -> Dict[str, AbstractValue]:
@@ -75,8 +82,13 @@ class SMU2Probe(AbstractMeasurement):
                 break
 
             self._device.set_voltage(voltage)
-            voltage, current = self.__measure_data_point()
-            file_handle.write("{} {}\n".format(voltage, current))
+            (voltage, current), stats = average_reads(self.__measure_data_point, self._target_error,
+                                                      self._max_average_time,
+                                                      floor=self._current_limit, stop=self._should_stop)
+            if self._target_error > 0:
+                file_handle.write("{} {} {} {}\n".format(voltage, current, stats.sem, stats.count))
+            else:
+                file_handle.write("{} {}\n".format(voltage, current))
             file_handle.flush()
             # Send data point to UI for plotting:
             self._signal_interface.emit_data({'v': voltage, 'i': current, 'datetime': datetime.now()})
@@ -103,7 +115,12 @@ class SMU2Probe(AbstractMeasurement):
         file_handle.write("# maximum voltage {0} V\n".format(self._max_voltage))
         file_handle.write("# current limit {0} A\n".format(self._current_limit))
         file_handle.write('# nplc {}\n'.format(self._nplc))
-        file_handle.write("Voltage Current\n")
+        if self._target_error > 0:
+            file_handle.write('# averaged to a relative error of {} within {} s\n'.format(self._target_error,
+                                                                                        self._max_average_time))
+            file_handle.write("Voltage Current CurrentError Samples\n")
+        else:
+            file_handle.write("Voltage Current\n")
 
     def __measure_data_point(self) -> Tuple[float, float]:
         """Return one data point: (voltage, current).
@@ -1,5 +1,7 @@
 from .measurement import register, AbstractMeasurement, Contacts, PlotRecommendation
 from .measurement import StringValue, FloatValue, IntegerValue, DatetimeValue, AbstractValue, SignalInterface, GPIBPathValue
+from .instruments import open_resource
+from .averaging import average_reads
 
 from typing import Dict, Tuple, List
 from typing.io import TextIO
@@ -21,19 +23,22 @@ class SMU2ProbeIvt(AbstractMeasurement):
     def __init__(self, signal_interface: SignalInterface,
                  path: str, contacts: Tuple[str, str],
                  v: float = 0.0, i: float = 1e-6,
-                 nplc: int = 3, comment: str = '', time_difference: float=0, gpib: str='GPIB0::10::INSTR'):
+                 nplc: int = 3, comment: str = '', time_difference: float=0, gpib: str='GPIB0::10::INSTR',
+                 target_error: float = 0.0, max_average_time: float = 5.0):
         super().__init__(signal_interface, path, contacts)
         self._max_voltage = v
         self._current_limit = i
         self._nplc = nplc
         self._comment = comment
+        self._target_error = target_error
+        self._max_average_time = max_average_time
         self._time_difference = time_difference
         self._gpib = gpib
 
-        resource_man = ResourceManager('@py')
-        resource = resource_man.open_resource(self._gpib)
+        resource = open_resource(self._gpib)
 
-        self._device = SMU2ProbeIvt._get_sourcemeter(resource)
+        self._device = self._shared(('sourcemeter', '@py', self._gpib),
+                                    lambda: SMU2ProbeIvt._get_sourcemeter(resource), 'sourcemeter')
         self._device.voltage_driven(0, i, nplc)
 
     @staticmethod
@@ -59,7 +64,9 @@ class SMU2ProbeIvt(AbstractMeasurement):
                 'i': FloatValue('Current Limit', default=1e-6),
                 'nplc': IntegerValue('NPLC', default=1),
                 'comment': StringValue('Comment', default=''),
-                'gpib': GPIBPathValue('GPIB Address', default='GPIB0::10::INSTR')}
+                'gpib': GPIBPathValue('GPIB Address', default='GPIB0::10::INSTR'),
+                'target_error': FloatValue('Target Rel. Error (0: off)', default=0.0),
+                'max_average_time': FloatValue('Max. Averaging Time [s]', default=5.0)}
 
     @staticmethod
     def outputs() -> Dict[str, AbstractValue]:
@@ -82,7 +89,9 @@ class SMU2ProbeIvt(AbstractMeasurement):
         switched_to_current_driven = False
 
         while not self._should_stop.is_set():
-            voltage, current = self.__measure_data_point()
+            (voltage, current), stats = average_reads(self.__measure_data_point, self._target_error,
+                                                      self._max_average_time,
+                                                      floor=self._current_limit, stop=self._should_stop)
             if not switched_to_current_driven and current > 0.9 * self._current_limit:
                 self._device.disarm()
                 self._device.set_voltage(0)
@@ -95,7 +104,11 @@ class SMU2ProbeIvt(AbstractMeasurement):
                 sleep(2)
                 
             timestamp = datetime.now()
-            file_handle.write("{} {} {}\n".format(timestamp.isoformat(), voltage, current))
+            if self._target_error > 0:
+                file_handle.write("{} {} {} {} {}\n".format(timestamp.isoformat(), voltage, current,
+                                                            stats.sem, stats.count))
+            else:
+                file_handle.write("{} {} {}\n".format(timestamp.isoformat(), voltage, current))
             file_handle.flush()
             # Send data point to UI for plotting:
             g = float('nan') if voltage == 0 else current / voltage
@@ -128,7 +141,12 @@ class SMU2ProbeIvt(AbstractMeasurement):
         file_handle.write("# maximum voltage {0} V\n".format(self._max_voltage))
         file_handle.write("# current limit {0} A\n".format(self._current_limit))
         file_handle.write('# nplc {}\n'.format(self._nplc))
-        file_handle.write("Datetime Voltage Current\n")
+        if self._target_error > 0:
+            file_handle.write('# averaged to a relative error of {} within {} s\n'.format(self._target_error,
+                                                                                        self._max_average_time))
+            file_handle.write("Datetime Voltage Current CurrentError Samples\n")
+        else:
+            file_handle.write("Datetime Voltage Current\n")
 
     def __measure_data_point(self) -> Tuple[float, float]:
         """Return one data point: (voltage, current).
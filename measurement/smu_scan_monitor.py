@@ -0,0 +1,270 @@
+from .measurement import register, SignalInterface, AbstractValue, AbstractMeasurement, Contacts, PlotRecommendation
+from .measurement import FloatValue, IntegerValue, StringValue, DatetimeValue, GPIBPathValue
+from .measurement import normalize_resource
+from .instruments import open_resource
+from .switching import DEFAULT_SETTLE_TIME, SwitchMatrix, order_scan, parse_scan_list, parse_smus, transition_cost
+
+from scientificdevices.keithley.sourcemeter2400 import Sourcemeter2400
+from scientificdevices.keithley.sourcemeter2602A import Sourcemeter2602A, SMUChannel
+from scientificdevices.keithley.sourcemeter2636A import Sourcemeter2636A
+
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from datetime import datetime
+from threading import Lock
+from time import monotonic
+from typing import Tuple, Dict, List, Set
+
+# samples of one scan list, the outputs are declared for this many
+MAX_SAMPLES = 24
+
+# power line frequency for the integration time of the sourcemeters
+LINE_FREQUENCY = 50.0
+
+DRIVERS = {'2400': Sourcemeter2400, '2602A': Sourcemeter2602A, '2636A': Sourcemeter2636A}
+CHANNELS = {'a': SMUChannel.channelA, 'b': SMUChannel.channelB}
+
+
+@register('SMU scan list monitor')
+class SMUScanMonitor(AbstractMeasurement):
+    """Conductance of many samples over time, connected to few sourcemeters by a switch matrix.
+
+    The scan list is described in measurement/switching.py. Sourcemeters at
+    different addresses run in parallel, each in its own thread, the two
+    channels of a 2602A or 2636A share the thread of their mainframe. Every
+    sample of a mainframe is read once per cycle, the cycle time is written
+    to the header as the planned interval and the measured intervals of
+    every sample are added at the end of the file and to the timing summary.
+    """
+
+    def __init__(self, signal_interface: SignalInterface,
+                 path: str, contacts: Tuple[str, str],
+                 v: float = 1e-3, i: float = 1e-6, nplc: int = 1, comment: str = '',
+                 smus: str = '', scan_list: str = '', switch: str = 'GPIB0::7::INSTR',
+                 settle_time: float = DEFAULT_SETTLE_TIME):
+
+        super().__init__(signal_interface, path, contacts)
+
+        self._voltage = v
+        self._current_limit = i
+        self._nplc = nplc
+        self._comment = comment
+        self._switch_address = switch
+
+        try:
+            self._smu_specs = {spec.name: spec for spec in parse_smus(smus)}
+            self._entries = parse_scan_list(scan_list, default_voltage=v)
+        except ValueError as error:
+            print(error)
+            self.abort()
+            return
+
+        unknown = sorted({entry.smu for entry in self._entries} - set(self._smu_specs))
+        if unknown:
+            print('unknown sourcemeters in the scan list: {}'.format(', '.join(unknown)))
+            self.abort()
+            return
+        if not 0 < len(self._entries) <= MAX_SAMPLES:
+            print('the scan list needs between 1 and {} samples'.format(MAX_SAMPLES))
+            self.abort()
+            return
+        self._columns = {entry.name: index + 1 for index, entry in enumerate(self._entries)}
+
+        self._switch = SwitchMatrix(self._timed(open_resource(switch), 'switch'), settle_time)
+        self._init_smus()
+        self._plan_scan()
+
+    def _init_smus(self):
+        self._smus = {}
+        for name, spec in self._smu_specs.items():
+            resource = open_resource(spec.address)
+            if spec.channel is None:
+                smu = DRIVERS[spec.model](resource)
+            else:
+                smu = DRIVERS[spec.model](resource, sub_device=CHANNELS[spec.channel.lower()])
+            self._smus[name] = self._timed(smu, 'sourcemeter {}'.format(name))
+            self._smus[name].voltage_driven(0, current_limit=self._current_limit, nplc=self._nplc)
+
+    def _plan_scan(self):
+        """Order the samples of every sourcemeter, the sourcemeters of one mainframe are read one after another."""
+        lanes = {}  # type: Dict[str, List[List]]
+        for name, spec in self._smu_specs.items():
+            entries = order_scan([entry for entry in self._entries if entry.smu == name])
+            if entries:
+                lanes.setdefault(normalize_resource(spec.address), []).append(entries)
+
+        # the planned interval only counts relay settling and integration, not the bus
+        integration = self._nplc / LINE_FREQUENCY
+        self._cycles = {}  # type: Dict[str, List]
+        self._planned_intervals = {}
+        for address, entries_of_smus in lanes.items():
+            interval = 0.0
+            for entries in entries_of_smus:
+                # a single sample is only switched once
+                steps = sum(transition_cost(entries[index - 1].channels, entry.channels)[0]
+                            for index, entry in enumerate(entries)) if len(entries) > 1 else 0
+                interval += steps * self._switch.settle_time + len(entries) * integration
+            self._cycles[address] = [entry for entries in entries_of_smus for entry in entries]
+            for entry in self._cycles[address]:
+                self._planned_intervals[entry.name] = interval
+
+    @staticmethod
+    def number_of_contacts():
+        return Contacts.NONE
+
+    @staticmethod
+    def inputs() -> Dict[str, AbstractValue]:
+        return {'v': FloatValue('Voltage', default=1e-3),
+                'i': FloatValue('Current Limit', default=1e-6),
+                'nplc': IntegerValue('NPLC', default=1),
+                'comment': StringValue('Comment', default=''),
+                'smus': StringValue('Sourcemeters (name model address [channel]; ...)',
+                                    default='A 2636A GPIB0::11::INSTR a; B 2636A GPIB0::11::INSTR b; '
+                                            'C 2602A GPIB0::12::INSTR a; D 2602A GPIB0::12::INSTR b; '
+                                            'E 2400 GPIB0::10::INSTR'),
+                'scan_list': StringValue('Scan List (sample sourcemeter relays [voltage]; ...)', default=''),
+                'switch': GPIBPathValue('Switch Address', default='GPIB0::7::INSTR'),
+                'settle_time': FloatValue('Relay Settle Time [s]', default=0.005)}
+
+    @classmethod
+    def resources(cls, inputs) -> Set[str]:
+        try:
+            smus = parse_smus(inputs.get('smus', cls.inputs()['smus'].default))
+        except ValueError:
+            smus = []
+        return super().resources(inputs) | {normalize_resource(smu.address) for smu in smus}
+
+    @staticmethod
+    def outputs() -> Dict[str, AbstractValue]:
+        return {'c1': FloatValue('Conductance 1 [S]'),
+                'c2': FloatValue('Conductance 2 [S]'),
+                'c3': FloatValue('Conductance 3 [S]'),
+                'c4': FloatValue('Conductance 4 [S]'),
+                'c5': FloatValue('Conductance 5 [S]'),
+                'c6': FloatValue('Conductance 6 [S]'),
+                'c7': FloatValue('Conductance 7 [S]'),
+                'c8': FloatValue('Conductance 8 [S]'),
+                'c9': FloatValue('Conductance 9 [S]'),
+                'c10': FloatValue('Conductance 10 [S]'),
+                'c11': FloatValue('Conductance 11 [S]'),
+                'c12': FloatValue('Conductance 12 [S]'),
+                'c13': FloatValue('Conductance 13 [S]'),
+                'c14': FloatValue('Conductance 14 [S]'),
+                'c15': FloatValue('Conductance 15 [S]'),
+                'c16': FloatValue('Conductance 16 [S]'),
+                'c17': FloatValue('Conductance 17 [S]'),
+                'c18': FloatValue('Conductance 18 [S]'),
+                'c19': FloatValue('Conductance 19 [S]'),
+                'c20': FloatValue('Conductance 20 [S]'),
+                'c21': FloatValue('Conductance 21 [S]'),
+                'c22': FloatValue('Conductance 22 [S]'),
+                'c23': FloatValue('Conductance 23 [S]'),
+                'c24': FloatValue('Conductance 24 [S]'),
+                'datetime': DatetimeValue('Timestamp')}
+
+    @property
+    def recommended_plots(self) -> List[PlotRecommendation]:
+        return [PlotRecommendation('{} - Conductance vs. Time'.format(entry.name),
+                                   x_label='datetime', y_label='c{}'.format(self._columns[entry.name]))
+                for entry in getattr(self, '_entries', [])]
+
+    def _measure(self, file_handle):
+        self.__write_header(file_handle)
+
+        self._file_lock = Lock()
+        self._intervals = {entry.name: [] for entry in self._entries}
+        self._switch.open_all()
+        self.__arm_devices()
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(self._cycles)) as executor:
+                futures = [executor.submit(self.__scan, cycle, file_handle) for cycle in self._cycles.values()]
+                wait(futures, return_when=FIRST_EXCEPTION)
+                # one sourcemeter failed, the others are stopped as well
+                self._should_stop.set()
+                for future in futures:
+                    future.result()
+        finally:
+            self.__disarm_devices()
+            self._switch.open_all()
+            self.__write_intervals(file_handle)
+
+        self._signal_interface.emit_aborted()
+
+    def __scan(self, cycle, file_handle):
+        """Read the samples of one mainframe in turn until the measurement is stopped."""
+        connected = {}  # the relays each sourcemeter is connected through
+        last_read = {}
+        while not self._should_stop.is_set():
+            for entry in cycle:
+                if self._should_stop.is_set():
+                    break
+                smu = self._smus[entry.smu]
+
+                if connected.get(entry.smu) != entry.channels:
+                    # the relays are not switched under voltage
+                    smu.set_voltage(0)
+                    settle_time = self._switch.switch(connected.get(entry.smu), entry.channels)
+                    connected[entry.smu] = entry.channels
+                    self._should_stop.wait(settle_time)
+                    smu.set_voltage(entry.voltage)
+
+                voltage, current = smu.read()
+                now = monotonic()
+                if entry.name in last_read:
+                    self._intervals[entry.name].append(now - last_read[entry.name])
+                last_read[entry.name] = now
+
+                self.__write_data(entry, voltage, current, file_handle)
+
+    def __write_header(self, file_handle):
+        file_handle.write("# {0}\n".format(datetime.now().isoformat()))
+        file_handle.write('# {}\n'.format(self._comment))
+        file_handle.write("# current limit {} A\n".format(self._current_limit))
+        file_handle.write('# nplc {}\n'.format(self._nplc))
+        file_handle.write('# switch {}, settle time {} s\n'.format(self._switch_address, self._switch.settle_time))
+        for address, cycle in self._cycles.items():
+            file_handle.write('#\n')
+            file_handle.write('# {}\n'.format(address))
+            for entry in cycle:
+                spec = self._smu_specs[entry.smu]
+                smu = ' '.join(field for field in (entry.smu, spec.model, spec.channel) if field)
+                file_handle.write('# {} (c{}): sourcemeter {}, relays {}, {} V, '
+                                  'every {:.3f} s at the least\n'.format(entry.name, self._columns[entry.name], smu,
+                                                                      ','.join(sorted(entry.channels)),
+                                                                      entry.voltage,
+                                                                      self._planned_intervals[entry.name]))
+        file_handle.write("Datetime Sample Voltage Current Conductance\n")
+
+    def __write_data(self, entry, voltage, current, file_handle):
+        conductance = current / voltage if voltage != 0 else float('nan')
+        timestamp = datetime.now()
+        with self._file_lock:
+            file_handle.write('{} {} {} {} {}\n'.format(timestamp.isoformat(), entry.name,
+                                                        voltage, current, conductance))
+            file_handle.flush()
+            self._signal_interface.emit_data({'c{}'.format(self._columns[entry.name]): conductance,
+                                              'datetime': timestamp})
+
+    def __write_intervals(self, file_handle):
+        """The measured time between two readings of every sample."""
+        summary = {}
+        for entry in self._entries:
+            intervals = self._intervals[entry.name]
+            if not intervals:
+                continue
+            mean, longest = sum(intervals) / len(intervals), max(intervals)
+            summary[entry.name] = dict(planned_s=self._planned_intervals[entry.name],
+                                       mean_s=mean, max_s=longest, readings=len(intervals) + 1)
+            file_handle.write('# {}: every {:.3f} s on average, {:.3f} s at the most\n'.format(entry.name,
+                                                                                             mean, longest))
+        self._timing.add(sample_intervals=summary, relay_operations=self._switch.operations)
+
+    def __arm_devices(self):
+        for smu in self._smus.values():
+            smu.set_voltage(0)
+            smu.arm()
+
+    def __disarm_devices(self):
+        for smu in self._smus.values():
+            smu.set_voltage(0)
+            smu.disarm()
@@ -1,5 +1,9 @@
 from .measurement import register, AbstractMeasurement, Contacts, PlotRecommendation
 from .measurement import StringValue, FloatValue, IntegerValue, DatetimeValue, AbstractValue, SignalInterface, GPIBPathValue
+from .instruments import open_resource
+from .averaging import average_reads
+from .ramp import RampController, restart_sweep
+from .watchdog import InstrumentError
 
 from typing import Dict, Tuple, List
 from typing.io import TextIO
@@ -20,7 +24,6 @@ from queue import Queue
 
 import gpib
 
-import traceback
 
 from ast import literal_eval
 
@@ -137,6 +140,8 @@ def get_gpib_device(port: int, timeout=0.5):
 
 @register('SourceMeter two probe Current vs. Temp. (blue)')
 class SMU2ProbeIvTBlue(AbstractMeasurement):
+    # the ITC503 of the blue cryostat
+    FIXED_RESOURCES = ('GPIB0::24::INSTR',)
 
 
     def __init__(self, signal_interface: SignalInterface,
@@ -144,11 +149,15 @@ class SMU2ProbeIvTBlue(AbstractMeasurement):
                  comment: str = '', gpib: str='GPIB0::12::INSTR',
                  sweep_rate:float = 1.0,
                  temperature_end: float = 2,
-                 nplc: int = 3, voltage:float = 0.1, current_limit: float=1e-6):
+                 nplc: int = 3, voltage:float = 0.1, current_limit: float=1e-6,
+                 target_error: float = 0.0, max_average_time: float = 5.0,
+                 min_sweep_rate: float = 0.0, max_sweep_rate: float = 2.5, resolution: float = 5.0):
                      
         super().__init__(signal_interface, path, contacts)
         self._comment = comment
-        self._temp = ITC(get_gpib_device(24))
+        self._target_error = target_error
+        self._max_average_time = max_average_time
+        self._temp = self._shared(('ITC', 24), lambda: ITC(get_gpib_device(24)), 'ITC503')
         self._sweep_rate = sweep_rate
         self._voltage = voltage
         self._current_limit = current_limit
@@ -164,10 +173,20 @@ class SMU2ProbeIvTBlue(AbstractMeasurement):
             self.abort()
             return   
             
-        resource_man = ResourceManager('@py')
-        resource = resource_man.open_resource(self._gpib)
+        if not (0 <= min_sweep_rate <= max_sweep_rate <= 2.5):
+            print("sweep rate bounds have to fulfil 0 <= min <= max <= 2.5")
+            self.abort()
+            return
+
+        # the sweep rate follows dR/dT if a minimal rate is given, see measurement/ramp.py
+        self._ramp = None
+        if min_sweep_rate > 0:
+            self._ramp = RampController(sweep_rate, min_sweep_rate, max_sweep_rate, resolution / 100)
+
+        resource = open_resource(self._gpib)
             
-        self._device = SMU2ProbeIvTBlue._get_sourcemeter(resource)
+        self._device = self._shared(('sourcemeter', '@py', self._gpib),
+                                    lambda: SMU2ProbeIvTBlue._get_sourcemeter(resource), 'sourcemeter')
         self._device.voltage_driven(0, current_limit, nplc)
             
         self._temperature_end = temperature_end
@@ -200,7 +219,12 @@ class SMU2ProbeIvTBlue(AbstractMeasurement):
                 'gpib': GPIBPathValue('GPIB Address', default='GPIB0::12::INSTR'),
                 'voltage' : FloatValue('Voltage', default=0.1),
                 'current_limit': FloatValue('Current Limit', default=1e-6),
-                'sweep_rate': FloatValue('Sweep Rate [K/min]', default=1)
+                'sweep_rate': FloatValue('Sweep Rate [K/min]', default=1),
+                'min_sweep_rate': FloatValue('Min. Sweep Rate (0: constant)', default=0.0),
+                'max_sweep_rate': FloatValue('Max. Sweep Rate', default=2.5),
+                'resolution': FloatValue('R Change [%/min]', default=5.0),
+                'target_error': FloatValue('Target Rel. Error (0: off)', default=0.0),
+                'max_average_time': FloatValue('Max. Averaging Time [s]', default=5.0)
                 }
 
     @staticmethod
@@ -223,9 +247,8 @@ class SMU2ProbeIvTBlue(AbstractMeasurement):
         while not self._should_stop.is_set():
             try:
                 self._acquire_data_point(file_handle)
-            except:
-                print('{} failed to acquire datapoint.'.format(datetime.now().isoformat()))
-                traceback.print_exc()
+            except InstrumentError as error:
+                print('{} failed to acquire datapoint: {}'.format(datetime.now().isoformat(), error))
                 
             self._toggle_pid_if_necessary()
 
@@ -250,19 +273,35 @@ class SMU2ProbeIvTBlue(AbstractMeasurement):
     
 
     def _acquire_data_point(self, file_handle):
-        voltage, current = self.__measure_data_point()
+        (voltage, current), stats = average_reads(self.__measure_data_point, self._target_error,
+                                                  self._max_average_time,
+                                                  floor=self._current_limit, stop=self._should_stop)
         T1, T2, T3 = self._temp.T1, self._temp.T2, self._temp.T3
         
-        file_handle.write('{} {} {} {} {} {}\n'.format(datetime.now().isoformat(), 
-                                                       voltage, current, T1, T2, T3))
+        if self._target_error > 0:
+            file_handle.write('{} {} {} {} {} {} {} {}\n'.format(datetime.now().isoformat(), voltage, current,
+                                                                T1, T2, T3, stats.sem, stats.count))
+        else:
+            file_handle.write('{} {} {} {} {} {}\n'.format(datetime.now().isoformat(), 
+                                                           voltage, current, T1, T2, T3))
         file_handle.flush()
         
-        conductance = current / voltage
+        conductance = current / voltage if voltage != 0 else float('nan')
         
         self._signal_interface.emit_data({'G': conductance, 'I': current, 'T': T3})
+        self._adapt_sweep_rate(file_handle, T3, current)
         
         
 
+    def _adapt_sweep_rate(self, file_handle, temperature, value):
+        if self._ramp is None:
+            return
+        rate = self._ramp.add(temperature, value)
+        if rate is not None:
+            restart_sweep(self._temp, self._temperature_end, rate)
+            file_handle.write('# sweep rate {} K/min from {} K\n'.format(rate, temperature))
+            print('DEBUG', 'sweep rate {} K/min from {} K'.format(rate, temperature))
+
     def __deinitialize_device(self) -> None:
         self._temp.stop_temperature_sweep()
 
@@ -272,7 +311,12 @@ class SMU2ProbeIvTBlue(AbstractMeasurement):
         file_handle.write('# {} V\n'.format(self._voltage))      
         file_handle.write('# {} A-max\n'.format(self._current_limit))  
         file_handle.write("# sweep rate {0} K/min\n".format(self._sweep_rate))
-        file_handle.write("Datetime Voltage Current T1 T2 T3\n")
+        if self._target_error > 0:
+            file_handle.write('# averaged to a relative error of {} within {} s\n'.format(self._target_error,
+                                                                                        self._max_average_time))
+            file_handle.write("Datetime Voltage Current T1 T2 T3 CurrentError Samples\n")
+        else:
+            file_handle.write("Datetime Voltage Current T1 T2 T3\n")
 
     def __measure_data_point(self):
         return self._device.read()
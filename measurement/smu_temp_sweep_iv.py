@@ -1,5 +1,10 @@
 from .measurement import register, AbstractMeasurement, Contacts, PlotRecommendation
 from .measurement import StringValue, FloatValue, IntegerValue, DatetimeValue, AbstractValue, SignalInterface, GPIBPathValue
+from .measurement import BooleanValue
+from .instruments import open_resource
+from .sweep import plan_sweep
+from .averaging import average_reads
+from .watchdog import InstrumentError
 
 from typing import Dict, Tuple, List
 from typing.io import TextIO
@@ -20,8 +25,6 @@ from queue import Queue
 
 import gpib
 
-import traceback
-
 from ast import literal_eval
 
 class GenericInstrument(object):
@@ -137,13 +140,19 @@ def get_gpib_device(port: int, timeout=0.5):
 
 @register('Two Probe I-V Automatic Temperature Sweep (blue)')
 class SMUTempSweepIV(AbstractMeasurement):
+    # the ITC503 of the blue cryostat
+    FIXED_RESOURCES = ('GPIB0::24::INSTR',)
+    # seconds a read of the sourcemeter may take
+    READ_TIMEOUT = 30.0
 
 
     def __init__(self, signal_interface: SignalInterface,
                  path: str, contacts: Tuple[str, str],
                  v: float = 0.0, i: float = 1e-6,
                  nplc: int = 3, comment: str = '', time_difference: float=0, gpib: str='GPIB0::10::INSTR',
-                 temperatures: str = '[2,10,100,300]'):
+                 temperatures: str = '[2,10,100,300]',
+                 adaptive: bool = False, min_step: float = 0.0, max_step: float = 0.0,
+                 tolerance: float = 0.01, target_error: float = 0.0, max_average_time: float = 5.0):
         super().__init__(signal_interface, path, contacts)
         self._max_voltage = v
         self._current_limit = i
@@ -151,15 +160,22 @@ class SMUTempSweepIV(AbstractMeasurement):
         self._comment = comment
         self._time_difference = time_difference
         self._gpib = gpib
-
-        resource_man = ResourceManager('@py')
-        resource = resource_man.open_resource(self._gpib)
-        resource.timeout = 30000
-
-        self._device = SMUTempSweepIV._get_sourcemeter(resource)
+        self._adaptive = adaptive
+        self._min_step = min_step
+        self._max_step = max_step
+        self._tolerance = tolerance
+        self._target_error = target_error
+        self._max_average_time = max_average_time
+
+        resource = open_resource(self._gpib)
+
+        # slow reads get a longer bus timeout, the watchdog sets it on the shared handle for every call
+        self._device = self._shared(('sourcemeter', '@py', self._gpib),
+                                    lambda: SMUTempSweepIV._get_sourcemeter(resource), 'sourcemeter',
+                                    deadlines={'read': self.READ_TIMEOUT})
         self._device.voltage_driven(0, i, nplc)
         
-        self._temp =  ITC(get_gpib_device(24))
+        self._temp = self._shared(('ITC', 24), lambda: ITC(get_gpib_device(24)), 'ITC503')
         
         step1 = np.linspace(0, self._max_voltage, 25, endpoint=False)
         step2 = np.linspace(self._max_voltage, -self._max_voltage, 50, endpoint=False)
@@ -168,7 +184,7 @@ class SMUTempSweepIV(AbstractMeasurement):
 
         try:
             self._temperatures = literal_eval(temperatures)
-        except:
+        except (ValueError, SyntaxError):
             print('ERROR', 'Malformed String for Temperatures')
             self.abort()
             return
@@ -214,7 +230,13 @@ class SMUTempSweepIV(AbstractMeasurement):
                 'nplc': IntegerValue('NPLC', default=1),
                 'comment': StringValue('Comment', default=''),
                 'gpib': GPIBPathValue('GPIB Address', default='GPIB0::10::INSTR'),
-                'temperatures': StringValue('Temperatures', default='[2,10,100.0,300]')
+                'temperatures': StringValue('Temperatures', default='[2,10,100.0,300]'),
+                'adaptive': BooleanValue('Adaptive Steps', default=False),
+                'min_step': FloatValue('Min. Step (0: auto)', default=0.0),
+                'max_step': FloatValue('Max. Step (0: auto)', default=0.0),
+                'tolerance': FloatValue('Step Tolerance', default=0.01),
+                'target_error': FloatValue('Target Rel. Error (0: off)', default=0.0),
+                'max_average_time': FloatValue('Max. Averaging Time [s]', default=5.0)
                 }
 
     @staticmethod
@@ -229,16 +251,20 @@ class SMUTempSweepIV(AbstractMeasurement):
     def _measure(self, file_handle):
         """Custom measurement code lives here.
         """
-        self.__write_header(file_handle)
+        # a resumed run continues in its old file below the header
+        if self._resume is None:
+            self.__write_header(file_handle)
         sleep(0.5)
         
 
-        for next_temperature in self._temperatures:
+        for index in range(self._resume_position, len(self._temperatures)):
             if self._should_stop.is_set():
                 break
 
-            self._goto_temperature_and_stabilize(next_temperature)  
+            self._goto_temperature_and_stabilize(self._temperatures[index])
             self._acquire_i_v_u_curve(file_handle)
+            if not self._should_stop.is_set():
+                self._checkpoint(file_handle, index + 1)
 
         self.__deinitialize_device()
 
@@ -263,10 +289,7 @@ class SMUTempSweepIV(AbstractMeasurement):
         while not temperature_reached:
             if len(temperatures) > 300:
                 temperatures = temperatures[1:300]
-            try:
-                temperatures.append(self._temp.T1)
-            except:
-                temperatures.append(self._temp.T1)
+            temperatures.append(self._temp.T1)
             
             if 20 < temperatures[-1] < 30 and time() - last_toggle_time >= 10:
                 self._temp.toggle_pid_auto(False)
@@ -296,10 +319,7 @@ class SMUTempSweepIV(AbstractMeasurement):
             if len(temperatures) == 300:
                 temperatures = temperatures[1:]
                 
-            try:
-                temperatures.append(self._temp.T1)
-            except:
-                temperatures.append(self._temp.T1)
+            temperatures.append(self._temp.T1)
         
             relative_std = np.std(temperatures) / temperature
         
@@ -328,8 +348,12 @@ class SMUTempSweepIV(AbstractMeasurement):
         currents = []
         temperatures = []
         
+        # a new sweep for every temperature, the curve may change a lot between them
+        sweep = plan_sweep([0, self._max_voltage, -self._max_voltage, 0], self._voltages,
+                           self._adaptive, self._min_step, self._max_step, self._tolerance)
+
         print('DEBUG','start voltage sweep')
-        for voltage in self._voltages:
+        for voltage in sweep:
             if self._should_stop.is_set():
                 self._device.disarm()
                 return
@@ -337,38 +361,38 @@ class SMUTempSweepIV(AbstractMeasurement):
             self._device.set_voltage(voltage)
             sleep(0.1)
             try:
-                voltage, current = self.__measure_data_point()
-            except:
-                file_handle.write("# error while collecting data\n")
-                print('ERROR', '-'*74)
-                traceback.print_exc()
-                continue
-                
-            try:
-                T1 = self._temp.T1
-                T2 = self._temp.T2
-                T3 = self._temp.T3   
-            except:
+                (voltage, current), stats = average_reads(self.__measure_data_point, self._target_error,
+                                                          self._max_average_time,
+                                                          floor=self._current_limit, stop=self._should_stop)
                 T1 = self._temp.T1
                 T2 = self._temp.T2
-                T3 = self._temp.T3   
+                T3 = self._temp.T3
+            except InstrumentError as error:
+                # the instruments were retried already, the point is skipped
+                file_handle.write("# error while collecting data\n")
+                print('ERROR', error)
+                continue
             
+            sweep.add(voltage, current)
             voltages.append(voltage)
             currents.append(current)
             temperatures.append(T3)
 
         
             timestamp = datetime.now()
-            file_handle.write("{} {} {} {} {} {}\n".format(timestamp.isoformat(), voltage, current, T1, T2, T3))
+            if self._target_error > 0:
+                file_handle.write("{} {} {} {} {} {} {} {}\n".format(timestamp.isoformat(), voltage, current,
+                                                                    T1, T2, T3, stats.sem, stats.count))
+            else:
+                file_handle.write("{} {} {} {} {} {}\n".format(timestamp.isoformat(), voltage, current, T1, T2, T3))
             file_handle.flush()
         
         self._device.disarm()
         try:
             R, _ = np.polyfit(currents, voltages, 1)
             self._signal_interface.emit_data({'R': R, 'T': np.mean(temperatures)})
-        except:
-            print('ERROR', '-'*74)
-            traceback.print_exc()
+        except (TypeError, ValueError, np.linalg.LinAlgError) as error:
+            print('ERROR', 'could not fit the I-V curve: {}'.format(error))
 
 
     def __deinitialize_device(self) -> None:
@@ -387,7 +411,14 @@ class SMUTempSweepIV(AbstractMeasurement):
         file_handle.write("# maximum voltagepython {0} V\n".format(self._max_voltage))
         file_handle.write("# current limit {0} A\n".format(self._current_limit))
         file_handle.write('# nplc {}\n'.format(self._nplc))
-        file_handle.write("Datetime Voltage Current T1 T2 T3\n")
+        if self._adaptive:
+            file_handle.write('# adaptive steps, tolerance {}\n'.format(self._tolerance))
+        if self._target_error > 0:
+            file_handle.write('# averaged to a relative error of {} within {} s\n'.format(self._target_error,
+                                                                                        self._max_average_time))
+            file_handle.write("Datetime Voltage Current T1 T2 T3 CurrentError Samples\n")
+        else:
+            file_handle.write("Datetime Voltage Current T1 T2 T3\n")
 
     def __measure_data_point(self) -> Tuple[float, float]:
         """Return one data point: (voltage, current).
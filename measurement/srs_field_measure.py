@@ -1,5 +1,7 @@
 from .measurement import register, AbstractMeasurement, Contacts, PlotRecommendation
 from .measurement import StringValue, FloatValue, IntegerValue, DatetimeValue, AbstractValue, SignalInterface, GPIBPathValue
+from .lockin import LockInPacer, read_outputs
+from .watchdog import InstrumentError
 
 from typing import Dict, Tuple, List
 from typing.io import TextIO
@@ -16,7 +18,6 @@ from queue import Queue
 
 import gpib
 
-import traceback
 
 from enum import Enum
 
@@ -140,13 +141,14 @@ class SRS830Measure(AbstractMeasurement):
     def __init__(self, signal_interface: SignalInterface,
                  path: str, contacts: Tuple[str, str, str, str],
                  R: float = 9.99e6, comment: str = '', gpib: str='GPIB0::7::INSTR',
-                 number_of_measurements: int = 5):
+                 number_of_measurements: int = 5, samples_per_tau: float = 1.0):
                      
         super().__init__(signal_interface, path, contacts)
         self._comment = comment
-        self._device = SR830m(gpib)
+        self._device = self._shared(('SR830m', gpib), lambda: SR830m(gpib), 'SR830')
         self._pre_resistance = R
         self._number_of_measurements = number_of_measurements 
+        self._samples_per_tau = samples_per_tau
 
         sleep(1)
 
@@ -158,6 +160,7 @@ class SRS830Measure(AbstractMeasurement):
     def inputs() -> Dict[str, AbstractValue]:
         return {'R': FloatValue('Pre Resistance', default=9.99e6),
                 'number_of_measurements': IntegerValue('Measurements', default=5),
+                'samples_per_tau': FloatValue('Samples per Time Constant (0: no pacing)', default=1.0),
                 'comment': StringValue('Comment', default=''),
                 'gpib': GPIBPathValue('GPIB Address', default='GPIB0::7::INSTR'),
                 }
@@ -172,18 +175,18 @@ class SRS830Measure(AbstractMeasurement):
         return [PlotRecommendation('Voltage Monitoring', x_label='Datetime', y_label='U', show_fit=False)]
 
     def _measure(self, file_handle):
+        self._pacer = LockInPacer(self._device, self._samples_per_tau)
         self.__write_header(file_handle)
         sleep(0.5)
         
         self.__initialize_device()
         for _ in range(self._number_of_measurements):
-            if self._should_stop.is_set():
+            if self._pacer.wait(self._should_stop):
                 break
             try:
                 self._acquire_data_point(file_handle)
-            except: 
-                print('{} failed to acquire datapoint.'.format(datetime.now().isoformat()))
-                traceback.print_exc()
+            except InstrumentError as error:
+                print('{} failed to acquire datapoint: {}'.format(datetime.now().isoformat(), error))
                 
 
         self.__deinitialize_device()
@@ -212,12 +215,13 @@ class SRS830Measure(AbstractMeasurement):
         file_handle.write('# {}\n'.format(self._comment))
         file_handle.write('# {} Hz\n'.format(self._device.freq))
         file_handle.write('# {} V\n'.format(self._device.slvl))        
-        file_handle.write('# {} Time constant\n'.format(self._device.oflt))
+        file_handle.write('# {} Time constant\n'.format(self._pacer.oflt))
+        file_handle.write('# {}\n'.format(self._pacer.describe()))
         file_handle.write("# pre resistance {0} OHM\n".format(self._pre_resistance))
         file_handle.write("Datetime Real Imaginary Amplitude Theta Sensitivity\n")
 
     def __measure_data_point(self):
-        return (self._device.outpX, self._device.outpY, self._device.outpR, self._device.outpT)
+        return read_outputs(self._device)
 
     def __get_auxiliary_data(self):
         return self._device.sens
@@ -1,7 +1,10 @@
 from .measurement import register, AbstractMeasurement, Contacts, PlotRecommendation
 from .measurement import StringValue, FloatValue, IntegerValue, DatetimeValue, AbstractValue, SignalInterface, GPIBPathValue
+from .measurement import normalize_resource
+from .lockin import MAX_LOCK_INS, LockInGroup, LockInPacer, parse_addresses
+from .watchdog import InstrumentError
 
-from typing import Dict, Tuple, List
+from typing import Dict, Tuple, List, Set
 from typing.io import TextIO
 
 from visa import ResourceManager
@@ -19,7 +22,6 @@ from queue import Queue
 
 import gpib
 
-import traceback
 
 from enum import Enum
 
@@ -138,6 +140,8 @@ def get_gpib_device(port: int, timeout=0.5):
 
 @register('SRS830 Voltage vs. Field (blue)')
 class SRS830UvTBlue(AbstractMeasurement):
+    # the ITC503 of the blue cryostat and its magnet power supply
+    FIXED_RESOURCES = ('GPIB0::24::INSTR', 'IPS120')
 
     class State(Enum):
         START = 0
@@ -153,16 +157,22 @@ class SRS830UvTBlue(AbstractMeasurement):
                  path: str, contacts: Tuple[str, str, str, str],
                  R: float = 9.99e6, comment: str = '', gpib: str='GPIB0::7::INSTR',
                  sweep_rate:float = 0.1,
-                 max_field: float = 8):
+                 max_field: float = 8, samples_per_tau: float = 1.0, lock_ins: str = ''):
                      
         super().__init__(signal_interface, path, contacts)
         self._comment = comment
-        self._device = SR830m(gpib)
-        self._mag = IPS120_10()
-        self._temp = ITC(get_gpib_device(24))
+        self._device = self._shared(('SR830m', gpib), lambda: SR830m(gpib), 'SR830')
+        # further lock-ins measure other voltages of the same sample, e.g. the Hall voltage
+        self._lock_in_addresses = [gpib] + parse_addresses(lock_ins)
+        self._lock_ins = LockInGroup([self._device] + [
+            self._shared(('SR830m', address), lambda address=address: SR830m(address), 'SR830 ' + address)
+            for address in self._lock_in_addresses[1:]])
+        self._mag = self._shared(('IPS120_10',), IPS120_10, 'IPS120')
+        self._temp = self._shared(('ITC', 24), lambda: ITC(get_gpib_device(24)), 'ITC503')
         self._pre_resistance = R
         self._sweep_rate = sweep_rate
         self._max_field = max_field
+        self._samples_per_tau = samples_per_tau
             
         if not (0 <= max_field <= 8): 
             print("field is too high or too low. (0 ... 8)")
@@ -173,6 +183,11 @@ class SRS830UvTBlue(AbstractMeasurement):
             print("you're insane! sweep rate is too high. (0 ... 0.3)")
             self.abort()
             return   
+
+        if len(self._lock_ins) > MAX_LOCK_INS:
+            print("at most {} lock-ins can be read".format(MAX_LOCK_INS))
+            self.abort()
+            return
         
         sleep(1)
         
@@ -187,35 +202,54 @@ class SRS830UvTBlue(AbstractMeasurement):
         return {'R': FloatValue('Pre Resistance', default=9.99e6),
                 'max_field': FloatValue('Max Field', default=1),
                 'sweep_rate': FloatValue('Sweep Rate [T/min]', default=0.1),
+                'samples_per_tau': FloatValue('Samples per Time Constant (0: no pacing)', default=1.0),
                 'comment': StringValue('Comment', default=''),
                 'gpib': GPIBPathValue('GPIB Address', default='GPIB0::7::INSTR'),
+                'lock_ins': StringValue('Further Lock-in Addresses', default=''),
                 }
 
+    @classmethod
+    def resources(cls, inputs) -> Set[str]:
+        return super().resources(inputs) | {normalize_resource(address)
+                                            for address in parse_addresses(inputs.get('lock_ins', ''))}
+
     @staticmethod
     def outputs() -> Dict[str, AbstractValue]:
         return {'U': FloatValue('Voltage[V]'),
+                'U2': FloatValue('Voltage 2[V]'),
+                'U3': FloatValue('Voltage 3[V]'),
+                'U4': FloatValue('Voltage 4[V]'),
                 'B': DatetimeValue('Field[T]')}
 
     @property
     def recommended_plots(self) -> List[PlotRecommendation]:
-        return [PlotRecommendation('Resistance Monitoring', x_label='B', y_label='U', show_fit=False)]
+        plots = [PlotRecommendation('Resistance Monitoring', x_label='B', y_label='U', show_fit=False)]
+        for number in range(2, len(self._lock_ins) + 1):
+            plots.append(PlotRecommendation('Lock-in {}'.format(number), x_label='B', y_label='U{}'.format(number)))
+        return plots
 
     def _measure(self, file_handle):
-        self.__write_header(file_handle)
-        sleep(0.5)
+        # the threads of the lock-ins are stopped also if the run fails
+        try:
+            # the lock-in with the longest time constant sets the pace
+            self._pacers = [LockInPacer(device, self._samples_per_tau) for device in self._lock_ins.devices]
+            self._pacer = max(self._pacers, key=lambda pacer: pacer.interval)
+            self.__write_header(file_handle)
+            sleep(0.5)
         
-        self.__initialize_device()
-
-        while not self._should_stop.is_set():
-            try:
-                self._acquire_data_point(file_handle)
-            except:
-                print('{} failed to acquire datapoint.'.format(datetime.now().isoformat()))
-                traceback.print_exc()
+            self.__initialize_device()
+
+            while not self._pacer.wait(self._should_stop):
+                try:
+                    self._acquire_data_point(file_handle)
+                except InstrumentError as error:
+                    print('{} failed to acquire datapoint: {}'.format(datetime.now().isoformat(), error))
                 
-            self._switch_states_if_necessary()
+                self._switch_states_if_necessary()
 
-        self.__deinitialize_device()
+            self.__deinitialize_device()
+        finally:
+            self._lock_ins.close()
 
     def _switch_states_if_necessary(self):
         field = self._mag.get_field()
@@ -250,16 +284,23 @@ class SRS830UvTBlue(AbstractMeasurement):
             
  
     def _acquire_data_point(self, file_handle):
-        x, y, r, t = self.__measure_data_point()
-        sensitivity = self.__get_auxiliary_data()
+        timestamp = datetime.now()
+        readings = self._lock_ins.read()
+        x, y, r, t, sensitivity = readings[0]
         T1, T2, T3 = self._temp.T1, self._temp.T2, self._temp.T3
         field = self._mag.get_field()
         
-        file_handle.write('{} {} {} {} {} {} {} {} {} {}\n'.format(datetime.now().isoformat(), field, 
-                                                             x, y, r, t,sensitivity, T1, T2, T3))
+        # the further lock-ins follow in the same row
+        values = [field, x, y, r, t, sensitivity, T1, T2, T3]
+        for reading in readings[1:]:
+            values.extend(reading)
+        file_handle.write('{} {}\n'.format(timestamp.isoformat(), ' '.join(str(value) for value in values)))
         file_handle.flush()
         
-        self._signal_interface.emit_data({'U': x, 'B': field})
+        data = {'U': x, 'B': field}
+        for number, reading in enumerate(readings[1:], 2):
+            data['U{}'.format(number)] = reading[0]
+        self._signal_interface.emit_data(data)
      
     def __initialize_device(self):
         self._mag.clear()
@@ -285,13 +326,13 @@ class SRS830UvTBlue(AbstractMeasurement):
         file_handle.write('# {}\n'.format(self._comment))
         file_handle.write('# {} Hz\n'.format(self._device.freq))
         file_handle.write('# {} V\n'.format(self._device.slvl))        
-        file_handle.write('# {} Time constant\n'.format(self._device.oflt))
+        file_handle.write('# {} Time constant\n'.format(self._pacers[0].oflt))
+        file_handle.write('# {}\n'.format(self._pacers[0].describe()))
         file_handle.write("# pre resistance {0} OHM\n".format(self._pre_resistance))
         file_handle.write("# sweep rate {0} T/min\n".format(self._sweep_rate))
-        file_handle.write("Datetime Field Real Imaginary Amplitude Theta Sensitivity T1 T2 T3\n")
-
-    def __measure_data_point(self):
-        return (self._device.outpX, self._device.outpY, self._device.outpR, self._device.outpT)
-
-    def __get_auxiliary_data(self):
-        return self._device.sens
+        columns = 'Field Real Imaginary Amplitude Theta Sensitivity T1 T2 T3'
+        for number, (address, device, pacer) in enumerate(zip(self._lock_in_addresses[1:], self._lock_ins.devices[1:],
+                                                              self._pacers[1:]), 2):
+            file_handle.write('# lock-in {}: {}, {} Hz, {}\n'.format(number, address, device.freq, pacer.describe()))
+            columns += ' Real{0} Imaginary{0} Amplitude{0} Theta{0} Sensitivity{0}'.format(number)
+        file_handle.write("Datetime {}\n".format(columns))
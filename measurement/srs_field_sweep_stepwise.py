@@ -1,5 +1,8 @@
 from .measurement import register, AbstractMeasurement, Contacts, PlotRecommendation
 from .measurement import StringValue, FloatValue, IntegerValue, DatetimeValue, AbstractValue, SignalInterface, GPIBPathValue
+from .lockin import LockInPacer, SENSITIVITIES, read_outputs
+from .averaging import RunningMean
+from .watchdog import InstrumentError
 
 from typing import Dict, Tuple, List
 from typing.io import TextIO
@@ -19,7 +22,6 @@ from queue import Queue
 
 import gpib
 
-import traceback
 
 from enum import Enum
 
@@ -138,6 +140,8 @@ def get_gpib_device(port: int, timeout=0.5):
 
 @register('SRS830 Voltage vs. Field stepwise (blue)')
 class SRS830UvTBlue(AbstractMeasurement):
+    # the ITC503 of the blue cryostat and its magnet power supply
+    FIXED_RESOURCES = ('GPIB0::24::INSTR', 'IPS120')
 
 
     def __init__(self, signal_interface: SignalInterface,
@@ -145,20 +149,26 @@ class SRS830UvTBlue(AbstractMeasurement):
                  R: float = 9.99e6, comment: str = '', gpib: str='GPIB0::7::INSTR',
                  sweep_rate:float = 0.1,
                  fields: str = '[]',
-                 number_of_measurements: int = 5):
+                 number_of_measurements: int = 5,
+                 target_error: float = 0.0, max_average_time: float = 300.0,
+                 samples_per_tau: float = 1.0, settle_time: float = 60.0):
                      
         super().__init__(signal_interface, path, contacts)
         self._comment = comment
-        self._device = SR830m(gpib)
-        self._mag = IPS120_10()
-        self._temp = ITC(get_gpib_device(24))
+        self._device = self._shared(('SR830m', gpib), lambda: SR830m(gpib), 'SR830')
+        self._mag = self._shared(('IPS120_10',), IPS120_10, 'IPS120')
+        self._temp = self._shared(('ITC', 24), lambda: ITC(get_gpib_device(24)), 'ITC503')
         self._pre_resistance = R
         self._sweep_rate = sweep_rate
         self._number_of_measurements = number_of_measurements
+        self._target_error = target_error
+        self._max_average_time = max_average_time
+        self._samples_per_tau = samples_per_tau
+        self._settle_time = settle_time
         
         try:
             self._fields = literal_eval(fields)
-        except:
+        except (ValueError, SyntaxError):
             print('ERROR', 'Malformed String for Fields')
             self.abort()
             return
@@ -186,6 +196,10 @@ class SRS830UvTBlue(AbstractMeasurement):
                 'fields': StringValue('Fields', default='[]'),
                 'sweep_rate': FloatValue('Sweep Rate [T/min]', default=0.1),
                 'number_of_measurements': IntegerValue('Measurements per field value', default=5),
+                'target_error': FloatValue('Target Rel. Error (0: off)', default=0.0),
+                'max_average_time': FloatValue('Max. Averaging Time [s]', default=300.0),
+                'samples_per_tau': FloatValue('Samples per Time Constant (at most one per correlation time)', default=1.0),
+                'settle_time': FloatValue('Settle Time per Field [s]', default=60.0),
                 'comment': StringValue('Comment', default=''),
                 'gpib': GPIBPathValue('GPIB Address', default='GPIB0::7::INSTR'),
                 }
@@ -200,29 +214,47 @@ class SRS830UvTBlue(AbstractMeasurement):
         return [PlotRecommendation('Resistance Monitoring', x_label='B', y_label='U', show_fit=False)]
 
     def _measure(self, file_handle):
-        self.__write_header(file_handle)
+        # the standard error assumes independent readings, so they are at least a correlation time apart
+        self._pacer = LockInPacer(self._device, self._samples_per_tau, independent=True)
+        # a resumed run continues in its old file below the header
+        if self._resume is None:
+            self.__write_header(file_handle)
         sleep(0.5)
         
         self.__initialize_device()
 
-        for field in self._fields:
+        for index in range(self._resume_position, len(self._fields)):
             if self._should_stop.is_set():
                 break
+            field = self._fields[index]
                 
-            self._goto_field_and_stabilize(field)
+            if not self._goto_field_and_stabilize(field):
+                break
             
-            for _ in range(self._number_of_measurements):
+            # at least number_of_measurements, more until the real part is precise enough relative to the range
+            stats = RunningMean(self._target_error, self._max_average_time, self._number_of_measurements,
+                                floor=SENSITIVITIES[int(self._device.sens)])
+            failures = 0
+            while not stats.done and not self._pacer.wait(self._should_stop):
                 try:
-                    self._acquire_data_point(file_handle)
-                except: 
-                    print('{} failed to acquire datapoint.'.format(datetime.now().isoformat()))
-                    traceback.print_exc()
-                
+                    stats.add(self._acquire_data_point(file_handle))
+                except InstrumentError as error:
+                    print('{} failed to acquire datapoint: {}'.format(datetime.now().isoformat(), error))
+                    failures += 1
+                    if failures >= self._number_of_measurements:
+                        break
+
+            file_handle.write('# field {} T: mean {} error {} relative error {} from {} samples\n'.format(
+                field, stats.mean, stats.sem, stats.relative_error, stats.count))
+            file_handle.flush()
+            if not self._should_stop.is_set():
+                self._checkpoint(file_handle, index + 1)
+
 
         self.__deinitialize_device()
 
-    def _goto_field_and_stabilize(self, field):
-        
+    def _goto_field_and_stabilize(self, field) -> bool:
+        """Sweep to field and wait the settle time, returns False if the run was stopped meanwhile."""
         self._mag.set_target_field(field)
         self._mag.set_sweep_mode(SweepMode.TO_SET_POINT)
         
@@ -234,10 +266,11 @@ class SRS830UvTBlue(AbstractMeasurement):
             if abs(current_field - field) < 0.001:
                 field_reached = True
 
-            sleep(1)
+            if self._should_stop.wait(1):
+                return False
 
-        print('DEBUG', datetime.now().isoformat() ,'waiting 60s to settle')
-        sleep(60)
+        print('DEBUG', datetime.now().isoformat(), 'waiting {}s to settle'.format(self._settle_time))
+        return not self._should_stop.wait(self._settle_time)
         
            
  
@@ -252,6 +285,7 @@ class SRS830UvTBlue(AbstractMeasurement):
         file_handle.flush()
         
         self._signal_interface.emit_data({'U': x, 'B': field})
+        return x
      
     def __initialize_device(self):
         self._mag.clear()
@@ -277,13 +311,17 @@ class SRS830UvTBlue(AbstractMeasurement):
         file_handle.write('# {}\n'.format(self._comment))
         file_handle.write('# {} Hz\n'.format(self._device.freq))
         file_handle.write('# {} V\n'.format(self._device.slvl))        
-        file_handle.write('# {} Time constant\n'.format(self._device.oflt))
+        file_handle.write('# {} Time constant\n'.format(self._pacer.oflt))
+        file_handle.write('# {}\n'.format(self._pacer.describe()))
         file_handle.write("# pre resistance {0} OHM\n".format(self._pre_resistance))
         file_handle.write("# sweep rate {0} T/min\n".format(self._sweep_rate))
+        if self._target_error > 0:
+            file_handle.write('# averaged to a relative error of {} within {} s\n'.format(self._target_error,
+                                                                                        self._max_average_time))
         file_handle.write("Datetime Field Real Imaginary Amplitude Theta Sensitivity T1 T2 T3\n")
 
     def __measure_data_point(self):
-        return (self._device.outpX, self._device.outpY, self._device.outpR, self._device.outpT)
+        return read_outputs(self._device)
 
     def __get_auxiliary_data(self):
         return self._device.sens
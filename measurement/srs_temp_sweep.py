@@ -1,7 +1,11 @@
 from .measurement import register, AbstractMeasurement, Contacts, PlotRecommendation
 from .measurement import StringValue, FloatValue, IntegerValue, DatetimeValue, AbstractValue, SignalInterface, GPIBPathValue
+from .measurement import normalize_resource
+from .lockin import MAX_LOCK_INS, LockInGroup, LockInPacer, parse_addresses
+from .ramp import RampController, restart_sweep
+from .watchdog import InstrumentError
 
-from typing import Dict, Tuple, List
+from typing import Dict, Tuple, List, Set
 from typing.io import TextIO
 
 from visa import ResourceManager
@@ -18,7 +22,6 @@ from queue import Queue
 
 import gpib
 
-import traceback
 
 from ast import literal_eval
 
@@ -135,20 +138,30 @@ def get_gpib_device(port: int, timeout=0.5):
 
 @register('SRS830 Resistance vs. Temp. (blue)')
 class SRS830RvTBlue(AbstractMeasurement):
+    # the ITC503 of the blue cryostat
+    FIXED_RESOURCES = ('GPIB0::24::INSTR',)
 
 
     def __init__(self, signal_interface: SignalInterface,
                  path: str, contacts: Tuple[str, str, str, str],
                  R: float = 9.99e6, comment: str = '', gpib: str='GPIB0::7::INSTR',
                  sweep_rate:float = 1.0,
-                 temperature_end: float = 2):
+                 temperature_end: float = 2,
+                 min_sweep_rate: float = 0.0, max_sweep_rate: float = 2.5, resolution: float = 5.0,
+                 samples_per_tau: float = 1.0, lock_ins: str = ''):
                      
         super().__init__(signal_interface, path, contacts)
         self._comment = comment
-        self._device = SR830m(gpib)
-        self._temp = ITC(get_gpib_device(24))
+        self._device = self._shared(('SR830m', gpib), lambda: SR830m(gpib), 'SR830')
+        # further lock-ins measure other voltages of the same sample, e.g. the Hall voltage
+        self._lock_in_addresses = [gpib] + parse_addresses(lock_ins)
+        self._lock_ins = LockInGroup([self._device] + [
+            self._shared(('SR830m', address), lambda address=address: SR830m(address), 'SR830 ' + address)
+            for address in self._lock_in_addresses[1:]])
+        self._temp = self._shared(('ITC', 24), lambda: ITC(get_gpib_device(24)), 'ITC503')
         self._pre_resistance = R
         self._sweep_rate = sweep_rate
+        self._samples_per_tau = samples_per_tau
             
         if not (0 <= temperature_end <= 295): 
             print("end temperature too high or too low. (0 ... 295)")
@@ -160,6 +173,21 @@ class SRS830RvTBlue(AbstractMeasurement):
             self.abort()
             return   
             
+        if not (0 <= min_sweep_rate <= max_sweep_rate <= 2.5):
+            print("sweep rate bounds have to fulfil 0 <= min <= max <= 2.5")
+            self.abort()
+            return
+
+        if len(self._lock_ins) > MAX_LOCK_INS:
+            print("at most {} lock-ins can be read".format(MAX_LOCK_INS))
+            self.abort()
+            return
+
+        # the sweep rate follows dR/dT if a minimal rate is given, see measurement/ramp.py
+        self._ramp = None
+        if min_sweep_rate > 0:
+            self._ramp = RampController(sweep_rate, min_sweep_rate, max_sweep_rate, resolution / 100)
+
         self._temperature_end = temperature_end
         
         self._last_toggle = time()
@@ -176,34 +204,58 @@ class SRS830RvTBlue(AbstractMeasurement):
                 'temperature_end': FloatValue('Target temperature', default=295),
                 'comment': StringValue('Comment', default=''),
                 'sweep_rate': FloatValue('Sweep Rate', default = 1.0),
+                'min_sweep_rate': FloatValue('Min. Sweep Rate (0: constant)', default=0.0),
+                'max_sweep_rate': FloatValue('Max. Sweep Rate', default=2.5),
+                'resolution': FloatValue('R Change [%/min]', default=5.0),
+                'samples_per_tau': FloatValue('Samples per Time Constant (0: no pacing)', default=1.0),
                 'gpib': GPIBPathValue('GPIB Address', default='GPIB0::7::INSTR'),
+                'lock_ins': StringValue('Further Lock-in Addresses', default=''),
                 }
 
+    @classmethod
+    def resources(cls, inputs) -> Set[str]:
+        return super().resources(inputs) | {normalize_resource(address)
+                                            for address in parse_addresses(inputs.get('lock_ins', ''))}
+
     @staticmethod
     def outputs() -> Dict[str, AbstractValue]:
         return {'R': FloatValue('Resistance'),
+                'R2': FloatValue('Resistance 2'),
+                'R3': FloatValue('Resistance 3'),
+                'R4': FloatValue('Resistance 4'),
                 'T': DatetimeValue('Temperature')}
 
     @property
     def recommended_plots(self) -> List[PlotRecommendation]:
-        return [PlotRecommendation('Resistance Monitoring', x_label='T', y_label='R', show_fit=False)]
+        plots = [PlotRecommendation('Resistance Monitoring', x_label='T', y_label='R', show_fit=False)]
+        for number in range(2, len(self._lock_ins) + 1):
+            plots.append(PlotRecommendation('Lock-in {}'.format(number), x_label='T', y_label='R{}'.format(number)))
+        return plots
 
     def _measure(self, file_handle):
-        self.__write_header(file_handle)
-        sleep(0.5)
+        # the threads of the lock-ins are stopped also if the run fails
+        try:
+            # the time constants and the excitation do not change during the measurement,
+            # the lock-in with the longest time constant sets the pace
+            self._pacers = [LockInPacer(device, self._samples_per_tau) for device in self._lock_ins.devices]
+            self._pacer = max(self._pacers, key=lambda pacer: pacer.interval)
+            self._excitation = self._device.slvl
+            self.__write_header(file_handle)
+            sleep(0.5)
         
-        self._start_sweep()
-
-        while not self._should_stop.is_set():
-            try:
-                self._acquire_data_point(file_handle)
-            except:
-                print('{} failed to acquire datapoint.'.format(datetime.now().isoformat()))
-                traceback.print_exc()
+            self._start_sweep()
+
+            while not self._pacer.wait(self._should_stop):
+                try:
+                    self._acquire_data_point(file_handle)
+                except InstrumentError as error:
+                    print('{} failed to acquire datapoint: {}'.format(datetime.now().isoformat(), error))
                 
-            self._toggle_pid_if_necessary()
+                self._toggle_pid_if_necessary()
 
-        self.__deinitialize_device()
+            self.__deinitialize_device()
+        finally:
+            self._lock_ins.close()
 
     def _start_sweep(self):
         current_temperature = self._temp.T1
@@ -224,20 +276,38 @@ class SRS830RvTBlue(AbstractMeasurement):
     
 
     def _acquire_data_point(self, file_handle):
-        x, y, r, t = self.__measure_data_point()
-        sensitivity = self.__get_auxiliary_data()
+        timestamp = datetime.now()
+        readings = self._lock_ins.read()
+        x, y, r, t, sensitivity = readings[0]
         T1, T2, T3 = self._temp.T1, self._temp.T2, self._temp.T3
         
-        file_handle.write('{} {} {} {} {} {} {} {} {}\n'.format(datetime.now().isoformat(), 
-                                                             x, y, r, t,sensitivity, T1, T2, T3))
+        # the further lock-ins follow in the same row
+        values = [x, y, r, t, sensitivity, T1, T2, T3]
+        for reading in readings[1:]:
+            values.extend(reading)
+        file_handle.write('{} {}\n'.format(timestamp.isoformat(), ' '.join(str(value) for value in values)))
         file_handle.flush()
         
-        resistance = x / self._device.slvl * self._pre_resistance
+        # the sine output of the first lock-in drives the current through the sample for all of them
+        resistance = x / self._excitation * self._pre_resistance
         
-        self._signal_interface.emit_data({'R': resistance, 'T': T3})
+        data = {'R': resistance, 'T': T3}
+        for number, reading in enumerate(readings[1:], 2):
+            data['R{}'.format(number)] = reading[0] / self._excitation * self._pre_resistance
+        self._signal_interface.emit_data(data)
+        self._adapt_sweep_rate(file_handle, T3, resistance)
         
         
 
+    def _adapt_sweep_rate(self, file_handle, temperature, value):
+        if self._ramp is None:
+            return
+        rate = self._ramp.add(temperature, value)
+        if rate is not None:
+            restart_sweep(self._temp, self._temperature_end, rate)
+            file_handle.write('# sweep rate {} K/min from {} K\n'.format(rate, temperature))
+            print('DEBUG', 'sweep rate {} K/min from {} K'.format(rate, temperature))
+
     def __deinitialize_device(self) -> None:
         self._temp.stop_temperature_sweep()
 
@@ -245,14 +315,14 @@ class SRS830RvTBlue(AbstractMeasurement):
         file_handle.write("# {0}\n".format(datetime.now().isoformat()))
         file_handle.write('# {}\n'.format(self._comment))
         file_handle.write('# {} Hz\n'.format(self._device.freq))
-        file_handle.write('# {} V\n'.format(self._device.slvl))        
-        file_handle.write('# {} Time constant\n'.format(self._device.oflt))
+        file_handle.write('# {} V\n'.format(self._excitation))        
+        file_handle.write('# {} Time constant\n'.format(self._pacers[0].oflt))
+        file_handle.write('# {}\n'.format(self._pacers[0].describe()))
         file_handle.write("# pre resistance {0} OHM\n".format(self._pre_resistance))
         file_handle.write("# sweep rate {0} K/min\n".format(self._sweep_rate))
-        file_handle.write("Datetime Real Imaginary Amplitude Theta Sensitivity T1 T2 T3\n")
-
-    def __measure_data_point(self):
-        return (self._device.outpX, self._device.outpY, self._device.outpR, self._device.outpT)
-
-    def __get_auxiliary_data(self):
-        return self._device.sens
+        columns = 'Real Imaginary Amplitude Theta Sensitivity T1 T2 T3'
+        for number, (address, device, pacer) in enumerate(zip(self._lock_in_addresses[1:], self._lock_ins.devices[1:],
+                                                              self._pacers[1:]), 2):
+            file_handle.write('# lock-in {}: {}, {} Hz, {}\n'.format(number, address, device.freq, pacer.describe()))
+            columns += ' Real{0} Imaginary{0} Amplitude{0} Theta{0} Sensitivity{0}'.format(number)
+        file_handle.write("Datetime {}\n".format(columns))
@@ -0,0 +1,155 @@
+"""Independent measurement stations which share one computer.
+
+A station runs one measurement at a time in its own thread. Before a run is
+started, the instruments it needs (see AbstractMeasurement.resources) are
+locked for the station, so two stations can not talk to the same instrument,
+e.g. the ITC503 of the blue cryostat at GPIB address 24.
+
+:usage:
+    station = Station('cryostat', signal_interface)
+    try:
+        station.start(REGISTRY['SRS830 Resistance vs. Temp. (blue)'], path, contacts, inputs)
+    except ResourceConflict as error:
+        print(error)
+"""
+from threading import Lock, Thread
+from typing import Dict, Iterable, Optional, Set
+
+from .checkpoint import Checkpoint
+from .measurement import AbstractMeasurement, SignalInterface
+
+
+class ResourceConflict(Exception):
+    """Raised when an instrument is already used by another station."""
+
+    def __init__(self, conflicts: Dict[str, str]) -> None:
+        """
+        :param conflicts: the busy instruments mapped to the stations which use them
+        """
+        self.conflicts = conflicts
+        super().__init__(', '.join('{} is used by {}'.format(resource, owner)
+                                   for resource, owner in sorted(conflicts.items())))
+
+
+class ResourceLocks:
+    """Keeps track of which station uses which instrument."""
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._owners = {}  # type: Dict[str, str]
+
+    def conflicts(self, owner: str, resources: Iterable[str]) -> Dict[str, str]:
+        """Return the resources which are used by someone else than owner."""
+        with self._lock:
+            return {resource: self._owners[resource] for resource in resources
+                    if self._owners.get(resource, owner) != owner}
+
+    def acquire(self, owner: str, resources: Iterable[str]) -> None:
+        """Lock all resources for owner or none of them.
+
+        :raises ResourceConflict: if one of the resources is used by another owner
+        """
+        resources = set(resources)
+        with self._lock:
+            conflicts = {resource: self._owners[resource] for resource in resources
+                         if self._owners.get(resource, owner) != owner}
+            if conflicts:
+                raise ResourceConflict(conflicts)
+            for resource in resources:
+                self._owners[resource] = owner
+
+    def release(self, owner: str) -> None:
+        """Unlock all resources of owner."""
+        with self._lock:
+            self._owners = {resource: other for resource, other in self._owners.items()
+                            if other != owner}
+
+    def resources(self, owner: str) -> Set[str]:
+        with self._lock:
+            return {resource for resource, other in self._owners.items() if other == owner}
+
+    def owner(self, resource: str) -> Optional[str]:
+        with self._lock:
+            return self._owners.get(resource)
+
+
+LOCKS = ResourceLocks()
+
+
+class Station:
+    """Runs measurements in its own thread with its own signal interface."""
+
+    def __init__(self, name: str, signal_interface: SignalInterface,
+                 locks: ResourceLocks = LOCKS) -> None:
+        """
+        :param name: unique name, it is shown in conflict messages
+        :param signal_interface: receives the signals of all measurements of this station
+        :param locks: shared between all stations
+        """
+        self._name = name
+        self._signal_interface = signal_interface
+        self._locks = locks
+        self._measurement = None  # type: Optional[AbstractMeasurement]
+        self._thread = None  # type: Optional[Thread]
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def signal_interface(self) -> SignalInterface:
+        return self._signal_interface
+
+    @property
+    def measurement(self) -> Optional[AbstractMeasurement]:
+        return self._measurement
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def conflicts(self, measurement_class, inputs: Dict) -> Dict[str, str]:
+        """Return the instruments of a planned run which are used by other stations."""
+        return self._locks.conflicts(self._name, measurement_class.resources(inputs))
+
+    def start(self, measurement_class, path: str, contacts, inputs: Dict,
+              resume: Optional[Checkpoint] = None) -> AbstractMeasurement:
+        """Create a measurement and run it in the thread of this station.
+
+        :param resume: continue the run of this checkpoint instead of starting a new one
+
+        :raises ResourceConflict: if another station uses one of the instruments
+        :raises RuntimeError: if this station is still running
+        """
+        if self.is_running:
+            raise RuntimeError('{} is still running'.format(self._name))
+
+        self._locks.acquire(self._name, measurement_class.resources(inputs))
+        try:
+            self._measurement = measurement_class(self._signal_interface, path, contacts, **inputs)
+            if resume is not None:
+                self._measurement.resume_from(resume)
+        except Exception:
+            self._locks.release(self._name)
+            raise
+
+        self._thread = Thread(target=self._run, name=self._name, daemon=True)
+        self._thread.start()
+        return self._measurement
+
+    def _run(self) -> None:
+        try:
+            self._measurement()
+        finally:
+            self._locks.release(self._name)
+
+    def abort(self) -> None:
+        if self._measurement is not None:
+            self._measurement.abort()
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def __str__(self) -> str:
+        return self._name
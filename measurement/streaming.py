@@ -0,0 +1,484 @@
+"""Publish the data points of running measurements to other programs.
+
+Notebooks and the lab dashboard subscribe to a local TCP or Unix socket
+instead of polling the growing .dat files. Every emitted data point and every
+started, finished, aborted and status signal becomes a frame with a sequence
+number. The frames are kept in a ring of the last REPLAY_SIZE frames, from
+which a server thread sends to every subscriber at its own pace. Publishing
+only appends to the ring, it never waits for a subscriber.
+
+A subscriber which falls behind by more than its limit loses frames. With
+DROP it receives the newest `limit` frames, with COALESCE only the newest
+data point (and all signals). Gaps show up in the sequence numbers. A
+subscriber can ask for a replay from a sequence number, as far as the ring
+reaches back.
+
+Wire format, all little endian:
+    hello (subscriber to publisher): b'DMP1', policy u8, replay_from i64 (-1: none), limit u32
+    frame: length u32, kind u8 (b'D' data, b'E' signal), sequence u64, time f64 (unix time), payload
+    data payload: count u16, then per value: name (u8 length, utf-8), type (1 byte), value
+        b'd' f64, b'q' i64, b'?' u8, b't' f64 seconds since 1970 of the naive timestamp,
+        b's' u16 length, utf-8
+    signal payload: name (u8 length, utf-8), text (u16 length, utf-8)
+
+:usage:
+    start_publisher('tcp://127.0.0.1:5557')   # measurements publish from now on
+
+    for message in Subscriber('tcp://127.0.0.1:5557', replay_from=0):
+        print(message.sequence, message.kind, message.data)
+"""
+import os
+import selectors
+import socket
+import struct
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from threading import Event, Lock, Thread
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+DEFAULT_ADDRESS = 'tcp://127.0.0.1:5557'
+
+DATA = b'D'
+SIGNAL = b'E'
+
+DROP = 0
+COALESCE = 1
+
+HELLO = struct.Struct('<4sBqI')
+HELLO_MAGIC = b'DMP1'
+FRAME = struct.Struct('<IcQd')
+
+EPOCH = datetime(1970, 1, 1)
+
+Message = namedtuple('Message', ['sequence', 'time', 'kind', 'data'])
+
+Value = Union[int, float, bool, str, datetime]
+
+
+def _name(text: str) -> bytes:
+    encoded = text.encode()[:255]
+    return struct.pack('<B', len(encoded)) + encoded
+
+
+def _text(text: str) -> bytes:
+    encoded = text.encode()[:65535]
+    return struct.pack('<H', len(encoded)) + encoded
+
+
+def encode_data(data: Dict[str, Value]) -> bytes:
+    parts = [struct.pack('<H', len(data))]
+    for key, value in data.items():
+        parts.append(_name(str(key)))
+        if isinstance(value, bool):
+            parts.append(b'?' + struct.pack('<B', value))
+        elif isinstance(value, int) and -2 ** 63 <= value < 2 ** 63:
+            parts.append(b'q' + struct.pack('<q', value))
+        elif isinstance(value, datetime):
+            parts.append(b't' + struct.pack('<d', (value.replace(tzinfo=None) - EPOCH).total_seconds()))
+        else:
+            try:
+                parts.append(b'd' + struct.pack('<d', float(value)))
+            except (TypeError, ValueError):
+                parts.append(b's' + _text(str(value)))
+    return b''.join(parts)
+
+
+def encode_signal(name: str, text: str = '') -> bytes:
+    return _name(name) + _text(text)
+
+
+def _read_name(payload: bytes, position: int) -> Tuple[str, int]:
+    length = payload[position]
+    return payload[position + 1:position + 1 + length].decode(), position + 1 + length
+
+
+def _read_text(payload: bytes, position: int) -> Tuple[str, int]:
+    length, = struct.unpack_from('<H', payload, position)
+    return payload[position + 2:position + 2 + length].decode(), position + 2 + length
+
+
+def decode_data(payload: bytes) -> Dict[str, Value]:
+    count, = struct.unpack_from('<H', payload)
+    position = 2
+    data = {}
+    for _ in range(count):
+        key, position = _read_name(payload, position)
+        kind = payload[position:position + 1]
+        position += 1
+        if kind == b'?':
+            data[key] = bool(payload[position])
+            position += 1
+        elif kind == b'q':
+            data[key], = struct.unpack_from('<q', payload, position)
+            position += 8
+        elif kind == b't':
+            seconds, = struct.unpack_from('<d', payload, position)
+            data[key] = EPOCH + timedelta(seconds=seconds)
+            position += 8
+        elif kind == b'd':
+            data[key], = struct.unpack_from('<d', payload, position)
+            position += 8
+        else:
+            data[key], position = _read_text(payload, position)
+    return data
+
+
+def decode_signal(payload: bytes) -> Tuple[str, str]:
+    name, position = _read_name(payload, 0)
+    text, _ = _read_text(payload, position)
+    return name, text
+
+
+def _parse_address(address: str) -> Tuple[int, Union[str, Tuple[str, int]]]:
+    """'tcp://host:port' or 'unix:///path' (or just a path) to a socket family and address."""
+    if address.startswith('tcp://'):
+        host, _, port = address[len('tcp://'):].rpartition(':')
+        return socket.AF_INET, (host or '127.0.0.1', int(port))
+    if address.startswith('unix://'):
+        address = address[len('unix://'):]
+    return socket.AF_UNIX, address
+
+
+class _Subscriber:
+    """State of one connected subscriber, only used by the server thread."""
+
+    # bytes handed to the socket at once
+    CHUNK = 256 * 1024
+
+    def __init__(self, connection: socket.socket) -> None:
+        self.connection = connection
+        self.hello = b''
+        self.ready = False
+        self.policy = DROP
+        self.limit = 0
+        self.cursor = 0
+        self.dropped = 0
+        self.output = bytearray()
+
+
+class Publisher:
+    """Serves the published frames to any number of subscribers."""
+
+    REPLAY_SIZE = 65536
+    DEFAULT_LIMIT = 4096
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, replay_size: int = REPLAY_SIZE) -> None:
+        """Bind the socket and start the server thread.
+
+        :param address: 'tcp://127.0.0.1:5557' or 'unix:///tmp/measurement.sock'
+        :param replay_size: number of frames which are kept for slow subscribers and replays
+        :raises OSError: if the address can not be bound
+        """
+        self._address = address
+        family, bind_address = _parse_address(address)
+        if family == socket.AF_UNIX and os.path.exists(bind_address):
+            # left over from a previous run
+            os.remove(bind_address)
+        self._server = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(bind_address)
+        self._server.listen()
+        self._server.setblocking(False)
+        self._unix_path = bind_address if family == socket.AF_UNIX else None
+
+        self._replay_size = replay_size
+        self._ring = [None] * replay_size  # type: List[Optional[Tuple[int, bytes, bytes]]]
+        self._next = 0
+        # only publishing threads take this lock, the server thread reads without it
+        self._lock = Lock()
+
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._wake_reader.setblocking(False)
+        self._wake_writer.setblocking(False)
+
+        self._subscribers = []  # type: List[_Subscriber]
+        self._stop = Event()
+        self._thread = Thread(target=self._serve, name='data publisher', daemon=True)
+        self._thread.start()
+
+    @property
+    def address(self) -> str:
+        return self._address
+
+    @property
+    def sequence(self) -> int:
+        """The sequence number of the next frame."""
+        return self._next
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, kind: bytes, payload: bytes) -> int:
+        """Add a frame and return its sequence number, this never waits for a subscriber."""
+        with self._lock:
+            sequence = self._next
+            frame = FRAME.pack(len(payload), kind, sequence, time.time()) + payload
+            self._ring[sequence % self._replay_size] = (sequence, kind, frame)
+            self._next = sequence + 1
+        try:
+            self._wake_writer.send(b'\0')
+        except (BlockingIOError, OSError):
+            # the server thread is awake anyway
+            pass
+        return sequence
+
+    def publish_data(self, data: Dict[str, Value]) -> int:
+        return self.publish(DATA, encode_data(data))
+
+    def publish_signal(self, name: str, text: str = '') -> int:
+        return self.publish(SIGNAL, encode_signal(name, text))
+
+    def close(self) -> None:
+        self._stop.set()
+        try:
+            self._wake_writer.send(b'\0')
+        except OSError:
+            pass
+        self._thread.join()
+        for subscriber in self._subscribers:
+            subscriber.connection.close()
+        self._subscribers = []
+        self._server.close()
+        self._wake_reader.close()
+        self._wake_writer.close()
+        if self._unix_path is not None and os.path.exists(self._unix_path):
+            os.remove(self._unix_path)
+
+    def _serve(self) -> None:
+        selector = selectors.DefaultSelector()
+        selector.register(self._server, selectors.EVENT_READ)
+        selector.register(self._wake_reader, selectors.EVENT_READ)
+
+        while not self._stop.is_set():
+            for key, events in selector.select(timeout=1.0):
+                if key.fileobj is self._server:
+                    self._accept(selector)
+                elif key.fileobj is self._wake_reader:
+                    try:
+                        while self._wake_reader.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                elif events & selectors.EVENT_READ:
+                    self._receive(selector, key.data)
+
+            for subscriber in list(self._subscribers):
+                if subscriber.ready:
+                    self._send(selector, subscriber)
+        selector.close()
+
+    def _accept(self, selector) -> None:
+        try:
+            connection, _ = self._server.accept()
+        except BlockingIOError:
+            return
+        connection.setblocking(False)
+        subscriber = _Subscriber(connection)
+        self._subscribers.append(subscriber)
+        selector.register(connection, selectors.EVENT_READ, subscriber)
+
+    def _drop(self, selector, subscriber: _Subscriber) -> None:
+        selector.unregister(subscriber.connection)
+        subscriber.connection.close()
+        self._subscribers.remove(subscriber)
+
+    def _receive(self, selector, subscriber: _Subscriber) -> None:
+        try:
+            received = subscriber.connection.recv(HELLO.size)
+        except BlockingIOError:
+            return
+        except OSError:
+            received = b''
+        if not received:
+            self._drop(selector, subscriber)
+            return
+        if subscriber.ready:
+            # subscribers do not send anything after the hello
+            return
+
+        subscriber.hello += received
+        if len(subscriber.hello) < HELLO.size:
+            return
+        magic, policy, replay_from, limit = HELLO.unpack(subscriber.hello[:HELLO.size])
+        if magic != HELLO_MAGIC:
+            self._drop(selector, subscriber)
+            return
+        subscriber.policy = policy
+        subscriber.limit = limit or self.DEFAULT_LIMIT
+        subscriber.cursor = self._next if replay_from < 0 else min(replay_from, self._next)
+        subscriber.ready = True
+
+    def _frames(self, subscriber: _Subscriber, head: int) -> List[bytes]:
+        """Frames from the cursor of a subscriber to head, thinned out if it is too far behind."""
+        oldest = max(head - self._replay_size, 0)
+        if subscriber.cursor < oldest:
+            subscriber.dropped += oldest - subscriber.cursor
+            subscriber.cursor = oldest
+
+        coalesce = False
+        if head - subscriber.cursor > subscriber.limit:
+            if subscriber.policy == COALESCE:
+                coalesce = True
+            else:
+                subscriber.dropped += head - subscriber.limit - subscriber.cursor
+                subscriber.cursor = head - subscriber.limit
+
+        frames = []
+        newest_data = None
+        size = 0
+        while subscriber.cursor < head and size < _Subscriber.CHUNK:
+            entry = self._ring[subscriber.cursor % self._replay_size]
+            subscriber.cursor += 1
+            if entry is None or entry[0] != subscriber.cursor - 1:
+                # overwritten while we were reading
+                subscriber.dropped += 1
+                continue
+            if coalesce and entry[1] == DATA:
+                if newest_data is not None:
+                    subscriber.dropped += 1
+                newest_data = entry[2]
+                continue
+            frames.append(entry[2])
+            size += len(entry[2])
+        if newest_data is not None:
+            frames.append(newest_data)
+        return frames
+
+    def _send(self, selector, subscriber: _Subscriber) -> None:
+        head = self._next
+        if not subscriber.output and subscriber.cursor < head:
+            subscriber.output += b''.join(self._frames(subscriber, head))
+        if not subscriber.output:
+            return
+
+        try:
+            sent = subscriber.connection.send(subscriber.output)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self._drop(selector, subscriber)
+            return
+        del subscriber.output[:sent]
+
+        # wait for the socket to become writable again, otherwise only for the hangup
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if subscriber.output or subscriber.cursor < self._next
+                                         else 0)
+        if selector.get_key(subscriber.connection).events != events:
+            selector.modify(subscriber.connection, events, subscriber)
+
+
+class PublishingSignalInterface:
+    """Wraps a signal interface, every signal is published as well."""
+
+    def __init__(self, signal_interface, publisher: Publisher) -> None:
+        self._signal_interface = signal_interface
+        self._publisher = publisher
+
+    def emit_data(self, data) -> None:
+        self._publisher.publish_data(data)
+        self._signal_interface.emit_data(data)
+
+    def emit_started(self) -> None:
+        self._publisher.publish_signal('started')
+        self._signal_interface.emit_started()
+
+    def emit_finished(self, data) -> None:
+        self._publisher.publish_signal('finished')
+        self._signal_interface.emit_finished(data)
+
+    def emit_aborted(self) -> None:
+        self._publisher.publish_signal('aborted')
+        self._signal_interface.emit_aborted()
+
+    def emit_status_message(self, message: str) -> None:
+        self._publisher.publish_signal('status', message)
+        self._signal_interface.emit_status_message(message)
+
+    def __getattr__(self, attribute: str):
+        return getattr(self._signal_interface, attribute)
+
+
+class Subscriber:
+    """Receives the frames of a publisher, e.g. in a notebook."""
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, replay_from: Optional[int] = None,
+                 policy: int = DROP, limit: int = 0, timeout: Optional[float] = None) -> None:
+        """
+        :param address: address of the publisher
+        :param replay_from: sequence number of the first frame, only new frames if None
+        :param policy: DROP or COALESCE, what the publisher does when this subscriber is too slow
+        :param limit: frames this subscriber may fall behind, the publisher's default if 0
+        :param timeout: seconds read waits for a frame, forever if None
+        """
+        family, connect_address = _parse_address(address)
+        self._socket = socket.socket(family, socket.SOCK_STREAM)
+        self._socket.connect(connect_address)
+        self._socket.settimeout(timeout)
+        self._socket.sendall(HELLO.pack(HELLO_MAGIC, policy, -1 if replay_from is None else replay_from, limit))
+        self._buffer = bytearray()
+
+    def _receive(self, size: int) -> bytes:
+        while len(self._buffer) < size:
+            chunk = self._socket.recv(65536)
+            if not chunk:
+                raise EOFError('publisher closed the connection')
+            self._buffer += chunk
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def read(self) -> Message:
+        """Return the next frame, data as dict and signals as (name, text).
+
+        :raises EOFError: if the publisher is gone
+        :raises socket.timeout: if no frame arrived within the timeout
+        """
+        length, kind, sequence, timestamp = FRAME.unpack(self._receive(FRAME.size))
+        payload = self._receive(length)
+        if kind == DATA:
+            return Message(sequence, timestamp, kind, decode_data(payload))
+        return Message(sequence, timestamp, kind, decode_signal(payload))
+
+    def __iter__(self) -> Iterator[Message]:
+        while True:
+            try:
+                yield self.read()
+            except EOFError:
+                return
+
+    def close(self) -> None:
+        self._socket.close()
+
+    def __enter__(self) -> 'Subscriber':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+PUBLISHER = None  # type: Optional[Publisher]
+
+
+def start_publisher(address: str = DEFAULT_ADDRESS) -> Publisher:
+    """Start the publisher of this process, measurements created afterwards publish their signals."""
+    global PUBLISHER
+    if PUBLISHER is None:
+        PUBLISHER = Publisher(address)
+    return PUBLISHER
+
+
+def stop_publisher() -> None:
+    global PUBLISHER
+    if PUBLISHER is not None:
+        PUBLISHER.close()
+        PUBLISHER = None
+
+
+def publishing(signal_interface):
+    """Return the signal interface wrapped if the publisher is running."""
+    if PUBLISHER is None:
+        return signal_interface
+    return PublishingSignalInterface(signal_interface, PUBLISHER)
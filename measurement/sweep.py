@@ -0,0 +1,236 @@
+"""Voltage steps of I-V sweeps.
+
+A FixedSweep visits the points of a grid like np.linspace. An AdaptiveSweep
+spends the points of the grid where the curve needs them. It runs through a
+list of corners, e.g. [0, v, -v, 0], hits every corner exactly and never
+needs more points than the budget, which is shared out among the segments
+between the corners by their length.
+
+Every segment is measured in two passes. The forward pass steps from one
+corner to the next with at most FORWARD_SHARE of the points of the segment:
+the last two points predict the next current, and the prediction error
+relative to the full scale current so far lets the step grow or shrink
+between min_step and max_step. A kink is only noticed after it was passed,
+so the second pass goes back into the segment: it measures the middle of
+the interval whose linear interpolation is worst, estimated from the
+curvature of the neighbouring points, until every interval is within the
+tolerance or the points of the segment are used up. A tolerance of 0.01
+means that a straight line between two points is off by about 1 % of the
+full scale.
+
+The voltage only goes back within a segment, after its end corner was
+reached, so hysteretic samples see the corners in the same order as
+with the grid.
+
+:usage:
+    sweep = plan_sweep([0, v], np.linspace(0, v, n), adaptive=True)
+    for voltage in sweep:
+        device.set_voltage(voltage)
+        voltage, current = device.read()
+        sweep.add(voltage, current)
+"""
+import math
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+
+class FixedSweep:
+    """The points of a grid, measured points do not change anything."""
+
+    def __init__(self, voltages: Sequence[float]) -> None:
+        self._voltages = list(voltages)
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self._voltages)
+
+    def __len__(self) -> int:
+        return len(self._voltages)
+
+    def add(self, voltage: float, current: float) -> None:
+        pass
+
+
+class AdaptiveSweep:
+    """Chooses the next voltage from the curvature of the points measured so far."""
+
+    # limits of the change of the step from one point to the next
+    MIN_FACTOR = 0.25
+    MAX_FACTOR = 2.0
+
+    # share of the points of a segment the forward pass may use, the others are left for the refinement
+    FORWARD_SHARE = 0.5
+
+    def __init__(self, corners: Sequence[float], budget: int, min_step: float, max_step: float,
+                 tolerance: float = 0.01) -> None:
+        """
+        :param corners: voltages the sweep runs through, e.g. [0, v, -v, 0]
+        :param budget: maximal number of points
+        :param min_step: smallest step in V, larger steps are used if the budget requires it,
+                         the refinement does not split intervals shorter than twice of it
+        :param max_step: largest step in V of the forward pass
+        :param tolerance: allowed error of a straight line between two points relative to the full scale
+        """
+        if budget < 2:
+            raise ValueError('a sweep needs a budget of at least two points')
+        if not 0 < min_step <= max_step:
+            raise ValueError('steps have to fulfil 0 < min_step <= max_step')
+
+        self._corners = [float(corner) for corner in corners]
+        self._budget = budget
+        self._min_step = min_step
+        self._max_step = max_step
+        self._tolerance = tolerance
+        self._allotments = self._share_budget()
+
+        self._corner = -1
+        self._position = self._corners[0]
+        self._planned = 0
+        self._current_scale = 0.0
+        # the point measured at the last corner, the first point of the following segment
+        self._corner_point = None  # type: Optional[Tuple[float, float]]
+        self._at_corner = True
+
+    def _share_budget(self) -> List[int]:
+        """Points of every segment after its first corner, in proportion to its length."""
+        lengths = [abs(end - start) for start, end in zip(self._corners[:-1], self._corners[1:])]
+        total = sum(lengths)
+        points = self._budget - 1
+        if total == 0:
+            return [0] * len(lengths)
+        allotments, used, covered = [], 0, 0.0
+        for length in lengths:
+            covered += length
+            allotment = int(round(points * covered / total)) - used
+            allotments.append(allotment)
+            used += allotment
+        return allotments
+
+    @property
+    def planned(self) -> int:
+        """Number of voltages handed out so far."""
+        return self._planned
+
+    def add(self, voltage: float, current: float) -> None:
+        """Tell the sweep the measured point, the next step is adapted to it."""
+        self._segment.append((voltage, current))
+        self._current_scale = max(self._current_scale, abs(current))
+        if self._at_corner:
+            self._corner_point = (voltage, current)
+            self._at_corner = False
+        if self._refining or len(self._segment) < 3:
+            return
+
+        (v0, i0), (v1, i1), (v2, i2) = self._segment[-3:]
+        if v1 == v0 or v2 == v1 or self._current_scale == 0:
+            return
+        slope = (i1 - i0) / (v1 - v0)
+        # the error of a linear interpolation is about an eighth of the extrapolation error
+        error = abs(i2 - (i1 + slope * (v2 - v1))) / 8 / self._current_scale
+        factor = self.MAX_FACTOR if error == 0 else math.sqrt(self._tolerance / error)
+        self._step *= min(max(factor, self.MIN_FACTOR), self.MAX_FACTOR)
+        self._step = min(max(self._step, self._min_step), self._max_step)
+
+    def __iter__(self) -> 'AdaptiveSweep':
+        return self
+
+    def __next__(self) -> float:
+        if self._corner < 0:
+            self._start_segment(0)
+            self._planned = 1
+            return self._position
+
+        while True:
+            if not self._refining:
+                voltage = self._forward()
+                if voltage is not None:
+                    break
+                self._refining = True
+
+            voltage = self._refinement() if self._remaining > 0 else None
+            if voltage is not None:
+                break
+            if self._corner + 2 >= len(self._corners):
+                raise StopIteration
+            self._start_segment(self._corner + 1)
+
+        self._remaining -= 1
+        self._planned += 1
+        return voltage
+
+    def _start_segment(self, corner: int) -> None:
+        self._corner = corner
+        self._position = self._corners[corner]
+        self._remaining = self._allotments[corner] if corner < len(self._allotments) else 0
+        self._forward_points = max(1, int(math.ceil(self._remaining * self.FORWARD_SHARE)))
+        self._step = min(2 * self._min_step, self._max_step)
+        self._refining = False
+        # the points of the segment in the order they were measured
+        self._segment = [self._corner_point] if self._corner_point else []  # type: List[Tuple[float, float]]
+
+    def _forward(self) -> Optional[float]:
+        """The next step towards the end corner of the segment, None when it was reached."""
+        target = self._corners[self._corner + 1]
+        distance = target - self._position
+        if distance == 0 or self._remaining <= 0:
+            return None
+
+        # the rest of the forward pass has to fit into its points
+        forward_left = max(1, self._forward_points - (self._allotments[self._corner] - self._remaining))
+        step = max(self._step, abs(distance) / forward_left)
+        if abs(distance) <= step * 1.000001:
+            self._position = target
+            self._at_corner = True
+        else:
+            self._position += math.copysign(step, distance)
+        return self._position
+
+    def _refinement(self) -> Optional[float]:
+        """The middle of the interval of the segment with the largest interpolation error, None if all are good."""
+        points = sorted(self._segment)
+        if len(points) < 2 or self._current_scale == 0:
+            return None
+
+        voltages = [point[0] for point in points]
+        currents = [point[1] for point in points]
+        # deviation of every inner point from the chord through its neighbours per V of their distance
+        deviations = [0.0] * len(points)
+        for index in range(1, len(points) - 1):
+            left, right = voltages[index] - voltages[index - 1], voltages[index + 1] - voltages[index]
+            if left <= 0 or right <= 0:
+                continue
+            chord = currents[index - 1] + (currents[index + 1] - currents[index - 1]) * left / (left + right)
+            deviations[index] = 2 * abs(currents[index] - chord) / (left + right)
+
+        worst, worst_error = None, self._tolerance * self._current_scale
+        for index in range(len(points) - 1):
+            width = voltages[index + 1] - voltages[index]
+            if width < 2 * self._min_step:
+                continue
+            if len(points) < 3:
+                error = math.inf
+            else:
+                # a kink between the points is off by about the deviation of its neighbours,
+                # a smooth bend by less, so intervals near a kink are split first
+                error = max(deviations[index], deviations[index + 1]) * width
+            if error > worst_error:
+                worst, worst_error = index, error
+        if worst is None:
+            return None
+        return (voltages[worst] + voltages[worst + 1]) / 2
+
+
+def plan_sweep(corners: Sequence[float], grid: Sequence[float], adaptive: bool = False,
+               min_step: float = 0.0, max_step: float = 0.0, tolerance: float = 0.01):
+    """Return a FixedSweep of the grid or an AdaptiveSweep through the corners with the size of the grid as budget.
+
+    A min_step or max_step of 0 is chosen relative to the mean step of the
+    grid: an eighth of it and four times of it.
+    """
+    corners = [float(corner) for corner in corners]
+    length = sum(abs(end - start) for start, end in zip(corners[:-1], corners[1:]))
+    if not adaptive or length == 0 or len(grid) < 2:
+        return FixedSweep(grid)
+
+    grid_step = length / (len(grid) - 1)
+    min_step = min_step or grid_step / 8
+    max_step = max_step or grid_step * 4
+    return AdaptiveSweep(corners, len(grid), min_step, max(min_step, max_step), tolerance)
@@ -0,0 +1,176 @@
+"""Scanning many samples with few sourcemeters through a switch matrix.
+
+A scan list assigns every sample a sourcemeter channel and the relays of a
+Keithley 7001/7002 switch system (channel list notation card!channel or
+card!row!column) which connect the sample to it:
+
+    S1 A 1!1!1,1!2!12 0.01; S2 A 1!1!2,1!2!12; S3 B 1!3!3,1!4!13
+
+i.e. name, sourcemeter, relays and optionally a voltage, separated by ';'
+or new lines. Relays which several samples use (e.g. a common ground) are
+counted, a relay is only opened when no other sample needs it, so the
+samples of different sourcemeters can be switched independently.
+
+Moving relays costs the settle time of the card, once for opening the
+relays of the previous sample and once for closing those of the next one
+(break before make). order_scan arranges the samples of one sourcemeter
+in a cycle which needs as few of these steps and relay operations as
+possible: a sample whose relays are a subset or superset of the previous
+one's needs only one step, one with the same relays none.
+
+:usage:
+    entries = parse_scan_list('S1 A 1!1,1!9; S2 A 1!2,1!9')
+    matrix = SwitchMatrix(open_resource('GPIB0::7::INSTR'))
+    matrix.switch(entries[0].channels, entries[1].channels)
+"""
+from collections import namedtuple
+from itertools import combinations
+from threading import Lock
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+# settle time of the relay cards in s, e.g. 3 ms for the reed relays of a 7011 or 7012
+DEFAULT_SETTLE_TIME = 0.005
+
+ScanEntry = namedtuple('ScanEntry', ['name', 'smu', 'channels', 'voltage'])
+SMUSpec = namedtuple('SMUSpec', ['name', 'model', 'address', 'channel'])
+
+
+def _entries(text: str) -> List[List[str]]:
+    return [entry.split() for entry in text.replace('\n', ';').split(';') if entry.strip()]
+
+
+def parse_smus(text: str) -> List[SMUSpec]:
+    """Sourcemeters like 'A 2636A GPIB0::11::INSTR a; C 2400 GPIB0::10::INSTR'.
+
+    :raises ValueError: if an entry has not three or four fields or a name is used twice
+    """
+    smus = []
+    for fields in _entries(text):
+        if len(fields) not in (3, 4):
+            raise ValueError('a sourcemeter is given as "name model address [channel]", not {!r}'.format(
+                ' '.join(fields)))
+        smus.append(SMUSpec(fields[0], fields[1], fields[2], fields[3] if len(fields) == 4 else None))
+    names = [smu.name for smu in smus]
+    if len(set(names)) != len(names):
+        raise ValueError('every sourcemeter needs its own name')
+    return smus
+
+
+def parse_scan_list(text: str, default_voltage: float = 0.0) -> List[ScanEntry]:
+    """Samples like 'S1 A 1!1!1,1!2!12 0.01', see the module documentation.
+
+    :raises ValueError: if an entry has not three or four fields or a name is used twice
+    """
+    entries = []
+    for fields in _entries(text):
+        if len(fields) not in (3, 4):
+            raise ValueError('a sample is given as "name sourcemeter relays [voltage]", not {!r}'.format(
+                ' '.join(fields)))
+        channels = frozenset(channel for channel in fields[2].split(',') if channel)
+        voltage = float(fields[3]) if len(fields) == 4 else default_voltage
+        entries.append(ScanEntry(fields[0], fields[1], channels, voltage))
+    names = [entry.name for entry in entries]
+    if len(set(names)) != len(names):
+        raise ValueError('every sample needs its own name')
+    return entries
+
+
+def transition_cost(previous: FrozenSet[str], following: FrozenSet[str]) -> Tuple[int, int]:
+    """Number of relay steps (opening, closing) and of relays which move between two samples."""
+    opened, closed = previous - following, following - previous
+    return bool(opened) + bool(closed), len(opened) + len(closed)
+
+
+def _cycle_cost(entries: Sequence[ScanEntry]) -> Tuple[int, int]:
+    steps, relays = 0, 0
+    for index, entry in enumerate(entries):
+        cost = transition_cost(entries[index - 1].channels, entry.channels)
+        steps, relays = steps + cost[0], relays + cost[1]
+    return steps, relays
+
+
+def order_scan(entries: Sequence[ScanEntry]) -> List[ScanEntry]:
+    """The samples of one sourcemeter in the cycle with the least relay steps.
+
+    The cycle is built by nearest neighbours and improved by reversing
+    sections (2-opt) as long as that helps, which is exact for the small
+    scan lists of a single sourcemeter in practice. Samples which cost the
+    same keep the order of the scan list.
+    """
+    order = list(entries)
+    if len(order) < 3:
+        return order
+
+    remaining = order[1:]
+    cycle = [order[0]]
+    while remaining:
+        following = min(remaining, key=lambda entry: transition_cost(cycle[-1].channels, entry.channels))
+        remaining.remove(following)
+        cycle.append(following)
+
+    best = _cycle_cost(cycle)
+    improved = True
+    while improved:
+        improved = False
+        for first, last in combinations(range(1, len(cycle)), 2):
+            candidate = cycle[:first] + cycle[first:last + 1][::-1] + cycle[last + 1:]
+            cost = _cycle_cost(candidate)
+            if cost < best:
+                cycle, best, improved = candidate, cost, True
+    return cycle
+
+
+def channel_list(channels: Iterable[str]) -> str:
+    return '(@{})'.format(','.join(sorted(channels)))
+
+
+class SwitchMatrix:
+    """Keithley 7001/7002 switch system, shared by the threads of several sourcemeters.
+
+    Every relay is closed as long as at least one sample needs it.
+    """
+
+    def __init__(self, resource, settle_time: float = DEFAULT_SETTLE_TIME) -> None:
+        """
+        :param resource: the open VISA resource of the switch system
+        :param settle_time: seconds a relay needs to settle after it was moved
+        """
+        self._resource = resource
+        self.settle_time = settle_time
+        self._lock = Lock()
+        self._users = {}  # type: Dict[str, int]
+        self.operations = 0
+
+    def open_all(self) -> None:
+        with self._lock:
+            self._resource.write(':ROUT:OPEN ALL')
+            self._users.clear()
+
+    def switch(self, previous: Optional[FrozenSet[str]], following: FrozenSet[str]) -> float:
+        """Disconnect the relays of the previous sample and connect those of the following one.
+
+        :return: the seconds the caller has to wait before the relays have settled
+        """
+        previous = previous or frozenset()
+        with self._lock:
+            opened = []
+            for channel in previous - following:
+                self._users[channel] -= 1
+                if self._users[channel] == 0:
+                    del self._users[channel]
+                    opened.append(channel)
+            closed = []
+            for channel in following - previous:
+                if channel not in self._users:
+                    closed.append(channel)
+                self._users[channel] = self._users.get(channel, 0) + 1
+
+            if opened:
+                self._resource.write(':ROUT:OPEN {}'.format(channel_list(opened)))
+            if opened and closed:
+                # wait for the opened relays first, the sourcemeter must not see two samples at once
+                self._resource.query('*OPC?')
+            if closed:
+                self._resource.write(':ROUT:CLOS {}'.format(channel_list(closed)))
+            self.operations += len(opened) + len(closed)
+        return self.settle_time if opened or closed else 0.0
@@ -0,0 +1,239 @@
+"""Latency statistics of the measurement loop.
+
+Every measurement records how long its instrument calls, file writes and
+emitted data points take. The durations are kept in histograms with
+logarithmic buckets (eight per octave, i.e. about 9 % resolution), so long
+runs need constant memory. A summary with points per second, percentiles
+and the share of time spent talking to instruments is saved next to the
+data file as '<name>.timing.json'.
+
+:usage:
+    recorder = TimingRecorder()
+    device = TimedProxy(Sourcemeter2400(resource), recorder, 'sourcemeter')
+    with recorder.span('fit'):
+        ...
+    recorder.summary()
+"""
+import json
+import math
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from threading import Lock
+from time import perf_counter_ns
+from typing import Any, Dict, Optional
+
+# spans of this category are counted as bus time
+BUS = 'bus'
+
+
+class Histogram:
+    """Counts durations in nanoseconds in logarithmic buckets."""
+
+    BUCKETS_PER_OCTAVE = 8
+
+    def __init__(self) -> None:
+        self._buckets = {}  # type: Dict[int, int]
+        self.count = 0
+        self.total = 0
+        self.minimum = None  # type: Optional[int]
+        self.maximum = None  # type: Optional[int]
+
+    def record(self, nanoseconds: int) -> None:
+        index = int(math.log2(max(nanoseconds, 1)) * self.BUCKETS_PER_OCTAVE)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += nanoseconds
+        self.minimum = nanoseconds if self.minimum is None else min(self.minimum, nanoseconds)
+        self.maximum = nanoseconds if self.maximum is None else max(self.maximum, nanoseconds)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Return the approximate duration in nanoseconds below which percent of the samples are."""
+        if self.count == 0:
+            return None
+
+        target = percent / 100 * self.count
+        cumulative = 0
+        for index in sorted(self._buckets):
+            cumulative += self._buckets[index]
+            if cumulative >= target:
+                center = 2 ** ((index + 0.5) / self.BUCKETS_PER_OCTAVE)
+                return min(max(center, self.minimum), self.maximum)
+        return float(self.maximum)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Summary in milliseconds."""
+        def milliseconds(value):
+            return None if value is None else value / 1e6
+
+        return dict(count=self.count, total_ms=milliseconds(self.total), mean_ms=milliseconds(self.mean),
+                    p50_ms=milliseconds(self.percentile(50)), p99_ms=milliseconds(self.percentile(99)),
+                    min_ms=milliseconds(self.minimum), max_ms=milliseconds(self.maximum))
+
+
+class TimingRecorder:
+    """Collects the spans of one measurement run, it may be read from another thread."""
+
+    # number of recent points from which the current rate is calculated
+    RATE_WINDOW = 50
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._histograms = {}  # type: Dict[str, Histogram]
+        self._categories = {}  # type: Dict[str, str]
+        self._points = 0
+        self._recent_points = deque(maxlen=self.RATE_WINDOW)
+        self._started = None  # type: Optional[datetime]
+        self._start = None  # type: Optional[int]
+        self._stop = None  # type: Optional[int]
+        self._extra = {}  # type: Dict[str, Any]
+
+    def start(self) -> None:
+        with self._lock:
+            self._started = datetime.now()
+            self._start = perf_counter_ns()
+            self._stop = None
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stop = perf_counter_ns()
+
+    def record(self, category: str, name: str, nanoseconds: int) -> None:
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram()
+                self._categories[name] = category
+            self._histograms[name].record(nanoseconds)
+
+    @contextmanager
+    def span(self, name: str, category: str = 'code'):
+        start = perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(category, name, perf_counter_ns() - start)
+
+    def point(self) -> None:
+        """Count a data point, the time since the previous one is recorded as 'point interval'."""
+        now = perf_counter_ns()
+        with self._lock:
+            previous = self._recent_points[-1] if self._recent_points else None
+            self._points += 1
+            self._recent_points.append(now)
+        if previous is not None:
+            self.record('point', 'point interval', now - previous)
+
+    def add(self, **values) -> None:
+        """Add values to the summary, e.g. counters of other parts of the program."""
+        with self._lock:
+            self._extra.update(values)
+
+    def _elapsed(self) -> Optional[int]:
+        if self._start is None:
+            return None
+        return (self._stop or perf_counter_ns()) - self._start
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = self._elapsed()
+            seconds = elapsed / 1e9 if elapsed else None
+            bus_time = sum(histogram.total for name, histogram in self._histograms.items()
+                           if self._categories[name] == BUS)
+
+            recent = list(self._recent_points)
+            if len(recent) > 1 and recent[-1] > recent[0]:
+                current_rate = (len(recent) - 1) / ((recent[-1] - recent[0]) / 1e9)
+            else:
+                current_rate = None
+
+            summary = dict(started=self._started.isoformat() if self._started else None,
+                           duration_s=seconds,
+                           points=self._points,
+                           points_per_second=self._points / seconds if seconds else None,
+                           current_points_per_second=current_rate,
+                           bus_utilization=bus_time / elapsed if elapsed else None,
+                           spans={name: dict(category=self._categories[name], **histogram.to_dict())
+                                  for name, histogram in sorted(self._histograms.items())})
+            summary.update(self._extra)
+            return summary
+
+    def save(self, file_path: str) -> None:
+        with open(file_path, 'w') as file_handle:
+            json.dump(self.summary(), file_handle, indent=1)
+
+
+class TimedProxy:
+    """Wraps an instrument driver and records every method call as a bus span.
+
+    Attributes which are no methods (e.g. properties which query the device)
+    are timed when they are read or written.
+    """
+
+    def __init__(self, instrument, recorder: TimingRecorder, name: str) -> None:
+        object.__setattr__(self, '_instrument', instrument)
+        object.__setattr__(self, '_recorder', recorder)
+        object.__setattr__(self, '_name', name)
+
+    def __getattr__(self, attribute: str):
+        start = perf_counter_ns()
+        value = getattr(self._instrument, attribute)
+        if not callable(value):
+            self._recorder.record(BUS, '{}.{}'.format(self._name, attribute), perf_counter_ns() - start)
+            return value
+
+        span_name = '{}.{}'.format(self._name, attribute)
+        recorder = self._recorder
+
+        def timed(*args, **kwargs):
+            with recorder.span(span_name, BUS):
+                return value(*args, **kwargs)
+        return timed
+
+    def __setattr__(self, attribute: str, value) -> None:
+        with self._recorder.span('{}.{}'.format(self._name, attribute), BUS):
+            setattr(self._instrument, attribute, value)
+
+    def __str__(self) -> str:
+        return str(self._instrument)
+
+    def __repr__(self) -> str:
+        return '<TimedProxy {} {!r}>'.format(self._name, self._instrument)
+
+
+class TimedFile:
+    """Wraps the data file and records the time spent writing."""
+
+    def __init__(self, file_handle, recorder: TimingRecorder) -> None:
+        self._file_handle = file_handle
+        self._recorder = recorder
+
+    def write(self, text: str) -> int:
+        with self._recorder.span('write', 'file'):
+            return self._file_handle.write(text)
+
+    def flush(self) -> None:
+        with self._recorder.span('flush', 'file'):
+            self._file_handle.flush()
+
+    def __getattr__(self, attribute: str):
+        return getattr(self._file_handle, attribute)
+
+
+class TimedSignalInterface:
+    """Wraps a signal interface, every emitted data point is counted and timed."""
+
+    def __init__(self, signal_interface, recorder: TimingRecorder) -> None:
+        self._signal_interface = signal_interface
+        self._recorder = recorder
+
+    def emit_data(self, data) -> None:
+        self._recorder.point()
+        with self._recorder.span('emit', 'emit'):
+            self._signal_interface.emit_data(data)
+
+    def __getattr__(self, attribute: str):
+        return getattr(self._signal_interface, attribute)
@@ -0,0 +1,371 @@
+"""Deadlines and bounded retries for instrument calls.
+
+A GPIB device which hangs blocks its caller until the bus timeout, and a
+garbled answer makes the driver raise. Both usually go away by themselves
+or after a device clear, so a single fault should neither cost seconds nor
+end the run. Every instrument of a measurement is wrapped in a
+GuardedProxy. Before each call the bus timeout of the VISA session of the
+driver is set to the deadline of the call, so a device which does not
+answer makes the driver return with an error after the deadline instead
+of the 30 s the session was opened with. A call which raises is tried
+again after a short backoff which grows exponentially, from the second
+retry on the device is cleared first and from the third on it is opened
+again, if it came from the instrument pool. When all attempts failed an
+InstrumentError is raised, the measurement decides whether to skip the
+point or to stop.
+
+The calls run in a worker thread of the instrument, which is given the
+deadline and a grace period to return, e.g. for drivers without a VISA
+session or calls made of several bus transfers. If it misses that as well,
+the device is cleared and the call gets another grace period to return.
+Nothing else is sent to the instrument while a call is still pending: its
+answer could be read by the next query, which would leave every later
+query one answer behind. If the call does not return at all, no retry is
+made, and the following calls fail at once until it has returned.
+
+The worker thread and the pending call belong to the VISA session, not to
+the proxy: the two channels of a 2602A or 2636A are two drivers and two
+proxies on one session, and a call which hangs on channel A has to hold
+back channel B as well. A session which several proxies use is cleared
+but never opened again, that would close it under the other proxies.
+
+Errors which no retry can fix (AttributeError, TypeError, ...) are raised
+at once. The number of retries, timeouts, clears, reopens and failures of
+every instrument is added to the timing summary of the run.
+
+:usage:
+    watchdog = Watchdog(recorder)
+    itc = GuardedProxy(ITC(get_gpib_device(24)), watchdog, 'ITC503', deadlines={'set_temperature_sweep': 10})
+    try:
+        temperature = itc.T1
+    except InstrumentError as error:
+        print(error)
+"""
+from concurrent.futures import Future, TimeoutError as DeadlineExceeded
+from queue import Queue
+from threading import Lock, Thread
+from time import sleep
+from typing import Any, Callable, Dict, Optional, Tuple
+from weakref import WeakSet, WeakValueDictionary
+
+# errors of the program instead of the instrument, they are not retried
+NOT_TRANSIENT = (AttributeError, TypeError, NameError, NotImplementedError)
+
+# attributes of the drivers which hold the bus handle, it is cleared if the driver has no clear itself
+TRANSPORTS = ('_dev', '_device', 'device', '_resource', 'resource', '_instrument')
+
+EVENTS = ('retries', 'timeouts', 'clears', 'reopens', 'failures')
+
+
+class InstrumentError(IOError):
+    """An instrument call failed even after it was retried."""
+
+
+class RetryPolicy:
+    """How often and how patiently an instrument call is tried."""
+
+    def __init__(self, attempts: int = 4, deadline: float = 5.0, grace: float = 5.0, backoff: float = 0.01,
+                 factor: float = 4.0, max_backoff: float = 1.0, clear_from: int = 3, reopen_from: int = 4) -> None:
+        """
+        :param attempts: number of attempts of a call, including the first
+        :param deadline: seconds a call may take, the bus timeout of the session is set to it
+        :param grace: seconds a call is waited for beyond the deadline, and again after the device was cleared
+        :param backoff: seconds to wait before the first retry
+        :param factor: the wait grows by this factor with every retry
+        :param max_backoff: longest wait between two attempts in seconds
+        :param clear_from: the device is cleared before this and every later attempt (counted from 1)
+        :param reopen_from: the device is opened again instead before this and every later attempt
+        """
+        if attempts < 1:
+            raise ValueError('a call needs at least one attempt')
+        self.attempts = attempts
+        self.deadline = deadline
+        self.grace = grace
+        self.backoff = backoff
+        self.factor = factor
+        self.max_backoff = max_backoff
+        self.clear_from = clear_from
+        self.reopen_from = reopen_from
+
+    def wait_before(self, attempt: int) -> float:
+        """Seconds to wait before an attempt, counted from 1."""
+        if attempt <= 1:
+            return 0.0
+        return min(self.backoff * self.factor ** (attempt - 2), self.max_backoff)
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+
+class Watchdog:
+    """Counts the faults of the instruments of one run, the counters are part of its timing summary."""
+
+    def __init__(self, recorder=None) -> None:
+        """
+        :param recorder: TimingRecorder of the run, the counters are added as 'watchdog'
+        """
+        self._lock = Lock()
+        self._recorder = recorder
+        self._counters = {}  # type: Dict[str, Dict[str, int]]
+        if recorder is not None:
+            recorder.add(watchdog={})
+
+    def count(self, name: str, event: str) -> None:
+        with self._lock:
+            counters = self._counters.setdefault(name, dict.fromkeys(EVENTS, 0))
+            counters[event] += 1
+            snapshot = self._snapshot()
+        if self._recorder is not None:
+            self._recorder.add(watchdog=snapshot)
+
+    def _snapshot(self) -> Dict[str, Dict[str, int]]:
+        return {name: dict(counters) for name, counters in self._counters.items()}
+
+    def counters(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return self._snapshot()
+
+
+def _serve(queue: Queue) -> None:
+    while True:
+        item = queue.get()
+        if item is None:
+            return
+        function, future = item
+        if not future.set_running_or_notify_cancel():
+            continue
+        try:
+            future.set_result(function())
+        except BaseException as error:
+            future.set_exception(error)
+
+
+class _Worker:
+    """The thread which talks to one instrument, calls are queued and run in order.
+
+    The thread ends when the worker is garbage collected.
+    """
+
+    def __init__(self, name: str) -> None:
+        self._queue = Queue()  # type: Queue
+        Thread(target=_serve, args=(self._queue,), name='instrument {}'.format(name), daemon=True).start()
+
+    def submit(self, function: Callable[[], Any]) -> Future:
+        future = Future()  # type: Future
+        self._queue.put((function, future))
+        return future
+
+    def __del__(self) -> None:
+        self._queue.put(None)
+
+
+class _Session:
+    """What the proxies of one VISA session share: the worker thread and a call which hangs."""
+
+    def __init__(self, name: str) -> None:
+        self.worker = _Worker(name)
+        self.users = WeakSet()
+        # future and description of a call which missed its deadline and did not return after the device clear
+        self.pending = None  # type: Optional[Tuple[Future, str]]
+
+
+# id of the bus handle to its _Session, which lives as long as a proxy uses it
+_SESSIONS = WeakValueDictionary()  # type: WeakValueDictionary
+_SESSIONS_LOCK = Lock()
+
+
+def _join_session(proxy, instrument, name: str) -> _Session:
+    """The _Session of the bus handle of the driver, the driver itself if it has none."""
+    handle = find_session(instrument)
+    key = id(handle if handle is not None else instrument)
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(key)
+        if session is None:
+            session = _SESSIONS[key] = _Session(name)
+        session.users.add(proxy)
+    return session
+
+
+def find_session(instrument):
+    """The VISA session of a driver, i.e. the driver or its bus handle if it has a timeout and a query."""
+    candidates = [instrument] + [getattr(instrument, name, None) for name in TRANSPORTS]
+    for candidate in candidates:
+        if hasattr(candidate, 'timeout') and callable(getattr(candidate, 'query', None)):
+            return candidate
+    return None
+
+
+def clear_device(instrument) -> bool:
+    """Send a device clear through the driver or its bus handle, return False if neither can."""
+    candidates = [instrument] + [getattr(instrument, name, None) for name in TRANSPORTS]
+    for candidate in candidates:
+        clear = getattr(candidate, 'clear', None)
+        if callable(clear):
+            clear()
+            return True
+    return False
+
+
+class GuardedProxy:
+    """Wraps an instrument driver, every method call and property access is guarded by the watchdog."""
+
+    def __init__(self, instrument, watchdog: Watchdog, name: str, wrap: Optional[Callable[[Any], Any]] = None,
+                 policy: RetryPolicy = DEFAULT_POLICY, deadlines: Optional[Dict[str, float]] = None,
+                 reopen: Optional[Callable[[], Any]] = None) -> None:
+        """
+        :param instrument: the driver
+        :param watchdog: counts the faults
+        :param name: name of the instrument in the counters and errors
+        :param wrap: applied to the driver before it is called, e.g. to time the calls
+        :param policy: attempts, deadline and backoff
+        :param deadlines: deadlines in seconds of single methods or properties, which take longer than usual
+        :param reopen: function without arguments which opens the instrument again, e.g. from the pool
+        """
+        object.__setattr__(self, '_wrap', wrap or (lambda instrument: instrument))
+        object.__setattr__(self, '_watchdog', watchdog)
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_policy', policy)
+        object.__setattr__(self, '_deadlines', dict(deadlines or {}))
+        object.__setattr__(self, '_reopen', reopen)
+        object.__setattr__(self, '_lock', Lock())
+        object.__setattr__(self, '_shared', None)
+        self._use(instrument)
+
+    def _use(self, instrument) -> None:
+        shared = _join_session(self, instrument, self._name)
+        with self._lock:
+            if self._shared is not None and self._shared is not shared:
+                self._shared.users.discard(self)
+            object.__setattr__(self, '_instrument', instrument)
+            object.__setattr__(self, '_target', self._wrap(instrument))
+            object.__setattr__(self, '_session', find_session(instrument))
+            object.__setattr__(self, '_shared', shared)
+
+    def _is_property(self, attribute: str) -> bool:
+        """Whether reading the attribute talks to the device, i.e. it is a property or another descriptor."""
+        descriptor = getattr(type(self._instrument), attribute, None)
+        return hasattr(descriptor, '__get__') and not callable(descriptor)
+
+    def __getattr__(self, attribute: str):
+        if self._is_property(attribute):
+            return self._call(attribute, lambda target: getattr(target, attribute))
+
+        value = getattr(self._target, attribute)
+        if not callable(value):
+            return value
+
+        def guarded(*args, **kwargs):
+            return self._call(attribute, lambda target: getattr(target, attribute)(*args, **kwargs))
+        return guarded
+
+    def __setattr__(self, attribute: str, value) -> None:
+        self._call(attribute, lambda target: setattr(target, attribute, value))
+
+    def _call(self, attribute: str, function: Callable[[Any], Any]) -> Any:
+        policy = self._policy
+        deadline = self._deadlines.get(attribute, policy.deadline)
+        wait = None if deadline is None else deadline + policy.grace
+        self._wait_for_pending(attribute, wait)
+
+        error = None  # type: Optional[BaseException]
+        missed = False
+        attempt = 0
+        while attempt < policy.attempts:
+            attempt += 1
+            if attempt > 1:
+                self._watchdog.count(self._name, 'retries')
+                self._recover(attempt)
+                sleep(policy.wait_before(attempt))
+
+            future = self._shared.worker.submit(self._bounded(function, deadline))
+            try:
+                return future.result(wait)
+            except Exception as failure:
+                error = failure
+                # a TimeoutError of the driver itself is an ordinary failure
+                missed = not future.done()
+                if missed:
+                    self._watchdog.count(self._name, 'timeouts')
+                    if not self._release(future, attribute):
+                        break
+                elif isinstance(failure, NOT_TRANSIENT):
+                    raise
+
+        self._watchdog.count(self._name, 'failures')
+        if missed:
+            message = 'no answer within {} s'.format(wait)
+        else:
+            message = '{}: {}'.format(type(error).__name__, error)
+        raise InstrumentError('{}.{} failed {} times, {}'.format(self._name, attribute, attempt,
+                                                                 message)) from error
+
+    def _bounded(self, function: Callable[[Any], Any], deadline: Optional[float]) -> Callable[[], Any]:
+        """The call with the bus timeout of the session set to the deadline, it runs in the worker."""
+        with self._lock:
+            target, session = self._target, self._session
+
+        def call():
+            if session is not None and deadline is not None and session.timeout != deadline * 1000:
+                session.timeout = deadline * 1000
+            return function(target)
+        return call
+
+    def _wait_for_pending(self, attribute: str, wait: Optional[float]) -> None:
+        """Let a call which hung earlier return first, the session is not used before."""
+        shared = self._shared
+        pending = shared.pending
+        if pending is None:
+            return
+        future, description = pending
+        try:
+            future.exception(wait)
+        except DeadlineExceeded:
+            self._watchdog.count(self._name, 'failures')
+            raise InstrumentError('{}.{} not sent, an earlier call {} still hangs'.format(
+                self._name, attribute, description))
+        if shared.pending is pending:
+            shared.pending = None
+
+    def _release(self, future: Future, attribute: str) -> bool:
+        """Make sure a call which missed its deadline no longer uses the session, False if it still does."""
+        if future.cancel():
+            # it was still queued behind another call
+            return True
+        self._clear()
+        try:
+            future.exception(self._policy.grace)
+        except DeadlineExceeded:
+            self._shared.pending = (future, 'to {}.{}'.format(self._name, attribute))
+            return False
+        return True
+
+    def _recover(self, attempt: int) -> None:
+        """Clear the device before a retry or open it again if that did not help and no other proxy uses it."""
+        policy = self._policy
+        if self._reopen is not None and attempt >= policy.reopen_from and len(self._shared.users) == 1:
+            try:
+                instrument = self._reopen()
+            except Exception as error:
+                print('WARNING', 'could not open {} again: {}'.format(self._name, error))
+            else:
+                self._use(instrument)
+                self._watchdog.count(self._name, 'reopens')
+                return
+
+        if attempt >= policy.clear_from:
+            self._clear()
+
+    def _clear(self) -> None:
+        try:
+            cleared = clear_device(self._instrument)
+        except Exception as error:
+            print('WARNING', 'could not clear {}: {}'.format(self._name, error))
+        else:
+            if cleared:
+                self._watchdog.count(self._name, 'clears')
+
+    def __str__(self) -> str:
+        return str(self._instrument)
+
+    def __repr__(self) -> str:
+        return '<GuardedProxy {} {!r}>'.format(self._name, self._instrument)
@@ -0,0 +1,286 @@
+"""Run measurements in a separate process.
+
+A measurement which crashes, hangs in a driver or leaks memory can then not
+take the GUI down with it. The worker process sends its data points through
+a ring buffer in shared memory; control messages (start, abort, status and
+the signals of the measurement) go through a pipe.
+
+:usage:
+    method = isolated(REGISTRY['Dummy Measurement'])
+    measurement = method(signal_interface, path, contacts, n=10)  # starts the process
+    measurement()  # runs the measurement, blocks until the process is done
+"""
+import ctypes
+import multiprocessing
+import pickle
+import struct
+from multiprocessing.sharedctypes import RawArray, RawValue
+from threading import Event, Lock, Thread
+from time import sleep
+from typing import Dict, List, Optional, Tuple
+
+from .measurement import PlotRecommendation, SignalInterface
+from .streaming import publishing
+
+
+class RingBuffer:
+    """Frames of bytes in shared memory for one writing and one reading process.
+
+    Every frame is prefixed with its length. The writer only moves the write
+    counter and the reader only moves the read counter, so no lock is needed.
+    """
+
+    HEADER = struct.Struct('<I')
+
+    DEFAULT_SIZE = 4 * 1024 * 1024
+
+    def __init__(self, size: int = DEFAULT_SIZE) -> None:
+        """
+        :param size: capacity in bytes
+        """
+        self._size = size
+        self._buffer = RawArray(ctypes.c_uint8, size)
+        # total number of bytes written and read, the positions are these modulo size
+        self._written = RawValue(ctypes.c_uint64, 0)
+        self._read = RawValue(ctypes.c_uint64, 0)
+
+    @property
+    def used(self) -> int:
+        return self._written.value - self._read.value
+
+    def put(self, data: bytes) -> bool:
+        """Append a frame, returns False if there is not enough space."""
+        frame = self.HEADER.pack(len(data)) + data
+        if len(frame) > self._size:
+            raise ValueError('frame of {} bytes does not fit into the buffer'.format(len(frame)))
+        if self._size - self.used < len(frame):
+            return False
+
+        written = self._written.value
+        self._copy_in(written, frame)
+        self._written.value = written + len(frame)
+        return True
+
+    def get(self) -> Optional[bytes]:
+        """Return the oldest frame or None if the buffer is empty."""
+        if self.used == 0:
+            return None
+
+        read = self._read.value
+        length, = self.HEADER.unpack(self._copy_out(read, self.HEADER.size))
+        data = self._copy_out(read + self.HEADER.size, length)
+        self._read.value = read + self.HEADER.size + length
+        return data
+
+    def _copy_in(self, position: int, data: bytes) -> None:
+        view = memoryview(self._buffer).cast('B')
+        start = position % self._size
+        first = min(len(data), self._size - start)
+        view[start:start + first] = data[:first]
+        view[:len(data) - first] = data[first:]
+
+    def _copy_out(self, position: int, length: int) -> bytes:
+        view = memoryview(self._buffer).cast('B')
+        start = position % self._size
+        first = min(length, self._size - start)
+        return bytes(view[start:start + first]) + bytes(view[:length - first])
+
+
+class PipeSignalInterface(SignalInterface):
+    """Used inside the worker process, it forwards all signals to the parent."""
+
+    def __init__(self, ring: RingBuffer, connection) -> None:
+        self._ring = ring
+        self._connection = connection
+        # the control thread answers status requests while the measurement sends its signals
+        self._lock = Lock()
+        self.number_of_points = 0
+
+    def send(self, *message) -> None:
+        with self._lock:
+            self._connection.send(message)
+
+    def emit_data(self, data) -> None:
+        frame = pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+        # the parent reads in its own thread, so a full buffer only lasts a moment
+        while not self._ring.put(frame):
+            sleep(0.001)
+        self.number_of_points += 1
+
+    def emit_started(self) -> None:
+        self.send('started')
+
+    def emit_finished(self, data) -> None:
+        self.send('finished', data)
+
+    def emit_aborted(self) -> None:
+        self.send('aborted')
+
+    def emit_status_message(self, message: str) -> None:
+        self.send('status', message)
+
+
+def _serve(method: str, path: str, contacts: Tuple[str, ...], inputs: Dict,
+           ring: RingBuffer, connection) -> None:
+    """Entry point of the worker process."""
+    from . import REGISTRY
+
+    signal_interface = PipeSignalInterface(ring, connection)
+    try:
+        measurement = REGISTRY[method](signal_interface, path, contacts, **inputs)
+        plots = [(plot.title, plot.x_label, plot.y_label, plot.show_fit, plot.z_label)
+                 for plot in measurement.recommended_plots]
+    except Exception as error:
+        connection.send(('error', '{}: {}'.format(type(error).__name__, error)))
+        return
+    connection.send(('ready', plots))
+
+    def listen():
+        while True:
+            try:
+                message = connection.recv()
+            except EOFError:
+                measurement.abort()
+                return
+            if message[0] == 'start':
+                started.set()
+            elif message[0] == 'abort':
+                measurement.abort()
+                started.set()
+            elif message[0] == 'status':
+                signal_interface.send('state', dict(points=signal_interface.number_of_points,
+                                                    buffer_used=ring.used))
+
+    started = Event()
+    Thread(target=listen, name='worker control', daemon=True).start()
+    started.wait()
+
+    try:
+        measurement()
+    except Exception as error:
+        signal_interface.send('error', '{}: {}'.format(type(error).__name__, error))
+    signal_interface.send('exit')
+
+
+class ProcessMeasurement:
+    """Stands in for a measurement object which lives in a worker process."""
+
+    START_TIMEOUT = 60
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, method: str, signal_interface: SignalInterface, path: str,
+                 contacts: Tuple[str, ...], **inputs) -> None:
+        """Start the worker process and wait until the measurement is created.
+
+        :param method: registered name of the measurement
+        :raises RuntimeError: if the measurement could not be created in the worker
+        """
+        # the measurement in the worker can not reach the publisher of this process
+        self._signal_interface = publishing(signal_interface)
+        self._ring = RingBuffer()
+        self._connection, child_connection = multiprocessing.Pipe()
+        self.state = {}  # type: Dict
+        self._exited = False
+
+        # a fork would copy the Qt application, so always start a fresh interpreter
+        context = multiprocessing.get_context('spawn')
+        self._process = context.Process(target=_serve, name='worker {}'.format(method), daemon=True,
+                                        args=(method, path, tuple(contacts), inputs,
+                                              self._ring, child_connection))
+        self._process.start()
+
+        if not self._connection.poll(self.START_TIMEOUT):
+            self._process.terminate()
+            raise RuntimeError('worker for {} did not start'.format(method))
+        message = self._connection.recv()
+        if message[0] != 'ready':
+            self._process.join()
+            raise RuntimeError(message[1])
+        self._recommended_plots = [PlotRecommendation(*plot) for plot in message[1]]
+
+    @property
+    def recommended_plots(self) -> List[PlotRecommendation]:
+        return self._recommended_plots
+
+    @property
+    def pid(self) -> int:
+        return self._process.pid
+
+    def abort(self) -> None:
+        if self._process.is_alive():
+            self._connection.send(('abort',))
+
+    def request_status(self) -> None:
+        """Ask the worker for its state, the answer is stored in self.state."""
+        if self._process.is_alive():
+            self._connection.send(('status',))
+
+    def __call__(self) -> None:
+        """Run the measurement and forward its signals until the worker is done."""
+        self._connection.send(('start',))
+
+        while not self._exited:
+            self._forward_data()
+            if self._connection.poll(self.POLL_INTERVAL):
+                self._handle(self._connection.recv())
+            elif not self._process.is_alive():
+                self._forward_data()
+                self._signal_interface.emit_status_message(
+                    'worker process died with exit code {}'.format(self._process.exitcode))
+                self._signal_interface.emit_finished({})
+                break
+
+        self._process.join()
+
+    def _forward_data(self) -> None:
+        frame = self._ring.get()
+        while frame is not None:
+            self._signal_interface.emit_data(pickle.loads(frame))
+            frame = self._ring.get()
+
+    def _handle(self, message: tuple) -> None:
+        # data points which were sent before the message have to arrive first
+        self._forward_data()
+
+        kind = message[0]
+        if kind == 'started':
+            self._signal_interface.emit_started()
+        elif kind == 'finished':
+            self._signal_interface.emit_finished(message[1])
+        elif kind == 'aborted':
+            self._signal_interface.emit_aborted()
+        elif kind == 'status':
+            self._signal_interface.emit_status_message(message[1])
+        elif kind == 'state':
+            self.state = message[1]
+        elif kind == 'error':
+            print('ERROR', 'worker {}: {}'.format(self._process.name, message[1]))
+            self._signal_interface.emit_status_message(message[1])
+        elif kind == 'exit':
+            self._exited = True
+
+
+class IsolatedMethod:
+    """Makes a registered method create ProcessMeasurement objects instead of running in-process."""
+
+    def __init__(self, name: str, method) -> None:
+        """
+        :param name: registered name of the method
+        :param method: the registered (lazy) class
+        """
+        self._name = name
+        self._method = method
+
+    def resources(self, inputs: Dict):
+        return self._method.resources(inputs)
+
+    def outputs(self):
+        return self._method.outputs()
+
+    def __call__(self, signal_interface: SignalInterface, path: str, contacts, **inputs) -> ProcessMeasurement:
+        return ProcessMeasurement(self._name, signal_interface, path, contacts, **inputs)
+
+
+def isolated(method) -> IsolatedMethod:
+    """Wrap a method of measurement.REGISTRY so it runs in a worker process."""
+    return IsolatedMethod(method.name, method)
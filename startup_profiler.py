@@ -0,0 +1,195 @@
+"""Measure where the start of the application spends its time.
+
+Run the application with
+
+    python3 main.py --profile-startup[=trace.json]
+
+to record the import time of every module, the construction time of the
+main widgets and the time spent scanning the GPIB bus. A ranked report is
+printed once the main window is shown and the events are saved as a JSON
+trace (Chrome trace event format, it can be opened in chrome://tracing or
+compared between releases).
+"""
+import builtins
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from time import perf_counter
+from typing import Dict, List, Optional
+
+FLAG = '--profile-startup'
+
+
+class StartupProfiler:
+    """Collects import times and named spans while the application starts."""
+
+    REPORT_LENGTH = 20
+
+    def __init__(self) -> None:
+        self._enabled = False
+        self._start = perf_counter()
+        self._events = []  # type: List[Dict]
+        self._lock = threading.Lock()
+        self._import_stack = threading.local()
+        self._original_import = None
+        self._trace_path = None  # type: Optional[str]
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def enable(self, trace_path: Optional[str] = None) -> None:
+        """Start recording and hook into the import statement.
+
+        :param trace_path: where to save the JSON trace, a time stamped file
+                           in the working directory if None
+        """
+        if self._enabled:
+            return
+        self._enabled = True
+        self._start = perf_counter()
+        self._trace_path = trace_path
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def disable(self) -> None:
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+        self._enabled = False
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        module_name = name
+        if level > 0 and globals is not None:
+            package = globals.get('__package__') or ''
+            base = package.rsplit('.', level - 1)[0] if level > 1 else package
+            module_name = '{}.{}'.format(base, name) if name else base
+
+        if module_name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        stack = self._stack()
+        stack.append(0.0)
+        start = perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            duration = perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += duration
+            self._add_event('import', module_name, start, duration, self_time=duration - children)
+
+    def _stack(self) -> List[float]:
+        if not hasattr(self._import_stack, 'stack'):
+            self._import_stack.stack = []
+        return self._import_stack.stack
+
+    def _add_event(self, category: str, name: str, start: float, duration: float,
+                   self_time: Optional[float] = None) -> None:
+        event = dict(category=category, name=name, start=start - self._start, duration=duration,
+                     self_time=duration if self_time is None else self_time,
+                     thread=threading.get_ident())
+        with self._lock:
+            self._events.append(event)
+
+    @contextmanager
+    def span(self, category: str, name: str):
+        """Record the time spent inside the with block, does nothing when disabled.
+
+        :param category: e.g. 'widget' or 'bus scan'
+        :param name: name shown in the report
+        """
+        if not self._enabled:
+            yield
+            return
+
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self._add_event(category, name, start, perf_counter() - start)
+
+    def events(self, category: Optional[str] = None) -> List[Dict]:
+        with self._lock:
+            return [event for event in self._events
+                    if category is None or event['category'] == category]
+
+    def report(self) -> str:
+        """Return a report with the most expensive events of every category ranked by time."""
+        total = perf_counter() - self._start
+        lines = ['startup took {:.3f} s'.format(total)]
+
+        imports = sorted(self.events('import'), key=lambda event: event['self_time'], reverse=True)
+        lines.append('')
+        lines.append('{} modules imported in {:.3f} s, most expensive (self / cumulative):'.format(
+            len(imports), sum(event['self_time'] for event in imports)))
+        for event in imports[:self.REPORT_LENGTH]:
+            lines.append('  {:8.1f} ms {:8.1f} ms  {}'.format(event['self_time'] * 1e3,
+                                                              event['duration'] * 1e3, event['name']))
+
+        categories = sorted({event['category'] for event in self.events()} - {'import'})
+        for category in categories:
+            spans = sorted(self.events(category), key=lambda event: event['duration'], reverse=True)
+            lines.append('')
+            lines.append('{} ({} spans, {:.3f} s):'.format(category, len(spans),
+                                                           sum(event['duration'] for event in spans)))
+            for event in spans[:self.REPORT_LENGTH]:
+                lines.append('  {:8.1f} ms  {}'.format(event['duration'] * 1e3, event['name']))
+
+        return '\n'.join(lines)
+
+    def save_trace(self, file_path: str) -> None:
+        """Save all events in the Chrome trace event format."""
+        trace_events = [dict(name=event['name'], cat=event['category'], ph='X', pid=os.getpid(),
+                             tid=event['thread'], ts=event['start'] * 1e6, dur=event['duration'] * 1e6,
+                             args=dict(self_time_ms=event['self_time'] * 1e3))
+                        for event in self.events()]
+        trace = dict(traceEvents=trace_events, displayTimeUnit='ms',
+                     otherData=dict(created=datetime.now().isoformat(),
+                                    python=sys.version, argv=sys.argv,
+                                    total_seconds=perf_counter() - self._start))
+        with open(file_path, 'w') as file_handle:
+            json.dump(trace, file_handle, indent=1)
+
+    def finish(self) -> None:
+        """Stop recording, print the report and save the trace."""
+        if not self._enabled:
+            return
+        self.disable()
+
+        trace_path = self._trace_path
+        if trace_path is None:
+            trace_path = 'startup_profile_{}.json'.format(datetime.now().strftime('%Y%m%d-%H%M%S'))
+
+        self.save_trace(trace_path)
+        print(self.report())
+        print('\nstartup trace saved to {}'.format(os.path.abspath(trace_path)))
+
+
+PROFILER = StartupProfiler()
+
+
+def enable_from_arguments(argv: List[str]) -> bool:
+    """Enable the profiler if the command line contains --profile-startup[=path].
+
+    The flag is removed from argv so it is not handed on to Qt.
+    """
+    for argument in list(argv):
+        if argument == FLAG or argument.startswith(FLAG + '='):
+            argv.remove(argument)
+            trace_path = argument[len(FLAG) + 1:] or None
+            PROFILER.enable(trace_path)
+            return True
+    return False
+
+
+def span(category: str, name: str):
+    return PROFILER.span(category, name)
+
+
+def finish() -> None:
+    PROFILER.finish()
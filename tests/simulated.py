@@ -0,0 +1,13 @@
+"""The simulated instruments of measurement.simulation for the tests.
+
+They are installed once for the whole test run, before the first module
+which imports the drivers, since no real drivers are needed to run the
+tests.
+"""
+from measurement import simulation
+
+
+def install() -> simulation.SimulatedWorld:
+    if not simulation.is_installed():
+        simulation.install(speedup=1000.0, latency=0.0, seed=0)
+    return simulation.WORLD
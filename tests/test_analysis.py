@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from analysis import Run, fit_lines, magnetoresistance, split_curves, stack
+
+
+class FitLinesTest(unittest.TestCase):
+
+    def test_like_polyfit(self):
+        random = np.random.default_rng(0)
+        x = random.uniform(-1, 1, (5, 20))
+        y = random.uniform(-2, 3, (5, 1)) * x + random.uniform(-1, 1, (5, 1)) + random.normal(0, 0.1, x.shape)
+        slopes, intercepts = fit_lines(x, y)
+        for row in range(len(x)):
+            np.testing.assert_allclose((slopes[row], intercepts[row]), np.polyfit(x[row], y[row], 1))
+
+    def test_nan_padding_is_left_out(self):
+        runs = [Run('a', [], {'x': np.arange(10.0), 'y': 2 * np.arange(10.0) + 1}),
+                Run('b', [], {'x': np.arange(4.0), 'y': -np.arange(4.0) + 3})]
+        x, y = stack(runs, 'x'), stack(runs, 'y')
+        self.assertTrue(np.isnan(x[1, 4:]).all())
+        slopes, intercepts = fit_lines(x, y)
+        np.testing.assert_allclose(slopes, [np.polyfit(run['x'], run['y'], 1)[0] for run in runs])
+        np.testing.assert_allclose(intercepts, [1, 3])
+
+    def test_rows_without_a_line_are_nan(self):
+        x = np.array([[1.0, np.nan, np.nan], [2.0, 2.0, 2.0], [0.0, 1.0, 2.0]])
+        slopes, intercepts = fit_lines(x, np.ones_like(x))
+        self.assertTrue(np.isnan(slopes[:2]).all())
+        self.assertTrue(np.isnan(intercepts[:2]).all())
+        self.assertEqual((slopes[2], intercepts[2]), (0.0, 1.0))
+
+
+class SplitCurvesTest(unittest.TestCase):
+
+    def run_at(self, seconds) -> Run:
+        times = np.datetime64('2026-01-01T00:00:00', 'us') + (np.asarray(seconds) * 1e6).astype('timedelta64[us]')
+        return Run('run', [], {'Datetime': times, 'Voltage': np.arange(float(len(seconds)))})
+
+    def test_split_at_long_gaps(self):
+        curves = split_curves(self.run_at([0, 1, 2, 3, 60, 61, 62, 200, 201]))
+        self.assertEqual([list(curve['Voltage']) for curve in curves], [[0, 1, 2, 3], [4, 5, 6], [7, 8]])
+        self.assertEqual(curves[1].seconds[0], 0)
+
+    def test_gap_factor(self):
+        run = self.run_at([0, 1, 2, 3, 6, 7, 8])
+        self.assertEqual(len(split_curves(run)), 1)
+        self.assertEqual(len(split_curves(run, gap_factor=2)), 2)
+
+    def test_runs_without_timestamps_are_kept(self):
+        run = Run('run', [], {'Voltage': np.arange(5.0)})
+        self.assertEqual(split_curves(run), [run])
+
+
+class MagnetoresistanceTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def write(self, name: str, header: str, fields: np.ndarray, signals: np.ndarray) -> str:
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as file_handle:
+            file_handle.write(header + 'Field Real\n')
+            for field, signal in zip(fields, signals):
+                file_handle.write('{} {}\n'.format(field, signal))
+        return path
+
+    def test_symmetric_and_antisymmetric_parts(self):
+        # up and down again, R(B) = 100 + 20 B^2 + 5 B
+        fields = np.concatenate((np.linspace(-1, 1, 9), np.linspace(1, -1, 9)))
+        resistance = 100 + 20 * fields ** 2 + 5 * fields
+        # the signal is converted with the excitation and the pre resistance of the header
+        path = self.write('sweep.dat', '# 0.5 V\n# pre resistance 1000.0 OHM\n', fields, resistance * 0.5 / 1000)
+
+        result = magnetoresistance([path], [0, 0.5, 1, 2])
+        np.testing.assert_allclose(result['B'], [0, 0.5, 1, 2])
+        np.testing.assert_allclose(result['R_sym'][0, :3], [100, 105, 120])
+        np.testing.assert_allclose(result['R_anti'][0, :3], [0, 2.5, 5], atol=1e-9)
+        np.testing.assert_allclose(result['MR'][0, :3], [0, 0.05, 0.2], atol=1e-12)
+        # outside of the sweep
+        self.assertTrue(np.isnan(result['R_sym'][0, 3]))
+
+    def test_signal_without_header_values(self):
+        fields = np.linspace(-1, 1, 5)
+        path = self.write('plain.dat', '# no excitation\n', fields, 3 + fields ** 2)
+        result = magnetoresistance([path], [1, 0])
+        np.testing.assert_allclose(result['R_sym'], [[4, 3]])
+        np.testing.assert_allclose(result['MR'], [[1 / 3, 0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
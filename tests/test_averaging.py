@@ -0,0 +1,49 @@
+import unittest
+from itertools import count
+from threading import Event
+
+from measurement.averaging import RunningMean, average_reads
+
+
+def alternating(mean: float, noise: float):
+    """A reader whose values alternate around the mean, like noise."""
+    signs = count()
+    return lambda: (0.0, mean + noise * (-1) ** next(signs))
+
+
+class AverageReadsTest(unittest.TestCase):
+
+    def test_single_read_without_target(self):
+        (voltage, current), stats = average_reads(alternating(1.0, 0.1))
+        self.assertEqual(stats.count, 1)
+        self.assertAlmostEqual(current, 1.1)
+
+    def test_zero_mean_is_done_relative_to_the_floor(self):
+        (voltage, current), stats = average_reads(alternating(0.0, 1e-9), target=1e-2, max_time=60, floor=1e-6)
+        self.assertEqual(stats.count, 3)
+        self.assertLess(stats.elapsed, 1)
+
+    def test_noisy_reads_are_averaged_until_precise(self):
+        (voltage, current), stats = average_reads(alternating(1.0, 0.1), target=1e-2, max_time=60)
+        self.assertGreater(stats.count, 3)
+        self.assertLessEqual(stats.sem, 1e-2 * abs(current))
+
+    def test_target_needs_a_time_limit(self):
+        with self.assertRaises(ValueError):
+            average_reads(alternating(0.0, 1.0), target=1e-3, max_time=0)
+        with self.assertRaises(ValueError):
+            RunningMean(target=1e-3)
+
+    def test_stop_ends_the_averaging(self):
+        stop = Event()
+        reads = alternating(0.0, 1.0)
+
+        def read():
+            stop.set()
+            return reads()
+        values, stats = average_reads(read, target=1e-3, max_time=60, stop=stop)
+        self.assertEqual(stats.count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
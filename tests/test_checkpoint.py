@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from typing import Dict
+
+from measurement.checkpoint import Checkpoint, checkpoint_path
+from measurement.measurement import AbstractMeasurement, AbstractValue, Contacts, DatetimeValue, IntegerValue
+from measurement.measurement import SignalInterface, StringValue
+
+
+class StepMeasurement(AbstractMeasurement):
+    """Writes one line per step and saves a checkpoint after each, not registered."""
+
+    def __init__(self, signal_interface: SignalInterface, path: str, contacts, n: int = 5,
+                 start: datetime = None, label: str = '') -> None:
+        super().__init__(signal_interface, path, contacts)
+        self._n = n
+        self._start = start
+        self._label = label
+        self.stop_after = None
+        self.measured = []
+
+    @staticmethod
+    def inputs() -> Dict[str, AbstractValue]:
+        return {'n': IntegerValue('Number of Steps', default=5),
+                'start': DatetimeValue('Start'),
+                'label': StringValue('Label')}
+
+    @staticmethod
+    def number_of_contacts() -> Contacts:
+        return Contacts.TWO
+
+    @property
+    def recommended_plots(self):
+        return []
+
+    def __str__(self) -> str:
+        return 'Step Measurement'
+
+    def _measure(self, file_handle) -> None:
+        if self._resume_position == 0:
+            print('step start label', file=file_handle)
+        for index in range(self._resume_position, self._n):
+            self.measured.append(index)
+            print(index, self._start.isoformat(), self._label, file=file_handle)
+            self._checkpoint(file_handle, index + 1)
+            if index + 1 == self.stop_after:
+                # a step which is cut off by the abort, it is not checkpointed
+                file_handle.write('{} incomplete'.format(index + 1))
+                self.abort()
+                break
+
+
+class ResumeTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.start = datetime(2026, 10, 19, 12, 30)
+        self.inputs = dict(n=5, start=self.start, label='2026-10-19')
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def _interrupted_run(self) -> StepMeasurement:
+        measurement = StepMeasurement(SignalInterface(), self.directory.name, ('1', '2'), **self.inputs)
+        measurement.stop_after = 2
+        measurement()
+        return measurement
+
+    def test_inputs_are_converted_to_their_types(self):
+        interrupted = self._interrupted_run()
+        checkpoint = Checkpoint.load(interrupted._file_path)
+        self.assertEqual(checkpoint.method, 'Step Measurement')
+        self.assertEqual(checkpoint.position, 2)
+        self.assertIsInstance(checkpoint.inputs['start'], str)
+        # a string which looks like a date stays a string
+        self.assertEqual(checkpoint.inputs_for(StepMeasurement), self.inputs)
+
+    def test_resume_truncates_and_skips_the_completed_steps(self):
+        interrupted = self._interrupted_run()
+        self.assertEqual(interrupted.measured, [0, 1])
+        checkpoint = Checkpoint.load(interrupted._file_path)
+        with open(interrupted._file_path) as file_handle:
+            self.assertTrue(file_handle.read().endswith('2 incomplete'))
+
+        resumed = StepMeasurement(SignalInterface(), checkpoint.path, checkpoint.contacts,
+                                  **checkpoint.inputs_for(StepMeasurement))
+        resumed.resume_from(checkpoint)
+        resumed()
+
+        self.assertEqual(resumed.measured, [2, 3, 4])
+        self.assertEqual(resumed._file_path, interrupted._file_path)
+        with open(resumed._file_path) as file_handle:
+            lines = file_handle.read().splitlines()
+        self.assertEqual(lines[0], 'step start label')
+        self.assertEqual([line.split()[0] for line in lines[1:3]], ['0', '1'])
+        self.assertTrue(lines[3].startswith('# resumed'))
+        self.assertEqual(lines[4:], ['{} {} 2026-10-19'.format(index, self.start.isoformat()) for index in (2, 3, 4)])
+        # the finished run needs no checkpoint any more
+        self.assertFalse(os.path.exists(checkpoint_path(resumed._file_path)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from measurement.datafile import DATETIME, FLOAT, DataFile
+
+HEADER = '# 2026-01-01T00:00:00\n# comment\nDatetime Voltage Current\n'
+ROWS = ['2026-01-01T00:00:01 0.1 1e-06\n', '2026-01-01T00:00:02 0.2 2e-06\n']
+
+
+class DataFileTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'contacts_A--B_001.dat')
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def write(self, text: str, mode: str = 'a') -> None:
+        with open(self.path, mode) as file_handle:
+            file_handle.write(text)
+
+    def check_rows(self, data: DataFile, count: int) -> None:
+        self.assertEqual(len(data), count)
+        self.assertEqual(data.kinds, {'Datetime': DATETIME, 'Voltage': FLOAT, 'Current': FLOAT})
+        np.testing.assert_allclose(data.column('Voltage'), [0.1, 0.2][:count])
+
+    def test_read(self):
+        self.write(HEADER + ''.join(ROWS))
+        with DataFile(self.path) as data:
+            self.assertEqual(data.header, ['2026-01-01T00:00:00', 'comment'])
+            self.assertEqual(data.columns, ['Datetime', 'Voltage', 'Current'])
+            self.check_rows(data, 2)
+            self.assertEqual(list(data.tail(1)['Current']), [2e-6])
+
+    def test_refresh_after_header_only(self):
+        self.write(HEADER)
+        with DataFile(self.path) as data:
+            self.assertEqual(len(data), 0)
+            self.write(''.join(ROWS))
+            self.assertEqual(data.refresh(), 2)
+            self.check_rows(data, 2)
+
+    def test_reopen_after_header_only(self):
+        self.write(HEADER)
+        DataFile(self.path).close()
+        self.write(''.join(ROWS))
+        with DataFile(self.path) as data:
+            self.check_rows(data, 2)
+
+    def test_incomplete_line_is_indexed_later(self):
+        self.write(HEADER + ROWS[0] + ROWS[1][:10])
+        with DataFile(self.path) as data:
+            self.assertEqual(len(data), 1)
+            self.write(ROWS[1][10:])
+            self.assertEqual(data.refresh(), 1)
+            self.check_rows(data, 2)
+
+    def test_index_is_reused(self):
+        self.write(HEADER + ROWS[0])
+        DataFile(self.path).close()
+        self.assertTrue(os.path.exists(self.path + DataFile.INDEX_SUFFIX))
+        self.write(ROWS[1])
+        with DataFile(self.path) as data:
+            self.check_rows(data, 2)
+
+    def test_truncated_file(self):
+        self.write(HEADER + ''.join(ROWS))
+        with DataFile(self.path) as data:
+            self.write(HEADER, 'w')
+            with self.assertRaises(ValueError):
+                data.refresh()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from PyQt5.QtCore import QCoreApplication
+
+from measurement.datafile import FLOAT
+from windows.file_follower import FileFollower
+
+HEADER = '# 2026-01-01T00:00:00\nDatetime Voltage Current\n'
+ROWS = ['2026-01-01T00:00:01 0.1 1e-06\n', '2026-01-01T00:00:02 0.2 2e-06\n']
+
+
+class FileFollowerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.application = QCoreApplication.instance() or QCoreApplication([])
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'contacts_A--B_001.dat')
+        self.write(HEADER)
+        self.follower = FileFollower(self.path, poll_interval=60000)
+        self.appended = []
+        self.reopened = []
+        self.follower.appended.connect(self.appended.append)
+        self.follower.reopened.connect(lambda: self.reopened.append(self.follower.data_file))
+
+    def tearDown(self) -> None:
+        self.follower.stop()
+        self.follower.data_file.close()
+        self.directory.cleanup()
+
+    def write(self, text: str, mode: str = 'a') -> None:
+        with open(self.path, mode) as file_handle:
+            file_handle.write(text)
+
+    def test_follow_a_run_which_only_wrote_its_header(self):
+        self.write(ROWS[0])
+        self.follower.check()
+        self.write(ROWS[1])
+        self.follower.check()
+        data = self.follower.data_file
+        self.assertEqual(self.appended, [1, 1])
+        self.assertEqual(data.kinds['Voltage'], FLOAT)
+        np.testing.assert_allclose(data.column('Voltage'), [0.1, 0.2])
+
+    def test_nothing_appended(self):
+        self.follower.check()
+        self.assertEqual(self.appended, [])
+
+    def test_replaced_file_is_reopened(self):
+        previous = self.follower.data_file
+        self.write(ROWS[0])
+        self.follower.check()
+        # a new file is moved over the old one, as when a run is copied again
+        replacement = self.path + '.new'
+        with open(replacement, 'w') as file_handle:
+            file_handle.write(HEADER + ''.join(ROWS))
+        os.replace(replacement, self.path)
+        self.follower.check()
+        self.assertEqual(self.reopened, [self.follower.data_file])
+        self.assertIsNot(self.follower.data_file, previous)
+        self.assertEqual(len(self.follower.data_file), 2)
+
+    def test_stop_keeps_the_file_open(self):
+        self.write(ROWS[0])
+        self.follower.check()
+        self.follower.stop()
+        np.testing.assert_allclose(self.follower.data_file.column('Voltage'), [0.1])
+
+
+if __name__ == '__main__':
+    unittest.main()
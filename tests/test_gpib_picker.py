@@ -0,0 +1,57 @@
+import unittest
+from unittest import mock
+
+from PyQt5.QtCore import Qt
+
+from tests import simulated
+
+simulated.install()
+
+from measurement.simulation import ResourceManager  # noqa: E402
+from windows import gpib_picker  # noqa: E402
+
+
+class BrokenResourceManager(ResourceManager):
+
+    def close(self) -> None:
+        raise OSError('session already closed')
+
+
+class DeviceScannerTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.scanner = gpib_picker.DeviceScanner()
+        self.finished = []
+        # the scan thread has no event loop of its own to deliver the signal to
+        self.scanner.scan_finished.connect(self.finished.append, Qt.DirectConnection)
+
+    def scan(self) -> None:
+        self.scanner.scan(identify=True)
+        self.scanner._thread.join(10)
+        self.assertFalse(self.scanner.is_scanning)
+
+    def test_scan_finds_and_identifies(self):
+        self.scan()
+        self.assertIsNone(self.scanner.error)
+        self.assertEqual(self.finished, [list(ResourceManager().list_resources())])
+        self.assertEqual(sorted(self.scanner.identities), sorted(self.finished[0]))
+        self.assertTrue(self.scanner.is_fresh)
+
+    def test_failing_resource_manager(self):
+        with mock.patch.object(gpib_picker, 'ResourceManager', side_effect=OSError('no VISA library')):
+            self.scan()
+        self.assertIsInstance(self.scanner.error, OSError)
+        self.assertEqual(self.finished, [[]])
+        # the failure is cached, a new picker does not scan again
+        self.assertTrue(self.scanner.is_fresh)
+
+    def test_failing_close(self):
+        with mock.patch.object(gpib_picker, 'ResourceManager', BrokenResourceManager):
+            self.scan()
+        self.assertIsInstance(self.scanner.error, OSError)
+        self.assertEqual(self.finished, [[]])
+        self.assertEqual(self.scanner.resources, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
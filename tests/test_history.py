@@ -0,0 +1,59 @@
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from measurement.history import DataHistory
+
+START = datetime(2026, 1, 1)
+
+
+class DataHistoryTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.history = DataHistory(window_points=100, spill_directory=self.directory.name)
+
+    def tearDown(self) -> None:
+        self.history.close()
+        self.directory.cleanup()
+
+    def fill(self, count: int) -> None:
+        for index in range(count):
+            point = {'datetime': START + timedelta(seconds=index), 'g': float(index)}
+            if index % 7 == 0:
+                point['sample'] = 'S{}'.format(index)
+            self.history.append(point)
+
+    def test_window_holds_the_newest_points(self):
+        self.fill(5000)
+        window = self.history.window(['datetime', 'g'])
+        self.assertEqual(self.history.spilled, 4900)
+        self.assertEqual(list(window['g']), [float(index) for index in range(4900, 5000)])
+        self.assertEqual(window['datetime'].iloc[-1], START + timedelta(seconds=4999))
+
+    def test_values_of_the_whole_run(self):
+        self.fill(1000)
+        values = self.history.values(['g'], start=890, stop=910)
+        self.assertEqual(list(values['g']), [float(index) for index in range(890, 910)])
+        self.assertEqual(len(self.history.values(['g'], max_points=100)), 100)
+
+    def test_text_is_kept(self):
+        self.fill(1000)
+        column = self.history.columns.index('sample')
+        self.assertEqual(self.history.value(7, column), 'S7')
+        self.assertEqual(self.history.value(994, column), 'S994')
+        self.assertEqual(list(self.history.window(['sample'])['sample'].dropna()),
+                         ['S{}'.format(index) for index in range(903, 1000, 7)])
+        self.assertEqual(self.history.values(['sample'], stop=8)['sample'].iloc[7], 'S7')
+
+    def test_new_column_later(self):
+        self.fill(500)
+        self.history.append({'g': 500.0, 'late': 1.0})
+        window = self.history.window(['g', 'late'])
+        self.assertTrue(window['late'].iloc[:-1].isna().all())
+        self.assertEqual(window['late'].iloc[-1], 1.0)
+        self.assertEqual(len(self.history.values(['late'])), 501)
+
+
+if __name__ == '__main__':
+    unittest.main()
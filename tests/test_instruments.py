@@ -0,0 +1,61 @@
+import unittest
+from threading import Event, Thread
+
+from measurement.instruments import InstrumentPool
+
+
+class FakeResource:
+
+    def __init__(self, **kwargs) -> None:
+        self.query_delay = 0.0
+        self.timeout = 2000
+        for name, value in kwargs.items():
+            setattr(self, name, value)
+
+
+class FakeResourceManager:
+
+    def open_resource(self, address: str, **kwargs) -> FakeResource:
+        return FakeResource(**kwargs)
+
+
+class InstrumentPoolTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.pool = InstrumentPool()
+        self.pool._resource_managers['@fake'] = FakeResourceManager()
+
+    def test_instrument_is_opened_once(self):
+        opened = []
+        first = self.pool.get('a', lambda: opened.append(1) or object())
+        self.assertIs(self.pool.get('a', lambda: opened.append(1) or object()), first)
+        self.assertEqual(opened, [1])
+
+    def test_opening_does_not_block_other_instruments(self):
+        opening, release = Event(), Event()
+
+        def slow():
+            opening.set()
+            release.wait(10)
+            return 'slow'
+        thread = Thread(target=self.pool.get, args=('slow', slow))
+        thread.start()
+        try:
+            self.assertTrue(opening.wait(10))
+            self.assertEqual(self.pool.get('fast', lambda: 'fast'), 'fast')
+            self.assertNotIn('slow', self.pool)
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(self.pool.get('slow', lambda: 'again'), 'slow')
+
+    def test_settings_apply_on_every_call(self):
+        first = self.pool.open_resource('GPIB0::1::INSTR', '@fake', query_delay=0.1)
+        second = self.pool.open_resource('GPIB0::1::INSTR', '@fake', query_delay=0.0, timeout=5000)
+        self.assertIs(first, second)
+        self.assertEqual(second.query_delay, 0.0)
+        self.assertEqual(second.timeout, 5000)
+
+
+if __name__ == '__main__':
+    unittest.main()
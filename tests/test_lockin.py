@@ -0,0 +1,68 @@
+import unittest
+from time import monotonic, sleep
+
+from measurement.lockin import LockInGroup, LockInPacer
+
+
+class FakeLockIn:
+    oflt = 10  # 1 s
+    ofsl = 1  # 12 dB/oct
+
+
+class LockInPacerTest(unittest.TestCase):
+
+    def test_interval_per_time_constant(self):
+        self.assertEqual(LockInPacer(FakeLockIn(), 2).interval, 0.5)
+        self.assertEqual(LockInPacer(FakeLockIn(), 0).interval, 0.0)
+
+    def test_independent_readings_are_a_correlation_time_apart(self):
+        pacer = LockInPacer(FakeLockIn(), 2, independent=True)
+        self.assertEqual(pacer.correlation_time, 4.0)
+        self.assertEqual(pacer.interval, 4.0)
+        self.assertEqual(LockInPacer(FakeLockIn(), 0, independent=True).interval, 4.0)
+        self.assertEqual(LockInPacer(FakeLockIn(), 0.1, independent=True).interval, 10.0)
+
+
+class SlowLockIn:
+    """Answers after delay seconds, X is its number."""
+
+    def __init__(self, number: int, delay: float) -> None:
+        self.number = number
+        self.delay = delay
+        self.sens = number
+
+    @property
+    def outpX(self):
+        sleep(self.delay)
+        return float(self.number)
+
+    @property
+    def outpY(self):
+        return 0.0
+
+
+class LockInGroupTest(unittest.TestCase):
+
+    def test_readings_are_in_the_order_of_the_devices(self):
+        # the last lock-in answers first
+        group = LockInGroup([SlowLockIn(number, 0.1 * (3 - number)) for number in range(3)])
+        try:
+            start = monotonic()
+            readings = group.read()
+            elapsed = monotonic() - start
+        finally:
+            group.close()
+        self.assertEqual([reading[0] for reading in readings], [0.0, 1.0, 2.0])
+        self.assertEqual([reading[4] for reading in readings], [0, 1, 2])
+        # read at the same time, not one after the other
+        self.assertLess(elapsed, 0.5)
+
+    def test_single_lock_in_is_read_directly(self):
+        group = LockInGroup([SlowLockIn(7, 0)])
+        self.assertEqual(len(group), 1)
+        self.assertEqual(group.read(), [(7.0, 0.0, 7.0, 0.0, 7)])
+        group.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import math
+import unittest
+
+from measurement.mapping import QuadtreeMap
+
+
+def measure(points: QuadtreeMap, function):
+    """Measure a map of function, return the points in the order they were handed out."""
+    measured = []
+    for x, y in points:
+        measured.append((x, y))
+        points.add(function(x, y))
+    return measured
+
+
+class QuadtreeMapTest(unittest.TestCase):
+
+    def test_plane_is_not_refined(self):
+        points = QuadtreeMap((0, 1), (0, 1), n=5, depth=2)
+        measured = measure(points, lambda x, y: 1 + 2 * x - y)
+        # the coarse grid and the centres of its cells
+        self.assertEqual(len(measured), 5 ** 2 + 4 ** 2)
+        self.assertEqual(points.planned, len(measured))
+
+    def test_curved_everywhere_is_refined_to_the_full_lattice(self):
+        points = QuadtreeMap((-1, 1), (-1, 1), n=3, depth=2, tolerance=0)
+        measured = measure(points, lambda x, y: x ** 2 + y ** 2)
+        self.assertEqual(points.uniform_points, 9 ** 2)
+        self.assertEqual(len(measured), points.uniform_points)
+        self.assertEqual(len(set(measured)), len(measured))
+
+    def test_refined_only_at_the_edge(self):
+        points = QuadtreeMap((0, 1), (0, 1), n=5, depth=3)
+        measured = measure(points, lambda x, y: 1.0 if x > 0.3 else 0.0)
+        self.assertLess(len(measured), points.uniform_points / 2)
+        lattice = [index / (points._size - 1) for index in range(points._size)]
+        for x, y in measured:
+            self.assertIn(x, lattice)
+        # the points of the finest level are in the coarse column of the edge, none far from it
+        finest = {x for x, y in measured if lattice.index(x) % 2 == 1}
+        self.assertTrue(finest)
+        self.assertTrue(all(0.25 < x < 0.5 for x in finest), finest)
+
+    def test_tolerance_is_relative_to_the_largest_value(self):
+        step = lambda x, y: 1e-9 * (x > 0.3)
+        measured = measure(QuadtreeMap((0, 1), (0, 1), n=5, depth=2, tolerance=0.01), step)
+        self.assertGreater(len(measured), 5 ** 2 + 4 ** 2)
+        measured = measure(QuadtreeMap((0, 1), (0, 1), n=5, depth=2, tolerance=0.01), lambda x, y: 1e3 + step(x, y))
+        self.assertEqual(len(measured), 5 ** 2 + 4 ** 2)
+
+    def test_missing_values_are_not_refined(self):
+        points = QuadtreeMap((0, 1), (0, 1), n=3, depth=2, tolerance=0)
+        measured = measure(points, lambda x, y: math.nan if x == 0 and y == 0 else x * x)
+        # the cell of the nan corner is not split, the other three are
+        self.assertLess(len(measured), points.uniform_points)
+        self.assertGreater(len(measured), 3 ** 2 + 2 ** 2)
+
+    def test_budget_keeps_the_coarse_grid(self):
+        points = QuadtreeMap((0, 1), (0, 2), n=4, depth=3, tolerance=0, budget=30)
+        self.assertEqual(points.max_points, 30)
+        measured = measure(points, lambda x, y: x ** 2 + y ** 2)
+        self.assertEqual(len(measured), 30)
+        self.assertEqual(points.planned, 30)
+        coarse = {(x / 3, 2 * y / 3) for x in range(4) for y in range(4)}
+        self.assertEqual({(round(x, 9), round(y, 9)) for x, y in measured[:16]},
+                         {(round(x, 9), round(y, 9)) for x, y in coarse})
+
+    def test_coarse_pass_snakes_row_by_row(self):
+        measured = measure(QuadtreeMap((0, 2), (0, 1), n=3, depth=0), lambda x, y: 0.0)
+        self.assertEqual(measured, [(0, 0), (1, 0), (2, 0), (2, 0.5), (1, 0.5), (0, 0.5), (0, 1), (1, 1), (2, 1)])
+
+    def test_invalid_grid(self):
+        with self.assertRaises(ValueError):
+            QuadtreeMap((0, 1), (0, 1), n=1)
+        with self.assertRaises(ValueError):
+            QuadtreeMap((0, 1), (0, 1), depth=-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+from unittest import mock
+
+from measurement.ramp import RampController
+
+
+class RampControllerTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.now = 1000.0
+        patcher = mock.patch('measurement.ramp.monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sweep(self, ramp: RampController, temperatures, value):
+        """Add the points of value(T), return the rates which were not None."""
+        rates = []
+        for temperature in temperatures:
+            rate = ramp.add(temperature, value(temperature))
+            if rate is not None:
+                rates.append(rate)
+        return rates
+
+    def test_slows_down_at_once_where_the_value_changes(self):
+        ramp = RampController(1.0, min_rate=0.01, max_rate=2.0, resolution=0.01)
+        self.assertIsNone(ramp.add(10.0, 100.0))
+        self.assertIsNone(ramp.add(10.1, 101.0))
+        # 1 %/min of the full scale of 102 at 10 per K
+        self.assertAlmostEqual(ramp.add(10.2, 102.0), 0.102)
+        self.assertAlmostEqual(ramp.rate, 0.102)
+
+    def test_rate_is_clamped(self):
+        ramp = RampController(1.0, min_rate=0.5, max_rate=2.0, resolution=0.01)
+        self.assertEqual(self.sweep(ramp, [10.0, 10.1, 10.2], lambda t: 100 * t), [0.5])
+
+        ramp = RampController(1.0, min_rate=0.5, max_rate=2.0, resolution=0.01, min_interval=0)
+        self.assertEqual(self.sweep(ramp, [10.0, 10.1, 10.2], lambda t: 100.0), [2.0])
+
+    def test_small_changes_are_ignored(self):
+        # 1 %/min of about 100 at 1.11 per K is 0.9 K/min, within 25 % of 1.0
+        ramp = RampController(1.0, min_rate=0.01, max_rate=2.0, resolution=0.01)
+        self.assertEqual(self.sweep(ramp, [10.0, 10.1, 10.2], lambda t: 100 + 1.11 * (t - 10)), [])
+        self.assertEqual(ramp.rate, 1.0)
+        # 0.7 K/min is not
+        ramp = RampController(1.0, min_rate=0.01, max_rate=2.0, resolution=0.01)
+        rates = self.sweep(ramp, [10.0, 10.1, 10.2], lambda t: 100 + 1.43 * (t - 10))
+        self.assertEqual(len(rates), 1)
+        self.assertAlmostEqual(rates[0], 0.7, places=2)
+
+    def test_speeds_up_only_after_min_interval(self):
+        ramp = RampController(1.0, min_rate=0.01, max_rate=2.0, resolution=0.01, min_interval=20.0)
+        self.assertEqual(len(self.sweep(ramp, [10.0, 10.1, 10.2], lambda t: 100 + 10 * (t - 10))), 1)
+        # flat from here on, the derivative of the window drops
+        flat = [10.3 + 0.1 * index for index in range(12)]
+        self.assertEqual(self.sweep(ramp, flat, lambda t: 102.0), [])
+        self.now += 19
+        self.assertEqual(self.sweep(ramp, [11.5], lambda t: 102.0), [])
+        self.now += 2
+        self.assertEqual(self.sweep(ramp, [11.6], lambda t: 102.0), [2.0])
+
+    def test_points_without_spread_or_invalid_values(self):
+        ramp = RampController(1.0, min_rate=0.01, max_rate=2.0, resolution=0.01)
+        self.assertEqual(self.sweep(ramp, [10.0, 10.0, 10.0], lambda t: 100.0), [])
+        self.assertIsNone(ramp.derivative())
+        self.assertIsNone(ramp.add(float('nan'), 1.0))
+        self.assertIsNone(ramp.add(10.0, float('inf')))
+
+    def test_invalid_bounds(self):
+        with self.assertRaises(ValueError):
+            RampController(1.0, min_rate=0, max_rate=2.0, resolution=0.01)
+        with self.assertRaises(ValueError):
+            RampController(1.0, min_rate=2.0, max_rate=1.0, resolution=0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
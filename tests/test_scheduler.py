@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+from time import monotonic, sleep
+
+from measurement.measurement import SignalInterface
+from measurement.scheduler import Job, JobState, RunQueue, Scheduler
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.queue = RunQueue(os.path.join(self.directory.name, 'queue.jsonl'))
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_stop_during_settle_time_leaves_the_job_queued(self):
+        job = self.queue.add(Job('Dummy', self.directory.name, settle_time=60))
+        scheduler = Scheduler(self.queue, SignalInterface())
+        start = monotonic()
+        scheduler.start()
+        # let it start waiting
+        sleep(0.1)
+        scheduler.abort()
+        scheduler.wait(10)
+        self.assertFalse(scheduler.is_running)
+        self.assertLess(monotonic() - start, 10)
+        self.assertEqual(job.state, JobState.PENDING)
+        self.assertEqual(self.queue.pending, [job])
+
+    def test_abort_while_the_job_is_published_as_running(self):
+        job = self.queue.add(Job('Dummy Measurement', self.directory.name, ('1', '2'), dict(n=3)))
+        scheduler = Scheduler(self.queue, SignalInterface())
+        set_state = self.queue.set_state
+        measurements = []
+
+        def abort_when_running(job, state):
+            set_state(job, state)
+            if state == JobState.RUNNING:
+                scheduler.abort()
+        self.queue.set_state = abort_when_running
+        scheduler._before_job = lambda job, measurement: measurements.append(measurement)
+
+        scheduler.start()
+        scheduler.wait(10)
+        self.assertFalse(scheduler.is_running)
+        self.assertEqual(job.state, JobState.ABORTED)
+        self.assertTrue(measurements[0].aborted)
+        self.assertEqual(os.listdir(self.directory.name), ['queue.jsonl'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import shlex
+import tempfile
+import unittest
+
+from tests import simulated
+
+simulated.install()
+
+from measurement.measurement import SignalInterface  # noqa: E402
+from measurement.smu_2probe import SMU2ProbeDual  # noqa: E402
+
+
+class RecordingSignalInterface(SignalInterface):
+
+    def __init__(self) -> None:
+        self.data = []
+
+    def emit_data(self, data) -> None:
+        self.data.append(data)
+
+
+class SMU2ProbeDualTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.signals = RecordingSignalInterface()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def read(self, name: str):
+        with open(os.path.join(self.directory.name, name)) as file_handle:
+            return file_handle.read().splitlines()
+
+    def test_each_pair_gets_its_own_file_and_overview_row(self):
+        measurement = SMU2ProbeDual(self.signals, self.directory.name, ('1', '2', '3', '4'), v=1.0, n=5)
+        measurement()
+
+        for name, channel, other in (('contacts_1--2_001.dat', 'a', '3 4 on channel b'),
+                                     ('contacts_3--4_001.dat', 'b', '1 2 on channel a')):
+            lines = self.read(name)
+            self.assertIn('# channel {}, measured together with contacts {}'.format(channel, other), lines)
+            rows = lines[lines.index('Voltage Current') + 1:]
+            self.assertEqual([float(row.split()[0]) for row in rows], [0.0, 0.25, 0.5, 0.75, 1.0])
+
+        self.assertEqual(sum('v' in data for data in self.signals.data), 5)
+        self.assertEqual(sum('v2' in data for data in self.signals.data), 5)
+
+        lines = [line for line in self.read('overview_SMU2ProbeDual.dat') if not line.startswith('#')]
+        columns = lines[0].split()
+        rows = [dict(zip(columns, shlex.split(line))) for line in lines[1:]]
+        self.assertEqual([(row['Contacts'], row['Channel'], row['Aborted']) for row in rows],
+                         [('1 2', 'a', 'False'), ('3 4', 'b', 'False')])
+        for row in rows:
+            self.assertGreater(float(row['Resistance']), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import math
+import unittest
+
+import numpy as np
+
+from measurement.sweep import plan_sweep
+
+BUDGET = 100
+
+# currents of 0 to 1 V sweeps
+CURVES = {'ohmic': lambda v: v,
+          'diode': lambda v: math.exp(v / 0.05),
+          'blockade onset': lambda v: max(0.0, v - 0.3182),
+          'tanh step': lambda v: math.tanh((v - 0.5) / 0.02)}
+
+
+def interpolation_error(voltages, curve) -> float:
+    """Largest error of the straight lines between the points relative to the full scale."""
+    voltages = np.array(sorted(set(voltages)))
+    fine = np.linspace(0, 1, 20001)
+    truth = np.array([curve(v) for v in fine])
+    interpolated = np.interp(fine, voltages, [curve(v) for v in voltages])
+    return np.max(np.abs(interpolated - truth)) / np.max(np.abs(truth))
+
+
+def run(sweep, curve):
+    voltages = []
+    for voltage in sweep:
+        voltages.append(voltage)
+        sweep.add(voltage, curve(voltage))
+    return voltages
+
+
+class AdaptiveSweepTest(unittest.TestCase):
+
+    def test_at_least_as_good_as_the_grid(self):
+        grid = np.linspace(0, 1, BUDGET)
+        for name, curve in CURVES.items():
+            with self.subTest(curve=name):
+                voltages = run(plan_sweep([0, 1], grid, adaptive=True, tolerance=0.002), curve)
+                self.assertLessEqual(len(voltages), BUDGET)
+                self.assertLessEqual(interpolation_error(voltages, curve), interpolation_error(grid, curve) + 1e-9)
+
+    def test_error_within_tolerance(self):
+        grid = np.linspace(0, 1, BUDGET)
+        for name, curve in CURVES.items():
+            with self.subTest(curve=name):
+                voltages = run(plan_sweep([0, 1], grid, adaptive=True, tolerance=0.01), curve)
+                self.assertLessEqual(interpolation_error(voltages, curve), 0.01)
+
+    def test_straight_line_needs_few_points(self):
+        voltages = run(plan_sweep([0, 1], np.linspace(0, 1, BUDGET), adaptive=True), CURVES['ohmic'])
+        self.assertLess(len(voltages), BUDGET / 2)
+
+    def test_corners_are_hit_in_order(self):
+        grid = np.linspace(0, 1, BUDGET)
+        voltages = run(plan_sweep([0, 1, -1, 0], grid, adaptive=True), CURVES['tanh step'])
+        self.assertLessEqual(len(voltages), BUDGET)
+        # the refinement of a segment may follow its end corner
+        last_zero = len(voltages) - 1 - voltages[::-1].index(0.0)
+        self.assertEqual(voltages[0], 0)
+        self.assertLess(voltages.index(1.0), voltages.index(-1.0))
+        self.assertLess(voltages.index(-1.0), last_zero)
+
+
+if __name__ == '__main__':
+    unittest.main()
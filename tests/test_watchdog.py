@@ -0,0 +1,200 @@
+import unittest
+from threading import Event, Lock, Thread
+from time import monotonic, sleep
+
+from measurement.watchdog import GuardedProxy, InstrumentError, RetryPolicy, Watchdog
+
+POLICY = RetryPolicy(deadline=0.05, grace=0.2, backoff=0.001)
+
+
+class FakeSession:
+    """A VISA session which answers a query with the query, slowly or not at all.
+
+    A hanging query ends with an error when the device is cleared, unless
+    the device is stuck. Concurrent queries are counted, they would mix up
+    the answers of a real device.
+    """
+
+    def __init__(self) -> None:
+        self.timeout = 30000.0
+        self.delay = 0.0
+        self.hanging = False
+        self.stuck = False
+        self.failures = 0
+        self.queries = []
+        self.timeouts = []
+        self.busy = 0
+        self.max_busy = 0
+        self.clears = 0
+        self._released = Event()
+        self._lock = Lock()
+
+    def query(self, message: str) -> str:
+        with self._lock:
+            self.busy += 1
+            self.max_busy = max(self.max_busy, self.busy)
+        try:
+            self.queries.append(message)
+            self.timeouts.append(self.timeout)
+            if self.hanging:
+                self._released.wait(10)
+                raise IOError('query aborted')
+            if self.failures > 0:
+                self.failures -= 1
+                raise ValueError('garbled answer')
+            sleep(self.delay)
+            return message
+        finally:
+            with self._lock:
+                self.busy -= 1
+
+    def clear(self) -> None:
+        self.clears += 1
+        if not self.stuck:
+            self.release()
+
+    def release(self) -> None:
+        self.hanging = False
+        self._released.set()
+
+
+class FakeChannel:
+    """One channel of a two channel sourcemeter, both channels talk through the same session."""
+
+    def __init__(self, session: FakeSession, channel: str) -> None:
+        self._dev = session
+        self._channel = channel
+
+    def query(self, message: str) -> str:
+        return self._dev.query('{}.{}'.format(self._channel, message))
+
+
+class GuardedProxyTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.session = FakeSession()
+        self.watchdog = Watchdog()
+        self.proxy = GuardedProxy(self.session, self.watchdog, 'fake', policy=POLICY)
+
+    def tearDown(self) -> None:
+        self.session.release()
+
+    def counters(self):
+        return self.watchdog.counters().get('fake', {})
+
+    def test_bus_timeout_follows_deadline(self):
+        proxy = GuardedProxy(self.session, self.watchdog, 'fake', policy=POLICY, deadlines={'query': 2.0})
+        self.assertEqual(proxy.query('*IDN?'), '*IDN?')
+        self.assertEqual(self.session.timeouts, [2000.0])
+
+    def test_slow_call_within_grace_is_not_retried(self):
+        self.session.delay = 0.1
+        self.assertEqual(self.proxy.query('A'), 'A')
+        self.assertEqual(self.session.queries, ['A'])
+        self.assertEqual(self.counters(), {})
+
+    def test_transient_error_is_retried(self):
+        self.session.failures = 1
+        start = monotonic()
+        self.assertEqual(self.proxy.query('A'), 'A')
+        self.assertLess(monotonic() - start, 0.1)
+        self.assertEqual(self.counters()['retries'], 1)
+
+    def test_program_errors_are_not_retried(self):
+        with self.assertRaises(AttributeError):
+            self.proxy.missing()
+        self.assertEqual(self.counters(), {})
+
+    def test_hanging_call_is_cleared_before_the_retry(self):
+        self.session.hanging = True
+        self.assertEqual(self.proxy.query('A'), 'A')
+        self.assertEqual(self.session.queries, ['A', 'A'])
+        self.assertEqual(self.session.max_busy, 1)
+        self.assertEqual(self.counters()['timeouts'], 1)
+        self.assertGreaterEqual(self.session.clears, 1)
+
+    def test_no_query_while_a_call_hangs(self):
+        self.session.hanging = True
+        self.session.stuck = True
+        with self.assertRaises(InstrumentError):
+            self.proxy.query('A')
+        start = monotonic()
+        with self.assertRaises(InstrumentError):
+            self.proxy.query('B')
+        self.assertLess(monotonic() - start, 1.0)
+        self.assertEqual(self.session.queries, ['A'])
+
+        # once the hanging call returned, the instrument is used again
+        self.session.stuck = False
+        self.session.release()
+        self.assertEqual(self.proxy.query('C'), 'C')
+        self.assertEqual(self.session.queries, ['A', 'C'])
+        self.assertEqual(self.session.max_busy, 1)
+
+    def test_reopen_after_repeated_failures(self):
+        session, fresh = FakeSession(), FakeSession()
+        proxy = GuardedProxy(session, self.watchdog, 'fake', policy=POLICY, reopen=lambda: fresh)
+        session.failures = 3
+        self.assertEqual(proxy.query('A'), 'A')
+        self.assertEqual(fresh.queries, ['A'])
+        self.assertEqual(self.counters()['reopens'], 1)
+
+    def test_failure_after_all_attempts(self):
+        self.session.failures = 10
+        with self.assertRaises(InstrumentError):
+            self.proxy.query('A')
+        self.assertEqual(len(self.session.queries), POLICY.attempts)
+        self.assertEqual(self.counters()['failures'], 1)
+
+
+class SharedSessionTest(unittest.TestCase):
+    """The two channels of one sourcemeter, each in its own proxy."""
+
+    def setUp(self) -> None:
+        self.session = FakeSession()
+        self.watchdog = Watchdog()
+        self.fresh = FakeSession()
+        self.channels = [GuardedProxy(FakeChannel(self.session, name), self.watchdog, name, policy=POLICY,
+                                      reopen=lambda name=name: FakeChannel(self.fresh, name))
+                         for name in ('a', 'b')]
+
+    def tearDown(self) -> None:
+        self.session.release()
+
+    def test_channels_do_not_talk_at_the_same_time(self):
+        self.session.delay = 0.01
+        threads = [Thread(target=lambda channel=channel: [channel.query(str(index)) for index in range(10)])
+                   for channel in self.channels]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.session.queries), 20)
+        self.assertEqual(self.session.max_busy, 1)
+
+    def test_hanging_channel_holds_back_the_other(self):
+        self.session.hanging = True
+        self.session.stuck = True
+        with self.assertRaises(InstrumentError):
+            self.channels[0].query('A')
+        with self.assertRaises(InstrumentError) as raised:
+            self.channels[1].query('B')
+        self.assertIn('a.query', str(raised.exception))
+        self.assertEqual(self.session.queries, ['a.A'])
+
+        self.session.stuck = False
+        self.session.release()
+        self.assertEqual(self.channels[1].query('C'), 'b.C')
+        self.assertEqual(self.session.max_busy, 1)
+
+    def test_shared_session_is_not_opened_again(self):
+        self.session.failures = 3
+        self.assertEqual(self.channels[0].query('A'), 'a.A')
+        self.assertEqual(self.fresh.queries, [])
+        counters = self.watchdog.counters()['a']
+        self.assertEqual(counters['reopens'], 0)
+        self.assertGreaterEqual(counters['clears'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
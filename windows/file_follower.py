@@ -0,0 +1,82 @@
+from PyQt5.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+
+import os
+
+from measurement.datafile import DataFile
+
+
+class FileFollower(QObject):
+    """Follows a data file which another process appends to, e.g. a run on the acquisition PC.
+
+    Only the bytes after the last indexed line are read. Changes are noticed
+    by the file system watcher where it works and by comparing the file size
+    every POLL_INTERVAL, since network shares do not report changes.
+    """
+
+    POLL_INTERVAL = 1000  # ms
+
+    appended = pyqtSignal(int)
+    # the file was truncated or replaced, data_file is a new DataFile
+    reopened = pyqtSignal()
+
+    def __init__(self, path: str, poll_interval: int = POLL_INTERVAL, parent: QObject = None) -> None:
+        """
+        :param path: path of a .dat or overview file
+        :param poll_interval: ms between two size checks
+        """
+        super().__init__(parent)
+        self._path = path
+        self._data_file = DataFile(path)
+        self._inode = os.stat(path).st_ino
+
+        self._watcher = QFileSystemWatcher([path], self)
+        self._watcher.fileChanged.connect(self.check)
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.check)
+        self._timer.start(poll_interval)
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def data_file(self) -> DataFile:
+        return self._data_file
+
+    def check(self) -> None:
+        """Index the appended lines and announce them."""
+        try:
+            inode = os.stat(self._path).st_ino
+        except OSError:
+            # the file is being replaced or the share is not reachable, try again later
+            return
+
+        try:
+            if inode != self._inode:
+                raise ValueError('{} was replaced'.format(self._path))
+            count = self._data_file.refresh()
+        except ValueError:
+            try:
+                data_file = DataFile(self._path)
+            except (OSError, ValueError):
+                # replaced once more meanwhile or not readable yet, try again later
+                return
+            # the windows are pointed to the new file before the old one is closed
+            previous, self._data_file = self._data_file, data_file
+            self._inode = inode
+            self.reopened.emit()
+            previous.close()
+            count = 0
+
+        # the watcher forgets files which were replaced
+        if self._path not in self._watcher.files():
+            self._watcher.addPath(self._path)
+
+        if count:
+            self.appended.emit(count)
+
+    def stop(self) -> None:
+        """Stop following, the data file stays open for the windows which still show it."""
+        self._timer.stop()
+        self._watcher.removePaths(self._watcher.files())
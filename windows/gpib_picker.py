@@ -1,13 +1,150 @@
 from PyQt5.QtWidgets import QWidget, QComboBox, QPushButton, QAction, QHBoxLayout
 from PyQt5.QtGui import QPixmap, QIcon, QFont
+from PyQt5.QtCore import QObject, Qt, pyqtSignal
 
 from base64 import b64decode
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Thread
+from time import monotonic
+from typing import Dict, List
 
 from visa import ResourceManager
 
+from startup_profiler import span
+
 REFRESH_ICON = 'iVBORw0KGgoAAAANSUhEUgAAAQAAAAEACAMAAABrrFhUAAADAFBMVEUAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAADMAAGYAAJkAAMwAAP8AMwAAMzMAM2YAM5kAM8wAM/8AZgAAZjMAZmYAZpkAZswAZv8AmQAAmTMAmWYAmZkAmcwAmf8AzAAAzDMAzGYAzJkAzMwAzP8A/wAA/zMA/2YA/5kA/8wA//8zAAAzADMzAGYzAJkzAMwzAP8zMwAzMzMzM2YzM5kzM8wzM/8zZgAzZjMzZmYzZpkzZswzZv8zmQAzmTMzmWYzmZkzmcwzmf8zzAAzzDMzzGYzzJkzzMwzzP8z/wAz/zMz/2Yz/5kz/8wz//9mAABmADNmAGZmAJlmAMxmAP9mMwBmMzNmM2ZmM5lmM8xmM/9mZgBmZjNmZmZmZplmZsxmZv9mmQBmmTNmmWZmmZlmmcxmmf9mzABmzDNmzGZmzJlmzMxmzP9m/wBm/zNm/2Zm/5lm/8xm//+ZAACZADOZAGaZAJmZAMyZAP+ZMwCZMzOZM2aZM5mZM8yZM/+ZZgCZZjOZZmaZZpmZZsyZZv+ZmQCZmTOZmWaZmZmZmcyZmf+ZzACZzDOZzGaZzJmZzMyZzP+Z/wCZ/zOZ/2aZ/5mZ/8yZ///MAADMADPMAGbMAJnMAMzMAP/MMwDMMzPMM2bMM5nMM8zMM//MZgDMZjPMZmbMZpnMZszMZv/MmQDMmTPMmWbMmZnMmczMmf/MzADMzDPMzGbMzJnMzMzMzP/M/wDM/zPM/2bM/5nM/8zM////AAD/ADP/AGb/AJn/AMz/AP//MwD/MzP/M2b/M5n/M8z/M///ZgD/ZjP/Zmb/Zpn/Zsz/Zv//mQD/mTP/mWb/mZn/mcz/mf//zAD/zDP/zGb/zJn/zMz/zP///wD//zP//2b//5n//8z///+vVk0cAAAAAXRSTlMAQObYZgAAAAFiS0dEAIgFHUgAAAAJcEhZcwAADsMAAA7DAcdvqGQAAAAHdElNRQfiBhQNCxLf9h6RAAADrklEQVR42u2d7Y7aQAxFTRwtEqmigIJ4/zetun8qVe0Stti+43v9AOBz4plxPiYxqwv/HZNRhf8ZzOxM/O7E+P6vuFDTUxx+d2p+bnx3an7n5n+Gv/XGvz7jn6mPfvfyJ+d38TPzu/jFz8vv4hf/s7iS8/ctgJ2c38V/JM7k/C5+8XeMRQUgfmYB4he/BIifVoD4JeBg3FUA3PwXFQA3f0sBJxUAt4A7uwDxS4D4JYBXgApAAjQCDseqAuDmlwAJEL8EMPNLgEaABGgESIAEiF8CJCAwoyuxgPRKcywBW/pYAxPg5AIKpltY/iwDSAIqllxHFjCTCShqOmAE1LRdOAKKGk90ARONgOrWu1oAQOtZKqBs5b1hCDgDLb0lApxcAFjz8VXsNUn0ngMhV180Ad5YgJMLAG5AUtLAXoDjs3igr8DRSYT+uRdFWIpj4L+SaGj9Ob6B0OIaQMASOrzc4Q1854fPjQSAzS/pAuBm2EH4jxuY6vjPsccHvwSCk+vQCYI2WoPwHzcwN+XHngZS0nrgGkhKCnYaSEsJ1EBiQvQCVkQDqekADoLkZOAMpKcCZuCSf4KGJaAgEagSKEkDyEBREjAGylI4KuCjq4AfGCVQmADEICj9ewAD+PpjkzjwPPPFEQxsPQvA/VRbAmMswqWtCEQbVtiMgjTiMclMdVMPxonhSOeiRZckgC7HlFyUgrogV3BZEuyS7GdcuwpInwhHvCuRfHPKvbGBUW/NZt6hd1wDTQvghU+/NOVPGwQdHtZvyp8yDazQAhIM9NitEPq48oc3NtBkt8Kv2L/z6w94AS98DT5M7xgFELhtaRT+uI1rwwgI27o4Cn/tW6Wj4d6ehHUUULmBHUNA4SsMQAQczOPGLsD6Cih7kQ2MABtgBYoVYOgLULgAe9sJ1guxjCMg5j9XJAEG3IDkCDDU5TeLv+C1pmgCbuwCDK/7SBZgYM1HvgBDWnpLBJgEoLQef4mcb+9gdB5lBWCpnznBFGCo/GkCVnYBVt16/89d2ffE5xP+ixnnFGCWP9lIAKWATQUgARIgAcT8JxWABFDzS4BGgApAApj5TQXw5i06KgAJEL8ENBWgAlABSID4JaBV3FUA3PymAlABiF8CxP88ZhWA+JkFiL9lbOT8GgAqAPGLn5ffxC9+Zv4bOf+xAtjJ+RdyfhM/M/9Ezm/c/DM5v3Hz7+T8xs1v3PzGzS98Yv5ze/wH9cH/8vCfjJrfmPGNJKjhs19Hh82/mEKhUFTFT7Bm7Bd9Kgv4AAAAAElFTkSuQmCC'
 
 
+class DeviceScanner(QObject):
+    """Scans the GPIB bus in a worker thread and shares the result between all pickers.
+
+    The result of a scan is cached for CACHE_TTL seconds, pickers which are
+    created in the meantime (e.g. one for every measurement method) reuse it.
+    Found addresses are announced one by one with device_found. If
+    identification is requested, every address is asked for '*IDN?' with at
+    most IDENTIFY_WORKERS queries running in parallel. Every scan ends with
+    scan_finished and the found addresses, a failed one with none.
+    """
+
+    scan_started = pyqtSignal()
+    device_found = pyqtSignal(str)
+    device_identified = pyqtSignal(str, str)
+    scan_finished = pyqtSignal(list)
+
+    VISA_LIBRARY = '@py'
+    CACHE_TTL = 60.0
+    IDENTIFY_WORKERS = 4
+    IDENTIFY_TIMEOUT = 1000  # ms
+
+    _instance = None
+
+    @classmethod
+    def instance(cls) -> 'DeviceScanner':
+        """Return the scanner shared by all pickers, it has to be created in the GUI thread."""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self):
+        super().__init__()
+        self._lock = Lock()
+        self._resources = []  # type: List[str]
+        self._identities = {}  # type: Dict[str, str]
+        self._scan_time = None
+        self._thread = None
+        self._error = None  # type: Exception
+
+    @property
+    def resources(self) -> List[str]:
+        with self._lock:
+            return list(self._resources)
+
+    @property
+    def identities(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._identities)
+
+    @property
+    def error(self) -> Exception:
+        """Why the last scan failed, None if it did not."""
+        return self._error
+
+    @property
+    def is_scanning(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def is_fresh(self) -> bool:
+        return self._scan_time is not None and monotonic() - self._scan_time < self.CACHE_TTL
+
+    def scan(self, force: bool = False, identify: bool = False) -> None:
+        """Start a scan unless one is running or the cached result is still fresh.
+
+        :param force: ignore the cached result
+        :param identify: ask every found device for its identification
+        """
+        if self.is_scanning or (self.is_fresh and not force):
+            return
+
+        self._thread = Thread(target=self._scan, args=(identify,), daemon=True)
+        self._thread.start()
+
+    def _scan(self, identify: bool) -> None:
+        with self._lock:
+            self._resources = []
+            if identify:
+                self._identities = {}
+        self._error = None
+        self.scan_started.emit()
+
+        try:
+            with span('bus scan', 'DeviceScanner.scan'):
+                rm = ResourceManager(self.VISA_LIBRARY)
+                try:
+                    try:
+                        found = [x for x in rm.list_resources() if 'GPIB' in x]
+                    except Exception:
+                        found = []
+
+                    for address in found:
+                        with self._lock:
+                            self._resources.append(address)
+                        self.device_found.emit(address)
+
+                    if identify:
+                        self._identify(rm, found)
+                finally:
+                    rm.close()
+        except Exception as error:
+            # e.g. no VISA library, the pickers waiting for the scan are told that nothing was found
+            print('WARNING', 'GPIB scan failed: {}'.format(error))
+            self._error = error
+            with self._lock:
+                self._resources = []
+        finally:
+            # a failed scan is cached as well, so not every new picker tries again
+            self._scan_time = monotonic()
+            self.scan_finished.emit(self.resources)
+
+    def _identify(self, rm: ResourceManager, addresses: List[str]) -> None:
+        def identify_one(address):
+            try:
+                resource = rm.open_resource(address, timeout=self.IDENTIFY_TIMEOUT)
+                try:
+                    identity = resource.query('*IDN?').strip()
+                finally:
+                    resource.close()
+            except Exception:
+                return
+
+            with self._lock:
+                self._identities[address] = identity
+            self.device_identified.emit(address, identity)
+
+        with ThreadPoolExecutor(max_workers=self.IDENTIFY_WORKERS) as executor:
+            list(executor.map(identify_one, addresses))
+
+
 class GPIBPicker(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -27,42 +164,64 @@ class GPIBPicker(QWidget):
         font.setPointSize(20)
         font.setWeight(QFont.Bold)
         button.setFont(font)
+        button.setToolTip('refresh devices\nright-click to identify devices')
         #button.setIcon(icon)
 
         button.clicked.connect(self.update_devices)
 
+        button.setContextMenuPolicy(Qt.ActionsContextMenu)
+        identify_action = QAction('identify devices (*IDN?)', button)
+        identify_action.triggered.connect(self.identify_devices)
+        button.addAction(identify_action)
+
         layout.addWidget(button)
 
-        self._resources = []
+        self._selected_address = ''
 
-        self.update_devices()
+        self._scanner = DeviceScanner.instance()
+        self._scanner.scan_started.connect(self._clear)
+        self._scanner.device_found.connect(self._add_device)
+        self._scanner.device_identified.connect(self._set_identity)
+
+        # fill in what is already known and only scan if the cache is stale
+        for address in self._scanner.resources:
+            self._add_device(address)
+        for address, identity in self._scanner.identities.items():
+            self._set_identity(address, identity)
+        self._scanner.scan()
 
     @property
     def device_address(self):
         return self._combobox.currentText()
 
     def update_devices(self):
-        rm = ResourceManager('@py')
+        self._scanner.scan(force=True)
 
-        try:
-            self._resources = [ x for x in rm.list_resources() if 'GPIB' in x]
-        except:
-            self._resources = []
+    def identify_devices(self):
+        self._scanner.scan(force=True, identify=True)
 
+    def _clear(self):
+        if self._combobox.count() > 0:
+            self._selected_address = self._combobox.currentText()
         self._combobox.clear()
 
-        for item in self._resources:
-            self._combobox.addItem(item)
+    def _add_device(self, address):
+        if self._combobox.findText(address) < 0:
+            self._combobox.addItem(address)
+
+        if address == self._selected_address:
+            self._combobox.setCurrentIndex(self._combobox.findText(address))
 
-        rm.close()
+    def _set_identity(self, address, identity):
+        index = self._combobox.findText(address)
+        if index >= 0:
+            self._combobox.setItemData(index, identity, Qt.ToolTipRole)
 
     def select_device(self, address):
-        if address in self._resources:
-            index = self._resources.index(address)
+        self._selected_address = address
+        index = self._combobox.findText(address)
+        if index >= 0:
             self._combobox.setCurrentIndex(index)
 
     def text(self):
         return self._combobox.currentText()
-
-
-
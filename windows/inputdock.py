@@ -214,3 +214,16 @@ class InputDock(QDockWidget):
             widget.show()
 
             self._contacts_picker.set_number_of_contacts(method.number_of_contacts())
+            self._load_method(name, method)
+
+    def _load_method(self, name, method):
+        """Import the module of a lazily registered method when it gets selected."""
+        if not hasattr(method, "load"):
+            return
+
+        try:
+            method.load()
+        except ImportError as error:
+            self._measure_button.setDisabled(True)
+            message = QErrorMessage(self)
+            message.showMessage("Could not load '{}': {}".format(name, error))
@@ -1,4 +1,4 @@
-from PyQt5.QtWidgets import QMdiSubWindow, QSizePolicy, QWidget, QVBoxLayout
+from PyQt5.QtWidgets import QMdiSubWindow, QSizePolicy, QWidget, QVBoxLayout, QCheckBox
 from PyQt5.QtGui import QIcon, QPixmap
 from PyQt5.QtCore import Qt
 
@@ -10,9 +10,11 @@ from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as Navigatio
 from matplotlib.figure import Figure
 from matplotlib.backend_bases import MouseEvent
 
+import numpy as np
 from pandas import DataFrame
 from typing import List, Tuple
 
+from measurement.history import DataHistory
 from measurement.measurement import PlotRecommendation
 
 
@@ -76,6 +78,10 @@ class PlotWidget(FigureCanvas):
 class PlotWindow(QMdiSubWindow):
     """This is a simple sub window to show a plot of data
     """
+
+    # the whole run is thinned out to this many points
+    MAX_HISTORY_POINTS = 5000
+
     def __init__(self, plot_recommendation: PlotRecommendation, plot_title_suffix: str,
                  x_axis_label: str, y_axis_label: str) -> None:
         super().__init__()
@@ -100,6 +106,14 @@ class PlotWindow(QMdiSubWindow):
         main_layout.addWidget(NavigationToolbar(self._plot_widget, self))
         main_layout.addWidget(self._plot_widget)
 
+        self._history = None  # type: DataHistory
+        self._columns = []  # type: List[str]
+        self._whole_run_box = QCheckBox('whole run')
+        self._whole_run_box.setToolTip('also show the points which are no longer kept in memory')
+        self._whole_run_box.setVisible(False)
+        self._whole_run_box.toggled.connect(lambda _: self.update_history())
+        main_layout.addWidget(self._whole_run_box)
+
         window_icon_pixmap = QPixmap(1, 1)
         window_icon_pixmap.fill(Qt.transparent)
         self.setWindowIcon(QIcon(window_icon_pixmap))
@@ -126,7 +140,145 @@ class PlotWindow(QMdiSubWindow):
                     self._plot_widget.add_figure(fit_data[:, 0], fit_data[:, 1], '-')
                 self._plot_widget.add_text(show_text)
 
+    def show_history(self, history: DataHistory, columns: Tuple[str, str]) -> None:
+        """
+        Shows two columns of the points of a run, call update_history when points were added
+        :param history: the points of the run
+        :param columns: the x and y column
+        """
+        self._history = history
+        self._columns = list(columns)
+        self._whole_run_box.setVisible(history.bounded)
+
+    @property
+    def columns(self) -> Tuple[str, str]:
+        return tuple(self._columns)
+
+    def update_history(self) -> None:
+        if self._history is None or not all(column in self._history.columns for column in self._columns):
+            return
+
+        if self._whole_run_box.isChecked():
+            data = self._history.values(self._columns, max_points=self.MAX_HISTORY_POINTS)
+        else:
+            data = self._history.window(self._columns)
+        self.update_data(data)
+
     def save_plot(self, file_path: str) -> None:
         """Save this plot to file as PDF."""
         self._plot_widget.save_figure(file_path)
-        
+
+
+class ImagePlotWindow(QMdiSubWindow):
+    """Shows z against x and y as an image, for points which are not on a regular grid like those of an adaptive map.
+
+    Every pixel gets the value of the nearest point. Only the points added
+    since the last update are drawn into the image, it is built again from
+    all points when a point lies outside of it.
+    """
+
+    RESOLUTION = 200
+
+    def __init__(self, plot_recommendation: PlotRecommendation, plot_title_suffix: str,
+                 x_axis_label: str, y_axis_label: str, z_axis_label: str) -> None:
+        super().__init__()
+
+        self.resize(512, 512)
+        self.setWindowTitle("{} {}".format(plot_recommendation.title, plot_title_suffix))
+
+        main_widget = QWidget()
+        self.setWidget(main_widget)
+        main_layout = QVBoxLayout()
+        main_widget.setLayout(main_layout)
+
+        self._figure = Figure(figsize=(5, 4), dpi=72)
+        self._axes = self._figure.add_subplot(111)
+        self._axes.set_title("{} {}".format(plot_recommendation.title, plot_title_suffix))
+        self._axes.set_xlabel(x_axis_label)
+        self._axes.set_ylabel(y_axis_label)
+        self._canvas = FigureCanvas(self._figure)
+        self._canvas.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+
+        main_layout.addWidget(NavigationToolbar(self._canvas, self))
+        main_layout.addWidget(self._canvas)
+
+        self._image = None
+        self._z_axis_label = z_axis_label
+
+        self._history = None  # type: DataHistory
+        self._columns = []  # type: List[str]
+        self._points = np.empty((0, 3))
+        self._clear_image(((0.0, 0.0), (0.0, 0.0)))
+
+        window_icon_pixmap = QPixmap(1, 1)
+        window_icon_pixmap.fill(Qt.transparent)
+        self.setWindowIcon(QIcon(window_icon_pixmap))
+
+    def show_history(self, history: DataHistory, columns: Tuple[str, str, str]) -> None:
+        """
+        Shows three columns of the points of a run, call update_history when points were added
+        :param history: the points of the run
+        :param columns: the x, y and z column
+        """
+        self._history = history
+        self._columns = list(columns)
+        self._points = np.empty((0, 3))
+        self._clear_image(((0.0, 0.0), (0.0, 0.0)))
+
+    @property
+    def columns(self) -> Tuple[str, str, str]:
+        return tuple(self._columns)
+
+    def _clear_image(self, extent) -> None:
+        self._extent = extent
+        self._distances = np.full((self.RESOLUTION, self.RESOLUTION), np.inf)
+        self._values = np.full((self.RESOLUTION, self.RESOLUTION), np.nan)
+        # pixel centres in units of the width and height of the image
+        self._pixels_x = (np.arange(self.RESOLUTION) + 0.5) / self.RESOLUTION
+        self._pixels_y = self._pixels_x[:, np.newaxis]
+
+    def _paint(self, points: np.ndarray) -> None:
+        (x0, x1), (y0, y1) = self._extent
+        width, height = (x1 - x0) or 1.0, (y1 - y0) or 1.0
+        for x, y, z in points:
+            distances = ((self._pixels_x - (x - x0) / width) ** 2 +
+                         (self._pixels_y - (y - y0) / height) ** 2)
+            closer = distances < self._distances
+            self._distances[closer] = distances[closer]
+            self._values[closer] = z
+
+    def update_history(self) -> None:
+        if self._history is None or not all(column in self._history.columns for column in self._columns):
+            return
+
+        if len(self._history) < len(self._points):
+            self.show_history(self._history, self.columns)
+        new_points = self._history.values(self._columns, start=len(self._points)).values.astype(float)
+        new_points = new_points[np.all(np.isfinite(new_points), axis=1)]
+        if len(new_points) == 0:
+            return
+        self._points = np.vstack((self._points, new_points))
+
+        (x0, x1), (y0, y1) = self._extent
+        if (new_points[:, 0].min() < x0 or new_points[:, 0].max() > x1 or
+                new_points[:, 1].min() < y0 or new_points[:, 1].max() > y1 or len(self._points) == len(new_points)):
+            self._clear_image(((self._points[:, 0].min(), self._points[:, 0].max()),
+                               (self._points[:, 1].min(), self._points[:, 1].max())))
+            self._paint(self._points)
+        else:
+            self._paint(new_points)
+        self._draw()
+
+    def _draw(self) -> None:
+        (x0, x1), (y0, y1) = self._extent
+        if self._image is None:
+            self._image = self._axes.imshow(self._values, origin='lower', aspect='auto', interpolation='nearest')
+            self._figure.colorbar(self._image, ax=self._axes, label=self._z_axis_label)
+        self._image.set_data(self._values)
+        self._image.set_extent((x0, x1 if x1 > x0 else x0 + 1, y0, y1 if y1 > y0 else y0 + 1))
+        self._image.set_clim(np.nanmin(self._values), np.nanmax(self._values))
+        self._canvas.draw_idle()
+
+    def save_plot(self, file_path: str) -> None:
+        """Save this plot to file as PDF."""
+        self._figure.savefig(file_path)
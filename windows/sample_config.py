@@ -56,6 +56,11 @@ class SampleConfig(QWidget):
             sample = samples[selected_text]
             self.sample_selection_changed.emit(sample)
 
+    @property
+    def groups(self):
+        """All saved contact groups, names mapped to lists of contacts."""
+        return {name: list(contacts) for name, contacts in self._configuration['samples'].items()}
+
     def save_to_file(self, file_path: str):
         with open(file_path, 'w', encoding='utf-8') as fil:
             json.dump(self._configuration, fil, indent=4)
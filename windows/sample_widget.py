@@ -163,6 +163,26 @@ class ContactsView(QMainWindow):
         self.selection_changed.emit()
 
         self.update()
+
+    def sequence(self, steps: int = None):
+        """Return the selections which repeated calls of next() would produce.
+
+        The current selection is the first element. Without steps the whole
+        ring is walked once, i.e. every position is visited one time.
+        """
+        if steps is None:
+            steps = len(self._contacts)
+
+        sectors = ['', 'I', 'II', 'III', 'IV']
+        names = ['{:s}{:1d}'.format(sectors[contact['sector']], contact['contact'])
+                 for contact in self._contacts]
+        selection = [contact['selected'] for contact in self._contacts]
+
+        result = []
+        for _ in range(steps):
+            result.append([name for name, selected in zip(names, selection) if selected])
+            selection = [selection[-1]] + selection[:-1]
+        return result
             
         
 
@@ -309,6 +329,9 @@ class ContactsSelector(QWidget):
     def next(self):
         self._sample_dialog.next()
 
+    def sequence(self, steps: int = None):
+        return self._sample_dialog.sequence(steps)
+
     def _clicked(self):
         if self._sample_dialog.isVisible():
             self._sample_dialog.hide()
@@ -0,0 +1,73 @@
+from PyQt5.QtWidgets import QMdiSubWindow, QTableWidget, QTableWidgetItem, QVBoxLayout, QWidget, QLabel
+from PyQt5.QtCore import Qt, QTimer
+
+from typing import Callable, Optional
+
+from measurement.timing import TimingRecorder
+
+
+class StatsWindow(QMdiSubWindow):
+    """Shows the live latency statistics of the running measurement."""
+
+    UPDATE_INTERVAL = 1000  # ms
+
+    COLUMNS = ['span', 'count', 'p50 [ms]', 'p99 [ms]', 'max [ms]']
+
+    def __init__(self, get_recorder: Callable[[], Optional[TimingRecorder]]) -> None:
+        """
+        :param get_recorder: returns the recorder of the measurement to show or None
+        """
+        super().__init__()
+        self._get_recorder = get_recorder
+
+        self._summary_label = QLabel()
+        self._table = QTableWidget(0, len(self.COLUMNS))
+        self._table.setHorizontalHeaderLabels(self.COLUMNS)
+        self._table.verticalHeader().hide()
+
+        layout = QVBoxLayout()
+        layout.addWidget(self._summary_label)
+        layout.addWidget(self._table)
+        widget = QWidget()
+        widget.setLayout(layout)
+
+        self.setWidget(widget)
+        self.setWindowTitle('Statistics')
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.update_stats)
+        self._timer.start(self.UPDATE_INTERVAL)
+        self.update_stats()
+
+    def update_stats(self) -> None:
+        recorder = self._get_recorder()
+        if recorder is None:
+            self._summary_label.setText('no statistics available')
+            self._table.setRowCount(0)
+            return
+
+        summary = recorder.summary()
+        self._summary_label.setText(
+            '{} points, {} points/s (now {}), bus utilization {}'.format(
+                summary['points'],
+                _format(summary['points_per_second'], '{:.2f}'),
+                _format(summary['current_points_per_second'], '{:.2f}'),
+                _format(summary['bus_utilization'], '{:.0%}')))
+
+        spans = summary['spans']
+        self._table.setRowCount(len(spans))
+        for row, (name, span) in enumerate(spans.items()):
+            values = [name, str(span['count']), _format(span['p50_ms'], '{:.2f}'),
+                      _format(span['p99_ms'], '{:.2f}'), _format(span['max_ms'], '{:.2f}')]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                item.setFlags(Qt.ItemIsEnabled)
+                self._table.setItem(row, column, item)
+
+    def closeEvent(self, event) -> None:
+        self._timer.stop()
+        super().closeEvent(event)
+
+
+def _format(value: Optional[float], pattern: str) -> str:
+    return '-' if value is None else pattern.format(value)
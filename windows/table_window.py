@@ -3,6 +3,8 @@ from PyQt5.QtCore import QAbstractTableModel, Qt, QVariant, QModelIndex
 
 import pandas
 
+from measurement.history import DataHistory
+
 class PandasTableDataModel(QAbstractTableModel):
     """This helps to display pandas DataFrames in a TableView"""
     def __init__(self, data: pandas.DataFrame) -> None:
@@ -51,6 +53,51 @@ class PandasTableDataModel(QAbstractTableModel):
         return QVariant()
 
 
+class HistoryTableModel(QAbstractTableModel):
+    """Shows a DataHistory, rows which were moved to disk are read when they become visible"""
+    def __init__(self, history: DataHistory) -> None:
+        super().__init__()
+        self.__history = history
+        self.__rows = len(history)
+        self.__columns = history.columns
+
+    @property
+    def history(self) -> DataHistory:
+        return self.__history
+
+    def refresh(self) -> None:
+        """tells the view about the points which were appended since the last call"""
+        columns = self.__history.columns
+        if columns != self.__columns:
+            self.beginResetModel()
+            self.__rows = len(self.__history)
+            self.__columns = columns
+            self.endResetModel()
+        elif len(self.__history) > self.__rows:
+            self.beginInsertRows(QModelIndex(), self.__rows, len(self.__history) - 1)
+            self.__rows = len(self.__history)
+            self.endInsertRows()
+
+    def rowCount(self, parent: QModelIndex = None, *args, **kwargs) -> int:
+        return self.__rows
+
+    def columnCount(self, parent: QModelIndex = None, *args, **kwargs) -> int:
+        return len(self.__columns)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> QVariant:
+        if index.isValid() and role == Qt.DisplayRole:
+            return QVariant(str(self.__history.value(index.row(), index.column())))
+        return QVariant()
+
+    def headerData(self, index: QModelIndex, orientation: Qt.Orientation = Qt.Horizontal,
+                   role: int = Qt.DisplayRole) -> QVariant:
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return QVariant(str(self.__columns[index]))
+        elif orientation == Qt.Vertical and role == Qt.DisplayRole:
+            return QVariant(str(index))
+        return QVariant()
+
+
 class TableWindow(QMdiSubWindow):
     """This is a simple sub window to show a table of data
     """
@@ -60,6 +107,7 @@ class TableWindow(QMdiSubWindow):
         self.setWindowFlags(Qt.WindowTitleHint | Qt.CustomizeWindowHint)
 
         self.__table = QTableView()
+        self.__history_model = None  # type: HistoryTableModel
 
         self.setWidget(self.__table)
         self.setWindowTitle('Table')
@@ -70,10 +118,31 @@ class TableWindow(QMdiSubWindow):
         :param data: A Pandas DataFrame with the containing Data
         :return:
         """
+        self.__history_model = None
         model = PandasTableDataModel(data)
         self.__table.setModel(model)
         self.__table.scrollToBottom()
 
+    def show_history(self, history: DataHistory) -> None:
+        """
+        Shows the data of a run, call update_history when points were added
+        :param history: the points of the run
+        """
+        self.__history_model = HistoryTableModel(history)
+        self.__table.setModel(self.__history_model)
+        self.__table.scrollToBottom()
+
+    @property
+    def history(self):
+        """the history or data file which is shown, None for a DataFrame"""
+        return self.__history_model.history if self.__history_model is not None else None
+
+    def update_history(self) -> None:
+        if self.__history_model is None:
+            return
+        self.__history_model.refresh()
+        self.__table.scrollToBottom()
+
     @property
     def selected_columns(self) -> int:
         return 0